@@ -15,10 +15,40 @@ def create_app() -> Flask:
     frontend_origin = os.getenv("FRONTEND_ORIGIN", "*")
     CORS(app, resources={r"/*": {"origins": frontend_origin}})
 
+    # orjson-backed JSON (when installed) with the same output as Flask's default
+    from .serialization import FastJSONProvider
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+
+    # Server-Timing headers and sampled trace logs (SERVER_TIMING, TRACE_SAMPLE_RATE)
+    from .tracing import init_tracing
+    init_tracing(app)
+
+    # gzip/brotli/zstd for larger text and JSON bodies (COMPRESS, COMPRESS_MIN_SIZE, COMPRESS_LEVEL)
+    from .compression import init_compression
+    init_compression(app)
+
     # Register API blueprint
     from .routes import api_bp
     app.register_blueprint(api_bp, url_prefix="/api")
 
+    # Build the optional in-process search, typeahead, leaderboard and analytics
+    # snapshots (SEARCH_INDEX=trigram, SUGGEST_INDEX=1, LEADERBOARD=1,
+    # ANALYTICS_ENGINE=numpy) off the request path
+    from .columnar import start_background_load as start_analytics_load
+    from .db import db_connection
+    from .leaderboard import start_background_load as start_leaderboard_load
+    from .search_index import start_background_load
+    from .suggest import start_background_load as start_suggest_load
+    loads = [
+        start_background_load(db_connection),
+        start_suggest_load(db_connection),
+        start_leaderboard_load(db_connection),
+        start_analytics_load(db_connection),
+    ]
+    # serve.py --preload waits on these so forked workers inherit built indexes
+    app.extensions["background_loads"] = [t for t in loads if t is not None]
+
     @app.get("/")
     def root():  # type: ignore
         return jsonify({"status": "ok"})
@@ -0,0 +1,528 @@
+"""ASGI serving mode.
+
+The reads that spend their time waiting on MySQL (search, suggest, the user
+lists, the DB ping) are served natively on the event loop through an aiomysql
+pool, so thousands of slow requests can be in flight in one process without a
+thread each. They run the same SQL that db.py builds for the Flask routes.
+
+Every other route (writes, bulk import, analytics, metrics, ...) is handed to
+the regular Flask app on a small thread pool, so both serving modes have the
+same routes. The analytics are answered from the result cache almost every
+time, so they gain little from a native async path.
+
+The native routes return the same bodies but skip the Flask response layers:
+they send no ETag and never answer 304, their replies are not compressed, and
+they always read from the primary, ignoring the read_primary cookie.
+
+Run with uvicorn (pip install -r requirements-async.txt)::
+
+    uvicorn --factory app.asgi:create_asgi_app --host 127.0.0.1 --port 5001
+"""
+
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple, Union, cast
+from urllib.parse import parse_qsl
+
+try:
+    import aiomysql  # type: ignore
+except ImportError:  # optional dependency, see requirements-async.txt
+    aiomysql = None
+
+from flask import Flask
+
+from . import create_app
+from .db import (
+    ALL_USERS_SQL,
+    SEARCH_DEFAULT_LIMIT,
+    SEARCH_MAX_LIMIT,
+    SEARCH_STREAM_BATCH,
+    SUGGEST_CATEGORIES,
+    _SEARCH_SPECS,
+    InvalidCursorError,
+    _build_search_sql,
+    _finish_search_page,
+    _get_db_config,
+    _strip_keys,
+    _suggest_query,
+    decode_search_cursor,
+)
+from .metrics import get_db_metrics
+from .serialization import encode_line, shaped, wants_columns
+from .suggest import SUGGEST_MAX_LIMIT, get_suggester
+from .tracing import Trace, activate, add_span, finish_trace, tracing_settings
+
+logger = logging.getLogger(__name__)
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def _get_asgi_config() -> Dict[str, Any]:
+    """Load async pool and WSGI bridge sizing from environment variables."""
+    return {
+        "pool_size": int(os.getenv("ASYNC_DB_POOL_SIZE", "50")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "5")),
+        "pool_recycle": float(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "wsgi_threads": int(os.getenv("ASGI_WSGI_THREADS", "8")),
+    }
+
+
+# Async data path
+
+
+class AsyncDatabase:
+    """aiomysql pool for the native routes, created on first use inside the serving loop.
+
+    Statements are recorded in the same DB metrics and Server-Timing spans as
+    the synchronous path, labelled after the route handler that issued them.
+    """
+
+    def __init__(self, max_size: int = 50, timeout: float = 5.0, recycle: float = 1800.0) -> None:
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self._pool: Any = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _get_pool(self) -> Any:
+        if self._pool is None:
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                if self._pool is None:
+                    cfg = _get_db_config()
+                    self._pool = await aiomysql.create_pool(
+                        host=cfg["host"],
+                        port=cfg["port"],
+                        user=cfg["user"],
+                        password=cfg["password"],
+                        db=cfg["database"],
+                        minsize=1,
+                        maxsize=self.max_size,
+                        pool_recycle=int(self.recycle),
+                        connect_timeout=3,
+                        autocommit=True,
+                    )
+        return self._pool
+
+    async def _acquire(self) -> Tuple[Any, Any]:
+        pool = await self._get_pool()
+        started = time.perf_counter()
+        conn = await asyncio.wait_for(pool.acquire(), self.timeout)
+        waited = time.perf_counter() - started
+        metrics = get_db_metrics()
+        if metrics.enabled:
+            metrics.observe_checkout(waited)
+        add_span("db-checkout", waited)
+        return pool, conn
+
+    def _record(self, name: str, sql: str, params: Any, seconds: float, rows: int) -> None:
+        add_span("sql", seconds, name)
+        metrics = get_db_metrics()
+        if not metrics.enabled:
+            return
+        metrics.observe_query(name, seconds, rows)
+        if metrics.slow_ms and seconds * 1000 >= metrics.slow_ms:
+            metrics.observe_slow(name, None, sql, params, seconds, rows)
+
+    async def fetchall(self, sql: str, params: Any = None) -> List[Dict[str, Any]]:
+        name = get_db_metrics().query_name(sys._getframe(1).f_code.co_name, sql)
+        pool, conn = await self._acquire()
+        started = time.perf_counter()
+        try:
+            async with conn.cursor(aiomysql.DictCursor) as cur:
+                await cur.execute(sql, params)
+                rows = list(await cur.fetchall() or [])
+        except Exception:
+            get_db_metrics().observe_error(name)
+            raise
+        finally:
+            pool.release(conn)
+        self._record(name, sql, params, time.perf_counter() - started, len(rows))
+        return rows
+
+    async def stream(
+        self, caller: str, sql: str, params: Any = None, batch_size: int = SEARCH_STREAM_BATCH
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Yield rows off an unbuffered cursor; an abandoned stream closes its connection.
+
+        ``caller`` names the statement in the metrics (an async generator
+        can't see who is iterating it).
+        """
+        name = get_db_metrics().query_name(caller, sql)
+        pool, conn = await self._acquire()
+        started = time.perf_counter()
+        count = 0
+        finished = False
+        try:
+            cur = await conn.cursor(aiomysql.SSDictCursor)
+            await cur.execute(sql, params)
+            while True:
+                batch = await cur.fetchmany(batch_size)
+                if not batch:
+                    break
+                count += len(batch)
+                for row in batch:
+                    yield row
+            await cur.close()
+            finished = True
+        except Exception:
+            get_db_metrics().observe_error(name)
+            raise
+        finally:
+            if not finished:
+                # Draining the rest of the result set could take as long as
+                # the query; drop the connection instead
+                conn.close()
+            pool.release(conn)
+            self._record(name, sql, params, time.perf_counter() - started, count)
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
+
+# Native routes
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    args: Dict[str, str]
+    headers: Dict[str, str]
+
+
+class Reply(NamedTuple):
+    status: int
+    body: Union[Any, AsyncIterator[bytes]]
+    content_type: str = "application/json"
+
+
+Handler = Callable[["AsgiApp", Request], Awaitable[Reply]]
+
+
+async def api_health(app: "AsgiApp", req: Request) -> Reply:
+    return Reply(200, {"status": "ok", "service": "api"})
+
+
+async def db_ping(app: "AsgiApp", req: Request) -> Reply:
+    try:
+        await app.db.fetchall("SELECT 1")
+        ok = True
+    except Exception as exc:
+        logger.error("DB ping failed: %s", exc)
+        ok = False
+    return Reply(200, {
+        "status": "ok" if ok else "error",
+        "error": None if ok else "Database connection failed",
+    })
+
+
+async def get_users(app: "AsgiApp", req: Request) -> Reply:
+    try:
+        return Reply(200, shaped(await app.db.fetchall(ALL_USERS_SQL), wants_columns(req.args)))
+    except Exception as exc:
+        logger.error(f"/users failed: {exc}")
+        return Reply(500, {"error": "Failed to fetch users"})
+
+
+async def get_all_users(app: "AsgiApp", req: Request) -> Reply:
+    try:
+        return Reply(200, shaped(await app.db.fetchall(ALL_USERS_SQL), wants_columns(req.args)))
+    except Exception as exc:
+        # Same contract as db.get_all_users(): an empty list on failure
+        logger.error(f"/users/all failed: {exc}")
+        return Reply(200, [])
+
+
+async def api_search(app: "AsgiApp", req: Request) -> Reply:
+    """Mirror of routes.api_search: full list, keyset page or NDJSON stream."""
+    query = req.args.get("q", "")
+    category = req.args.get("category", "media")
+    sort = req.args.get("sort", "az")
+    token = req.args.get("cursor")
+    raw_limit = req.args.get("limit")
+    stream = req.args.get("stream", "").lower() in ("1", "true", "yes")
+
+    after = None
+    if token:
+        try:
+            after = decode_search_cursor(token, category, sort, query)
+        except InvalidCursorError as exc:
+            return Reply(400, {"error": str(exc)})
+
+    if category not in _SEARCH_SPECS:
+        return Reply(400 if stream else 500, {"error": "Invalid category"})
+
+    if stream:
+        sql, params = _build_search_sql(query, category, sort, after=after)
+        rows = app.db.stream("api_search", sql, tuple(params))
+        # As in routes.api_search: setup failures get a 500, later ones a last error line
+        try:
+            first: Optional[Dict[str, Any]] = await rows.__anext__()
+        except StopAsyncIteration:
+            first = None
+        except Exception as exc:
+            logger.error(f"/search stream failed: {exc}")
+            return Reply(500, {"error": "Search failed"})
+
+        async def generate() -> AsyncIterator[bytes]:
+            try:
+                if first is not None:
+                    yield encode_line(_strip_keys(first))
+                async for row in rows:
+                    yield encode_line(_strip_keys(row))
+            except Exception as exc:
+                logger.error(f"/search stream failed: {exc}")
+                yield encode_line({"error": "Search failed"})
+            finally:
+                await rows.aclose()
+
+        return Reply(200, generate(), "application/x-ndjson")
+
+    if raw_limit is not None or token:
+        try:
+            limit = int(raw_limit) if raw_limit is not None else SEARCH_DEFAULT_LIMIT
+        except ValueError:
+            return Reply(400, {"error": "limit must be an integer"})
+        limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+        try:
+            sql, params = _build_search_sql(query, category, sort, after=after, limit=limit + 1, with_keys=True)
+            rows = await app.db.fetchall(sql, tuple(params))
+        except Exception as exc:
+            logger.error(f"/search failed: {exc}")
+            return Reply(500, {"error": "Search failed"})
+        items, next_cursor = _finish_search_page(rows, query, category, sort, limit)
+        if wants_columns(req.args):
+            return Reply(200, {**shaped(items, True).to_json_value(), "next_cursor": next_cursor})
+        return Reply(200, {"items": items, "next_cursor": next_cursor})
+
+    try:
+        sql, params = _build_search_sql(query, category, sort)
+        rows = await app.db.fetchall(sql, tuple(params))
+    except Exception as exc:
+        logger.error(f"/search failed: {exc}")
+        return Reply(500, {"error": "Search failed"})
+    return Reply(200, shaped([_strip_keys(row) for row in rows], wants_columns(req.args)))
+
+
+async def api_suggest(app: "AsgiApp", req: Request) -> Reply:
+    prefix = req.args.get("q", "").strip()
+    category = req.args.get("category", "all")
+    try:
+        limit = int(req.args.get("limit", 10))
+    except ValueError:
+        return Reply(400, {"error": "limit must be an integer"})
+    if not prefix:
+        return Reply(200, [])
+    if category not in SUGGEST_CATEGORIES:
+        return Reply(400, {"error": "Invalid category"})
+    limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+
+    found = get_suggester().complete(prefix, category, limit)
+    if found is not None:
+        return Reply(200, found)
+    try:
+        sql, params = _suggest_query(prefix, category, limit)
+        rows = await app.db.fetchall(sql, params)
+    except Exception as exc:
+        logger.error(f"/suggest failed: {exc}")
+        return Reply(500, {"error": "Suggest failed"})
+    for row in rows:
+        row["weight"] = int(row["weight"])
+    return Reply(200, rows)
+
+
+NATIVE_ROUTES: Dict[str, Handler] = {
+    "/api/health": api_health,
+    "/api/db/ping": db_ping,
+    "/api/users": get_users,
+    "/api/users/all": get_all_users,
+    "/api/search": api_search,
+    "/api/suggest": api_suggest,
+}
+
+
+# WSGI bridge
+
+
+def _wsgi_environ(scope: Scope, body: bytes) -> Dict[str, Any]:
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ: Dict[str, Any] = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": str(client[0]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+            continue
+        if name == "CONTENT_LENGTH":
+            environ["CONTENT_LENGTH"] = value
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _run_wsgi(wsgi_app: Flask, environ: Dict[str, Any]) -> Tuple[int, List[Tuple[str, str]], bytes]:
+    """Call the Flask app in a worker thread and buffer its whole response."""
+    started: List[Any] = []
+
+    def start_response(status: str, headers: List[Tuple[str, str]], exc_info: Any = None) -> Callable[[bytes], None]:
+        started[:] = [status, headers]
+        return lambda data: None
+
+    result = wsgi_app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        close = getattr(result, "close", None)
+        if close is not None:
+            close()
+    status, headers = started
+    return int(status.split(" ", 1)[0]), headers, body
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+# Application
+
+
+class AsgiApp:
+    """ASGI application: native async routes plus the Flask app for everything else."""
+
+    def __init__(self, flask_app: Flask, db: Any, wsgi_threads: int = 8) -> None:
+        self.flask_app = flask_app
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=max(1, wsgi_threads), thread_name_prefix="asgi-wsgi")
+        self._allow_origin = os.getenv("FRONTEND_ORIGIN", "*")
+        self._server_timing, self._sample_rate = tracing_settings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        handler = NATIVE_ROUTES.get(scope["path"]) if scope["method"] == "GET" else None
+        if handler is None:
+            await self._call_wsgi(scope, receive, send)
+        else:
+            await self._call_native(handler, scope, send)
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.db.close()
+                self._executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _call_wsgi(self, scope: Scope, receive: Receive, send: Send) -> None:
+        body = await _read_body(receive)
+        environ = _wsgi_environ(scope, body)
+        loop = asyncio.get_running_loop()
+        status, headers, payload = await loop.run_in_executor(self._executor, _run_wsgi, self.flask_app, environ)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+        })
+        await send({"type": "http.response.body", "body": payload})
+
+    def _cors_headers(self, req: Request) -> List[Tuple[bytes, bytes]]:
+        # What Flask-CORS sends for a simple GET
+        if self._allow_origin == "*":
+            return [(b"access-control-allow-origin", b"*")]
+        origin = req.headers.get("origin")
+        if origin == self._allow_origin:
+            return [(b"access-control-allow-origin", origin.encode("latin-1")), (b"vary", b"Origin")]
+        return []
+
+    async def _call_native(self, handler: Handler, scope: Scope, send: Send) -> None:
+        req = Request(
+            method=scope["method"],
+            path=scope["path"],
+            args=dict(parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)),
+            headers={k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])},
+        )
+        trace = Trace(req.method, req.path, self._sample_rate > 0 and random.random() < self._sample_rate)
+        with activate(trace):
+            try:
+                reply = await handler(self, req)
+            except Exception as exc:
+                logger.error(f"{req.path} failed: {exc}")
+                reply = Reply(500, {"error": "Internal Server Error"})
+
+            streaming = hasattr(reply.body, "__aiter__")
+            headers = [(b"content-type", reply.content_type.encode("latin-1"))]
+            headers += self._cors_headers(req)
+            if not streaming:
+                # Same encoding as jsonify() outside debug mode
+                body = self.flask_app.json.encode(reply.body) + b"\n"
+                headers.append((b"content-length", str(len(body)).encode("latin-1")))
+            if self._server_timing:
+                # A stream's header only covers the time before its first row, as under Flask
+                headers.append((b"server-timing", finish_trace(trace, reply.status).encode("latin-1")))
+                headers.append((b"timing-allow-origin", self._allow_origin.encode("latin-1")))
+
+            await send({"type": "http.response.start", "status": reply.status, "headers": headers})
+            if not streaming:
+                await send({"type": "http.response.body", "body": body})
+                return
+            chunks = cast(Any, reply.body)
+            try:
+                async for chunk in chunks:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            finally:
+                # Releases the connection now if the client went away mid-stream
+                await chunks.aclose()
+            await send({"type": "http.response.body", "body": b""})
+
+
+def create_asgi_app() -> AsgiApp:
+    """Factory for uvicorn (``--factory app.asgi:create_asgi_app``)."""
+    if aiomysql is None:
+        raise RuntimeError("ASGI mode needs aiomysql: pip install -r requirements-async.txt")
+    cfg = _get_asgi_config()
+    db = AsyncDatabase(cfg["pool_size"], cfg["pool_timeout"], cfg["pool_recycle"])
+    return AsgiApp(create_app(), db, cfg["wsgi_threads"])
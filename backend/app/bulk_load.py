@@ -0,0 +1,393 @@
+import csv
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .migrate import iter_statements
+
+logger = logging.getLogger(__name__)
+
+# Tables the sample data and synthetic datasets write to, parents first
+LOAD_TABLES = ("Genre", "Platform", "User", "Media", "Review", "Watchlist")
+
+# "INSERT [IGNORE] INTO T (cols) VALUES (...)": everything up to VALUES is the
+# group key, the rest is the row list that can be concatenated with others.
+_INSERT = re.compile(
+    r"^(INSERT\s+(?:IGNORE\s+)?INTO\s+`?(\w+)`?\s*\([^)]*\)\s*VALUES)\s*(\(.*\))$",
+    re.IGNORECASE | re.DOTALL,
+)
+_ON_DUPLICATE = re.compile(r"\bON\s+DUPLICATE\s+KEY\b", re.IGNORECASE)
+
+_DUPLICATE_ENTRY = 1062
+# LOAD DATA LOCAL refused by the client or server
+_LOCAL_INFILE_DISABLED = {1148, 2068, 3948}
+
+
+class LoadStats:
+    """Row/statement counters and throughput for one load."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.statements = 0
+        self.tables: Dict[str, int] = defaultdict(int)
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_sec(self) -> float:
+        elapsed = self.seconds
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return f"{self.rows:,} rows in {self.seconds:.1f}s ({self.rows_per_sec:,.0f} rows/sec, {self.statements:,} statements)"
+
+
+def _count_rows(values: str) -> int:
+    """Rows in a VALUES list; counts top-level ``(`` outside string literals."""
+    depth = rows = 0
+    quote: Optional[str] = None
+    i, n = 0, len(values)
+    while i < n:
+        c = values[i]
+        if quote:
+            if c == "\\":
+                i += 1
+            elif c == quote:
+                quote = None
+        elif c in ("'", '"'):
+            quote = c
+        elif c == "(":
+            if depth == 0:
+                rows += 1
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        i += 1
+    return rows
+
+
+class _InsertBatcher:
+    """Coalesces consecutive single-row INSERTs into multi-row statements."""
+
+    def __init__(self, cur: Any, stats: LoadStats, max_bytes: int) -> None:
+        self.cur = cur
+        self.stats = stats
+        self.max_bytes = max_bytes
+        self._prefix: Optional[str] = None
+        self._table = ""
+        self._values: List[str] = []
+        self._size = 0
+
+    def add(self, prefix: str, table: str, values: str) -> None:
+        if prefix != self._prefix or self._size + len(values) > self.max_bytes:
+            self.flush()
+            self._prefix, self._table = prefix, table
+        self._values.append(values)
+        self._size += len(values) + 2
+
+    def flush(self) -> None:
+        if not self._values:
+            return
+        prefix, values = self._prefix, self._values
+        self._values, self._size = [], 0
+        try:
+            self.cur.execute(f"{prefix} {', '.join(values)}")
+            self.stats.statements += 1
+            rows = sum(_count_rows(v) for v in values)
+        except Exception as exc:
+            if getattr(exc, "errno", None) != _DUPLICATE_ENTRY:
+                raise
+            # One duplicate fails the whole multi-row statement; replay the
+            # rows one by one so the rest still load (matching the old loader)
+            rows = 0
+            for v in values:
+                try:
+                    self.cur.execute(f"{prefix} {v}")
+                    rows += _count_rows(v)
+                except Exception as row_exc:
+                    if getattr(row_exc, "errno", None) != _DUPLICATE_ENTRY:
+                        raise
+                self.stats.statements += 1
+        self.stats.rows += rows
+        self.stats.tables[self._table] += rows
+
+
+def load_sql_stream(
+    conn: Any,
+    lines: Iterable[str],
+    max_bytes: int = 4 * 1024 * 1024,
+    commit_rows: int = 50000,
+    progress_every: int = 100000,
+) -> LoadStats:
+    """Execute a SQL dump, merging runs of single-row INSERTs into multi-row ones.
+
+    ``lines`` is streamed (an open file works), so memory stays bounded by
+    ``max_bytes`` per statement regardless of the dump's size. Keep
+    ``max_bytes`` below the server's max_allowed_packet.
+    """
+    stats = LoadStats()
+    cur = conn.cursor()
+    batcher = _InsertBatcher(cur, stats, max_bytes)
+    committed = 0
+    reported = 0
+    try:
+        for stmt in iter_statements(lines):
+            match = _INSERT.match(stmt)
+            if match and not _ON_DUPLICATE.search(stmt):
+                batcher.add(match.group(1), match.group(2), match.group(3))
+            else:
+                batcher.flush()
+                cur.execute(stmt)
+                stats.statements += 1
+                if cur.with_rows:
+                    cur.fetchall()
+
+            if stats.rows - committed >= commit_rows:
+                conn.commit()
+                committed = stats.rows
+            if progress_every and stats.rows - reported >= progress_every:
+                reported = stats.rows
+                logger.info("  %s", stats.summary())
+        batcher.flush()
+        conn.commit()
+    finally:
+        cur.close()
+    return stats
+
+
+def load_sql_file(conn: Any, path: str, replace_db: Optional[Tuple[str, str]] = None, **kwargs: Any) -> LoadStats:
+    """Stream ``path`` into :func:`load_sql_stream`.
+
+    ``replace_db`` = (old, new) rewrites the database name on each line, as
+    init_db.py does for the hardcoded ``USE mediawatchlist``.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        lines: Iterable[str] = f
+        if replace_db:
+            old, new = replace_db
+            lines = (line.replace(old, new) for line in f)
+        return load_sql_stream(conn, lines, **kwargs)
+
+
+# Secondary index handling
+#
+# InnoDB ignores ALTER TABLE ... DISABLE KEYS, so non-unique secondary and
+# FULLTEXT indexes are dropped before the load and rebuilt afterwards, where
+# MySQL can sort-build each one in a single pass instead of maintaining it
+# row by row. UNIQUE indexes stay in place because the load relies on them
+# (INSERT IGNORE), and indexes MySQL needs for a foreign key can't be dropped.
+
+class IndexDef:
+    def __init__(self, table: str, name: str, kind: str, columns: List[str]) -> None:
+        self.table = table
+        self.name = name
+        self.kind = kind  # "INDEX" or "FULLTEXT INDEX"
+        self.columns = columns
+
+    def add_clause(self) -> str:
+        return f"ADD {self.kind} `{self.name}` ({', '.join(self.columns)})"
+
+    def __repr__(self) -> str:
+        return f"{self.table}.{self.name}"
+
+
+def secondary_indexes(conn: Any, tables: Sequence[str] = LOAD_TABLES) -> List[IndexDef]:
+    """Droppable secondary indexes on ``tables`` in the current database."""
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            SELECT TABLE_NAME, INDEX_NAME, INDEX_TYPE, COLUMN_NAME, SUB_PART, COLLATION
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE()
+              AND TABLE_NAME IN ({', '.join(['%s'] * len(tables))})
+              AND INDEX_NAME <> 'PRIMARY'
+              AND NON_UNIQUE = 1
+            ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+            """,
+            tuple(tables),
+        )
+        rows = cur.fetchall()
+        cur.execute(
+            f"""
+            SELECT TABLE_NAME, COLUMN_NAME
+            FROM information_schema.KEY_COLUMN_USAGE
+            WHERE TABLE_SCHEMA = DATABASE()
+              AND TABLE_NAME IN ({', '.join(['%s'] * len(tables))})
+              AND REFERENCED_TABLE_NAME IS NOT NULL
+            """,
+            tuple(tables),
+        )
+        fk_columns = {(t, c) for t, c in cur.fetchall()}
+    finally:
+        cur.close()
+
+    found: Dict[Tuple[str, str], IndexDef] = {}
+    for table, name, index_type, column, sub_part, collation in rows:
+        key = (table, name)
+        if key not in found:
+            kind = "FULLTEXT INDEX" if index_type == "FULLTEXT" else "INDEX"
+            found[key] = IndexDef(table, name, kind, [])
+        col = f"`{column}`" + (f"({sub_part})" if sub_part else "") + (" DESC" if collation == "D" else "")
+        found[key].columns.append(col)
+
+    # An index whose leading column carries a foreign key may be the only
+    # index backing that constraint; leave those alone
+    return [
+        idx for (table, _), idx in found.items()
+        if (table, idx.columns[0].split("`")[1]) not in fk_columns
+    ]
+
+
+def drop_indexes(conn: Any, indexes: Iterable[IndexDef]) -> List[IndexDef]:
+    """Drop ``indexes``; returns the ones actually dropped."""
+    dropped = []
+    cur = conn.cursor()
+    try:
+        for idx in indexes:
+            try:
+                cur.execute(f"ALTER TABLE `{idx.table}` DROP INDEX `{idx.name}`")
+                dropped.append(idx)
+            except Exception as exc:
+                logger.warning("Keeping index %r: %s", idx, exc)
+    finally:
+        cur.close()
+    return dropped
+
+
+def rebuild_indexes(conn: Any, indexes: Iterable[IndexDef]) -> None:
+    """Re-add dropped indexes: one ALTER per table for B-trees, FULLTEXT one at a time."""
+    by_table: Dict[str, List[IndexDef]] = defaultdict(list)
+    fulltext: List[IndexDef] = []
+    for idx in indexes:
+        (fulltext if idx.kind.startswith("FULLTEXT") else by_table[idx.table]).append(idx)
+
+    cur = conn.cursor()
+    try:
+        for table, defs in by_table.items():
+            cur.execute(f"ALTER TABLE `{table}` " + ", ".join(d.add_clause() for d in defs))
+        # InnoDB builds only one FULLTEXT index per ALTER
+        for idx in fulltext:
+            cur.execute(f"ALTER TABLE `{idx.table}` {idx.add_clause()}")
+    finally:
+        cur.close()
+
+
+@contextmanager
+def indexes_deferred(conn: Any, tables: Sequence[str] = LOAD_TABLES) -> Iterator[List[IndexDef]]:
+    """Drop droppable secondary indexes for the duration of a ``with`` block.
+
+    They are rebuilt on exit even if the load fails, so the schema is never
+    left without them.
+    """
+    dropped = drop_indexes(conn, secondary_indexes(conn, tables))
+    if dropped:
+        logger.info("Deferred %d secondary indexes: %s", len(dropped), dropped)
+    try:
+        yield dropped
+    finally:
+        if dropped:
+            started = time.perf_counter()
+            rebuild_indexes(conn, dropped)
+            logger.info("Rebuilt %d indexes in %.1fs", len(dropped), time.perf_counter() - started)
+
+
+@contextmanager
+def fast_load_session(conn: Any) -> Iterator[None]:
+    """Session settings for a bulk load: no FK checks, explicit commits."""
+    cur = conn.cursor()
+    autocommit = conn.autocommit
+    try:
+        cur.execute("SET SESSION foreign_key_checks = 0")
+        conn.autocommit = False
+        yield
+    finally:
+        try:
+            cur.execute("SET SESSION foreign_key_checks = 1")
+            conn.autocommit = autocommit
+        finally:
+            cur.close()
+
+
+# CSV loading
+#
+# Files are plain RFC 4180 CSV (Python's csv module dialect) with a header
+# row of column names. Backslashes are data, not escapes, so the files can't
+# express NULL; leave nullable columns out of the file instead.
+
+def load_csv(
+    conn: Any,
+    table: str,
+    path: str,
+    stats: Optional[LoadStats] = None,
+    batch_rows: int = 5000,
+) -> LoadStats:
+    """Load a CSV file whose header row names ``table``'s columns into ``table``.
+
+    Uses ``LOAD DATA LOCAL INFILE`` (the connection needs
+    ``allow_local_infile=True`` and the server ``local_infile=ON``); if that
+    is refused, falls back to multi-row INSERTs from the parsed file.
+    """
+    stats = stats or LoadStats()
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        header = next(csv.reader(f))
+    columns = ", ".join(f"`{c}`" for c in header)
+
+    cur = conn.cursor()
+    try:
+        try:
+            cur.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE `{table}` CHARACTER SET utf8mb4 "
+                "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                "LINES TERMINATED BY '\\n' IGNORE 1 LINES "
+                f"({columns})",
+                (os.path.abspath(path),),
+            )
+            rows = cur.rowcount
+            stats.statements += 1
+        except Exception as exc:
+            if getattr(exc, "errno", None) not in _LOCAL_INFILE_DISABLED:
+                raise
+            logger.info("LOAD DATA LOCAL unavailable (%s); inserting %s in batches", exc, table)
+            sql = f"INSERT INTO `{table}` ({columns}) VALUES ({', '.join(['%s'] * len(header))})"
+            rows = 0
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                reader = csv.reader(f)
+                next(reader)
+                batch: List[List[str]] = []
+                for row in reader:
+                    batch.append(row)
+                    if len(batch) >= batch_rows:
+                        cur.executemany(sql, batch)
+                        rows += len(batch)
+                        stats.statements += 1
+                        batch = []
+                if batch:
+                    cur.executemany(sql, batch)
+                    rows += len(batch)
+                    stats.statements += 1
+        conn.commit()
+    finally:
+        cur.close()
+    stats.rows += rows
+    stats.tables[table] += rows
+    return stats
+
+
+def load_csv_dir(conn: Any, directory: str, tables: Sequence[str] = LOAD_TABLES) -> LoadStats:
+    """Load ``<Table>.csv`` files from ``directory`` in parent-first order."""
+    stats = LoadStats()
+    for table in tables:
+        path = os.path.join(directory, f"{table}.csv")
+        if os.path.exists(path):
+            before = stats.rows
+            load_csv(conn, table, path, stats)
+            logger.info("  %s: %s rows", table, f"{stats.rows - before:,}")
+    return stats
@@ -0,0 +1,238 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+
+class _Entry:
+    __slots__ = ("value", "expires", "size", "tags")
+
+    def __init__(self, value: Any, expires: float, size: int, tags: Tuple[str, ...]) -> None:
+        self.value = value
+        self.expires = expires
+        self.size = size
+        self.tags = tags
+
+
+class _Flight:
+    """A computation in progress that concurrent callers can wait on."""
+
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def _estimate_size(value: Any) -> int:
+    """Approximate the footprint of a cached value by its JSON length."""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 1024
+
+
+class ResultCache:
+    """Thread-safe TTL + LRU cache with tag-based invalidation.
+
+    Entries expire after ``ttl`` seconds and the least recently used ones are
+    evicted once ``max_entries`` or ``max_bytes`` is exceeded. Each entry is
+    tagged with the tables it was read from so a write to one table only drops
+    the results that depend on it.
+
+    Concurrent misses for the same key are coalesced: one caller computes and
+    the rest wait for its result, so a burst of identical requests costs a
+    single database round trip.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024, ttl: float = 30.0) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._tag_versions: Dict[str, int] = {}
+        self._generation = 0
+        self._bytes = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        return cls(
+            max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256")),
+            max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+            ttl=float(os.getenv("RESULT_CACHE_TTL", "30")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Any],
+        tags: Iterable[str] = (),
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        """Return the cached value for ``key``, computing it at most once."""
+        if not self.enabled:
+            return compute()
+
+        tags = tuple(tags)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry.value
+                self._remove(key)
+                self._expirations += 1
+
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self._coalesced += 1
+                leader = False
+            else:
+                flight = self._inflight[key] = _Flight()
+                self._misses += 1
+                leader = True
+                versions = self._versions(tags)
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = compute()
+        except BaseException as exc:
+            flight.error = exc
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+            raise
+
+        flight.value = value
+        size = _estimate_size(value) if cacheable(value) else None
+        with self._lock:
+            self._inflight.pop(key, None)
+            # Skip storing if a write invalidated these tags while we computed
+            if size is not None and self._versions(tags) == versions:
+                self._store(key, value, tags, size)
+        flight.event.set()
+        return value
+
+    def invalidate(self, tags: Optional[Iterable[str]] = None) -> int:
+        """Drop entries tagged with any of ``tags`` (or everything if None)."""
+        with self._lock:
+            if tags is None:
+                dropped = len(self._entries)
+                self._generation += 1
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                wanted = set(tags)
+                for tag in wanted:
+                    self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+                stale = [k for k, e in self._entries.items() if wanted.intersection(e.tags)]
+                for key in stale:
+                    self._remove(key)
+                dropped = len(stale)
+            self._invalidations += dropped
+            return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses + self._coalesced
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+                "hit_ratio": round((self._hits + self._coalesced) / lookups, 4) if lookups else 0.0,
+            }
+
+    # Internals (caller holds self._lock)
+
+    def _versions(self, tags: Tuple[str, ...]) -> Tuple[int, ...]:
+        return (self._generation,) + tuple(self._tag_versions.get(t, 0) for t in tags)
+
+    def _store(self, key: Hashable, value: Any, tags: Tuple[str, ...], size: int) -> None:
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(value, time.monotonic() + self.ttl, size, tags)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._evictions += 1
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Process-wide result cache, configured from RESULT_CACHE_* on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache.from_env()
+    return _cache
+
+
+def _is_ok_result(value: Any) -> bool:
+    # db.py helpers return (ok, error, rows); never cache a failure
+    return isinstance(value, tuple) and bool(value) and value[0] is True
+
+
+def cached(namespace: str, tables: Iterable[str]) -> Callable:
+    """Cache a db.py read helper keyed by ``namespace`` and its arguments.
+
+    Results are shared between callers and must be treated as read-only.
+    """
+    tags = tuple(tables)
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = (namespace, args, tuple(sorted(kwargs.items())))
+            return get_result_cache().get_or_compute(
+                key, lambda: func(*args, **kwargs), tags=tags, cacheable=_is_ok_result
+            )
+
+        wrapper.uncached = func  # type: ignore[attr-defined]
+        wrapper.tables = tags  # type: ignore[attr-defined]
+        return wrapper
+
+    return decorator
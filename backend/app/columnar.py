@@ -0,0 +1,458 @@
+"""Vectorised analytics over an in-memory, columnar copy of Review and Media.
+
+With ANALYTICS_ENGINE=numpy (and numpy installed) the process keeps Review
+as four parallel arrays (user id, media id, rating, status code) and Media
+as arrays indexed by MediaId (type, genre, platform, year). The copy is built
+from one scan of each table in a background thread at startup. After that,
+the write helpers in db.py and ingest.py patch single rows in place.
+
+Those helpers only see this process's writes, so the copy is also reloaded in
+full every ANALYTICS_REFRESH seconds to pick up writes made by other serve.py
+workers or outside the app (see snapshots.Refresh).
+
+Metrics are group-bys over whole columns: ``np.bincount`` sums and counts
+per key, and ``np.argpartition`` picks a top-N without sorting everything.
+An aggregate over a million reviews takes a few milliseconds and puts no load
+on MySQL. Until the snapshot has loaded, or without numpy, every method
+returns None and db.py runs its SQL instead.
+"""
+import logging
+import os
+import threading
+from decimal import ROUND_HALF_UP, Decimal
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .leaderboard import _marks, average_rating
+from .rollups import ReviewState
+from .snapshots import Refresh, WriteLog, start_background_load as _start_load
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ("Planning", "Watching", "Completed", "Havent Watched")
+_STATUS_CODES = {name: code for code, name in enumerate(STATUSES)}
+_COMPLETED = _STATUS_CODES["Completed"]
+
+# Stand-ins for NULL (and for freed review slots) in the integer columns
+_NO_RATING = -(2 ** 31)
+_NO_CODE = -1
+
+HISTOGRAM_GROUPS = ("all", "genre", "type")
+
+_FETCH_BATCH = 5000
+_FOUR_PLACES = Decimal("0.0001")
+
+
+def numpy_available() -> bool:
+    return np is not None
+
+
+class ReviewColumns:
+    """Review rows as parallel arrays, one slot per (user, media) pair.
+
+    Appends double the capacity when full. A deleted review frees its slot
+    (its rating and status become the NULL stand-ins, so every metric skips
+    it) and the next insert reuses it.
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.size = 0
+        self.user = np.zeros(capacity, np.int32)
+        self.media = np.zeros(capacity, np.int32)
+        self.rating = np.full(capacity, _NO_RATING, np.int32)
+        self.status = np.full(capacity, _NO_CODE, np.int8)
+        self._slots: Dict[Tuple[int, int], int] = {}
+        self._free: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def put(self, user_id: Optional[int], media_id: Optional[int], state: ReviewState) -> None:
+        """Set the review of (user, media) to ``state``; None deletes it."""
+        key = (user_id or 0, media_id or 0)
+        slot = self._slots.get(key)
+        if state is None:
+            if slot is not None:
+                del self._slots[key]
+                self.user[slot] = self.media[slot] = 0
+                self.rating[slot] = _NO_RATING
+                self.status[slot] = _NO_CODE
+                self._free.append(slot)
+            return
+        if slot is None:
+            slot = self._free.pop() if self._free else self._append()
+            self._slots[key] = slot
+        rating, status = state
+        self.user[slot], self.media[slot] = key
+        self.rating[slot] = _NO_RATING if rating is None else int(rating)
+        self.status[slot] = _STATUS_CODES.get(status, _NO_CODE)  # type: ignore[arg-type]
+
+    def _append(self) -> int:
+        if self.size == len(self.user):
+            capacity = 2 * len(self.user)
+            self.user = _resized(self.user, capacity, 0)
+            self.media = _resized(self.media, capacity, 0)
+            self.rating = _resized(self.rating, capacity, _NO_RATING)
+            self.status = _resized(self.status, capacity, _NO_CODE)
+        self.size += 1
+        return self.size - 1
+
+
+class MediaColumns:
+    """Media attributes in arrays indexed directly by MediaId.
+
+    Types are stored as small codes into ``type_names``; missing genres,
+    platforms and years are 0. ``known`` marks the ids of existing media.
+    """
+
+    def __init__(self, capacity: int = 256) -> None:
+        self.known = np.zeros(capacity, bool)
+        self.type = np.full(capacity, _NO_CODE, np.int16)
+        self.genre = np.zeros(capacity, np.int32)
+        self.platform = np.zeros(capacity, np.int32)
+        self.year = np.zeros(capacity, np.int32)
+        self.names: Dict[int, str] = {}
+        self.type_names: List[str] = []
+        self._type_codes: Dict[str, int] = {}
+
+    def ensure(self, media_id: int) -> None:
+        """Grow the arrays so ``media_id`` is a valid index."""
+        if media_id >= len(self.type):
+            capacity = max(media_id + 1, 2 * len(self.type))
+            self.known = _resized(self.known, capacity, False)
+            self.type = _resized(self.type, capacity, _NO_CODE)
+            self.genre = _resized(self.genre, capacity, 0)
+            self.platform = _resized(self.platform, capacity, 0)
+            self.year = _resized(self.year, capacity, 0)
+
+    def put(
+        self,
+        media_id: int,
+        name: Optional[str],
+        media_type: Optional[str],
+        genre_id: Optional[int],
+        platform_id: Optional[int],
+        year: Optional[int],
+    ) -> None:
+        self.ensure(media_id)
+        if media_type is None:
+            code = _NO_CODE
+        else:
+            code = self._type_codes.get(media_type, -1)
+            if code < 0:
+                code = self._type_codes[media_type] = len(self.type_names)
+                self.type_names.append(media_type)
+        self.type[media_id] = code
+        self.genre[media_id] = genre_id or 0
+        self.platform[media_id] = platform_id or 0
+        self.year[media_id] = year or 0
+        self.known[media_id] = name is not None
+        if name is None:
+            self.names.pop(media_id, None)
+        else:
+            self.names[media_id] = name
+
+    def remove(self, media_id: int) -> None:
+        self.put(media_id, None, None, None, None, None)
+
+
+def _resized(array: Any, capacity: int, fill: int) -> Any:
+    grown = np.full(capacity, fill, array.dtype)
+    grown[: len(array)] = array
+    return grown
+
+
+class _Snapshot:
+    def __init__(self) -> None:
+        self.reviews = ReviewColumns()
+        self.media = MediaColumns()
+        self.genres: Dict[int, str] = {}
+
+    def review_changed(self, user_id: Optional[int], media_id: Optional[int], new: ReviewState) -> None:
+        if media_id:
+            self.media.ensure(int(media_id))
+        self.reviews.put(user_id, media_id, new)
+
+    def rated(self) -> Tuple[Any, Any]:
+        """(media ids, ratings) of every rated review."""
+        n = self.reviews.size
+        rating = self.reviews.rating[:n]
+        mask = rating != _NO_RATING
+        return self.reviews.media[:n][mask], rating[mask]
+
+    def completions(self) -> Any:
+        """Completed reviews per MediaId, as an array indexed by id."""
+        n = self.reviews.size
+        done = self.reviews.media[:n][self.reviews.status[:n] == _COMPLETED]
+        return np.bincount(done, minlength=len(self.media.type))
+
+
+class AnalyticsEngine:
+    """Columnar snapshot of Review/Media with vectorised group-by metrics.
+
+    Rows returned by the metric methods are shaped like the SQL they stand
+    in for, so db.py can return either. With ``refresh`` (seconds) the
+    snapshot is rebuilt that often, and is not used once it is twice that old.
+    """
+
+    def __init__(self, enabled: bool, refresh: float = 0) -> None:
+        self.enabled = enabled and np is not None
+        self.ready = False
+        self._snapshot: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # Review pairs, media ids and genre ids written while a load is scanning
+        self._writes = WriteLog(3)
+        self._refresh = Refresh("Analytics snapshot", self.load, refresh)
+
+    def load(self, conn: Any) -> Dict[str, int]:
+        """Rebuild the snapshot from one scan of Genre, Media and Review."""
+        with self._load_lock:
+            with self._lock:
+                self._writes.start()
+            fresh = _Snapshot()
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT GenreId, GenreName FROM Genre")
+                fresh.genres = dict(cur.fetchall())
+                cur.execute("SELECT MediaId, MediaName, MediaType, GenreId, PlatformId, ReleaseYear FROM Media")
+                for row in cur.fetchall():
+                    fresh.media.put(*row)
+                cur.execute("SELECT UserId, MediaId, Rating, Status FROM Review")
+                while True:
+                    batch = cur.fetchmany(_FETCH_BATCH)
+                    if not batch:
+                        break
+                    for user_id, media_id, rating, status in batch:
+                        fresh.review_changed(user_id, media_id, (rating, status))
+
+                def install() -> None:
+                    self._snapshot = fresh
+
+                self._writes.replay(self._lock, partial(_reread, cur, fresh), install, conn)
+            except Exception:
+                with self._lock:
+                    self._writes.stop()
+                raise
+            finally:
+                cur.close()
+
+            self.ready = True
+            self._refresh.mark_loaded()
+            return {"reviews": len(fresh.reviews), "media": len(fresh.media.names), "genres": len(fresh.genres)}
+
+    def _read(self, metric: Callable[[_Snapshot], Any]) -> Any:
+        if not (self.enabled and self.ready and self._refresh.usable()):
+            return None
+        with self._lock:
+            return metric(self._snapshot)  # type: ignore[arg-type]
+
+    # Metrics
+
+    def genre_averages(self) -> Optional[List[Dict[str, Any]]]:
+        """Average rating per genre, as get_avg_rating_per_genre returns it."""
+        def metric(s: _Snapshot) -> List[Dict[str, Any]]:
+            media_ids, ratings = s.rated()
+            genres = s.media.genre[media_ids]
+            sums = np.bincount(genres, weights=ratings)
+            counts = np.bincount(genres)
+            rows = []
+            for genre_id in np.flatnonzero(counts):
+                name = s.genres.get(int(genre_id))
+                if genre_id and name is not None:
+                    avg = Decimal(int(sums[genre_id])) / int(counts[genre_id])
+                    rows.append({"avg_rating": avg.quantize(_FOUR_PLACES, rounding=ROUND_HALF_UP), "GenreName": name})
+            rows.sort(key=lambda r: r["GenreName"])
+            return rows
+        return self._read(metric)
+
+    def top_rated_media(self, limit: int, min_votes: int = 1) -> Optional[List[Dict[str, Any]]]:
+        """Best average ratings among media with at least ``min_votes`` ratings."""
+        def metric(s: _Snapshot) -> List[Dict[str, Any]]:
+            media_ids, ratings = s.rated()
+            size = len(s.media.type)
+            sums = np.bincount(media_ids, weights=ratings, minlength=size)
+            counts = np.bincount(media_ids, minlength=size)
+            eligible = counts >= min_votes
+            scores = np.where(eligible, sums / np.maximum(counts, 1), -np.inf)
+            return [
+                {
+                    "MediaType": _type_name(s.media, i),
+                    "MediaName": s.media.names.get(i),
+                    "AvgRating": average_rating(int(sums[i]), int(counts[i])),
+                }
+                for i in _top_ids(scores, eligible & s.media.known, limit)
+            ]
+        return self._read(metric)
+
+    def top_media_completed(self, limit: int, min_completions: int = 1) -> Optional[List[Dict[str, Any]]]:
+        """Most completed media with at least ``min_completions`` completions."""
+        def metric(s: _Snapshot) -> List[Dict[str, Any]]:
+            done = s.completions()
+            eligible = (done >= min_completions) & s.media.known
+            return [
+                {"MediaName": s.media.names.get(i), "user_completions": int(done[i])}
+                for i in _top_ids(done, eligible, limit)
+            ]
+        return self._read(metric)
+
+    def rating_histogram(self, by: str = "all") -> Optional[Dict[str, Any]]:
+        """Reviews per rating value, overall or per genre/media type.
+
+        ``{"ratings": [lo, ..., hi], "counts": {group: [n_lo, ..., n_hi]}}``
+        """
+        def metric(s: _Snapshot) -> Dict[str, Any]:
+            media_ids, ratings = s.rated()
+            if by == "genre":
+                keys, names = s.media.genre[media_ids], s.genres
+            elif by == "type":
+                keys = s.media.type[media_ids].astype(np.int32)
+                names = dict(enumerate(s.media.type_names))
+            else:
+                keys, names = np.zeros(len(ratings), np.int32), {0: "all"}
+            # Reviews whose group is unknown (no genre, say) are left out
+            known = np.isin(keys, np.fromiter(names, np.int32, len(names)))
+            keys, ratings = keys[known], ratings[known]
+            if not len(ratings):
+                return {"ratings": [], "counts": {}}
+            lo, hi = int(ratings.min()), int(ratings.max())
+            width = hi - lo + 1
+            groups, group_index = np.unique(keys, return_inverse=True)
+            cells = np.bincount(group_index * width + (ratings - lo), minlength=len(groups) * width)
+            grid = cells.reshape(len(groups), width)
+            return {
+                "ratings": list(range(lo, hi + 1)),
+                "counts": {names[int(g)]: grid[i].tolist() for i, g in enumerate(groups)},
+            }
+        return self._read(metric)
+
+    # Write hooks, called by db.py after commit
+
+    def review_changed(self, user_id: Optional[int], media_id: Optional[int], new: ReviewState) -> None:
+        """Set the (user, media) review to ``new`` (None for a delete)."""
+        pair = (int(user_id or 0), int(media_id or 0))
+        self._apply(lambda s: s.review_changed(user_id, media_id, new), pairs=(pair,))
+
+    def media_saved(
+        self,
+        media_id: Optional[int],
+        name: str,
+        media_type: Optional[str],
+        genre_id: Optional[int],
+        platform_id: Optional[int],
+        year: Optional[int],
+    ) -> None:
+        if media_id:
+            self._apply(
+                lambda s: s.media.put(int(media_id), name, media_type, genre_id, platform_id, year),
+                media_ids=(int(media_id),),
+            )
+
+    def genre_saved(self, genre_id: Optional[int], name: str) -> None:
+        if genre_id:
+            self._apply(lambda s: s.genres.__setitem__(int(genre_id), name), genre_ids=(int(genre_id),))
+
+    def _apply(
+        self,
+        change: Callable[[_Snapshot], None],
+        pairs: Iterable[Tuple[int, int]] = (),
+        media_ids: Iterable[int] = (),
+        genre_ids: Iterable[int] = (),
+    ) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._writes.record(pairs, media_ids, genre_ids)
+            if self._snapshot is not None:
+                change(self._snapshot)
+
+
+def _type_name(media: MediaColumns, media_id: int) -> Optional[str]:
+    code = int(media.type[media_id])
+    return media.type_names[code] if code >= 0 else None
+
+
+def _top_ids(scores: Any, eligible: Any, limit: int) -> List[int]:
+    """Ids of the ``limit`` best eligible scores, best first, ties by ascending id."""
+    candidates = np.flatnonzero(eligible)
+    if not len(candidates) or limit <= 0:
+        return []
+    values = scores[candidates].astype(float)
+    if len(candidates) > limit:
+        # Keep everything tied with the limit-th best score so ties still break by id
+        cutoff = values[np.argpartition(-values, limit - 1)[:limit]].min()
+        keep = values >= cutoff
+        candidates, values = candidates[keep], values[keep]
+    order = np.lexsort((candidates, -values))[:limit]
+    return [int(i) for i in candidates[order]]
+
+
+def _reread(
+    cur: Any,
+    snapshot: _Snapshot,
+    pairs: Set[Tuple[int, int]],
+    media_ids: Set[int],
+    genre_ids: Set[int],
+) -> None:
+    """Replace the given rows with what the database holds now."""
+    if genre_ids:
+        ids = tuple(genre_ids)
+        for genre_id in ids:
+            snapshot.genres.pop(genre_id, None)
+        cur.execute(f"SELECT GenreId, GenreName FROM Genre WHERE GenreId IN ({_marks(len(ids))})", ids)
+        snapshot.genres.update(cur.fetchall())
+    if media_ids:
+        ids = tuple(media_ids)
+        for media_id in ids:
+            snapshot.media.remove(media_id)
+        cur.execute(
+            "SELECT MediaId, MediaName, MediaType, GenreId, PlatformId, ReleaseYear "
+            f"FROM Media WHERE MediaId IN ({_marks(len(ids))})",
+            ids,
+        )
+        for row in cur.fetchall():
+            snapshot.media.put(*row)
+    if pairs:
+        params: List[int] = []
+        for user_id, media_id in pairs:
+            params += [user_id, media_id]
+        cur.execute(
+            "SELECT UserId, MediaId, Rating, Status FROM Review "
+            f"WHERE (UserId, MediaId) IN ({', '.join(['(%s, %s)'] * len(pairs))})",
+            tuple(params),
+        )
+        found = {(row[0], row[1]): (row[2], row[3]) for row in cur.fetchall()}
+        for user_id, media_id in pairs:
+            snapshot.review_changed(user_id, media_id, found.get((user_id, media_id)))
+
+
+_engine: Optional[AnalyticsEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_analytics_engine() -> AnalyticsEngine:
+    """Process-wide engine, enabled by ANALYTICS_ENGINE=numpy when numpy is installed."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                wanted = os.getenv("ANALYTICS_ENGINE", "sql") == "numpy"
+                if wanted and np is None:
+                    logger.warning("ANALYTICS_ENGINE=numpy but numpy is not installed; using SQL")
+                refresh = max(0, int(os.getenv("ANALYTICS_REFRESH", "300")))
+                _engine = AnalyticsEngine(wanted, refresh=refresh)
+    return _engine
+
+
+def start_background_load(connect: Any) -> Optional[threading.Thread]:
+    """Build the snapshot off the request path; ``connect`` is a db_connection-style factory."""
+    engine = get_analytics_engine()
+    if not engine.enabled:
+        return None
+    engine._refresh.connect = connect
+    return _start_load("Analytics snapshot", engine.load, connect)
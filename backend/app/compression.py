@@ -0,0 +1,202 @@
+"""Negotiated response compression (zstd, brotli, gzip).
+
+Responses at least ``COMPRESS_MIN_SIZE`` bytes long with a text or JSON
+mimetype are compressed with the best coding the client accepts. gzip is
+always available; brotli and zstd are used when the ``brotli`` and
+``zstandard`` packages are installed (see requirements.txt).
+
+Responses tagged by ``versions.conditional`` are identified exactly by their
+ETag, so their compressed bodies are kept in a small LRU keyed by (ETag,
+coding). Repeat hits on the analytics, dashboard and search routes then reuse
+the stored bytes instead of compressing the same body again.
+"""
+import gzip
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import Flask, Response, request
+
+from .tracing import span
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # optional, see requirements.txt
+    brotli = None
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # optional, see requirements.txt
+    zstandard = None
+
+_COMPRESSIBLE = ("application/json", "application/x-ndjson", "text/")
+
+# Level used when COMPRESS_LEVEL is unset, and the valid range, per coding
+_LEVELS: Dict[str, Tuple[int, int, int]] = {
+    "gzip": (6, 1, 9),
+    "br": (4, 0, 11),
+    "zstd": (3, 1, 22),
+}
+
+
+def _compress_gzip(data: bytes, level: int) -> bytes:
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _compress_br(data: bytes, level: int) -> bytes:
+    return brotli.compress(data, quality=level)
+
+
+def _compress_zstd(data: bytes, level: int) -> bytes:
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def available_codings() -> List[str]:
+    """Supported codings in server preference order."""
+    codings = []
+    if zstandard is not None:
+        codings.append("zstd")
+    if brotli is not None:
+        codings.append("br")
+    codings.append("gzip")
+    return codings
+
+
+_COMPRESSORS: Dict[str, Callable[[bytes, int], bytes]] = {
+    "gzip": _compress_gzip,
+    "br": _compress_br,
+    "zstd": _compress_zstd,
+}
+
+
+def coding_level(coding: str, level: Optional[int]) -> int:
+    """COMPRESS_LEVEL clamped to ``coding``'s range, or its default if unset."""
+    default, low, high = _LEVELS[coding]
+    return default if level is None else max(low, min(high, level))
+
+
+class CompressedBodies:
+    """Thread-safe LRU of compressed bodies bounded by total bytes."""
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return body
+
+    def put(self, key: Tuple[str, str], body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = body
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+def compression_settings() -> Dict[str, Any]:
+    level = os.getenv("COMPRESS_LEVEL")
+    return {
+        "enabled": os.getenv("COMPRESS", "1") == "1",
+        "min_size": int(os.getenv("COMPRESS_MIN_SIZE", "1024")),
+        "level": int(level) if level else None,
+        "cache_bytes": int(os.getenv("COMPRESS_CACHE_MAX_BYTES", str(8 * 1024 * 1024))),
+    }
+
+
+def _negotiate(codings: List[str]) -> Optional[str]:
+    accepted = request.accept_encodings
+    coding = accepted.best_match(codings)
+    return coding if coding and accepted[coding] > 0 else None
+
+
+def _tag_not_modified(response: Response, codings: List[str]) -> None:
+    """Give a 304 the suffixed tag of the compressed 200 the client is revalidating."""
+    etag, weak = response.get_etag()
+    if not etag:
+        return
+    response.vary.add("Accept-Encoding")
+    coding = _negotiate(codings)
+    if coding and request.if_none_match.contains_weak(f"{etag}-{coding}"):
+        response.set_etag(f"{etag}-{coding}", weak=weak)
+
+
+def init_compression(app: Flask) -> None:
+    """Register the response hook (COMPRESS=0 turns compression off).
+
+    Registered after tracing so the time spent shows up as the ``compress``
+    span in Server-Timing.
+    """
+    settings = compression_settings()
+    if not settings["enabled"]:
+        return
+    codings = available_codings()
+    min_size, level = settings["min_size"], settings["level"]
+    bodies = CompressedBodies(settings["cache_bytes"])
+    app.extensions["compressed_bodies"] = bodies
+
+    @app.after_request
+    def _compress(response: Response) -> Response:
+        if response.status_code == 304:
+            _tag_not_modified(response, codings)
+            return response
+        if not response.mimetype.startswith(_COMPRESSIBLE):
+            return response
+        response.vary.add("Accept-Encoding")
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.content_length is None
+            or response.content_length < min_size
+        ):
+            return response
+        coding = _negotiate(codings)
+        if coding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        key = (etag, coding) if etag and not weak else None
+        body = bodies.get(key) if key else None
+        if body is None:
+            with span("compress", coding):
+                body = _COMPRESSORS[coding](response.get_data(), coding_level(coding, level))
+            if key:
+                bodies.put(key, body)
+
+        response.set_data(body)
+        response.headers["Content-Encoding"] = coding
+        if etag:
+            # Each coding is a distinct representation with its own tag
+            response.set_etag(f"{etag}-{coding}", weak=weak)
+        return response
@@ -0,0 +1,129 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from .db import (
+    STATEMENT_TIMEOUT_ERRNO,
+    get_avg_rating_per_genre,
+    get_recent_low_rated,
+    get_top_media_completed,
+    get_top_rated_media,
+    get_top_users_completed,
+    get_users_rating_above,
+    statement_timeout,
+)
+
+logger = logging.getLogger(__name__)
+
+# Section name -> db.py function, one per analytics endpoint. Names follow
+# the endpoint paths so the frontend can map them one to one.
+DASHBOARD_QUERIES: Dict[str, Callable[[], Tuple[bool, Optional[str], Any]]] = {
+    "top_rated_media": get_top_rated_media,
+    "top_users_completed": get_top_users_completed,
+    "top_media_completions": get_top_media_completed,
+    "avg_rating_genre": get_avg_rating_per_genre,
+    "users_rated_high": get_users_rating_above,
+    "low_rated_recent": get_recent_low_rated,
+}
+
+
+def dashboard_tables(sections: Optional[Iterable[str]] = None) -> Tuple[str, ...]:
+    """Tables read by ``sections`` (default: all), from each query's cache tags."""
+    names = DASHBOARD_QUERIES if sections is None else sections
+    tables = set()
+    for name in names:
+        tables.update(getattr(DASHBOARD_QUERIES.get(name), "tables", ()))
+    return tuple(sorted(tables))
+
+
+def _get_dashboard_config() -> Dict[str, float]:
+    return {
+        "workers": int(os.getenv("DASHBOARD_WORKERS", "6")),
+        "timeout": float(os.getenv("DASHBOARD_QUERY_TIMEOUT", "5")),
+    }
+
+
+# One bounded executor per worker process, shared by all dashboard requests,
+# so concurrent page loads queue for threads (and pooled connections) instead
+# of multiplying them. Rebuilt after fork like the connection pool.
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                workers = max(1, int(_get_dashboard_config()["workers"]))
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dashboard")
+                _executor_pid = pid
+    return _executor
+
+
+def _run_section(name: str, fn: Callable[[], Tuple[bool, Optional[str], Any]], timeout: float) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    with statement_timeout(timeout):
+        ok, err, data = fn()
+    if not ok:
+        raise RuntimeError(err or "Query failed")
+    return data, time.perf_counter() - started
+
+
+def _error_message(exc: BaseException, timeout: float) -> str:
+    text = str(exc)
+    if str(STATEMENT_TIMEOUT_ERRNO) in text or "maximum statement execution time" in text:
+        return f"Timed out after {timeout:g}s"
+    return "Query failed"
+
+
+def load_dashboard(sections: Optional[Iterable[str]] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Run the analytics queries in parallel and collect whatever finishes in time.
+
+    Each section is bounded twice: MySQL aborts its SELECTs after ``timeout``
+    seconds (max_execution_time), and the response stops waiting for it at the
+    same deadline, so one slow or failed query only blanks its own section.
+
+    Returns ``{"data": {...}, "errors": {...}, "timings_ms": {...}}``; a
+    section appears in exactly one of ``data`` and ``errors``.
+    """
+    names = list(DASHBOARD_QUERIES) if sections is None else list(sections)
+    unknown = [n for n in names if n not in DASHBOARD_QUERIES]
+    if unknown:
+        raise ValueError(f"Unknown section: {', '.join(unknown)}")
+    timeout = _get_dashboard_config()["timeout"] if timeout is None else timeout
+
+    executor = get_executor()
+    futures: Dict[Future, str] = {}
+    for name in names:
+        # A fresh context copy per task keeps the request's trace (and any
+        # other contextvars) visible inside the worker thread
+        ctx = contextvars.copy_context()
+        futures[executor.submit(ctx.run, _run_section, name, DASHBOARD_QUERIES[name], timeout)] = name
+
+    # Queue time counts against the deadline too: the page should not wait
+    # longer than this whatever the executor backlog
+    wait(futures, timeout=timeout)
+
+    result: Dict[str, Any] = {"data": {}, "errors": {}, "timings_ms": {}}
+    for future, name in futures.items():
+        if not future.done():
+            future.cancel()
+            result["errors"][name] = f"Timed out after {timeout:g}s"
+            logger.error("Dashboard section %s timed out after %ss", name, timeout)
+            continue
+        exc = future.exception()
+        if exc is not None:
+            result["errors"][name] = _error_message(exc, timeout)
+            logger.error("Dashboard section %s failed: %s", name, exc)
+            continue
+        data, seconds = future.result()
+        result["data"][name] = data
+        result["timings_ms"][name] = round(seconds * 1000, 2)
+    return result
@@ -1,11 +1,34 @@
+import base64
+import json
 import os
-from typing import Tuple, Optional, Dict, Any, List, cast
+import re
+import threading
+import time
+from contextlib import closing, contextmanager
+from contextvars import ContextVar, Token
+from decimal import Decimal
+from typing import Tuple, Optional, Dict, Any, Generator, List, Iterator, cast
 
 
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, InterfaceError
 from mysql.connector.connection import MySQLConnection
 
+from .cache import cached, get_result_cache
+from .columnar import get_analytics_engine
+from .entities import ENTITIES, get_entity_cache
+from .leaderboard import get_leaderboard
+from .metrics import InstrumentedConnection, get_db_metrics
+from .pool import ConnectionPool
+from .replicas import ReplicaSet, parse_endpoints
+from .rollups import USER_STATUS_COLUMNS, ReviewState, apply_review_change, rollups_enabled
+from .search_index import get_search_index
+from .serialization import RowSet
+from .statements import Statement, attach_prepared, execute, prepared_cache_size, run, statement
+from .suggest import SUGGEST_MAX_LIMIT, get_suggester
+from .tracing import add_span
+from .versions import get_data_versions
+
 def _get_db_config() -> Dict[str, Any]:
     """Load DB configuration from environment variables.
 
@@ -21,12 +44,15 @@ def _get_db_config() -> Dict[str, Any]:
     }
 
 
-def get_connection() -> MySQLConnection:
-    """Create and return a new MySQL connection using the above config."""
+def get_connection(host: Optional[str] = None, port: Optional[int] = None) -> MySQLConnection:
+    """Create and return a new MySQL connection using the above config.
+
+    ``host``/``port`` override DB_HOST/DB_PORT (used for read replicas).
+    """
     cfg = _get_db_config()
     conn = mysql.connector.connect(
-        host=cfg["host"],
-        port=cfg["port"],
+        host=host or cfg["host"],
+        port=port or cfg["port"],
         user=cfg["user"],
         password=cfg["password"],
         database=cfg["database"],
@@ -36,277 +62,645 @@ def get_connection() -> MySQLConnection:
     return conn  # type: ignore
 
 
+# Connection pooling
+#
+# Each worker process owns one pool, created lazily on first use. The pid is
+# remembered so a pool inherited across fork() is never shared with the parent.
+# Set DB_POOL_SIZE=0 to fall back to one direct connection per call.
+
+_pool: Optional[ConnectionPool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool_config() -> Dict[str, Any]:
+    """Load pool sizing/timeouts from environment variables."""
+    return {
+        "max_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT", "5")),
+        "recycle": float(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "ping_after": float(os.getenv("DB_POOL_PING_AFTER", "5")),
+    }
+
+
+def get_pool() -> Optional[ConnectionPool]:
+    """Return this process's connection pool, or None when pooling is disabled."""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            cfg = _get_pool_config()
+            if cfg["max_size"] <= 0:
+                return None
+            _pool = ConnectionPool(get_connection, **cfg)
+            _pool_pid = pid
+        return _pool
+
+
+def close_pool() -> None:
+    """Close this process's pools so the next checkout builds fresh ones."""
+    global _pool, _replicas, _replicas_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.close()
+        _pool = None
+    with _replicas_lock:
+        if _replicas is not None and _replicas_pid == os.getpid():
+            _replicas.close()
+        _replicas = None
+        _replicas_pid = None
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Pool occupancy and counters, or ``{"enabled": False}`` in direct mode."""
+    pool = get_pool()
+    if pool is None:
+        return {"enabled": False}
+    stats: Dict[str, Any] = {"enabled": True, **pool.stats()}
+    replicas = get_replicas()
+    if replicas is not None:
+        stats["replicas"] = replicas.stats()
+    return stats
+
+
+# Read replicas
+#
+# With DB_REPLICAS set (and pooling on), helpers that pass read_only=True to
+# db_connection() read from a replica; everything else, and every read once
+# the replicas are all ejected, uses the primary. A client that just wrote
+# keeps reading from the primary for DB_READ_YOUR_WRITES seconds (routes.py
+# marks those requests with prefer_primary_reads()). Results that go into the
+# shared result cache are also read from the primary for that long after a
+# write in this process, so the cache never goes back to pre-write data.
+
+_replicas: Optional[ReplicaSet] = None
+_replicas_pid: Optional[int] = None
+_replicas_lock = threading.Lock()
+
+_read_primary: ContextVar[bool] = ContextVar("read_primary", default=False)
+_last_local_write = float("-inf")
+
+# Client errors meaning the server or the connection to it is gone
+_CONNECTION_LOST_ERRNOS = (2003, 2006, 2013, 2055)
+
+
+def _get_replica_config() -> Dict[str, Any]:
+    return {
+        "endpoints": parse_endpoints(os.getenv("DB_REPLICAS", ""), int(os.getenv("DB_PORT", "3306"))),
+        "eject_seconds": float(os.getenv("DB_REPLICA_EJECT_SECONDS", "30")),
+    }
+
+
+def read_your_writes_seconds() -> float:
+    return float(os.getenv("DB_READ_YOUR_WRITES", "5"))
+
+
+def get_replicas() -> Optional[ReplicaSet]:
+    """This process's read replicas, or None when none are configured (or pooling is off)."""
+    global _replicas, _replicas_pid
+    pid = os.getpid()
+    if _replicas_pid == pid:
+        return _replicas
+
+    with _replicas_lock:
+        if _replicas_pid != pid:
+            cfg = _get_replica_config()
+            pool_cfg = _get_pool_config()
+            _replicas = None
+            if cfg["endpoints"] and pool_cfg["max_size"] > 0:
+                def pool_factory(host: str, port: int) -> ConnectionPool:
+                    return ConnectionPool(lambda: get_connection(host, port), **pool_cfg)
+
+                _replicas = ReplicaSet(cfg["endpoints"], pool_factory, cfg["eject_seconds"])
+            _replicas_pid = pid
+        return _replicas
+
+
+def prefer_primary_reads() -> Token:
+    """Send this context's read_only checkouts to the primary; undo with restore_read_routing()."""
+    return _read_primary.set(True)
+
+
+def restore_read_routing(token: Token) -> None:
+    try:
+        _read_primary.reset(token)
+    except ValueError:
+        # Reset from a different context (e.g. after a streamed body)
+        _read_primary.set(False)
+
+
+def _replica_allowed(shared: bool) -> bool:
+    if _read_primary.get():
+        return False
+    return not (shared and time.monotonic() - _last_local_write < read_your_writes_seconds())
+
+
+@contextmanager
+def _session(conn: MySQLConnection, metrics: Any, started: float) -> Iterator[MySQLConnection]:
+    attach_prepared(conn, prepared_cache_size())
+    wrapped = _instrumented(conn, metrics, started)
+    with _execution_limit(conn):
+        yield wrapped
+
+
+@contextmanager
+def db_connection(read_only: bool = False, shared: bool = False) -> Iterator[MySQLConnection]:
+    """Borrow a connection for the duration of a ``with`` block.
+
+    Pooled connections are rolled back (if a transaction is still open) and
+    returned on exit; in direct mode the connection is simply closed. The
+    checkout time is added to the request trace. With DB_METRICS on (the
+    default) it is also recorded as a metric, and the caller gets a proxy
+    whose cursors time every statement (see metrics.py).
+
+    ``read_only`` lets the read go to a replica; ``shared`` marks a result
+    that is cached for every client (see "Read replicas" above).
+    """
+    metrics = get_db_metrics()
+    started = time.perf_counter()
+    replicas = get_replicas() if read_only else None
+    replica = replicas.choose() if replicas is not None and _replica_allowed(shared) else None
+    if replica is not None:
+        try:
+            conn = replica.pool.acquire()
+        except Error:
+            replicas.eject(replica)  # type: ignore[union-attr]
+        else:
+            try:
+                with _session(conn, metrics, started) as wrapped:
+                    yield wrapped
+            except Error as exc:
+                if isinstance(exc, InterfaceError) or exc.errno in _CONNECTION_LOST_ERRNOS:
+                    replicas.eject(replica)  # type: ignore[union-attr]
+                raise
+            finally:
+                replica.pool.release(conn)
+            return
+
+    pool = get_pool()
+    if pool is not None:
+        with pool.connection() as conn:
+            with _session(conn, metrics, started) as wrapped:
+                yield wrapped
+        return
+
+    conn = get_connection()
+    try:
+        wrapped = _instrumented(conn, metrics, started)
+        with _execution_limit(conn):
+            yield wrapped
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+# Server-side cap (MySQL max_execution_time, ms) on SELECTs run over
+# connections borrowed in this context; 0 means no cap. Set with
+# statement_timeout() so it follows work handed to other threads via
+# contextvars.copy_context().
+_statement_timeout_ms: ContextVar[int] = ContextVar("statement_timeout_ms", default=0)
+
+# MySQL's "maximum statement execution time exceeded"
+STATEMENT_TIMEOUT_ERRNO = 3024
+
+
+@contextmanager
+def statement_timeout(seconds: float) -> Iterator[None]:
+    """Abort SELECTs that run longer than ``seconds`` on connections borrowed inside the block."""
+    token = _statement_timeout_ms.set(max(1, int(seconds * 1000)))
+    try:
+        yield
+    finally:
+        _statement_timeout_ms.reset(token)
+
+
+@contextmanager
+def _execution_limit(conn: MySQLConnection) -> Iterator[None]:
+    limit = _statement_timeout_ms.get()
+    if not limit:
+        yield
+        return
+    cur = conn.cursor()
+    cur.execute("SET SESSION max_execution_time = %s", (limit,))
+    cur.close()
+    try:
+        yield
+    finally:
+        # Pooled connections must not carry the limit to the next borrower;
+        # if this fails the connection is broken and gets discarded anyway
+        try:
+            cur = conn.cursor()
+            cur.execute("SET SESSION max_execution_time = 0")
+            cur.close()
+        except Exception:
+            pass
+
+
+def _instrumented(conn: MySQLConnection, metrics: Any, started: float) -> MySQLConnection:
+    waited = time.perf_counter() - started
+    add_span("db-checkout", waited)
+    if not metrics.enabled:
+        return conn
+    metrics.observe_checkout(waited)
+    return cast(MySQLConnection, InstrumentedConnection(conn, metrics))
+
+
+def _after_commit(*tables: str) -> None:
+    """Tell in-process caches and HTTP validators that a committed write touched ``tables``."""
+    global _last_local_write
+    _last_local_write = time.monotonic()
+    get_result_cache().invalidate(tables)
+    get_data_versions().bump(tables)
+
+
 def ping_database() -> Tuple[bool, Optional[str]]:
     """Execute a trivial query to confirm connectivity and credentials.
 
     Returns (ok, error_message_if_any).
     """
     try:
-        conn = get_connection()
-    except Error as exc:
-        return False, str(exc)
-    except Exception as exc:
-        return False, str(exc)
-
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT 1")
-        cur.fetchone()
-        cur.close()
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            cur.close()
         return True, None
     except Error as exc:
         return False, str(exc)
     except Exception as exc:
         return False, str(exc)
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
 
 
 # Group 1 — Top 5 highest rated
 
+_TOP_RATED_MEDIA_ROLLUP_SQL = statement("top_rated_media_rollup", """
+    SELECT
+        m.MediaType,
+        m.MediaName,
+        s.AvgRating
+    FROM MediaSummary AS s
+    JOIN Media AS m ON s.MediaId = m.MediaId
+    WHERE s.RatingCount >= %s
+    ORDER BY s.AvgRating DESC
+    LIMIT %s;
+""")
+
+_TOP_RATED_MEDIA_SQL = statement("top_rated_media", """
+    SELECT
+        Media.MediaType,
+        Media.MediaName,
+        ROUND(AVG(Review.Rating), 2) AS AvgRating
+    FROM Review
+    JOIN Media ON Review.MediaId = Media.MediaId
+    GROUP BY Media.MediaId, Media.MediaType
+    HAVING COUNT(Review.Rating) >= %s
+    ORDER BY AvgRating DESC
+    LIMIT %s;
+""")
+
+
+@cached("top_rated_media", tables=("Review", "Media"))
 def get_top_rated_media(limit: int = 5):
-    conn = None
+    leaderboard = get_leaderboard()
+    rows = leaderboard.top("top_rated_media", limit)
+    if rows is None:
+        rows = get_analytics_engine().top_rated_media(limit, leaderboard.min_votes)
+    if rows is not None:
+        return True, None, rows
     try:
-        conn = get_connection()
-        cur = conn.cursor(dictionary=True)
-
-        query = """
-            SELECT 
-                Media.MediaType,
-                Media.MediaName,
-                ROUND(AVG(Review.Rating), 2) AS AvgRating
-            FROM Review
-            JOIN Media ON Review.MediaId = Media.MediaId
-            GROUP BY Media.MediaId, Media.MediaType
-            ORDER BY AvgRating DESC
-            LIMIT %s;
-        """
-
-        cur.execute(query, (limit,))
-        rows = cur.fetchall() or []
-        cur.close()
+        with db_connection(read_only=True, shared=True) as conn:
+            if rollups_enabled():
+                query = _TOP_RATED_MEDIA_ROLLUP_SQL
+            else:
+                query = _TOP_RATED_MEDIA_SQL
+
+            with run(conn, query, (leaderboard.min_votes, limit), dictionary=True) as cur:
+                rows = cur.fetchall() or []
         return True, None, rows
 
     except Error as exc:
         return False, str(exc), None
-    finally:
-        if conn:
-            conn.close()
 
 
 
 # Group 2 — Users w/ most completions
 
+_TOP_USERS_COMPLETED_ROLLUP_SQL = statement("top_users_completed_rollup", """
+    SELECT
+        u.FirstName,
+        u.LastName,
+        s.Completions AS media_done
+    FROM UserSummary AS s
+    JOIN User AS u ON s.UserId = u.UserId
+    WHERE s.Completions >= %s
+    ORDER BY s.Completions DESC
+    LIMIT %s OFFSET 0;
+""")
+
+_TOP_USERS_COMPLETED_SQL = statement("top_users_completed", """
+    SELECT
+        u.FirstName,
+        u.LastName,
+        COUNT(*) AS media_done
+    FROM User AS u
+    JOIN Review AS r ON u.UserId = r.UserId
+    WHERE r.Status = 'Completed'
+    GROUP BY u.UserId, u.FirstName, u.LastName
+    HAVING media_done >= %s
+    ORDER BY media_done DESC
+    LIMIT %s OFFSET 0;
+""")
+
+
+@cached("top_users_completed", tables=("Review", "User"))
 def get_top_users_completed(limit: int = 5):
-    conn = None
+    leaderboard = get_leaderboard()
+    rows = leaderboard.top("top_users_completed", limit)
+    if rows is not None:
+        return True, None, rows
     try:
-        conn = get_connection()
-        cur = conn.cursor(dictionary=True)
-
-        query = """
-            SELECT 
-                u.FirstName, 
-                u.LastName, 
-                COUNT(*) AS media_done
-            FROM User AS u
-            JOIN Review AS r ON u.UserId = r.UserId
-            WHERE r.Status = 'Completed'
-            GROUP BY u.UserId, u.FirstName, u.LastName
-            HAVING media_done > 5
-            ORDER BY media_done DESC
-            LIMIT %s OFFSET 0;
-        """
-
-        cur.execute(query, (limit,))
-        rows = cur.fetchall() or []
-        cur.close()
+        with db_connection(read_only=True, shared=True) as conn:
+            if rollups_enabled():
+                query = _TOP_USERS_COMPLETED_ROLLUP_SQL
+            else:
+                query = _TOP_USERS_COMPLETED_SQL
+
+            with run(conn, query, (leaderboard.min_completions, limit), dictionary=True) as cur:
+                rows = cur.fetchall() or []
         return True, None, rows
 
     except Error as exc:
         return False, str(exc), None
-    finally:
-        if conn:
-            conn.close()
 
 
 # Group 2 — Media w/ most completions
 
+_TOP_MEDIA_COMPLETED_ROLLUP_SQL = statement("top_media_completed_rollup", """
+    SELECT
+        m.MediaName,
+        s.Completions AS user_completions
+    FROM MediaSummary AS s
+    JOIN Media AS m ON s.MediaId = m.MediaId
+    WHERE s.Completions >= %s
+    ORDER BY s.Completions DESC
+    LIMIT %s OFFSET 0;
+""")
+
+_TOP_MEDIA_COMPLETED_SQL = statement("top_media_completed", """
+    SELECT
+        m.MediaName,
+        COUNT(*) AS user_completions
+    FROM Media AS m
+    JOIN Review AS r ON m.MediaId = r.MediaId
+    WHERE r.Status = 'Completed'
+    GROUP BY m.MediaId, m.MediaName
+    HAVING user_completions >= %s
+    ORDER BY user_completions DESC
+    LIMIT %s OFFSET 0;
+""")
+
+
+@cached("top_media_completed", tables=("Review", "Media"))
 def get_top_media_completed(limit: int = 5):
-    conn = None
+    leaderboard = get_leaderboard()
+    rows = leaderboard.top("top_media_completed", limit)
+    if rows is None:
+        rows = get_analytics_engine().top_media_completed(limit, leaderboard.min_completions)
+    if rows is not None:
+        return True, None, rows
     try:
-        conn = get_connection()
-        cur = conn.cursor(dictionary=True)
-
-        query = """
-            SELECT 
-                m.MediaName, 
-                COUNT(*) AS user_completions
-            FROM Media AS m
-            JOIN Review AS r ON m.MediaId = r.MediaId
-            WHERE r.Status = 'Completed'
-            GROUP BY m.MediaId, m.MediaName
-            HAVING user_completions > 5
-            ORDER BY user_completions DESC
-            LIMIT %s OFFSET 0;
-        """
-
-        cur.execute(query, (limit,))
-        rows = cur.fetchall() or []
-        cur.close()
+        with db_connection(read_only=True, shared=True) as conn:
+            if rollups_enabled():
+                query = _TOP_MEDIA_COMPLETED_ROLLUP_SQL
+            else:
+                query = _TOP_MEDIA_COMPLETED_SQL
+
+            with run(conn, query, (leaderboard.min_completions, limit), dictionary=True) as cur:
+                rows = cur.fetchall() or []
         return True, None, rows
 
     except Error as exc:
         return False, str(exc), None
-    finally:
-        if conn:
-            conn.close()
 
 
 
 # Group 2 — Average rating per genre
 
+_AVG_RATING_PER_GENRE_ROLLUP_SQL = statement("avg_rating_per_genre_rollup", """
+    SELECT
+        SUM(s.RatingSum) / SUM(s.RatingCount) AS avg_rating,
+        g.GenreName
+    FROM GenreSummary AS s
+    JOIN Genre AS g ON s.GenreId = g.GenreId
+    GROUP BY g.GenreName
+    HAVING SUM(s.RatingCount) > 0;
+""")
+
+_AVG_RATING_PER_GENRE_SQL = statement("avg_rating_per_genre", """
+    SELECT
+        AVG(r.Rating) AS avg_rating,
+        g.GenreName
+    FROM Review AS r
+    JOIN Media AS m ON r.MediaId = m.MediaId
+    JOIN Genre AS g ON m.GenreId = g.GenreId
+    GROUP BY g.GenreName;
+""")
+
+
+@cached("avg_rating_per_genre", tables=("Review", "Media", "Genre"))
 def get_avg_rating_per_genre():
-    conn = None
+    rows = get_analytics_engine().genre_averages()
+    if rows is not None:
+        return True, None, rows
     try:
-        conn = get_connection()
-        cur = conn.cursor(dictionary=True)
-
-        query = """
-            SELECT 
-                AVG(r.Rating) AS avg_rating, 
-                g.GenreName
-            FROM Review AS r
-            JOIN Media AS m ON r.MediaId = m.MediaId
-            JOIN Genre AS g ON m.GenreId = g.GenreId
-            GROUP BY g.GenreName;
-        """
-
-        cur.execute(query)
-        rows = cur.fetchall() or []
-        cur.close()
+        with db_connection(read_only=True, shared=True) as conn:
+            if rollups_enabled():
+                query = _AVG_RATING_PER_GENRE_ROLLUP_SQL
+            else:
+                query = _AVG_RATING_PER_GENRE_SQL
+
+            with run(conn, query, dictionary=True) as cur:
+                rows = cur.fetchall() or []
         return True, None, rows
 
     except Error as exc:
         return False, str(exc), None
-    finally:
-        if conn:
-            conn.close()
+
+
+# Rating histogram, overall or per genre / media type
+
+_RATING_HISTOGRAM_SQL = {
+    "all": statement("rating_histogram", """
+        SELECT 'all' AS grp, Rating, COUNT(*) AS n
+        FROM Review
+        WHERE Rating IS NOT NULL
+        GROUP BY Rating;
+    """),
+    "genre": statement("rating_histogram_genre", """
+        SELECT g.GenreName AS grp, r.Rating, COUNT(*) AS n
+        FROM Review AS r
+        JOIN Media AS m ON r.MediaId = m.MediaId
+        JOIN Genre AS g ON m.GenreId = g.GenreId
+        WHERE r.Rating IS NOT NULL
+        GROUP BY g.GenreName, r.Rating;
+    """),
+    "type": statement("rating_histogram_type", """
+        SELECT m.MediaType AS grp, r.Rating, COUNT(*) AS n
+        FROM Review AS r
+        JOIN Media AS m ON r.MediaId = m.MediaId
+        WHERE r.Rating IS NOT NULL
+        GROUP BY m.MediaType, r.Rating;
+    """),
+}
+
+
+@cached("rating_histogram", tables=("Review", "Media", "Genre"))
+def get_rating_histogram(by: str = "all"):
+    """``{"ratings": [lo, ..., hi], "counts": {group: [n_lo, ..., n_hi]}}``"""
+    histogram = get_analytics_engine().rating_histogram(by)
+    if histogram is not None:
+        return True, None, histogram
+    try:
+        with db_connection(read_only=True, shared=True) as conn:
+            with run(conn, _RATING_HISTOGRAM_SQL[by]) as cur:
+                cells = cur.fetchall() or []
+    except Error as exc:
+        return False, str(exc), None
+
+    if not cells:
+        return True, None, {"ratings": [], "counts": {}}
+    lo = min(int(rating) for _, rating, _ in cells)
+    hi = max(int(rating) for _, rating, _ in cells)
+    counts: Dict[str, List[int]] = {}
+    for group, rating, n in cells:
+        counts.setdefault(group, [0] * (hi - lo + 1))[int(rating) - lo] = int(n)
+    return True, None, {"ratings": list(range(lo, hi + 1)), "counts": dict(sorted(counts.items()))}
 
 
 
 # Group 3 — Users who rated above threshold
 
+_USERS_RATING_ABOVE_SQL = statement("users_rating_above", """
+    SELECT
+        UserId,
+        FirstName,
+        LastName,
+        ProfileName
+    FROM User
+    WHERE UserId IN (
+        SELECT UserId
+        FROM Review
+        WHERE Rating >= %s
+    );
+""")
+
+
+@cached("users_rating_above", tables=("Review", "User"))
 def get_users_rating_above(min_rating: int = 4):
-    conn = None
     try:
-        conn = get_connection()
-        cur = conn.cursor(dictionary=True)
+        with db_connection(read_only=True, shared=True) as conn:
+            query = _USERS_RATING_ABOVE_SQL
 
-        query = """
-            SELECT 
-                UserId, 
-                FirstName, 
-                LastName, 
-                ProfileName
-            FROM User
-            WHERE UserId IN (
-                SELECT UserId
-                FROM Review
-                WHERE Rating >= %s
-            );
-        """
-
-        cur.execute(query, (min_rating,))
-        rows = cur.fetchall() or []
-        cur.close()
+            with run(conn, query, (min_rating,), dictionary=True) as cur:
+                rows = cur.fetchall() or []
         return True, None, rows
 
     except Error as exc:
         return False, str(exc), None
-    finally:
-        if conn:
-            conn.close()
 
 
 
 # Group 3 — 10 most recent low-rated media
 
+_RECENT_LOW_RATED_SQL = statement("recent_low_rated", """
+    SELECT
+        Media.MediaName,
+        Media.MediaType,
+        Media.ReleaseYear,
+        Review.Rating
+    FROM Review
+    JOIN Media ON Review.MediaId = Media.MediaId
+    WHERE Review.Rating <= 3
+    ORDER BY Media.ReleaseYear DESC
+    LIMIT %s;
+""")
+
+
+@cached("recent_low_rated", tables=("Review", "Media"))
 def get_recent_low_rated(limit: int = 10):
-    conn = None
     try:
-        conn = get_connection()
-        cur = conn.cursor(dictionary=True)
+        with db_connection(read_only=True, shared=True) as conn:
+            query = _RECENT_LOW_RATED_SQL
 
-        query = """
-            SELECT 
-                Media.MediaName,
-                Media.MediaType,
-                Media.ReleaseYear,
-                Review.Rating
-            FROM Review
-            JOIN Media ON Review.MediaId = Media.MediaId
-            WHERE Review.Rating <= 3
-            ORDER BY Media.ReleaseYear DESC
-            LIMIT %s;
-        """
-
-        cur.execute(query, (limit,))
-        rows = cur.fetchall() or []
-        cur.close()
+            with run(conn, query, (limit,), dictionary=True) as cur:
+                rows = cur.fetchall() or []
         return True, None, rows
 
     except Error as exc:
         return False, str(exc), None
-    finally:
-        if conn:
-            conn.close()
 
 #User CRUD
 
+_INSERT_USER_SQL = statement(
+    "insert_user", "INSERT INTO User (FirstName, LastName, ProfileName) VALUES (%s, %s, %s)"
+)
+_UPDATE_USER_SQL = statement("update_user", """
+    UPDATE User
+    SET FirstName=%s, LastName=%s, ProfileName=%s
+    WHERE UserId=%s
+""")
+_DELETE_USER_SQL = statement("delete_user", "DELETE FROM User WHERE UserId=%s")
+_DELETE_USER_SUMMARY_SQL = statement("delete_user_summary", "DELETE FROM UserSummary WHERE UserId=%s")
+
+
 def create_user(first: str, last: str, profile: str) -> Tuple[bool, Optional[str]]:
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO User (FirstName, LastName, ProfileName) VALUES (%s, %s, %s)",
-            (first, last, profile),
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
+        with db_connection() as conn:
+            user_id = execute(conn, _INSERT_USER_SQL, (first, last, profile))
+            conn.commit()
+        _after_commit("User")
+        get_search_index().upsert("user", user_id, (first, last, profile))
+        get_suggester().user_saved(user_id, profile)
+        get_leaderboard().user_saved(user_id, first, last)
         return True, None
     except Exception as e:
         return False, str(e)
 
 
-def get_all_users() -> List[Dict[str, Any]]:
+ALL_USERS_SQL = statement("all_users", "SELECT * FROM User")
+
+
+def fetch_all_users(rowset: bool = False) -> Any:
+    """Every user as dicts, or as a RowSet with ``rowset=True``; raises on failure."""
+    with db_connection(read_only=True) as conn:
+        with run(conn, ALL_USERS_SQL, dictionary=not rowset) as cur:
+            rows: Any = RowSet.from_cursor(cur) if rowset else cur.fetchall()
+    return rows
+
+
+def get_all_users(rowset: bool = False) -> Any:
+    """Like fetch_all_users, but empty on failure."""
     try:
-        conn = get_connection()
-        cur = conn.cursor(dictionary=True)
-        cur.execute("SELECT * FROM User")
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
-        return rows  # type: ignore
+        return fetch_all_users(rowset)
     except Exception:
-        return []
+        return RowSet([], []) if rowset else []
 
 
 def update_user(user_id: int, first: str, last: str, profile: str) -> Tuple[bool, Optional[str]]:
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            UPDATE User
-            SET FirstName=%s, LastName=%s, ProfileName=%s
-            WHERE UserId=%s
-        """, (first, last, profile, user_id))
-        conn.commit()
-        cur.close()
-        conn.close()
+        with db_connection() as conn:
+            execute(conn, _UPDATE_USER_SQL, (first, last, profile, user_id))
+            conn.commit()
+        _after_commit("User")
+        get_entity_cache("user").discard((user_id,))
+        get_search_index().upsert("user", user_id, (first, last, profile))
+        get_suggester().user_saved(user_id, profile)
+        get_leaderboard().user_saved(user_id, first, last)
         return True, None
     except Exception as e:
         return False, str(e)
@@ -314,31 +708,174 @@ def update_user(user_id: int, first: str, last: str, profile: str) -> Tuple[bool
 
 def delete_user(user_id: int) -> Tuple[bool, Optional[str]]:
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("DELETE FROM User WHERE UserId=%s", (user_id,))
-        conn.commit()
-        cur.close()
-        conn.close()
+        with db_connection() as conn:
+            execute(conn, _DELETE_USER_SQL, (user_id,))
+            if rollups_enabled():
+                execute(conn, _DELETE_USER_SUMMARY_SQL, (user_id,))
+            conn.commit()
+        _after_commit("User")
+        get_entity_cache("user").discard((user_id,))
+        get_search_index().remove("user", user_id)
+        get_suggester().user_removed(user_id)
+        get_leaderboard().user_removed(user_id)
         return True, None
     except Exception as e:
         return False, str(e)
 
 
 
+# Batch lookups by id, read through the per-entity caches
+
+_BATCH_SQL = {
+    "user": "SELECT UserId, FirstName, LastName, ProfileName FROM User",
+    "media": "SELECT MediaId, MediaName, MediaType, ReleaseYear, GenreId, PlatformId, Description FROM Media",
+    "review": "SELECT ReviewId, UserId, MediaId, Rating, ReviewText, Status FROM Review",
+}
+
+
+def get_by_ids(entity: str, ids: List[int]) -> Tuple[bool, Optional[str], Optional[List[Optional[Dict[str, Any]]]]]:
+    """Rows of ``entity`` for ``ids`` in the order given, None for ids that do not exist.
+
+    Ids not in the entity cache are read with a single ``WHERE id IN (...)``.
+    """
+    key = ENTITIES[entity][1]
+
+    def load(missing: List[int]) -> Dict[int, Dict[str, Any]]:
+        query = f"{_BATCH_SQL[entity]} WHERE {key} IN ({', '.join(['%s'] * len(missing))})"
+        with db_connection(read_only=True, shared=True) as conn:
+            with run(conn, query, tuple(missing), dictionary=True) as cur:
+                return {row[key]: row for row in cur.fetchall()}
+
+    try:
+        rows = get_entity_cache(entity).get_many(ids, load)
+    except Error as exc:
+        return False, str(exc), None
+    return True, None, [rows.get(item_id) for item_id in ids]
+
+
+# Per-user statistics. UserSummary keeps them per user when rollups are on;
+# otherwise the user's reviews are aggregated, which the (UserId, MediaId)
+# index keeps to that user's rows.
+
+_USER_STATS_ROLLUP_SQL = statement("user_stats_rollup", """
+    SELECT
+        u.UserId,
+        u.ProfileName,
+        COALESCE(s.ReviewCount, 0) AS ReviewCount,
+        COALESCE(s.RatingCount, 0) AS RatingCount,
+        s.AvgRating,
+        COALESCE(s.Planning, 0) AS Planning,
+        COALESCE(s.Watching, 0) AS Watching,
+        COALESCE(s.Completions, 0) AS Completed,
+        COALESCE(s.HaventWatched, 0) AS `Havent Watched`
+    FROM User AS u
+    LEFT JOIN UserSummary AS s ON s.UserId = u.UserId
+    WHERE u.UserId = %s
+""")
+
+_USER_STATS_SQL = statement("user_stats", """
+    SELECT
+        u.UserId,
+        u.ProfileName,
+        COUNT(r.ReviewId) AS ReviewCount,
+        COUNT(r.Rating) AS RatingCount,
+        ROUND(AVG(r.Rating), 2) AS AvgRating,
+        SUM(r.Status = 'Planning') AS Planning,
+        SUM(r.Status = 'Watching') AS Watching,
+        SUM(r.Status = 'Completed') AS Completed,
+        SUM(r.Status = 'Havent Watched') AS `Havent Watched`
+    FROM User AS u
+    LEFT JOIN Review AS r ON r.UserId = u.UserId
+    WHERE u.UserId = %s
+    GROUP BY u.UserId, u.ProfileName
+""")
+
+
+@cached("user_stats", tables=("Review", "User"))
+def get_user_stats(user_id: int):
+    """Review count, average rating and reviews per status for one user.
+
+    ``rows`` is a single dict, or None when the user does not exist.
+    """
+    try:
+        with db_connection(read_only=True, shared=True) as conn:
+            query = _USER_STATS_ROLLUP_SQL if rollups_enabled() else _USER_STATS_SQL
+            with run(conn, query, (user_id,), dictionary=True) as cur:
+                row = cur.fetchone()
+        if row is None:
+            return True, None, None
+        row["Status"] = {name: int(row.pop(name) or 0) for name in USER_STATUS_COLUMNS}
+        return True, None, row
+
+    except Error as exc:
+        return False, str(exc), None
+
+
 # Review CRUD
 
+_LOCK_REVIEW_SQL = statement(
+    "lock_review", "SELECT UserId, MediaId, Rating, Status FROM Review WHERE ReviewId=%s FOR UPDATE"
+)
+_INSERT_REVIEW_SQL = statement("insert_review", """
+    INSERT INTO Review (UserId, MediaId, Rating, ReviewText, Status)
+    VALUES (%s, %s, %s, %s, %s)
+""")
+_UPDATE_REVIEW_SQL = statement("update_review", """
+    UPDATE Review
+    SET Rating=%s, ReviewText=%s, Status=%s
+    WHERE ReviewId=%s
+""")
+_DELETE_REVIEW_SQL = statement("delete_review", "DELETE FROM Review WHERE ReviewId=%s")
+
+
+def _lock_review(conn: Any, review_id: int) -> Optional[Dict[str, Any]]:
+    """Read and row-lock a review's current values ahead of an update/delete."""
+    with run(conn, _LOCK_REVIEW_SQL, (review_id,), buffered=True) as cur:
+        row = cur.fetchone()
+    if row is None:
+        return None
+    return dict(zip(("UserId", "MediaId", "Rating", "Status"), row))
+
+
+def _needs_old_review() -> bool:
+    """Whether anything downstream of a review write needs its previous values."""
+    return (
+        rollups_enabled()
+        or get_suggester().enabled
+        or get_leaderboard().enabled
+        or get_analytics_engine().enabled
+    )
+
+
+def _review_changed(user_id: Optional[int], media_id: Optional[int], old: ReviewState, new: ReviewState) -> None:
+    """Bring the in-memory rankings and analytics snapshot up to date with a committed review write."""
+    get_leaderboard().review_changed(user_id, media_id, old, new)
+    get_analytics_engine().review_changed(user_id, media_id, new)
+
+
+def _media_saved(
+    media_id: Optional[int],
+    name: str,
+    media_type: str,
+    genre_id: Optional[int],
+    platform_id: Optional[int],
+    year: Optional[int],
+) -> None:
+    get_leaderboard().media_saved(media_id, name, media_type)
+    get_analytics_engine().media_saved(media_id, name, media_type, genre_id, platform_id, year)
+
+
 def create_review(user_id: int, media_id: int, rating: int, text: str, status: str) -> Tuple[bool, Optional[str]]:
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO Review (UserId, MediaId, Rating, ReviewText, Status)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (user_id, media_id, rating, text, status))
-        conn.commit()
-        cur.close()
-        conn.close()
+        with db_connection() as conn:
+            execute(conn, _INSERT_REVIEW_SQL, (user_id, media_id, rating, text, status))
+            if rollups_enabled():
+                with closing(conn.cursor()) as cur:
+                    apply_review_change(cur, user_id, media_id, None, (rating, status))
+            conn.commit()
+        _after_commit("Review")
+        get_suggester().review_added(user_id, media_id)
+        _review_changed(user_id, media_id, None, (rating, status))
         return True, None
     except Exception as e:
         return False, str(e)
@@ -346,16 +883,17 @@ def create_review(user_id: int, media_id: int, rating: int, text: str, status: s
 
 def update_review(review_id: int, rating: int, text: str, status: str) -> Tuple[bool, Optional[str]]:
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            UPDATE Review
-            SET Rating=%s, ReviewText=%s, Status=%s
-            WHERE ReviewId=%s
-        """, (rating, text, status, review_id))
-        conn.commit()
-        cur.close()
-        conn.close()
+        with db_connection() as conn:
+            old = _lock_review(conn, review_id) if _needs_old_review() else None
+            execute(conn, _UPDATE_REVIEW_SQL, (rating, text, status, review_id))
+            if old and rollups_enabled():
+                with closing(conn.cursor()) as cur:
+                    apply_review_change(cur, old["UserId"], old["MediaId"], (old["Rating"], old["Status"]), (rating, status))
+            conn.commit()
+        _after_commit("Review")
+        get_entity_cache("review").discard((review_id,))
+        if old:
+            _review_changed(old["UserId"], old["MediaId"], (old["Rating"], old["Status"]), (rating, status))
         return True, None
     except Exception as e:
         return False, str(e)
@@ -363,233 +901,620 @@ def update_review(review_id: int, rating: int, text: str, status: str) -> Tuple[
 
 def delete_review(review_id: int) -> Tuple[bool, Optional[str]]:
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("DELETE FROM Review WHERE ReviewId=%s", (review_id,))
-        conn.commit()
-        cur.close()
-        conn.close()
+        with db_connection() as conn:
+            old = _lock_review(conn, review_id) if _needs_old_review() else None
+            execute(conn, _DELETE_REVIEW_SQL, (review_id,))
+            if old and rollups_enabled():
+                with closing(conn.cursor()) as cur:
+                    apply_review_change(cur, old["UserId"], old["MediaId"], (old["Rating"], old["Status"]), None)
+            conn.commit()
+        _after_commit("Review")
+        get_entity_cache("review").discard((review_id,))
+        if old:
+            get_suggester().review_added(old["UserId"], old["MediaId"], -1)
+            _review_changed(old["UserId"], old["MediaId"], (old["Rating"], old["Status"]), None)
         return True, None
     except Exception as e:
         return False, str(e)
 
 # Search Functionality
+#
+# Each category is described once: its base query, the LIKE filter, the
+# FULLTEXT columns and the ORDER BY keys for every supported sort. Sort keys
+# are COALESCEd to a value below any real one, which keeps MySQL's
+# NULLs-first-ascending order while making them comparable in keyset
+# predicates. The primary key is always the final tie-breaker so every row
+# has a unique position for cursors.
+#
+# The text filter is resolved in order of preference: the in-process trigram
+# index (SEARCH_INDEX=trigram) turns the term into a primary-key IN list;
+# sort=relevance without it uses the FULLTEXT indexes; anything else falls
+# back to LIKE '%term%'.
+
+_SEARCH_SPECS: Dict[str, Dict[str, Any]] = {
+    "media": {
+        "tables": ("Media", "Genre", "Platform", "Review"),
+        "select": """
+            SELECT 
+                m.MediaName, 
+                m.MediaType, 
+                m.ReleaseYear, 
+                g.GenreName, 
+                p.PlatformName, 
+                ROUND(AVG(r.Rating), 2) as AvgRating,
+                COUNT(r.ReviewId) as ReviewCount
+        """,
+        "from": """
+            FROM Media m
+            LEFT JOIN Genre g ON m.GenreId = g.GenreId
+            LEFT JOIN Platform p ON m.PlatformId = p.PlatformId
+            LEFT JOIN Review r ON m.MediaId = r.MediaId
+        """,
+        "where": "m.MediaName LIKE %s",
+        "terms": 1,
+        "match": "m.MediaName",
+        "id": "m.MediaId",
+        "sorts": {
+            "az": [("COALESCE(m.MediaName, '')", "ASC", False)],
+            "za": [("COALESCE(m.MediaName, '')", "DESC", False)],
+            "rating_desc": [("COALESCE(ROUND(AVG(r.Rating), 2), -1)", "DESC", True)],
+            "rating_asc": [("COALESCE(ROUND(AVG(r.Rating), 2), -1)", "ASC", True)],
+            "year_desc": [("COALESCE(m.ReleaseYear, -1)", "DESC", False)],
+            "year_asc": [("COALESCE(m.ReleaseYear, -1)", "ASC", False)],
+        },
+    },
+    "user": {
+        "tables": ("User", "Review"),
+        "select": """
+            SELECT 
+                u.FirstName, 
+                u.LastName, 
+                u.ProfileName,
+                COUNT(r.ReviewId) as ReviewCount
+        """,
+        "from": """
+            FROM User u
+            LEFT JOIN Review r ON u.UserId = r.UserId
+        """,
+        "where": "(u.FirstName LIKE %s OR u.LastName LIKE %s OR u.ProfileName LIKE %s)",
+        "terms": 3,
+        "match": "u.FirstName, u.LastName, u.ProfileName",
+        "id": "u.UserId",
+        "sorts": {
+            "az": [("COALESCE(u.LastName, '')", "ASC", False), ("COALESCE(u.FirstName, '')", "ASC", False)],
+            "za": [("COALESCE(u.LastName, '')", "DESC", False), ("COALESCE(u.FirstName, '')", "DESC", False)],
+            "count_desc": [("COUNT(r.ReviewId)", "DESC", True)],
+            "count_asc": [("COUNT(r.ReviewId)", "ASC", True)],
+        },
+    },
+    "genre": {
+        "tables": ("Genre", "Media", "Review"),
+        "select": """
+            SELECT 
+                g.GenreName,
+                COUNT(m.MediaId) as MediaCount,
+                ROUND(AVG(r.Rating), 2) as AvgRating
+        """,
+        "from": """
+            FROM Genre g
+            LEFT JOIN Media m ON g.GenreId = m.GenreId
+            LEFT JOIN Review r ON m.MediaId = r.MediaId
+        """,
+        "where": "g.GenreName LIKE %s",
+        "terms": 1,
+        "match": "g.GenreName",
+        "id": "g.GenreId",
+        "sorts": {
+            "az": [("COALESCE(g.GenreName, '')", "ASC", False)],
+            "za": [("COALESCE(g.GenreName, '')", "DESC", False)],
+            "rating_desc": [("COALESCE(ROUND(AVG(r.Rating), 2), -1)", "DESC", True)],
+            "rating_asc": [("COALESCE(ROUND(AVG(r.Rating), 2), -1)", "ASC", True)],
+            "count_desc": [("COUNT(m.MediaId)", "DESC", True)],
+            "count_asc": [("COUNT(m.MediaId)", "ASC", True)],
+        },
+    },
+}
+
+# With rollups on, the user search reads each user's review count from
+# UserSummary, one row per user, instead of grouping every matching user's
+# reviews. The keyset sort keys become plain columns, so paging predicates go
+# in WHERE and there is no GROUP BY.
+_USER_SEARCH_ROLLUP_SPEC: Dict[str, Any] = {
+    **_SEARCH_SPECS["user"],
+    "select": """
+            SELECT 
+                u.FirstName, 
+                u.LastName, 
+                u.ProfileName,
+                COALESCE(s.ReviewCount, 0) as ReviewCount
+        """,
+    "from": """
+            FROM User u
+            LEFT JOIN UserSummary s ON u.UserId = s.UserId
+        """,
+    "group": False,
+    "sorts": {
+        **_SEARCH_SPECS["user"]["sorts"],
+        "count_desc": [("COALESCE(s.ReviewCount, 0)", "DESC", False)],
+        "count_asc": [("COALESCE(s.ReviewCount, 0)", "ASC", False)],
+    },
+}
+
+
+def _search_spec(category: str) -> Dict[str, Any]:
+    if category == "user" and rollups_enabled():
+        return _USER_SEARCH_ROLLUP_SPEC
+    return _SEARCH_SPECS[category]
+
+
+# The relevance score is selected under the alias of the first sort key
+_RELEVANCE_KEY = "_k0"
+
+# Above this many trigram matches an IN list stops paying off; use SQL instead
+SEARCH_INDEX_MAX_IDS = int(os.getenv("SEARCH_INDEX_MAX_IDS", "5000"))
+
+SEARCH_DEFAULT_LIMIT = 50
+SEARCH_MAX_LIMIT = 500
+SEARCH_STREAM_BATCH = 500
+
+
+def search_tables(category: str) -> Optional[Tuple[str, ...]]:
+    """Tables a search in ``category`` reads, or None for an unknown category."""
+    spec = _SEARCH_SPECS.get(category)
+    return spec["tables"] if spec else None
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a search continuation token is malformed or doesn't match the request."""
+
 
-def search_database(query: str, category: str, sort: str) -> Tuple[bool, Optional[str], Optional[List[Dict[str, Any]]]]:
-    conn = None
+def _cursor_value(value: Any) -> Any:
+    # Decimals (AVG results) travel as strings; MySQL compares them numerically
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def encode_search_cursor(category: str, sort: str, query: str, keys: List[Any]) -> str:
+    """Opaque continuation token for the row whose sort keys are ``keys``."""
+    payload = {"c": category, "s": sort, "q": query, "k": [_cursor_value(k) for k in keys]}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_search_cursor(token: str, category: str, sort: str, query: str) -> List[Any]:
+    """Return the sort keys stored in ``token`` after checking it belongs to this search."""
     try:
-        conn = get_connection()
-        cur = conn.cursor(dictionary=True)
-        
-        sql = ""
-        params = []
-        search_term = f"%{query}%"
-
-        if category == 'media':
-            sql = """
-                SELECT 
-                    m.MediaName, 
-                    m.MediaType, 
-                    m.ReleaseYear, 
-                    g.GenreName, 
-                    p.PlatformName, 
-                    ROUND(AVG(r.Rating), 2) as AvgRating,
-                    COUNT(r.ReviewId) as ReviewCount
-                FROM Media m
-                LEFT JOIN Genre g ON m.GenreId = g.GenreId
-                LEFT JOIN Platform p ON m.PlatformId = p.PlatformId
-                LEFT JOIN Review r ON m.MediaId = r.MediaId
-                WHERE m.MediaName LIKE %s
-                GROUP BY m.MediaId
-            """
-            params = [search_term]
-            
-            if sort == 'az':
-                sql += " ORDER BY m.MediaName ASC"
-            elif sort == 'za':
-                sql += " ORDER BY m.MediaName DESC"
-            elif sort == 'rating_desc':
-                sql += " ORDER BY AvgRating DESC"
-            elif sort == 'rating_asc':
-                sql += " ORDER BY AvgRating ASC"
-            elif sort == 'year_desc':
-                sql += " ORDER BY m.ReleaseYear DESC"
-            elif sort == 'year_asc':
-                sql += " ORDER BY m.ReleaseYear ASC"
-
-        elif category == 'user':
-            sql = """
-                SELECT 
-                    u.FirstName, 
-                    u.LastName, 
-                    u.ProfileName,
-                    COUNT(r.ReviewId) as ReviewCount
-                FROM User u
-                LEFT JOIN Review r ON u.UserId = r.UserId
-                WHERE u.FirstName LIKE %s OR u.LastName LIKE %s OR u.ProfileName LIKE %s
-                GROUP BY u.UserId
-            """
-            params = [search_term, search_term, search_term]
-            
-            if sort == 'az':
-                sql += " ORDER BY u.LastName ASC, u.FirstName ASC"
-            elif sort == 'za':
-                sql += " ORDER BY u.LastName DESC, u.FirstName DESC"
-            elif sort == 'count_desc':
-                sql += " ORDER BY ReviewCount DESC"
-            elif sort == 'count_asc':
-                sql += " ORDER BY ReviewCount ASC"
-
-        elif category == 'genre':
-            sql = """
-                SELECT 
-                    g.GenreName,
-                    COUNT(m.MediaId) as MediaCount,
-                    ROUND(AVG(r.Rating), 2) as AvgRating
-                FROM Genre g
-                LEFT JOIN Media m ON g.GenreId = m.GenreId
-                LEFT JOIN Review r ON m.MediaId = r.MediaId
-                WHERE g.GenreName LIKE %s
-                GROUP BY g.GenreId
-            """
-            params = [search_term]
-            
-            if sort == 'az':
-                sql += " ORDER BY g.GenreName ASC"
-            elif sort == 'za':
-                sql += " ORDER BY g.GenreName DESC"
-            elif sort == 'rating_desc':
-                sql += " ORDER BY AvgRating DESC"
-            elif sort == 'rating_asc':
-                sql += " ORDER BY AvgRating ASC"
-            elif sort == 'count_desc':
-                sql += " ORDER BY MediaCount DESC"
-            elif sort == 'count_asc':
-                sql += " ORDER BY MediaCount ASC"
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        keys = payload["k"]
+    except (ValueError, TypeError, KeyError) as exc:
+        raise InvalidCursorError("Invalid cursor") from exc
+
+    spec = _SEARCH_SPECS.get(category)
+    if (
+        spec is None
+        or payload.get("c") != category
+        or payload.get("s") != sort
+        or payload.get("q") != query
+        or not isinstance(keys, list)
+        or len(keys) != len(_sort_keys(spec, sort))
+        or not all(isinstance(k, (str, int, float)) for k in keys)
+    ):
+        raise InvalidCursorError("Cursor does not match this search")
+    return keys
+
+
+def _sort_keys(spec: Dict[str, Any], sort: str) -> List[Tuple[str, str, bool]]:
+    """ORDER BY keys for ``sort`` with the primary key appended as tie-breaker."""
+    if sort == "relevance":
+        keys = [(_RELEVANCE_KEY, "DESC", True)]
+    else:
+        keys = list(spec["sorts"].get(sort, []))
+    direction = keys[0][1] if keys else "ASC"
+    return keys + [(spec["id"], direction, False)]
+
+
+def _fulltext_terms(query: str) -> str:
+    """Boolean-mode FULLTEXT query requiring every word as a prefix: 'star wa' -> '+star* +wa*'."""
+    words = re.findall(r"\w+", query)
+    return " ".join(f"+{w}*" for w in words)
+
+
+def _text_plan(category: str, query: str, sort: str) -> Tuple[str, List[Any], Optional[str], List[Any]]:
+    """Choose how to filter (and, for sort=relevance, score) rows matching ``query``.
+
+    Returns (where_sql, where_params, relevance_sql, relevance_params). The
+    SQL only varies with the number of ids when the search index is used.
+    """
+    spec = _SEARCH_SPECS[category]
+
+    ranked = get_search_index().search(category, query) if query else None
+    if ranked is not None and len(ranked) <= SEARCH_INDEX_MAX_IDS:
+        if not ranked:
+            return "FALSE", [], ("0" if sort == "relevance" else None), []
+        ids = [doc_id for doc_id, _ in ranked]
+        where = f"{spec['id']} IN ({', '.join(['%s'] * len(ids))})"
+        if sort != "relevance":
+            return where, ids, None, []
+        # FIELD() against the ids listed worst-first yields a rank where higher is better
+        worst_first = ids[::-1]
+        relevance = f"FIELD({spec['id']}, {', '.join(['%s'] * len(ids))})"
+        return where, ids, relevance, worst_first
+
+    terms = _fulltext_terms(query)
+    if sort == "relevance" and terms:
+        match = f"MATCH({spec['match']}) AGAINST (%s IN BOOLEAN MODE)"
+        return match, [terms], match, [terms]
+
+    like = [f"%{query}%"] * spec["terms"]
+    return spec["where"], like, ("0" if sort == "relevance" else None), []
+
+
+def _build_search_sql(
+    query: str,
+    category: str,
+    sort: str,
+    after: Optional[List[Any]] = None,
+    limit: Optional[int] = None,
+    with_keys: bool = False,
+) -> Tuple[str, List[Any]]:
+    spec = _search_spec(category)
+    keys = _sort_keys(spec, sort)
+    where, where_params, relevance, relevance_params = _text_plan(category, query, sort)
+
+    select = spec["select"].rstrip()
+    select_params: List[Any] = []
+    if relevance is not None:
+        select += f",\n                {relevance} AS {_RELEVANCE_KEY}"
+        select_params.extend(relevance_params)
+    if with_keys:
+        select += "".join(
+            f",\n                {expr} AS _k{i}"
+            for i, (expr, _, _) in enumerate(keys)
+            if expr != f"_k{i}"
+        )
 
+    having = ""
+    having_params: List[Any] = []
+
+    if after is not None:
+        # Lexicographic "row comes after the cursor" over mixed directions:
+        # (k0 > v0) OR (k0 = v0 AND k1 > v1) OR ...
+        clauses = []
+        keyset_params: List[Any] = []
+        for i, (expr, direction, _) in enumerate(keys):
+            op = ">" if direction == "ASC" else "<"
+            parts = [f"{keys[j][0]} = %s" for j in range(i)] + [f"{expr} {op} %s"]
+            clauses.append("(" + " AND ".join(parts) + ")")
+            keyset_params.extend(after[: i + 1])
+        predicate = "(" + " OR ".join(clauses) + ")"
+        if any(is_agg for _, _, is_agg in keys):
+            having = f"\n            HAVING {predicate}"
+            having_params = keyset_params
         else:
-            return False, "Invalid category", None
+            where = f"{where} AND {predicate}"
+            where_params = where_params + keyset_params
+
+    order_by = ", ".join(f"{expr} {direction}" for expr, direction, _ in keys)
+    group_by = f"\n            GROUP BY {spec['id']}{having}" if spec.get("group", True) else ""
+    sql = (
+        f"{select}\n            {spec['from'].strip()}\n"
+        f"            WHERE {where}{group_by}\n"
+        f"            ORDER BY {order_by}"
+    )
+    params = select_params + where_params + having_params
+    if limit is not None:
+        sql += "\n            LIMIT %s"
+        params.append(limit)
+    if not where.startswith(f"{spec['id']} IN ("):
+        # One text per category/sort/paging shape, so it is worth preparing;
+        # id lists from the search index change length with every query
+        return Statement(f"search_{category}", sql), params
+    return sql, params
+
+
+def _pop_keys(row: Dict[str, Any], count: int) -> List[Any]:
+    return [row.pop(f"_k{i}") for i in range(count)]
+
 
-        cur.execute(sql, tuple(params))
-        rows = cur.fetchall() or []
-        cur.close()
-        return True, None, cast(List[Dict[str, Any]], rows)
+def _strip_keys(row: Dict[str, Any]) -> Dict[str, Any]:
+    row.pop(_RELEVANCE_KEY, None)
+    return row
+
+
+def search_database(query: str, category: str, sort: str, rowset: bool = False) -> Tuple[bool, Optional[str], Any]:
+    """Return every match in one list. Prefer search_page/iter_search for large results.
+
+    With ``rowset=True`` the rows come back as a RowSet read from a tuple
+    cursor, which encodes without building a dict per row.
+    """
+    if category not in _SEARCH_SPECS:
+        return False, "Invalid category", None
+    try:
+        with db_connection(read_only=True) as conn:
+            sql, params = _build_search_sql(query, category, sort)
+            with run(conn, sql, tuple(params), dictionary=not rowset) as cur:
+                if rowset:
+                    rows: Any = RowSet.from_cursor(cur, exclude=(_RELEVANCE_KEY,))
+                else:
+                    rows = [_strip_keys(row) for row in cur.fetchall() or []]
+        return True, None, rows
 
     except Error as exc:
         return False, str(exc), None
-    finally:
-        if conn:
-            conn.close()
 
 
-def create_full_media_entry(data: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
+def search_page(
+    query: str,
+    category: str,
+    sort: str,
+    limit: int = SEARCH_DEFAULT_LIMIT,
+    after: Optional[List[Any]] = None,
+) -> Tuple[bool, Optional[str], Optional[List[Dict[str, Any]]], Optional[str]]:
+    """Keyset-paginated search.
+
+    Returns (ok, error, rows, next_cursor); ``next_cursor`` is None on the last
+    page. ``after`` is the decoded cursor from the previous page.
     """
-    Orchestrates the creation of User, Genre, Platform, Media, and Review
-    in a single transaction (or reuses existing ones).
+    if category not in _SEARCH_SPECS:
+        return False, "Invalid category", None, None
+    limit = max(1, min(int(limit), SEARCH_MAX_LIMIT))
+    try:
+        with db_connection(read_only=True) as conn:
+            sql, params = _build_search_sql(query, category, sort, after=after, limit=limit + 1, with_keys=True)
+            with run(conn, sql, tuple(params), dictionary=True) as cur:
+                rows = cur.fetchall() or []
+    except Error as exc:
+        return False, str(exc), None, None
+
+    page, next_cursor = _finish_search_page(cast(List[Dict[str, Any]], rows), query, category, sort, limit)
+    return True, None, page, next_cursor
+
+
+def _finish_search_page(
+    rows: List[Dict[str, Any]], query: str, category: str, sort: str, limit: int
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Trim a page queried with ``limit + 1`` rows and build its next cursor.
+
+    The extra row only tells whether another page exists.
     """
-    conn = None
+    key_count = len(_sort_keys(_SEARCH_SPECS[category], sort))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    last_keys: List[Any] = []
+    for row in rows:
+        last_keys = _pop_keys(row, key_count)
+    next_cursor = encode_search_cursor(category, sort, query, last_keys) if has_more else None
+    return rows, next_cursor
+
+
+def iter_search(
+    query: str,
+    category: str,
+    sort: str,
+    after: Optional[List[Any]] = None,
+    batch_size: int = SEARCH_STREAM_BATCH,
+) -> Generator[Dict[str, Any], None, None]:
+    """Yield matches straight off an unbuffered cursor, ``batch_size`` rows at a time.
+
+    Memory stays flat regardless of result size. The connection is held until
+    the iterator is exhausted or closed; an abandoned stream drops it rather
+    than draining the remaining rows.
+    """
+    if category not in _SEARCH_SPECS:
+        raise ValueError("Invalid category")
+    sql, params = _build_search_sql(query, category, sort, after=after)
+    with db_connection(read_only=True) as conn, run(conn, sql, tuple(params), dictionary=True) as cur:
+        while True:
+            batch = cur.fetchmany(batch_size)
+            if not batch:
+                break
+            for row in batch:
+                yield _strip_keys(cast(Dict[str, Any], row))
+
+
+# Typeahead
+#
+# /api/suggest is answered from the in-memory prefix index when SUGGEST_INDEX=1
+# and it has loaded; otherwise from these prefix LIKE queries, which can use
+# the name indexes because the pattern is anchored.
+
+_SUGGEST_SQL: Dict[str, str] = {
+    "media": """
+        SELECT m.MediaName AS text, 'media' AS type, COUNT(r.ReviewId) AS weight
+        FROM Media m
+        LEFT JOIN Review r ON r.MediaId = m.MediaId
+        WHERE m.MediaName LIKE %s
+        GROUP BY m.MediaName
+    """,
+    "user": """
+        SELECT u.ProfileName AS text, 'user' AS type, COUNT(r.ReviewId) AS weight
+        FROM User u
+        LEFT JOIN Review r ON r.UserId = u.UserId
+        WHERE u.ProfileName LIKE %s
+        GROUP BY u.ProfileName
+    """,
+    "genre": """
+        SELECT g.GenreName AS text, 'genre' AS type, COUNT(r.ReviewId) AS weight
+        FROM Genre g
+        LEFT JOIN Media m ON m.GenreId = g.GenreId
+        LEFT JOIN Review r ON r.MediaId = m.MediaId
+        WHERE g.GenreName LIKE %s
+        GROUP BY g.GenreName
+    """,
+}
+SUGGEST_CATEGORIES = ("all",) + tuple(_SUGGEST_SQL)
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _suggest_query(prefix: str, category: str, limit: int) -> Tuple[str, Tuple[Any, ...]]:
+    categories = tuple(_SUGGEST_SQL) if category == "all" else (category,)
+    pattern = _escape_like(prefix) + "%"
+    query = " UNION ALL ".join(f"({_SUGGEST_SQL[c].strip()})" for c in categories)
+    query += " ORDER BY weight DESC, text LIMIT %s"
+    return Statement(f"suggest_{category}", query), tuple(pattern for _ in categories) + (limit,)
+
+
+def suggest_names(prefix: str, category: str = "all", limit: int = 10) -> Tuple[bool, Optional[str], Optional[List[Dict[str, Any]]]]:
+    """Names starting with ``prefix``, most-reviewed first."""
+    if category not in SUGGEST_CATEGORIES:
+        return False, "Invalid category", None
+    limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+
+    found = get_suggester().complete(prefix, category, limit)
+    if found is not None:
+        return True, None, found
+
+    query, params = _suggest_query(prefix, category, limit)
     try:
-        conn = get_connection()
-        conn.start_transaction()  # Explicitly start transaction for ACID compliance
+        with db_connection(read_only=True) as conn:
+            with run(conn, query, params, dictionary=True) as cur:
+                rows = cast(List[Dict[str, Any]], cur.fetchall())
+        for row in rows:
+            row["weight"] = int(row["weight"])
+        return True, None, rows
+    except Error as exc:
+        return False, str(exc), None
 
-        def fetch_value(sql: str, params: tuple) -> Any:
-            cur = conn.cursor(buffered=True)
-            try:
-                cur.execute(sql, params)
-                rows = cur.fetchall()
-                return rows[0][0] if rows else None
-            except Exception:
-                # If fetchall fails or returns nothing, ensure we close cleanly
-                return None
-            finally:
-                cur.close()
 
-        def insert_record(sql: str, params: tuple) -> Any:
-            cur = conn.cursor(buffered=True)
-            try:
-                cur.execute(sql, params)
-                # Some drivers/configurations might have issues with fetchall after insert
-                # We can try to consume results if any exist, but ignore errors
-                try:
-                    cur.fetchall()
-                except Exception:
-                    pass
-                return cur.lastrowid
-            finally:
-                cur.close()
+# Row lookups for create_full_media_entry(). FOR UPDATE locks the matching
+# index range, so each needs an index on its WHERE columns (see
+# migrations/0002) or it locks the whole table.
+_FIND_USER_SQL = statement("find_user", "SELECT UserId FROM User WHERE ProfileName = %s FOR UPDATE")
+_FIND_GENRE_SQL = statement("find_genre", "SELECT GenreId FROM Genre WHERE GenreName = %s FOR UPDATE")
+_FIND_PLATFORM_SQL = statement("find_platform", "SELECT PlatformId FROM Platform WHERE PlatformName = %s FOR UPDATE")
+_FIND_MEDIA_SQL = statement("find_media", """
+    SELECT MediaId FROM Media
+    WHERE MediaName = %s AND MediaType = %s AND ReleaseYear = %s FOR UPDATE
+""")
+_FIND_REVIEW_SQL = statement(
+    "find_review", "SELECT ReviewId, Rating, Status FROM Review WHERE UserId = %s AND MediaId = %s FOR UPDATE"
+)
+_INSERT_GENRE_SQL = statement("insert_genre", "INSERT INTO Genre (GenreName) VALUES (%s)")
+_INSERT_PLATFORM_SQL = statement("insert_platform", "INSERT INTO Platform (PlatformName) VALUES (%s)")
+_INSERT_MEDIA_SQL = statement("insert_media", """
+    INSERT INTO Media (MediaName, MediaType, ReleaseYear, GenreId, PlatformId, Description)
+    VALUES (%s, %s, %s, %s, %s, %s)
+""")
+
 
-        def execute_stmt(sql: str, params: tuple) -> None:
-            cur = conn.cursor(buffered=True)
+def create_full_media_entry(data: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
+    """
+    Orchestrates the creation of User, Genre, Platform, Media, and Review
+    in a single transaction (or reuses existing ones).
+    """
+    # Rows inserted by this entry, added to the search index once committed
+    created: List[Tuple[str, Any, Tuple[Any, ...]]] = []
+    try:
+        with db_connection() as conn:
             try:
-                cur.execute(sql, params)
-                try:
-                    cur.fetchall()
-                except Exception:
-                    pass
-            finally:
-                cur.close()
-
-        # 1. Ensure User
-        # Use FOR UPDATE to lock rows and ensure Isolation (prevent race conditions)
-        user_id = fetch_value("SELECT UserId FROM User WHERE ProfileName = %s FOR UPDATE", (data['profilename'],))
-        if not user_id:
-            user_id = insert_record(
-                "INSERT INTO User (FirstName, LastName, ProfileName) VALUES (%s, %s, %s)",
-                (data['firstname'], data['lastname'], data['profilename'])
-            )
-
-        # 2. Ensure Genre
-        genre_id = fetch_value("SELECT GenreId FROM Genre WHERE GenreName = %s FOR UPDATE", (data['genre'],))
-        if not genre_id:
-            genre_id = insert_record("INSERT INTO Genre (GenreName) VALUES (%s)", (data['genre'],))
-
-        # 3. Ensure Platform
-        platform_id = fetch_value("SELECT PlatformId FROM Platform WHERE PlatformName = %s FOR UPDATE", (data['platform'],))
-        if not platform_id:
-            platform_id = insert_record("INSERT INTO Platform (PlatformName) VALUES (%s)", (data['platform'],))
-
-        # 4. Ensure Media
-        media_id = fetch_value("""
-            SELECT MediaId FROM Media 
-            WHERE MediaName = %s AND MediaType = %s AND ReleaseYear = %s FOR UPDATE
-        """, (data['medianame'], data['mediatype'], data['releaseyear']))
+                conn.start_transaction()  # Explicitly start transaction for ACID compliance
+
+                def fetch_value(sql: str, params: tuple) -> Any:
+                    try:
+                        with run(conn, sql, params, buffered=True) as cur:
+                            rows = cur.fetchall()
+                        return rows[0][0] if rows else None
+                    except Exception:
+                        # If fetchall fails or returns nothing, ensure we close cleanly
+                        return None
+
+                def fetch_row(sql: str, params: tuple) -> Optional[tuple]:
+                    with run(conn, sql, params, buffered=True) as cur:
+                        rows = cur.fetchall()
+                    return tuple(rows[0]) if rows else None
+
+                def insert_record(sql: str, params: tuple) -> Any:
+                    return execute(conn, sql, params)
+
+                def execute_stmt(sql: str, params: tuple) -> None:
+                    execute(conn, sql, params)
+
+                # 1. Ensure User
+                # Use FOR UPDATE to lock rows and ensure Isolation (prevent race conditions)
+                user_id = fetch_value(_FIND_USER_SQL, (data['profilename'],))
+                if not user_id:
+                    user_id = insert_record(
+                        _INSERT_USER_SQL,
+                        (data['firstname'], data['lastname'], data['profilename'])
+                    )
+                    created.append(("user", user_id, (data['firstname'], data['lastname'], data['profilename'])))
+
+                # 2. Ensure Genre
+                genre_id = fetch_value(_FIND_GENRE_SQL, (data['genre'],))
+                if not genre_id:
+                    genre_id = insert_record(_INSERT_GENRE_SQL, (data['genre'],))
+                    created.append(("genre", genre_id, (data['genre'],)))
+
+                # 3. Ensure Platform
+                platform_id = fetch_value(_FIND_PLATFORM_SQL, (data['platform'],))
+                if not platform_id:
+                    platform_id = insert_record(_INSERT_PLATFORM_SQL, (data['platform'],))
+
+                # 4. Ensure Media
+                media_id = fetch_value(_FIND_MEDIA_SQL, (data['medianame'], data['mediatype'], data['releaseyear']))
         
-        if not media_id:
-            media_id = insert_record("""
-                INSERT INTO Media (MediaName, MediaType, ReleaseYear, GenreId, PlatformId, Description)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                data['medianame'], 
-                data['mediatype'], 
-                data['releaseyear'], 
-                genre_id, 
-                platform_id, 
-                data.get('description', '')
-            ))
-
-        # 5. Create or Update Review
-        review_id = fetch_value("SELECT ReviewId FROM Review WHERE UserId = %s AND MediaId = %s FOR UPDATE", (user_id, media_id))
+                if not media_id:
+                    media_id = insert_record(_INSERT_MEDIA_SQL, (
+                        data['medianame'], 
+                        data['mediatype'], 
+                        data['releaseyear'], 
+                        genre_id, 
+                        platform_id, 
+                        data.get('description', '')
+                    ))
+                    created.append(("media", media_id, (data['medianame'],)))
+
+                # 5. Create or Update Review
+                existing = fetch_row(_FIND_REVIEW_SQL, (user_id, media_id))
+                review_id = existing[0] if existing else None
         
+                if review_id:
+                    # Update existing review
+                    execute_stmt(_UPDATE_REVIEW_SQL, (data['rating'], data.get('ratingtext', ''), data['status'], review_id))
+                else:
+                    # Insert new review
+                    execute_stmt(_INSERT_REVIEW_SQL, (user_id, media_id, data['rating'], data.get('ratingtext', ''), data['status']))
+
+                if rollups_enabled():
+                    cur = conn.cursor()
+                    try:
+                        apply_review_change(
+                            cur, user_id, media_id,
+                            (existing[1], existing[2]) if existing else None,
+                            (int(data['rating']), data['status']),
+                        )
+                    finally:
+                        cur.close()
+
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        _after_commit("User", "Genre", "Platform", "Media", "Review")
         if review_id:
-            # Update existing review
-            execute_stmt("""
-                UPDATE Review 
-                SET Rating = %s, ReviewText = %s, Status = %s
-                WHERE ReviewId = %s
-            """, (data['rating'], data.get('ratingtext', ''), data['status'], review_id))
-        else:
-            # Insert new review
-            execute_stmt("""
-                INSERT INTO Review (UserId, MediaId, Rating, ReviewText, Status)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (user_id, media_id, data['rating'], data.get('ratingtext', ''), data['status']))
-
-        conn.commit()
+            get_entity_cache("review").discard((review_id,))
+        suggester, leaderboard = get_suggester(), get_leaderboard()
+        for category, doc_id, fields in created:
+            get_search_index().upsert(category, doc_id, fields)
+            if category == "user":
+                suggester.user_saved(doc_id, fields[2])
+                leaderboard.user_saved(doc_id, fields[0], fields[1])
+            elif category == "genre":
+                suggester.genre_saved(doc_id, fields[0])
+                get_analytics_engine().genre_saved(doc_id, fields[0])
+            else:
+                suggester.media_saved(doc_id, fields[0], genre_id)
+                _media_saved(doc_id, fields[0], data['mediatype'], genre_id, platform_id, data['releaseyear'])
+        if not existing:
+            suggester.review_added(user_id, media_id)
+        _review_changed(
+            user_id, media_id,
+            (existing[1], existing[2]) if existing else None,
+            (int(data['rating']), data['status']),
+        )
         return True, None
     except Exception as e:
-        if conn:
-            conn.rollback()
         return False, str(e)
-    finally:
-        if conn:
-            conn.close()
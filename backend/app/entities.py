@@ -0,0 +1,142 @@
+"""Per-entity read-through caches behind the batch lookup routes.
+
+``GET /api/users/batch``, ``/api/media/batch`` and ``/api/reviews/batch`` take
+up to BATCH_MAX_IDS ids. Ids held in the entity's cache are answered from
+memory. The rest are read with one ``WHERE id IN (...)`` query and cached.
+Entries are single rows keyed by id, unlike the result cache, so a write only
+drops the rows it changed: db.py calls ``discard`` after commit. Ids that do
+not exist are not cached, so rows created later are found right away.
+
+Each worker process has its own caches. ENTITY_CACHE_TTL bounds how long a
+write handled by another worker can go unseen.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# entity -> (table, primary key)
+ENTITIES: Dict[str, Tuple[str, str]] = {
+    "user": ("User", "UserId"),
+    "media": ("Media", "MediaId"),
+    "review": ("Review", "ReviewId"),
+}
+
+Row = Dict[str, Any]
+
+
+def batch_max_ids() -> int:
+    """Most ids one batch request may ask for (BATCH_MAX_IDS)."""
+    return int(os.getenv("BATCH_MAX_IDS", "100"))
+
+
+class EntityCache:
+    """Thread-safe TTL + LRU map of id -> row for one table."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 30.0) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Tuple[Row, float]]" = OrderedDict()
+        # Bumped by every discard; a load that overlapped one is not stored,
+        # since it may have read the row before the write committed
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "EntityCache":
+        return cls(
+            max_entries=int(os.getenv("ENTITY_CACHE_MAX_ENTRIES", "1024")),
+            ttl=float(os.getenv("ENTITY_CACHE_TTL", "30")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get_many(self, ids: Sequence[int], load: Callable[[List[int]], Dict[int, Row]]) -> Dict[int, Row]:
+        """Rows for those ``ids`` that exist; ``load`` reads the ones not cached.
+
+        Rows are shared between callers and must be treated as read-only.
+        """
+        wanted = list(dict.fromkeys(ids))
+        if not self.enabled:
+            return load(wanted) if wanted else {}
+
+        found: Dict[int, Row] = {}
+        missing: List[int] = []
+        now = time.monotonic()
+        with self._lock:
+            for item_id in wanted:
+                entry = self._entries.get(item_id)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(item_id)
+                    found[item_id] = entry[0]
+                elif entry is not None:
+                    del self._entries[item_id]
+                    missing.append(item_id)
+                else:
+                    missing.append(item_id)
+            self._hits += len(found)
+            self._misses += len(missing)
+            generation = self._generation
+        if not missing:
+            return found
+
+        loaded = load(missing)
+        found.update(loaded)
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            if self._generation == generation:
+                for item_id, row in loaded.items():
+                    self._entries[item_id] = (row, expires)
+                    self._entries.move_to_end(item_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+        return found
+
+    def discard(self, ids: Iterable[Optional[int]]) -> None:
+        """Drop the cached rows for ``ids`` after a write changed or deleted them."""
+        with self._lock:
+            self._generation += 1
+            for item_id in ids:
+                self._entries.pop(item_id, None)  # type: ignore[arg-type]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_caches: Dict[str, EntityCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_entity_cache(entity: str) -> EntityCache:
+    """Process-wide cache for ``entity``, configured from ENTITY_CACHE_* on first use."""
+    cache = _caches.get(entity)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.setdefault(entity, EntityCache.from_env())
+    return cache
+
+
+def entity_cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {entity: get_entity_cache(entity).stats() for entity in ENTITIES}
@@ -0,0 +1,74 @@
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
+
+from . import db
+
+
+class PlanCheck(NamedTuple):
+    """A hot query to EXPLAIN, with sample parameters.
+
+    ``allow_scan`` lists table names/aliases a full scan is acceptable on
+    (tiny lookup tables, or the outer side of a query that returns most rows).
+    """
+
+    name: str
+    sql: str
+    params: Tuple[Any, ...]
+    allow_scan: Tuple[str, ...] = ()
+
+
+# The GROUP BY fallbacks used with ANALYTICS_ROLLUPS=0 read every review by
+# design and are left out; the rollup reads below are the indexed path.
+HOT_QUERIES: List[PlanCheck] = [
+    PlanCheck("top_rated_media (rollup)", db._TOP_RATED_MEDIA_ROLLUP_SQL, (1, 5)),
+    PlanCheck("top_users_completed (rollup)", db._TOP_USERS_COMPLETED_ROLLUP_SQL, (6, 5)),
+    PlanCheck("top_media_completed (rollup)", db._TOP_MEDIA_COMPLETED_ROLLUP_SQL, (6, 5)),
+    # One row per genre on both sides
+    PlanCheck("avg_rating_per_genre (rollup)", db._AVG_RATING_PER_GENRE_ROLLUP_SQL, (), allow_scan=("s", "g")),
+    # Most users qualify, so scanning User is fine; Review must use an index
+    PlanCheck("users_rating_above", db._USERS_RATING_ABOVE_SQL, (4,), allow_scan=("User",)),
+    PlanCheck("recent_low_rated", db._RECENT_LOW_RATED_SQL, (10,)),
+    PlanCheck("user_stats (rollup)", db._USER_STATS_ROLLUP_SQL, (1,)),
+    PlanCheck("full_entry: find user", db._FIND_USER_SQL, ("someone",)),
+    PlanCheck("full_entry: find genre", db._FIND_GENRE_SQL, ("Drama",)),
+    PlanCheck("full_entry: find platform", db._FIND_PLATFORM_SQL, ("Netflix",)),
+    PlanCheck("full_entry: find media", db._FIND_MEDIA_SQL, ("Dune", "Movie", 2021)),
+    PlanCheck("full_entry: find review", db._FIND_REVIEW_SQL, (1, 1)),
+    PlanCheck("suggest: media", db._SUGGEST_SQL["media"], ("du%",)),
+    PlanCheck("suggest: user", db._SUGGEST_SQL["user"], ("du%",)),
+    PlanCheck("suggest: genre", db._SUGGEST_SQL["genre"], ("dr%",)),
+]
+
+
+def explain(conn: Any, sql: str, params: Iterable[Any] = ()) -> List[Dict[str, Any]]:
+    """Return MySQL's EXPLAIN rows for ``sql``."""
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute("EXPLAIN " + sql.strip().rstrip(";"), tuple(params))
+        return cur.fetchall() or []
+    finally:
+        cur.close()
+
+
+def full_scans(plan: List[Dict[str, Any]], allow: Iterable[str] = ()) -> List[str]:
+    """Tables in ``plan`` read with a full table scan (access type ALL)."""
+    allowed = set(allow)
+    return [
+        str(row.get("table"))
+        for row in plan
+        if row.get("type") == "ALL" and row.get("table") not in allowed
+    ]
+
+
+def check_query_plans(conn: Any, checks: Iterable[PlanCheck] = HOT_QUERIES) -> List[Dict[str, Any]]:
+    """EXPLAIN each check and report which ones fall back to full scans."""
+    results = []
+    for check in checks:
+        plan = explain(conn, check.sql, check.params)
+        scans = full_scans(plan, check.allow_scan)
+        results.append({
+            "name": check.name,
+            "ok": not scans,
+            "full_scans": scans,
+            "keys": [row.get("key") for row in plan],
+        })
+    return results
@@ -0,0 +1,362 @@
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .columnar import get_analytics_engine
+from .db import _after_commit, _media_saved, _review_changed, db_connection
+from .entities import get_entity_cache
+from .leaderboard import get_leaderboard
+from .rollups import ReviewState, RollupBatch, rollups_enabled
+from .search_index import get_search_index
+from .suggest import get_suggester
+
+logger = logging.getLogger(__name__)
+
+# Fields every media entry must carry (same contract as POST /api/media-entries)
+MEDIA_ENTRY_FIELDS = (
+    "firstname", "lastname", "profilename", "mediatype", "medianame",
+    "releaseyear", "genre", "platform", "rating", "status",
+)
+
+REVIEW_STATUSES = ("Planning", "Watching", "Completed", "Havent Watched")
+
+# Column widths from the schema; longer values would fail the whole chunk in
+# strict mode, so they're rejected per item up front
+_MAX_LENGTHS = {
+    "firstname": 50, "lastname": 50, "profilename": 50, "genre": 50,
+    "platform": 50, "medianame": 100, "mediatype": 50,
+}
+
+
+def get_chunk_size() -> int:
+    """Entries committed per transaction (INGEST_CHUNK_SIZE)."""
+    return max(1, int(os.getenv("INGEST_CHUNK_SIZE", "500")))
+
+
+def missing_field(entry: Dict[str, Any]) -> Optional[str]:
+    for field in MEDIA_ENTRY_FIELDS:
+        if field not in entry or not entry[field]:
+            return field
+    return None
+
+
+def _normalize(entry: Any) -> Dict[str, Any]:
+    """Validate one raw entry and coerce its types, raising ValueError on bad input."""
+    if not isinstance(entry, dict):
+        raise ValueError("Entry must be a JSON object")
+    field = missing_field(entry)
+    if field:
+        raise ValueError(f"Missing field: {field}")
+
+    clean = {f: str(entry[f]).strip() for f in _MAX_LENGTHS}
+    for f, limit in _MAX_LENGTHS.items():
+        if len(clean[f]) > limit:
+            raise ValueError(f"{f} longer than {limit} characters")
+    try:
+        clean["releaseyear"] = int(entry["releaseyear"])
+        clean["rating"] = int(entry["rating"])
+    except (TypeError, ValueError):
+        raise ValueError("releaseyear and rating must be integers")
+    clean["status"] = str(entry["status"])
+    if clean["status"] not in REVIEW_STATUSES:
+        raise ValueError(f"Invalid status: {clean['status']}")
+    clean["description"] = str(entry.get("description") or "")
+    clean["ratingtext"] = str(entry.get("ratingtext") or "")
+    return clean
+
+
+def _fold(value: str) -> str:
+    # Approximates the case-insensitive, trailing-space-insensitive matching
+    # of the default MySQL collation, so lookups line up with the rows found
+    return value.rstrip(" ").casefold()
+
+
+def _marks(rows: int, width: int = 1) -> str:
+    group = "%s" if width == 1 else "(" + ", ".join(["%s"] * width) + ")"
+    return ", ".join([group] * rows)
+
+
+def parse_ndjson(lines: Iterable[Any]) -> Iterator[Any]:
+    """Decode newline-delimited JSON; a bad line yields its ValueError instead of stopping."""
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            yield ValueError(f"Invalid JSON: {exc}")
+
+
+class _Resolver:
+    """Set-based lookup-or-insert of one name table for a chunk."""
+
+    def __init__(self, cur: Any, table: str, id_col: str, columns: Tuple[str, ...], unique: bool) -> None:
+        self.cur = cur
+        self.table = table
+        self.id_col = id_col
+        # Insert columns; the last one is the name looked up
+        self.columns = columns
+        self.name_col = columns[-1]
+        self.unique = unique
+        self.created: List[Tuple[int, Tuple[Any, ...]]] = []
+
+    def _select(self, names: List[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        self.cur.execute(
+            f"SELECT {self.id_col}, {self.name_col} FROM {self.table} "
+            f"WHERE {self.name_col} IN ({_marks(len(names))}) ORDER BY {self.id_col} FOR UPDATE",
+            tuple(names),
+        )
+        for row_id, name in self.cur.fetchall():
+            found.setdefault(_fold(name), row_id)
+        return found
+
+    def resolve(self, rows: Dict[str, Tuple[Any, ...]]) -> Dict[str, int]:
+        """Map folded name -> id, inserting ``rows`` (folded name -> column values) that don't exist."""
+        if not rows:
+            return {}
+        ids = self._select([values[-1] for values in rows.values()])
+        missing = [key for key in rows if key not in ids]
+        if missing:
+            # IGNORE lets a concurrent insert of the same unique name win quietly
+            self.cur.executemany(
+                f"INSERT {'IGNORE ' if self.unique else ''}INTO {self.table} ({', '.join(self.columns)}) "
+                f"VALUES ({_marks(len(self.columns))})",
+                [rows[key] for key in missing],
+            )
+            fresh = self._select([rows[key][-1] for key in missing])
+            for key, row_id in fresh.items():
+                if key not in ids:
+                    ids[key] = row_id
+                    self.created.append((row_id, rows[key]))
+        return ids
+
+
+def _ingest_chunk(conn: Any, items: List[Tuple[int, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Upsert one chunk in a single transaction; returns per-item statuses and what was created."""
+    cur = conn.cursor(buffered=True)
+    conn.start_transaction()
+    try:
+        users = _Resolver(cur, "User", "UserId", ("FirstName", "LastName", "ProfileName"), unique=False)
+        genres = _Resolver(cur, "Genre", "GenreId", ("GenreName",), unique=True)
+        platforms = _Resolver(cur, "Platform", "PlatformId", ("PlatformName",), unique=True)
+
+        # Built from the reversed chunk so the first entry naming a row wins
+        user_ids = users.resolve({
+            _fold(e["profilename"]): (e["firstname"], e["lastname"], e["profilename"]) for _, e in reversed(items)
+        })
+        genre_ids = genres.resolve({_fold(e["genre"]): (e["genre"],) for _, e in reversed(items)})
+        platform_ids = platforms.resolve({_fold(e["platform"]): (e["platform"],) for _, e in reversed(items)})
+
+        # Media is keyed by (name, type, year); new rows take the genre and
+        # platform of the first entry that mentions them
+        def media_key(e: Dict[str, Any]) -> Tuple[str, str, int]:
+            return (_fold(e["medianame"]), _fold(e["mediatype"]), e["releaseyear"])
+
+        wanted: Dict[Tuple[str, str, int], Dict[str, Any]] = {}
+        for _, e in items:
+            wanted.setdefault(media_key(e), e)
+
+        def select_media(entries: List[Dict[str, Any]]) -> Dict[Tuple[str, str, int], Tuple[int, Optional[int]]]:
+            params: List[Any] = []
+            for e in entries:
+                params += [e["medianame"], e["mediatype"], e["releaseyear"]]
+            cur.execute(
+                "SELECT MediaId, MediaName, MediaType, ReleaseYear, GenreId FROM Media "
+                f"WHERE (MediaName, MediaType, ReleaseYear) IN ({_marks(len(entries), 3)}) "
+                "ORDER BY MediaId FOR UPDATE",
+                tuple(params),
+            )
+            found: Dict[Tuple[str, str, int], Tuple[int, Optional[int]]] = {}
+            for media_id, name, mtype, year, genre_id in cur.fetchall():
+                found.setdefault((_fold(name), _fold(mtype), year), (media_id, genre_id))
+            return found
+
+        media = select_media(list(wanted.values()))
+        new_media = [e for key, e in wanted.items() if key not in media]
+        created_media: List[Tuple[int, str, Optional[int], str, Optional[int], int]] = []
+        if new_media:
+            cur.executemany(
+                "INSERT IGNORE INTO Media (MediaName, MediaType, ReleaseYear, GenreId, PlatformId, Description) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                [
+                    (e["medianame"], e["mediatype"], e["releaseyear"],
+                     genre_ids.get(_fold(e["genre"])), platform_ids.get(_fold(e["platform"])), e["description"])
+                    for e in new_media
+                ],
+            )
+            for key, value in select_media(new_media).items():
+                if key not in media:
+                    media[key] = value
+                    e = wanted[key]
+                    created_media.append((
+                        value[0], e["medianame"], value[1], e["mediatype"],
+                        platform_ids.get(_fold(e["platform"])), e["releaseyear"],
+                    ))
+
+        # Reviews: read current state for every (user, media) pair once, then
+        # apply the entries in order so repeats within a chunk behave like
+        # successive single-entry calls
+        results: List[Dict[str, Any]] = []
+        pairs: Dict[Tuple[int, int], Optional[Tuple[int, Optional[int], Optional[str]]]] = {}
+        resolved: List[Tuple[int, Dict[str, Any], int, int, Optional[int]]] = []
+        for index, e in items:
+            user_id = user_ids.get(_fold(e["profilename"]))
+            found = media.get(media_key(e))
+            if user_id is None or found is None:
+                what = "user" if user_id is None else "media"
+                results.append({"index": index, "status": "error", "error": f"Could not resolve {what}"})
+                continue
+            resolved.append((index, e, user_id, found[0], found[1]))
+            pairs[(user_id, found[0])] = None
+
+        if pairs:
+            params: List[Any] = []
+            for user_id, media_id in pairs:
+                params += [user_id, media_id]
+            cur.execute(
+                "SELECT UserId, MediaId, ReviewId, Rating, Status FROM Review "
+                f"WHERE (UserId, MediaId) IN ({_marks(len(pairs), 2)}) FOR UPDATE",
+                tuple(params),
+            )
+            for user_id, media_id, review_id, rating, status in cur.fetchall():
+                pairs[(user_id, media_id)] = (review_id, rating, status)
+
+        batch = RollupBatch()
+        rows: Dict[Tuple[int, int], Tuple[Any, ...]] = {}
+        new_reviews: List[Tuple[int, int]] = []
+        updated_reviews: List[int] = []
+        review_changes: List[Tuple[int, int, ReviewState, ReviewState]] = []
+        for index, e, user_id, media_id, genre_id in resolved:
+            pair = (user_id, media_id)
+            current = pairs[pair]
+            old = (current[1], current[2]) if current else None
+            batch.add(user_id, media_id, genre_id, old, (e["rating"], e["status"]))
+            review_changes.append((user_id, media_id, old, (e["rating"], e["status"])))
+            if current is None:
+                new_reviews.append(pair)
+            elif current[0]:
+                updated_reviews.append(current[0])
+            pairs[pair] = (current[0] if current else 0, e["rating"], e["status"])
+            rows[pair] = (user_id, media_id, e["rating"], e["ratingtext"], e["status"])
+            results.append({"index": index, "status": "updated" if current else "created"})
+
+        if rows:
+            # Relies on the uq_review_user_media index (migration 0002)
+            cur.executemany(
+                "INSERT INTO Review (UserId, MediaId, Rating, ReviewText, Status) "
+                "VALUES (%s, %s, %s, %s, %s) "
+                "ON DUPLICATE KEY UPDATE Rating = VALUES(Rating), ReviewText = VALUES(ReviewText), "
+                "Status = VALUES(Status)",
+                list(rows.values()),
+            )
+        if rollups_enabled():
+            batch.flush(cur)
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    return {
+        "results": results,
+        "users": users.created,
+        "genres": genres.created,
+        "media": created_media,
+        "new_reviews": new_reviews,
+        "updated_reviews": updated_reviews,
+        "review_changes": review_changes,
+    }
+
+
+def _after_chunk(outcome: Dict[str, Any]) -> None:
+    """Bring the in-process caches and indexes up to date with a committed chunk."""
+    _after_commit("User", "Genre", "Platform", "Media", "Review")
+    get_entity_cache("review").discard(outcome["updated_reviews"])
+    search, suggester, leaderboard = get_search_index(), get_suggester(), get_leaderboard()
+    for user_id, (first, last, profile) in outcome["users"]:
+        search.upsert("user", user_id, (first, last, profile))
+        suggester.user_saved(user_id, profile)
+        leaderboard.user_saved(user_id, first, last)
+    for genre_id, (name,) in outcome["genres"]:
+        search.upsert("genre", genre_id, (name,))
+        suggester.genre_saved(genre_id, name)
+        get_analytics_engine().genre_saved(genre_id, name)
+    for media_id, name, genre_id, media_type, platform_id, year in outcome["media"]:
+        search.upsert("media", media_id, (name,))
+        suggester.media_saved(media_id, name, genre_id)
+        _media_saved(media_id, name, media_type, genre_id, platform_id, year)
+    for user_id, media_id in outcome["new_reviews"]:
+        suggester.review_added(user_id, media_id)
+    for user_id, media_id, old, new in outcome["review_changes"]:
+        _review_changed(user_id, media_id, old, new)
+
+
+def ingest_media_entries(entries: Iterable[Any], chunk_size: Optional[int] = None) -> Dict[str, Any]:
+    """Create or update many media entries, committing every ``chunk_size`` entries.
+
+    Each entry has the same shape as a POST /api/media-entries body. Items
+    that fail validation are reported and skipped. If a chunk fails in the
+    database it is rolled back and its entries are retried one by one, each
+    as its own single-entry chunk on the same connection, so a single bad row
+    only fails itself.
+
+    Returns ``{"received", "created", "updated", "failed", "results"}`` where
+    ``results`` holds ``{"index", "status", "error"?}`` per entry in input
+    order.
+    """
+    chunk_size = chunk_size or get_chunk_size()
+    results: List[Dict[str, Any]] = []
+    pending: List[Tuple[int, Dict[str, Any]]] = []
+    received = 0
+
+    def flush(conn: Any) -> None:
+        if not pending:
+            return
+        try:
+            outcome = _ingest_chunk(conn, pending)
+        except Exception as exc:
+            logger.warning("Bulk chunk of %d failed (%s); retrying entries individually", len(pending), exc)
+            # Retried on this connection: borrowing another per entry would
+            # wait on the pool this import already holds a connection from
+            for index, entry in pending:
+                try:
+                    single = _ingest_chunk(conn, [(index, entry)])
+                except Exception as entry_exc:
+                    results.append({"index": index, "status": "error", "error": str(entry_exc)})
+                else:
+                    results.extend(single["results"])
+                    _after_chunk(single)
+        else:
+            results.extend(outcome["results"])
+            _after_chunk(outcome)
+        pending.clear()
+
+    with db_connection() as conn:
+        for index, entry in enumerate(entries):
+            received += 1
+            try:
+                if isinstance(entry, Exception):
+                    raise ValueError(str(entry))
+                pending.append((index, _normalize(entry)))
+            except ValueError as exc:
+                results.append({"index": index, "status": "error", "error": str(exc)})
+                continue
+            if len(pending) >= chunk_size:
+                flush(conn)
+        flush(conn)
+
+    results.sort(key=lambda r: r["index"])
+    return {
+        "received": received,
+        "created": sum(1 for r in results if r["status"] == "created"),
+        "updated": sum(1 for r in results if r["status"] == "updated"),
+        "failed": sum(1 for r in results if r["status"] == "error"),
+        "results": results,
+    }
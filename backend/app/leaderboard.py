@@ -0,0 +1,341 @@
+"""In-memory rankings behind the top-N analytics routes.
+
+/api/top-rated-media, /api/top-users-completed and /api/top-media-completions
+otherwise sort a whole aggregate on every request to return a few rows. With
+LEADERBOARD=1 each ranking is a sorted list kept in the process. It is built
+from one pass over Review at startup, in a background thread like the
+suggest index, and the review write helpers in db.py apply this process's
+writes to it. An update bisects to the entry's old and new positions, so a
+write costs O(log n) comparisons plus a short memmove instead of a re-sort,
+and reading the top ``limit`` rows is a slice. Until the first load
+finishes, or with LEADERBOARD=0, the routes answer from SQL.
+
+Each process has its own copy. Writes made by other serve.py workers or
+outside the app reach it through a full reload every LEADERBOARD_REFRESH
+seconds (see snapshots.Refresh).
+"""
+import os
+import threading
+from bisect import bisect_left, insort
+from decimal import ROUND_HALF_UP, Decimal
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .rollups import ReviewState, _contribution
+from .snapshots import Refresh, WriteLog, start_background_load as _start_load
+
+BOARDS = ("top_rated_media", "top_users_completed", "top_media_completed")
+
+_FETCH_BATCH = 5000
+_CENTS = Decimal("0.01")
+_FOUR_PLACES = Decimal("0.0001")
+
+
+def leaderboard_settings() -> Dict[str, int]:
+    """K, the entry thresholds and the reload interval; the SQL fallbacks apply the same thresholds."""
+    return {
+        "k": max(1, int(os.getenv("LEADERBOARD_K", "100"))),
+        "min_votes": max(1, int(os.getenv("LEADERBOARD_MIN_VOTES", "1"))),
+        "min_completions": max(1, int(os.getenv("LEADERBOARD_MIN_COMPLETIONS", "6"))),
+        "refresh": max(0, int(os.getenv("LEADERBOARD_REFRESH", "300"))),
+    }
+
+
+def average_rating(rating_sum: int, rating_count: int) -> Decimal:
+    """ROUND(sum / count, 2) as MySQL computes it (division to 4 places, then round)."""
+    exact = (Decimal(rating_sum) / rating_count).quantize(_FOUR_PLACES, rounding=ROUND_HALF_UP)
+    return exact.quantize(_CENTS, rounding=ROUND_HALF_UP)
+
+
+class Ranking:
+    """Ids ordered best-first by score, ties broken by ascending id.
+
+    Only ids with a score are listed. ``_keys`` holds each listed id's sort
+    key, so an update can find the old entry by bisection.
+    """
+
+    def __init__(self) -> None:
+        self._order: List[Tuple[Any, int]] = []
+        self._keys: Dict[int, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def set(self, item_id: int, score: Any) -> None:
+        """Place ``item_id`` at ``score``; None takes it off the ranking."""
+        key = None if score is None else -score
+        old = self._keys.pop(item_id, None)
+        if old is not None:
+            if old == key:
+                self._keys[item_id] = old
+                return
+            del self._order[bisect_left(self._order, (old, item_id))]
+        if key is not None:
+            insort(self._order, (key, item_id))
+            self._keys[item_id] = key
+
+    def top(self, n: int) -> List[Tuple[int, Any]]:
+        """The best ``n`` (id, score) pairs."""
+        return [(item_id, -key) for key, item_id in self._order[:n]]
+
+
+class _BoardState:
+    """Per-media and per-user counters plus the three rankings built from them."""
+
+    def __init__(self, min_votes: int, min_completions: int) -> None:
+        self.min_votes = min_votes
+        self.min_completions = min_completions
+        # media id -> [name, type, rating sum, rating count, completions]
+        self.media: Dict[int, List[Any]] = {}
+        # user id -> [first name, last name, completions]
+        self.users: Dict[int, List[Any]] = {}
+        self.rankings = {board: Ranking() for board in BOARDS}
+
+    def _media(self, media_id: int) -> List[Any]:
+        entry = self.media.get(media_id)
+        if entry is None:
+            entry = self.media[media_id] = [None, None, 0, 0, 0]
+        return entry
+
+    def _user(self, user_id: int) -> List[Any]:
+        entry = self.users.get(user_id)
+        if entry is None:
+            entry = self.users[user_id] = [None, None, 0]
+        return entry
+
+    def rank_media(self, media_id: int) -> None:
+        entry = self.media.get(media_id)
+        rated = done = None
+        if entry is not None and entry[0] is not None:
+            if entry[3] >= self.min_votes:
+                rated = average_rating(entry[2], entry[3])
+            if entry[4] >= self.min_completions:
+                done = entry[4]
+        self.rankings["top_rated_media"].set(media_id, rated)
+        self.rankings["top_media_completed"].set(media_id, done)
+
+    def rank_user(self, user_id: int) -> None:
+        entry = self.users.get(user_id)
+        done = None
+        if entry is not None and entry[0] is not None and entry[2] >= self.min_completions:
+            done = entry[2]
+        self.rankings["top_users_completed"].set(user_id, done)
+
+    def count_review(self, user_id: Optional[int], media_id: Optional[int], old: ReviewState, new: ReviewState) -> None:
+        """Fold a review change into the counters without re-ranking."""
+        old_sum, old_count, old_done = _contribution(old)
+        new_sum, new_count, new_done = _contribution(new)
+        if media_id is not None:
+            entry = self._media(media_id)
+            entry[2] += new_sum - old_sum
+            entry[3] += new_count - old_count
+            entry[4] += new_done - old_done
+        if user_id is not None:
+            self._user(user_id)[2] += new_done - old_done
+
+    def review_changed(self, user_id: Optional[int], media_id: Optional[int], old: ReviewState, new: ReviewState) -> None:
+        self.count_review(user_id, media_id, old, new)
+        if media_id is not None:
+            self.rank_media(media_id)
+        if user_id is not None:
+            self.rank_user(user_id)
+
+    def media_saved(self, media_id: int, name: str, media_type: Optional[str]) -> None:
+        entry = self._media(media_id)
+        entry[0], entry[1] = name, media_type
+        self.rank_media(media_id)
+
+    def user_saved(self, user_id: int, first: str, last: str) -> None:
+        entry = self._user(user_id)
+        entry[0], entry[1] = first, last
+        self.rank_user(user_id)
+
+    def user_removed(self, user_id: int) -> None:
+        self.users.pop(user_id, None)
+        self.rank_user(user_id)
+
+    def rows(self, board: str, limit: int) -> List[Dict[str, Any]]:
+        """``limit`` rows shaped like the SQL query for ``board``."""
+        top = self.rankings[board].top(limit)
+        if board == "top_rated_media":
+            return [
+                {"MediaType": self.media[i][1], "MediaName": self.media[i][0], "AvgRating": score}
+                for i, score in top
+            ]
+        if board == "top_media_completed":
+            return [{"MediaName": self.media[i][0], "user_completions": score} for i, score in top]
+        return [
+            {"FirstName": self.users[i][0], "LastName": self.users[i][1], "media_done": score}
+            for i, score in top
+        ]
+
+
+class Leaderboard:
+    """Top-K rankings for rating and completions, answered from memory.
+
+    ``top()`` returns None while the leaderboard is disabled or still
+    loading, and the db.py helpers then run their SQL instead. ``k`` caps the
+    ``limit`` either path serves. With ``refresh`` (seconds) the rankings are
+    rebuilt that often, and are not served once they are twice that old.
+    """
+
+    def __init__(
+        self, enabled: bool, k: int = 100, min_votes: int = 1, min_completions: int = 6, refresh: float = 0,
+    ) -> None:
+        self.enabled = enabled
+        self.k = k
+        self.min_votes = min_votes
+        self.min_completions = min_completions
+        self.ready = False
+        self._state = _BoardState(min_votes, min_completions)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # Media and user ids written while a load is scanning
+        self._writes = WriteLog(2)
+        self._refresh = Refresh("Leaderboard", self.load, refresh)
+
+    def load(self, conn: Any) -> Dict[str, int]:
+        """Rebuild from one pass over Review, plus the Media and User names."""
+        with self._load_lock:
+            with self._lock:
+                self._writes.start()
+            fresh = _BoardState(self.min_votes, self.min_completions)
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT MediaId, MediaName, MediaType FROM Media")
+                for media_id, name, media_type in cur.fetchall():
+                    fresh._media(media_id)[:2] = [name, media_type]
+                cur.execute("SELECT UserId, FirstName, LastName FROM User")
+                for user_id, first, last in cur.fetchall():
+                    fresh._user(user_id)[:2] = [first, last]
+
+                cur.execute("SELECT UserId, MediaId, Rating, Status FROM Review")
+                while True:
+                    batch = cur.fetchmany(_FETCH_BATCH)
+                    if not batch:
+                        break
+                    for user_id, media_id, rating, status in batch:
+                        fresh.count_review(user_id, media_id, None, (rating, status))
+
+                for media_id in list(fresh.media):
+                    fresh.rank_media(media_id)
+                for user_id in list(fresh.users):
+                    fresh.rank_user(user_id)
+
+                def install() -> None:
+                    self._state = fresh
+
+                self._writes.replay(self._lock, partial(_reread, cur, fresh), install, conn)
+            except Exception:
+                with self._lock:
+                    self._writes.stop()
+                raise
+            finally:
+                cur.close()
+
+            self.ready = True
+            self._refresh.mark_loaded()
+            return {board: len(ranking) for board, ranking in fresh.rankings.items()}
+
+    def top(self, board: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """The best ``limit`` rows of ``board``, or None when the leaderboard can't answer."""
+        if not (self.enabled and self.ready and self._refresh.usable()):
+            return None
+        limit = max(1, min(limit, self.k))
+        with self._lock:
+            return self._state.rows(board, limit)
+
+    # Write hooks, called by db.py after commit
+
+    def review_changed(self, user_id: Optional[int], media_id: Optional[int], old: ReviewState, new: ReviewState) -> None:
+        """Apply a review insert (``old=None``), update or delete (``new=None``)."""
+        self._apply(lambda s: s.review_changed(user_id, media_id, old, new), (media_id,), (user_id,))
+
+    def media_saved(self, media_id: Optional[int], name: str, media_type: Optional[str]) -> None:
+        if media_id:
+            self._apply(lambda s: s.media_saved(int(media_id), name, media_type), (media_id,), ())
+
+    def user_saved(self, user_id: Optional[int], first: str, last: str) -> None:
+        if user_id:
+            self._apply(lambda s: s.user_saved(int(user_id), first, last), (), (user_id,))
+
+    def user_removed(self, user_id: int) -> None:
+        self._apply(lambda s: s.user_removed(int(user_id)), (), (user_id,))
+
+    def _apply(
+        self,
+        change: Callable[[_BoardState], None],
+        media_ids: Iterable[Optional[int]],
+        user_ids: Iterable[Optional[int]],
+    ) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._writes.record(
+                (int(i) for i in media_ids if i is not None), (int(i) for i in user_ids if i is not None),
+            )
+            change(self._state)
+
+
+def _marks(count: int) -> str:
+    return ", ".join(["%s"] * count)
+
+
+def _reread(cur: Any, state: _BoardState, media_ids: Set[int], user_ids: Set[int]) -> None:
+    """Replace the names and counters of the given ids with what the database holds now."""
+    if media_ids:
+        ids = tuple(media_ids)
+        for media_id in ids:
+            state.media.pop(media_id, None)
+        cur.execute(f"SELECT MediaId, MediaName, MediaType FROM Media WHERE MediaId IN ({_marks(len(ids))})", ids)
+        for media_id, name, media_type in cur.fetchall():
+            state._media(media_id)[:2] = [name, media_type]
+        cur.execute(
+            "SELECT MediaId, COALESCE(SUM(Rating), 0), COUNT(Rating), SUM(Status = 'Completed') "
+            f"FROM Review WHERE MediaId IN ({_marks(len(ids))}) GROUP BY MediaId",
+            ids,
+        )
+        for media_id, rating_sum, rating_count, done in cur.fetchall():
+            state._media(media_id)[2:] = [int(rating_sum), int(rating_count), int(done or 0)]
+        for media_id in ids:
+            state.rank_media(media_id)
+
+    if user_ids:
+        ids = tuple(user_ids)
+        for user_id in ids:
+            state.users.pop(user_id, None)
+        cur.execute(f"SELECT UserId, FirstName, LastName FROM User WHERE UserId IN ({_marks(len(ids))})", ids)
+        for user_id, first, last in cur.fetchall():
+            state._user(user_id)[:2] = [first, last]
+        cur.execute(
+            "SELECT UserId, SUM(Status = 'Completed') "
+            f"FROM Review WHERE UserId IN ({_marks(len(ids))}) GROUP BY UserId",
+            ids,
+        )
+        for user_id, done in cur.fetchall():
+            state._user(user_id)[2] = int(done or 0)
+        for user_id in ids:
+            state.rank_user(user_id)
+
+
+_leaderboard: Optional[Leaderboard] = None
+_leaderboard_lock = threading.Lock()
+
+
+def get_leaderboard() -> Leaderboard:
+    """Process-wide leaderboard, enabled by LEADERBOARD=1."""
+    global _leaderboard
+    if _leaderboard is None:
+        with _leaderboard_lock:
+            if _leaderboard is None:
+                _leaderboard = Leaderboard(os.getenv("LEADERBOARD", "0") == "1", **leaderboard_settings())
+    return _leaderboard
+
+
+def start_background_load(connect: Any) -> Optional[threading.Thread]:
+    """Build the leaderboard off the request path; ``connect`` is a db_connection-style factory."""
+    leaderboard = get_leaderboard()
+    if not leaderboard.enabled:
+        return None
+    leaderboard._refresh.connect = connect
+    return _start_load("Leaderboard", leaderboard.load, connect)
@@ -0,0 +1,370 @@
+import bisect
+import contextlib
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from . import statements
+from .tracing import add_span
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; +Inf is implicit
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+`?(\w+)", re.IGNORECASE)
+_FINGERPRINT_CACHE_MAX = 2048
+
+# Wrappers between a db.py helper and the cursor it executes on
+_PASSTHROUGH_FILES = (statements.__file__, contextlib.__file__)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        # Caller holds the registry lock
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        out, running = [], 0
+        for bound, n in zip(self.bounds + (float("inf"),), self.counts):
+            running += n
+            out.append(("+Inf" if bound == float("inf") else _format_number(bound), running))
+        return out
+
+
+def _format_number(value: float) -> str:
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def fingerprint(sql: str) -> str:
+    """Short, low-cardinality label for a statement, e.g. ``select_review``."""
+    text = sql.lstrip()
+    verb = text.split(None, 1)[0].lower() if text else "unknown"
+    match = _TABLE.search(text)
+    return f"{verb}_{match.group(1).lower()}" if match else verb
+
+
+class DbMetrics:
+    """Query and connection-checkout histograms plus the slow-query log.
+
+    Each statement is labelled ``<calling function>:<verb>_<table>`` (e.g.
+    ``get_top_rated_media:select_mediasummary``) so a slow dashboard request
+    can be traced back to the line in db.py that issued it.
+    """
+
+    def __init__(self, enabled: bool = True, slow_ms: float = 500.0, explain_slow: bool = False) -> None:
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.explain_slow = explain_slow
+
+        self._lock = threading.Lock()
+        self._durations: Dict[str, Histogram] = {}
+        self._rows: Dict[str, Histogram] = {}
+        self._errors: Dict[str, int] = {}
+        self._slow: Dict[str, int] = {}
+        self._checkout = Histogram(LATENCY_BUCKETS)
+        self._fingerprints: Dict[str, str] = {}
+
+    @classmethod
+    def from_env(cls) -> "DbMetrics":
+        return cls(
+            enabled=os.getenv("DB_METRICS", "1") == "1",
+            slow_ms=float(os.getenv("SLOW_QUERY_MS", "500")),
+            explain_slow=os.getenv("SLOW_QUERY_EXPLAIN", "0") == "1",
+        )
+
+    # Recording
+
+    def query_name(self, caller: str, sql: str) -> str:
+        label = self._fingerprints.get(sql)
+        if label is None:
+            label = fingerprint(sql)
+            if len(self._fingerprints) < _FINGERPRINT_CACHE_MAX:
+                self._fingerprints[sql] = label
+        return f"{caller}:{label}"
+
+    def observe_query(self, name: str, seconds: float, rows: int) -> None:
+        with self._lock:
+            hist = self._durations.get(name)
+            if hist is None:
+                hist = self._durations[name] = Histogram(LATENCY_BUCKETS)
+                self._rows[name] = Histogram(ROW_BUCKETS)
+            hist.observe(seconds)
+            self._rows[name].observe(max(rows, 0))
+
+    def observe_error(self, name: str) -> None:
+        with self._lock:
+            self._errors[name] = self._errors.get(name, 0) + 1
+
+    def observe_checkout(self, seconds: float) -> None:
+        with self._lock:
+            self._checkout.observe(seconds)
+
+    def observe_slow(self, name: str, conn: Any, sql: str, params: Any, seconds: float, rows: int) -> None:
+        with self._lock:
+            self._slow[name] = self._slow.get(name, 0) + 1
+        plan = ""
+        if self.explain_slow and conn is not None and sql.lstrip()[:6].upper() == "SELECT":
+            plan = _explain_summary(conn, sql, params)
+        logger.warning(
+            "Slow query %s: %.1f ms, %d rows, params=%s\n%s%s",
+            name, seconds * 1000, rows, _short(repr(params)), " ".join(sql.split()), plan,
+        )
+
+    # Reporting
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-query counts/totals, for tests and debugging."""
+        with self._lock:
+            return {
+                name: {
+                    "count": hist.count,
+                    "seconds": hist.sum,
+                    "rows": self._rows[name].sum,
+                    "errors": self._errors.get(name, 0),
+                    "slow": self._slow.get(name, 0),
+                }
+                for name, hist in self._durations.items()
+            }
+
+    def render(self) -> List[str]:
+        """Prometheus text-format lines for the database metrics."""
+        lines: List[str] = []
+        with self._lock:
+            _render_histogram(lines, "db_query_duration_seconds", "Statement execute + fetch time", self._durations)
+            _render_histogram(lines, "db_query_rows", "Rows returned or affected per statement", self._rows)
+            _render_counter(lines, "db_query_errors_total", "Statements that raised", self._errors)
+            _render_counter(lines, "db_slow_queries_total", f"Statements slower than {self.slow_ms:g} ms", self._slow)
+            _render_histogram(lines, "db_connection_checkout_seconds", "Time to obtain a connection",
+                              {"": self._checkout})
+        return lines
+
+
+def _render_histogram(lines: List[str], metric: str, help_text: str, series: Dict[str, Histogram]) -> None:
+    lines.append(f"# HELP {metric} {help_text}")
+    lines.append(f"# TYPE {metric} histogram")
+    for name in sorted(series):
+        hist = series[name]
+        label = f'query="{_escape_label(name)}",' if name else ""
+        for bound, count in hist.cumulative():
+            lines.append(f'{metric}_bucket{{{label}le="{bound}"}} {count}')
+        suffix = f"{{{label.rstrip(',')}}}" if name else ""
+        lines.append(f"{metric}_sum{suffix} {hist.sum!r}")
+        lines.append(f"{metric}_count{suffix} {hist.count}")
+
+
+def _render_counter(lines: List[str], metric: str, help_text: str, values: Dict[str, int]) -> None:
+    lines.append(f"# HELP {metric} {help_text}")
+    lines.append(f"# TYPE {metric} counter")
+    for name in sorted(values):
+        lines.append(f'{metric}{{query="{_escape_label(name)}"}} {values[name]}')
+
+
+def render_stats(lines: List[str], prefix: str, values: Dict[str, Any], counters: Sequence[str] = ()) -> None:
+    """Append the numeric entries of a stats dict (pool, cache) as gauges, or counters for ``counters``."""
+    for key in sorted(values):
+        value = values[key]
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if key in counters:
+            lines.append(f"# TYPE {prefix}_{key}_total counter")
+            lines.append(f"{prefix}_{key}_total {value!r}")
+        else:
+            lines.append(f"# TYPE {prefix}_{key} gauge")
+            lines.append(f"{prefix}_{key} {value!r}")
+
+
+def _short(text: str, limit: int = 500) -> str:
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def _explain_summary(conn: Any, sql: str, params: Any) -> str:
+    """One line per EXPLAIN row, or "" if the plan can't be read right now."""
+    if getattr(conn, "unread_result", False):
+        return ""
+    try:
+        cur = conn.cursor(dictionary=True)
+        try:
+            cur.execute("EXPLAIN " + sql.strip().rstrip(";"), params or ())
+            plan = cur.fetchall() or []
+        finally:
+            cur.close()
+    except Exception as exc:
+        return f"\n  EXPLAIN failed: {exc}"
+    return "".join(
+        f"\n  {row.get('table')}: type={row.get('type')} key={row.get('key')} "
+        f"rows={row.get('rows')} extra={row.get('Extra')}"
+        for row in plan
+    )
+
+
+# Instrumented connection/cursor wrappers
+
+
+class _Pending:
+    """A statement whose result set is still being fetched."""
+
+    __slots__ = ("name", "sql", "params", "seconds", "rows")
+
+    def __init__(self, name: str, sql: str, params: Any, seconds: float) -> None:
+        self.name = name
+        self.sql = sql
+        self.params = params
+        self.seconds = seconds
+        self.rows = 0
+
+
+class InstrumentedCursor:
+    """Cursor proxy timing every execute and the fetches that follow it.
+
+    A statement is recorded once its result is fully read (or the cursor
+    moves on / closes), so the duration covers execute plus fetch and the
+    row count is what the caller actually received.
+    """
+
+    def __init__(self, cursor: Any, conn: Any, metrics: DbMetrics) -> None:
+        self._cur = cursor
+        self._conn = conn
+        self._metrics = metrics
+        self._pending: Optional[_Pending] = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cur, name)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.fetchone, None)
+
+    def __enter__(self) -> "InstrumentedCursor":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _caller(self) -> str:
+        # Frame 0 is _caller, 1 is execute/executemany, 2 is the db helper
+        # unless the statement went through statements.run()
+        frame = sys._getframe(2)
+        while frame.f_back is not None and frame.f_code.co_filename in _PASSTHROUGH_FILES:
+            frame = frame.f_back
+        return frame.f_code.co_name
+
+    def _run(self, method: Callable[..., Any], name: str, sql: str, params: Any, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Tuple[Any, float]:
+        started = time.perf_counter()
+        try:
+            result = method(sql, params, *args, **kwargs)
+        except Exception:
+            self._metrics.observe_error(name)
+            raise
+        return result, time.perf_counter() - started
+
+    def execute(self, operation: str, params: Any = None, *args: Any, **kwargs: Any) -> Any:
+        self._finish()
+        name = self._metrics.query_name(self._caller(), operation)
+        result, seconds = self._run(self._cur.execute, name, operation, params, args, kwargs)
+        if getattr(self._cur, "with_rows", False):
+            self._pending = _Pending(name, operation, params, seconds)
+        else:
+            self._record(name, operation, params, seconds, self._cur.rowcount)
+        return result
+
+    def executemany(self, operation: str, seq_params: Any, *args: Any, **kwargs: Any) -> Any:
+        self._finish()
+        name = self._metrics.query_name(self._caller(), operation)
+        result, seconds = self._run(self._cur.executemany, name, operation, seq_params, args, kwargs)
+        self._record(name, operation, f"<{len(seq_params)} rows>" if hasattr(seq_params, "__len__") else "<many>",
+                     seconds, self._cur.rowcount)
+        return result
+
+    def fetchone(self) -> Any:
+        started = time.perf_counter()
+        row = self._cur.fetchone()
+        self._fetched(started, 0 if row is None else 1, done=row is None)
+        return row
+
+    def fetchmany(self, size: int = 1) -> List[Any]:
+        started = time.perf_counter()
+        rows = self._cur.fetchmany(size)
+        self._fetched(started, len(rows), done=len(rows) < size)
+        return rows
+
+    def fetchall(self) -> List[Any]:
+        started = time.perf_counter()
+        rows = self._cur.fetchall()
+        self._fetched(started, len(rows or ()), done=True)
+        return rows
+
+    def close(self) -> Any:
+        self._finish()
+        return self._cur.close()
+
+    def _fetched(self, started: float, rows: int, done: bool) -> None:
+        pending = self._pending
+        if pending is None:
+            return
+        pending.seconds += time.perf_counter() - started
+        pending.rows += rows
+        if done:
+            self._finish()
+
+    def _finish(self) -> None:
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            self._record(pending.name, pending.sql, pending.params, pending.seconds, pending.rows)
+
+    def _record(self, name: str, sql: str, params: Any, seconds: float, rows: int) -> None:
+        self._metrics.observe_query(name, seconds, rows)
+        add_span("sql", seconds, name)
+        if self._metrics.slow_ms and seconds * 1000 >= self._metrics.slow_ms:
+            self._metrics.observe_slow(name, self._conn, sql, params, seconds, rows)
+
+
+class InstrumentedConnection:
+    """Connection proxy whose cursors are InstrumentedCursors."""
+
+    def __init__(self, conn: Any, metrics: DbMetrics) -> None:
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_metrics", metrics)
+
+    def cursor(self, *args: Any, **kwargs: Any) -> InstrumentedCursor:
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._conn, self._metrics)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._conn, name, value)
+
+
+_metrics: Optional[DbMetrics] = None
+_metrics_lock = threading.Lock()
+
+
+def get_db_metrics() -> DbMetrics:
+    """Process-wide database metrics, configured from the environment on first use."""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = DbMetrics.from_env()
+    return _metrics
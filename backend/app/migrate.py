@@ -0,0 +1,211 @@
+import hashlib
+import logging
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+
+_FILENAME = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+
+# Errors meaning "this statement's effect is already in place". Tolerating
+# them lets a migration interrupted halfway (DDL auto-commits in MySQL) be
+# re-run without manual cleanup.
+_ALREADY_APPLIED = {
+    1050,  # table already exists
+    1060,  # duplicate column name
+    1061,  # duplicate key name
+    1826,  # duplicate foreign key constraint name
+}
+
+_CREATE_TRACKING_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        Version INT PRIMARY KEY,
+        Name VARCHAR(255) NOT NULL,
+        Checksum CHAR(64) NOT NULL,
+        AppliedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+class MigrationError(RuntimeError):
+    """A migration statement failed; earlier migrations stay applied."""
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+
+
+class StatementSplitter:
+    """Incremental SQL statement splitter, fed one line at a time.
+
+    Semicolons inside quoted strings, backticks and comments don't end a
+    statement; ``--`` and ``#`` line comments and ``/* */`` block comments are
+    dropped. Quote and comment state carries across lines, so a large dump
+    can be streamed without holding it in memory.
+    """
+
+    def __init__(self) -> None:
+        self._buf: List[str] = []
+        self._quote: Optional[str] = None
+        self._in_block = False
+
+    def feed(self, line: str) -> List[str]:
+        """Consume ``line`` (including its newline) and return the statements it completed."""
+        done: List[str] = []
+        buf = self._buf
+        i, n = 0, len(line)
+        while i < n:
+            if self._in_block:
+                j = line.find("*/", i)
+                if j < 0:
+                    return done
+                self._in_block = False
+                buf.append(" ")
+                i = j + 2
+                continue
+
+            if self._quote is not None:
+                q = self._quote
+                j = i
+                while j < n:
+                    c = line[j]
+                    if c == "\\" and q != "`":
+                        j += 2
+                        continue
+                    if c == q:
+                        if j + 1 < n and line[j + 1] == q:  # doubled quote
+                            j += 2
+                            continue
+                        self._quote = None
+                        j += 1
+                        break
+                    j += 1
+                buf.append(line[i:j])
+                i = j
+                continue
+
+            ch = line[i]
+            if ch in ("'", '"', "`"):
+                self._quote = ch
+                buf.append(ch)
+                i += 1
+            elif ch == "#" or (ch == "-" and line.startswith("--", i) and (i + 2 == n or line[i + 2] in " \t\r\n")):
+                buf.append("\n")
+                return done
+            elif ch == "/" and line.startswith("/*", i):
+                self._in_block = True
+                i += 2
+            elif ch == ";":
+                stmt = "".join(buf).strip()
+                if stmt:
+                    done.append(stmt)
+                buf.clear()
+                i += 1
+            else:
+                # Copy the run of ordinary characters in one go
+                j = i + 1
+                while j < n and line[j] not in "'\"`#-/;":
+                    j += 1
+                buf.append(line[i:j])
+                i = j
+        return done
+
+    def close(self) -> List[str]:
+        """Return the trailing statement that had no terminating semicolon, if any."""
+        stmt = "".join(self._buf).strip()
+        self._buf.clear()
+        return [stmt] if stmt else []
+
+
+def iter_statements(lines: Iterable[str]) -> Iterator[str]:
+    """Stream statements out of an iterable of lines (e.g. an open file)."""
+    splitter = StatementSplitter()
+    for line in lines:
+        yield from splitter.feed(line)
+    yield from splitter.close()
+
+
+def split_sql(text: str) -> Iterator[str]:
+    """Yield the statements in ``text``."""
+    return iter_statements(text.splitlines(keepends=True))
+
+
+def discover(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    """Load ``NNNN_name.sql`` files from ``directory`` in version order."""
+    found = []
+    for filename in os.listdir(directory):
+        match = _FILENAME.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+            found.append(Migration(int(match.group(1)), match.group(2), f.read()))
+    found.sort(key=lambda m: m.version)
+    versions = [m.version for m in found]
+    if len(set(versions)) != len(versions):
+        raise MigrationError(f"Duplicate migration versions in {directory}: {versions}")
+    return found
+
+
+def applied_migrations(conn: Any) -> Dict[int, str]:
+    """Map of applied version -> checksum, creating the tracking table if needed."""
+    cur = conn.cursor()
+    try:
+        cur.execute(_CREATE_TRACKING_TABLE)
+        cur.execute("SELECT Version, Checksum FROM schema_migrations")
+        return {int(version): checksum for version, checksum in cur.fetchall()}
+    finally:
+        cur.close()
+
+
+def migrate(conn: Any, migrations: Optional[Iterable[Migration]] = None, target: Optional[int] = None) -> List[Migration]:
+    """Apply every pending migration up to ``target`` and return those applied.
+
+    ``conn`` must already have the application database selected.
+    """
+    migrations = list(discover() if migrations is None else migrations)
+    applied = applied_migrations(conn)
+    done: List[Migration] = []
+
+    for migration in migrations:
+        if target is not None and migration.version > target:
+            break
+        if migration.version in applied:
+            if applied[migration.version] != migration.checksum:
+                logger.warning(
+                    "Migration %04d_%s changed after it was applied; edit a new migration instead",
+                    migration.version, migration.name,
+                )
+            continue
+
+        cur = conn.cursor()
+        try:
+            for stmt in split_sql(migration.sql):
+                try:
+                    cur.execute(stmt)
+                except Exception as exc:
+                    if getattr(exc, "errno", None) in _ALREADY_APPLIED:
+                        logger.info("%04d_%s: already applied: %s", migration.version, migration.name, exc)
+                        continue
+                    conn.rollback()
+                    raise MigrationError(
+                        f"{migration.version:04d}_{migration.name} failed: {exc}\nStatement: {stmt[:200]}"
+                    ) from exc
+            cur.execute(
+                "INSERT INTO schema_migrations (Version, Name, Checksum) VALUES (%s, %s, %s)",
+                (migration.version, migration.name, migration.checksum),
+            )
+            conn.commit()
+        finally:
+            cur.close()
+        done.append(migration)
+
+    return done
@@ -0,0 +1,66 @@
+-- Baseline: the schema as it stood before migrations were introduced.
+-- Every statement is IF NOT EXISTS so databases created from the old
+-- schema.sql adopt this version without changes.
+
+CREATE TABLE IF NOT EXISTS User (
+    UserId INT AUTO_INCREMENT PRIMARY KEY,
+    FirstName VARCHAR(50),
+    LastName VARCHAR(50),
+    ProfileName VARCHAR(50)
+);
+
+CREATE TABLE IF NOT EXISTS Genre (
+    GenreId INT AUTO_INCREMENT PRIMARY KEY,
+    GenreName VARCHAR(50)
+);
+
+CREATE TABLE IF NOT EXISTS Platform (
+    PlatformId INT AUTO_INCREMENT PRIMARY KEY,
+    PlatformName VARCHAR(50)
+);
+
+CREATE TABLE IF NOT EXISTS Media (
+    MediaId INT AUTO_INCREMENT PRIMARY KEY,
+    MediaName VARCHAR(100),
+    MediaType VARCHAR(50),
+    ReleaseYear INT,
+    GenreId INT,
+    PlatformId INT,
+    Description TEXT,
+    FOREIGN KEY (GenreId) REFERENCES Genre(GenreId),
+    FOREIGN KEY (PlatformId) REFERENCES Platform(PlatformId)
+);
+
+CREATE TABLE IF NOT EXISTS Review (
+    ReviewId INT AUTO_INCREMENT PRIMARY KEY,
+    UserId INT,
+    MediaId INT,
+    Rating INT,
+    ReviewText TEXT,
+    Status ENUM ('Planning', 'Watching', 'Completed', 'Havent Watched') DEFAULT 'Planning',
+    FOREIGN KEY (UserId) REFERENCES User(UserId),
+    FOREIGN KEY (MediaId) REFERENCES Media(MediaId)
+);
+
+CREATE TABLE IF NOT EXISTS Watchlist (
+    UserId INT,
+    MediaId INT,
+    Status VARCHAR(20),
+    PRIMARY KEY (UserId, MediaId),
+    FOREIGN KEY (UserId) REFERENCES User(UserId),
+    FOREIGN KEY (MediaId) REFERENCES Media(MediaId)
+);
+
+CREATE TABLE IF NOT EXISTS MediaGenre (
+    MediaId INT,
+    GenreId INT,
+    FOREIGN KEY (MediaId) REFERENCES Media(MediaId),
+    FOREIGN KEY (GenreId) REFERENCES Genre(GenreId)
+);
+
+CREATE TABLE IF NOT EXISTS MediaPlatform (
+    MediaId INT,
+    PlatformId INT,
+    FOREIGN KEY (MediaId) REFERENCES Media(MediaId),
+    FOREIGN KEY (PlatformId) REFERENCES Platform(PlatformId)
+);
@@ -0,0 +1,28 @@
+-- Indexes for the lookups in create_full_media_entry() and the analytics
+-- queries. Each index is its own online (INPLACE, LOCK=NONE) ALTER so reads
+-- and writes continue while it builds, and a half-applied run can resume.
+--
+-- The UNIQUE indexes encode what create_full_media_entry() already assumes
+-- (one review per user/media, one row per genre/platform/media identity).
+-- They fail with "Duplicate entry" if existing data violates that; remove
+-- the duplicates and re-run init_db.py.
+
+-- One review per (user, media); also serves per-user lookups
+ALTER TABLE Review ADD UNIQUE INDEX uq_review_user_media (UserId, MediaId), ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Completions per user / per media: filter on Status, covered group key
+ALTER TABLE Review ADD INDEX idx_review_status_user (Status, UserId), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE Review ADD INDEX idx_review_status_media (Status, MediaId), ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Rating threshold filters, covering the UserId/MediaId they return
+ALTER TABLE Review ADD INDEX idx_review_rating_user (Rating, UserId), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE Review ADD INDEX idx_review_media_rating (MediaId, Rating), ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE User ADD INDEX idx_user_profile (ProfileName), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE Genre ADD UNIQUE INDEX uq_genre_name (GenreName), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE Platform ADD UNIQUE INDEX uq_platform_name (PlatformName), ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Media identity used by the full-entry upsert; the MediaName prefix also
+-- serves A-Z sorts and typeahead LIKE 'prefix%'
+ALTER TABLE Media ADD UNIQUE INDEX uq_media_identity (MediaName, MediaType, ReleaseYear), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE Media ADD INDEX idx_media_year (ReleaseYear), ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,55 @@
+-- Summary tables behind the dashboard analytics (ANALYTICS_ROLLUPS). They
+-- hold running sums and counts per media/user/genre, kept in step by the
+-- db.py write helpers, so top-N and per-genre reads skip aggregating Review.
+--
+-- Created empty here, then backfilled from existing reviews. The backfill
+-- recomputes every counter, so re-running it is harmless.
+
+CREATE TABLE IF NOT EXISTS MediaSummary (
+    MediaId INT PRIMARY KEY,
+    RatingSum BIGINT NOT NULL DEFAULT 0,
+    RatingCount INT NOT NULL DEFAULT 0,
+    Completions INT NOT NULL DEFAULT 0,
+    AvgRating DECIMAL(6,2) AS (IF(RatingCount > 0, ROUND(RatingSum / RatingCount, 2), NULL)) STORED,
+    INDEX idx_mediasummary_avg (AvgRating),
+    INDEX idx_mediasummary_completions (Completions)
+);
+
+CREATE TABLE IF NOT EXISTS UserSummary (
+    UserId INT PRIMARY KEY,
+    Completions INT NOT NULL DEFAULT 0,
+    INDEX idx_usersummary_completions (Completions)
+);
+
+CREATE TABLE IF NOT EXISTS GenreSummary (
+    GenreId INT PRIMARY KEY,
+    RatingSum BIGINT NOT NULL DEFAULT 0,
+    RatingCount INT NOT NULL DEFAULT 0
+);
+
+INSERT INTO MediaSummary (MediaId, RatingSum, RatingCount, Completions)
+SELECT MediaId, COALESCE(SUM(Rating), 0), COUNT(Rating), SUM(Status = 'Completed')
+FROM Review
+WHERE MediaId IS NOT NULL
+GROUP BY MediaId
+ON DUPLICATE KEY UPDATE
+    RatingSum = VALUES(RatingSum),
+    RatingCount = VALUES(RatingCount),
+    Completions = VALUES(Completions);
+
+INSERT INTO UserSummary (UserId, Completions)
+SELECT UserId, SUM(Status = 'Completed')
+FROM Review
+WHERE UserId IS NOT NULL
+GROUP BY UserId
+ON DUPLICATE KEY UPDATE Completions = VALUES(Completions);
+
+INSERT INTO GenreSummary (GenreId, RatingSum, RatingCount)
+SELECT m.GenreId, COALESCE(SUM(r.Rating), 0), COUNT(r.Rating)
+FROM Review AS r
+JOIN Media AS m ON r.MediaId = m.MediaId
+WHERE m.GenreId IS NOT NULL
+GROUP BY m.GenreId
+ON DUPLICATE KEY UPDATE
+    RatingSum = VALUES(RatingSum),
+    RatingCount = VALUES(RatingCount);
@@ -0,0 +1,34 @@
+-- Per-user review statistics on UserSummary, served by /api/users/<id>/stats
+-- and used by the user search instead of grouping Review per user. The
+-- counters are kept in step by the same write helpers that maintain
+-- Completions.
+
+ALTER TABLE UserSummary ADD COLUMN ReviewCount INT NOT NULL DEFAULT 0;
+ALTER TABLE UserSummary ADD COLUMN RatingSum BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE UserSummary ADD COLUMN RatingCount INT NOT NULL DEFAULT 0;
+ALTER TABLE UserSummary ADD COLUMN Planning INT NOT NULL DEFAULT 0;
+ALTER TABLE UserSummary ADD COLUMN Watching INT NOT NULL DEFAULT 0;
+ALTER TABLE UserSummary ADD COLUMN HaventWatched INT NOT NULL DEFAULT 0;
+ALTER TABLE UserSummary ADD COLUMN AvgRating DECIMAL(6,2) AS (IF(RatingCount > 0, ROUND(RatingSum / RatingCount, 2), NULL)) STORED;
+ALTER TABLE UserSummary ADD INDEX idx_usersummary_reviews (ReviewCount);
+
+-- Backfill from Review. Recomputes every counter, so re-running is harmless.
+INSERT INTO UserSummary (
+    UserId, ReviewCount, RatingSum, RatingCount,
+    Planning, Watching, Completions, HaventWatched
+)
+SELECT
+    UserId, COUNT(*), COALESCE(SUM(Rating), 0), COUNT(Rating),
+    SUM(Status = 'Planning'), SUM(Status = 'Watching'),
+    SUM(Status = 'Completed'), SUM(Status = 'Havent Watched')
+FROM Review
+WHERE UserId IS NOT NULL
+GROUP BY UserId
+ON DUPLICATE KEY UPDATE
+    ReviewCount = VALUES(ReviewCount),
+    RatingSum = VALUES(RatingSum),
+    RatingCount = VALUES(RatingCount),
+    Planning = VALUES(Planning),
+    Watching = VALUES(Watching),
+    Completions = VALUES(Completions),
+    HaventWatched = VALUES(HaventWatched);
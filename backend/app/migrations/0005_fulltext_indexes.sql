@@ -0,0 +1,8 @@
+-- FULLTEXT indexes for search with sort=relevance (MATCH ... AGAINST).
+-- InnoDB cannot build these with LOCK=NONE: the first one on a table adds a
+-- hidden FTS_DOC_ID column and rebuilds it, blocking writes meanwhile.
+-- Run during a quiet period on large tables.
+
+ALTER TABLE User ADD FULLTEXT INDEX ft_user_names (FirstName, LastName, ProfileName);
+ALTER TABLE Genre ADD FULLTEXT INDEX ft_genre_name (GenreName);
+ALTER TABLE Media ADD FULLTEXT INDEX ft_media_name (MediaName);
@@ -0,0 +1,222 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+from mysql.connector.connection import MySQLConnection
+from mysql.connector.errors import PoolError
+
+
+class PoolTimeoutError(PoolError):
+    """Raised when no connection could be checked out before the timeout.
+
+    Subclasses mysql.connector's ``PoolError`` (itself an ``Error``) so the
+    existing ``except Error`` handlers in db.py report it like any other
+    database failure.
+    """
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of MySQL connections.
+
+    Connections are created lazily by ``factory`` up to ``max_size``. Idle
+    connections are reused LIFO so the warmest socket is handed out first;
+    ones older than ``recycle`` seconds are closed instead of reused, and ones
+    that have sat idle longer than ``ping_after`` seconds are pinged before
+    being handed out so callers never receive a dead socket.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], MySQLConnection],
+        max_size: int = 10,
+        timeout: float = 5.0,
+        recycle: float = 1800.0,
+        ping_after: float = 5.0,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+
+        self._cond = threading.Condition(threading.Lock())
+        # Each idle entry is (connection, created_at, returned_at)
+        self._idle: Deque[Tuple[MySQLConnection, float, float]] = deque()
+        self._created_at: Dict[int, float] = {}
+        self._open = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._discarded = 0
+        self._timeouts = 0
+        self._wait_seconds = 0.0
+
+    # Checkout / release
+
+    def acquire(self, timeout: Optional[float] = None) -> MySQLConnection:
+        """Borrow a healthy connection, creating one if the pool has room."""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            entry = None
+            create = False
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolError("Connection pool is closed")
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._open < self.max_size:
+                        self._open += 1
+                        create = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Timed out after {timeout:.1f}s waiting for a database connection "
+                            f"(pool size {self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+
+            if create:
+                conn = self._create()
+            else:
+                assert entry is not None
+                conn = self._validate(entry)
+                if conn is None:
+                    continue
+
+            with self._cond:
+                self._checkouts += 1
+                self._wait_seconds += time.monotonic() - started
+            return conn
+
+    def release(self, conn: MySQLConnection) -> None:
+        """Return a connection to the pool, resetting any open transaction."""
+        # An abandoned unbuffered read (e.g. a client dropping a streamed
+        # response) may have millions of rows left; reconnecting is cheaper
+        # than draining them.
+        if conn.unread_result:
+            self.discard(conn)
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self.discard(conn)
+            return
+
+        with self._cond:
+            if self._closed:
+                self._close_quietly(conn)
+                self._forget(conn)
+                return
+            created_at = self._created_at.get(id(conn), time.monotonic())
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def discard(self, conn: MySQLConnection) -> None:
+        """Close a connection that must not be reused and free its slot."""
+        self._close_quietly(conn)
+        with self._cond:
+            self._discarded += 1
+            self._forget(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[MySQLConnection]:
+        """Context manager that borrows a connection and always gives it back."""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            # release() rolls back; a connection that cannot roll back is dropped
+            self.release(conn)
+
+    def close(self) -> None:
+        """Close every idle connection; borrowed ones close when released."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            for conn, _, _ in idle:
+                self._forget(conn)
+            self._cond.notify_all()
+        for conn, _, _ in idle:
+            self._close_quietly(conn)
+
+    # Stats
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool occupancy and lifetime counters."""
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                "max_size": self.max_size,
+                "open": self._open,
+                "idle": idle,
+                "in_use": self._open - idle,
+                "checkouts": self._checkouts,
+                "created": self._created,
+                "recycled": self._recycled,
+                "discarded": self._discarded,
+                "timeouts": self._timeouts,
+                "avg_wait_ms": round(1000 * self._wait_seconds / self._checkouts, 3) if self._checkouts else 0.0,
+            }
+
+    # Internals
+
+    def _create(self) -> MySQLConnection:
+        try:
+            conn = self._factory()
+        except BaseException:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created += 1
+            self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _validate(self, entry: Tuple[MySQLConnection, float, float]) -> Optional[MySQLConnection]:
+        """Return the connection if it is still usable, otherwise drop it."""
+        conn, created_at, returned_at = entry
+        now = time.monotonic()
+
+        if self.recycle and now - created_at > self.recycle:
+            self._close_quietly(conn)
+            with self._cond:
+                self._recycled += 1
+                self._forget(conn)
+            return None
+
+        if now - returned_at > self.ping_after:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                self.discard(conn)
+                return None
+        return conn
+
+    def _forget(self, conn: MySQLConnection) -> None:
+        # Caller holds self._cond
+        if self._created_at.pop(id(conn), None) is not None:
+            self._open -= 1
+
+    @staticmethod
+    def _close_quietly(conn: MySQLConnection) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
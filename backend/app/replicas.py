@@ -0,0 +1,88 @@
+"""Read replica selection for db.py.
+
+Each replica in DB_REPLICAS gets its own ConnectionPool. Reads are spread
+round-robin over the replicas that are currently healthy. A replica that
+fails to hand out a connection, or drops one mid-query, is ejected for
+DB_REPLICA_EJECT_SECONDS. After that it is tried again, and a replica that
+keeps failing is ejected again. When every replica is ejected, reads fall
+back to the primary.
+"""
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .pool import ConnectionPool
+
+
+def parse_endpoints(spec: str, default_port: int = 3306) -> List[Tuple[str, int]]:
+    """``"db-r1, db-r2:3307"`` -> ``[("db-r1", 3306), ("db-r2", 3307)]``."""
+    endpoints = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.rpartition(":") if ":" in item else (item, "", "")
+        endpoints.append((host, int(port) if port else default_port))
+    return endpoints
+
+
+class Replica:
+    __slots__ = ("name", "pool", "ejected_until", "ejections", "checkouts")
+
+    def __init__(self, name: str, pool: ConnectionPool) -> None:
+        self.name = name
+        self.pool = pool
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.checkouts = 0
+
+
+class ReplicaSet:
+    """Round-robin over healthy replicas with time-based ejection."""
+
+    def __init__(
+        self,
+        endpoints: List[Tuple[str, int]],
+        pool_factory: Callable[[str, int], ConnectionPool],
+        eject_seconds: float = 30.0,
+    ) -> None:
+        self.eject_seconds = eject_seconds
+        self.replicas = [Replica(f"{host}:{port}", pool_factory(host, port)) for host, port in endpoints]
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+
+    def choose(self) -> Optional[Replica]:
+        """The next healthy replica, or None if all are ejected."""
+        now = time.monotonic()
+        count = len(self.replicas)
+        with self._lock:
+            start = next(self._next)
+            for i in range(count):
+                replica = self.replicas[(start + i) % count]
+                if replica.ejected_until <= now:
+                    replica.checkouts += 1
+                    return replica
+        return None
+
+    def eject(self, replica: Replica) -> None:
+        with self._lock:
+            replica.ejected_until = time.monotonic() + self.eject_seconds
+            replica.ejections += 1
+
+    def close(self) -> None:
+        for replica in self.replicas:
+            replica.pool.close()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                replica.name: {
+                    "healthy": replica.ejected_until <= now,
+                    "checkouts": replica.checkouts,
+                    "ejections": replica.ejections,
+                    **replica.pool.stats(),
+                }
+                for replica in self.replicas
+            }
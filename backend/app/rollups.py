@@ -0,0 +1,235 @@
+import os
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from mysql.connector.connection import MySQLConnection
+
+from .migrate import migrate
+
+
+# Summary tables backing the dashboard analytics (migrations 0003/0004).
+# They hold running sums and counts so top-N and per-genre queries read one
+# row per media/user/genre instead of aggregating the whole Review table on
+# every request.
+
+# (rating, status) of a review row, or None when the row does not exist
+ReviewState = Optional[Tuple[Optional[int], Optional[str]]]
+
+
+def rollups_enabled() -> bool:
+    """Whether analytics read from (and writes maintain) the summary tables."""
+    return os.getenv("ANALYTICS_ROLLUPS", "1") == "1"
+
+
+def _contribution(state: ReviewState) -> Tuple[int, int, int]:
+    """(rating_sum, rating_count, completions) a single review adds to its rollups."""
+    if state is None:
+        return 0, 0, 0
+    rating, status = state
+    rated = rating is not None
+    return (int(rating) if rated else 0, 1 if rated else 0, 1 if status == "Completed" else 0)
+
+
+# Review.Status values with their own UserSummary counter
+USER_STATUS_COLUMNS = {
+    "Planning": "Planning",
+    "Watching": "Watching",
+    "Completed": "Completions",
+    "Havent Watched": "HaventWatched",
+}
+
+
+def _user_contribution(state: ReviewState) -> Tuple[int, ...]:
+    """(reviews, rating_sum, rating_count, planning, watching, completions, havent_watched)."""
+    if state is None:
+        return (0,) * 7
+    _, status = state
+    rating_sum, rating_count, _ = _contribution(state)
+    return (1, rating_sum, rating_count) + tuple(
+        1 if status == name else 0 for name in USER_STATUS_COLUMNS
+    )
+
+
+def _user_delta(old: ReviewState, new: ReviewState) -> Tuple[int, ...]:
+    return tuple(n - o for o, n in zip(_user_contribution(old), _user_contribution(new)))
+
+
+_MEDIA_DELTA_SQL = """
+    INSERT INTO MediaSummary (MediaId, RatingSum, RatingCount, Completions)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        RatingSum = RatingSum + VALUES(RatingSum),
+        RatingCount = RatingCount + VALUES(RatingCount),
+        Completions = Completions + VALUES(Completions)
+"""
+
+_GENRE_DELTA_SQL = """
+    INSERT INTO GenreSummary (GenreId, RatingSum, RatingCount)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        RatingSum = RatingSum + VALUES(RatingSum),
+        RatingCount = RatingCount + VALUES(RatingCount)
+"""
+
+_USER_DELTA_SQL = """
+    INSERT INTO UserSummary (UserId, ReviewCount, RatingSum, RatingCount, Planning, Watching, Completions, HaventWatched)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        ReviewCount = ReviewCount + VALUES(ReviewCount),
+        RatingSum = RatingSum + VALUES(RatingSum),
+        RatingCount = RatingCount + VALUES(RatingCount),
+        Planning = Planning + VALUES(Planning),
+        Watching = Watching + VALUES(Watching),
+        Completions = Completions + VALUES(Completions),
+        HaventWatched = HaventWatched + VALUES(HaventWatched)
+"""
+
+
+def apply_review_change(
+    cur: Any,
+    user_id: Optional[int],
+    media_id: Optional[int],
+    old: ReviewState,
+    new: ReviewState,
+) -> None:
+    """Fold a review insert/update/delete into the summary tables.
+
+    Must run on the same connection and transaction as the Review write so the
+    rollups commit (or roll back) together with it. Pass ``old=None`` for an
+    insert and ``new=None`` for a delete.
+    """
+    old_sum, old_count, old_done = _contribution(old)
+    new_sum, new_count, new_done = _contribution(new)
+    d_sum, d_count, d_done = new_sum - old_sum, new_count - old_count, new_done - old_done
+
+    if media_id is not None and (d_sum or d_count or d_done):
+        cur.execute(_MEDIA_DELTA_SQL, (media_id, d_sum, d_count, d_done))
+
+    if media_id is not None and (d_sum or d_count):
+        cur.execute(
+            """
+            INSERT INTO GenreSummary (GenreId, RatingSum, RatingCount)
+            SELECT GenreId, %s, %s FROM Media WHERE MediaId = %s AND GenreId IS NOT NULL
+            ON DUPLICATE KEY UPDATE
+                RatingSum = RatingSum + VALUES(RatingSum),
+                RatingCount = RatingCount + VALUES(RatingCount)
+            """,
+            (d_sum, d_count, media_id),
+        )
+
+    user_delta = _user_delta(old, new)
+    if user_id is not None and any(user_delta):
+        cur.execute(_USER_DELTA_SQL, (user_id, *user_delta))
+
+
+class RollupBatch:
+    """Net rollup deltas for many review changes, written with one statement per table.
+
+    Used by bulk writes, where calling apply_review_change() per review would
+    cost up to three statements each. The caller supplies the media's GenreId
+    since it already has it from resolving the batch.
+    """
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        self._media: Dict[int, List[int]] = defaultdict(lambda: [0, 0, 0])
+        self._genre: Dict[int, List[int]] = defaultdict(lambda: [0, 0])
+        self._user: Dict[int, List[int]] = defaultdict(lambda: [0] * 7)
+
+    def add(
+        self,
+        user_id: Optional[int],
+        media_id: Optional[int],
+        genre_id: Optional[int],
+        old: ReviewState,
+        new: ReviewState,
+    ) -> None:
+        old_sum, old_count, old_done = _contribution(old)
+        new_sum, new_count, new_done = _contribution(new)
+        d_sum, d_count, d_done = new_sum - old_sum, new_count - old_count, new_done - old_done
+        if media_id is not None:
+            m = self._media[media_id]
+            m[0] += d_sum
+            m[1] += d_count
+            m[2] += d_done
+            if genre_id is not None:
+                g = self._genre[genre_id]
+                g[0] += d_sum
+                g[1] += d_count
+        if user_id is not None:
+            u = self._user[user_id]
+            for i, d in enumerate(_user_delta(old, new)):
+                u[i] += d
+
+    def flush(self, cur: Any) -> None:
+        """Write the accumulated deltas on ``cur`` (same transaction as the reviews)."""
+        media = [(k, *v) for k, v in self._media.items() if any(v)]
+        genre = [(k, *v) for k, v in self._genre.items() if any(v)]
+        user = [(k, *v) for k, v in self._user.items() if any(v)]
+        if media:
+            cur.executemany(_MEDIA_DELTA_SQL, media)
+        if genre:
+            cur.executemany(_GENRE_DELTA_SQL, genre)
+        if user:
+            cur.executemany(_USER_DELTA_SQL, user)
+        self.clear()
+
+
+def rebuild_rollups(conn: MySQLConnection) -> Dict[str, int]:
+    """Recompute every summary table from Review in one transaction.
+
+    Pending migrations are applied first, so the tables exist with every
+    column. Returns the number of rows written per table.
+    """
+    migrate(conn)
+    cur = conn.cursor()
+    try:
+        conn.start_transaction()
+        counts: Dict[str, int] = {}
+
+        cur.execute("DELETE FROM MediaSummary")
+        cur.execute("""
+            INSERT INTO MediaSummary (MediaId, RatingSum, RatingCount, Completions)
+            SELECT MediaId, COALESCE(SUM(Rating), 0), COUNT(Rating), SUM(Status = 'Completed')
+            FROM Review
+            WHERE MediaId IS NOT NULL
+            GROUP BY MediaId
+        """)
+        counts["MediaSummary"] = cur.rowcount
+
+        cur.execute("DELETE FROM UserSummary")
+        cur.execute("""
+            INSERT INTO UserSummary (
+                UserId, ReviewCount, RatingSum, RatingCount,
+                Planning, Watching, Completions, HaventWatched
+            )
+            SELECT
+                UserId, COUNT(*), COALESCE(SUM(Rating), 0), COUNT(Rating),
+                SUM(Status = 'Planning'), SUM(Status = 'Watching'),
+                SUM(Status = 'Completed'), SUM(Status = 'Havent Watched')
+            FROM Review
+            WHERE UserId IS NOT NULL
+            GROUP BY UserId
+        """)
+        counts["UserSummary"] = cur.rowcount
+
+        cur.execute("DELETE FROM GenreSummary")
+        cur.execute("""
+            INSERT INTO GenreSummary (GenreId, RatingSum, RatingCount)
+            SELECT m.GenreId, COALESCE(SUM(r.Rating), 0), COUNT(r.Rating)
+            FROM Review AS r
+            JOIN Media AS m ON r.MediaId = m.MediaId
+            WHERE m.GenreId IS NOT NULL
+            GROUP BY m.GenreId
+        """)
+        counts["GenreSummary"] = cur.rowcount
+
+        conn.commit()
+        return counts
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
@@ -1,22 +1,46 @@
-from flask import Blueprint, jsonify, request
-from typing import Dict, Any
-from .db import ping_database
+from flask import Blueprint, Response, current_app, g, jsonify, request, stream_with_context
+from typing import Dict, Any, Optional
+from .db import ping_database, get_pool_stats
+from .cache import get_result_cache
+from .metrics import get_db_metrics, render_stats
+from .columnar import HISTOGRAM_GROUPS
+from .leaderboard import get_leaderboard
+from .ingest import MEDIA_ENTRY_FIELDS, ingest_media_entries, parse_ndjson
+from .dashboard import dashboard_tables, load_dashboard
+from .entities import ENTITIES, batch_max_ids, entity_cache_stats
+from .serialization import encode_line, shaped, wants_columns
+from .statements import prepared_stats
+from .versions import conditional
 from .db import (
     get_top_rated_media,
     get_top_users_completed,
     get_top_media_completed,
     get_avg_rating_per_genre,
+    get_rating_histogram,
     get_users_rating_above,
     get_recent_low_rated,
     create_user,
-    get_all_users,
+    fetch_all_users,
+    get_user_stats,
+    get_by_ids,
     update_user,
     delete_user,
     create_review,
     update_review,
     delete_review,
     create_full_media_entry,
-    search_database
+    search_database,
+    search_page,
+    iter_search,
+    decode_search_cursor,
+    InvalidCursorError,
+    SEARCH_DEFAULT_LIMIT,
+    search_tables,
+    suggest_names,
+    get_replicas,
+    prefer_primary_reads,
+    read_your_writes_seconds,
+    restore_read_routing,
 )
 import logging
 
@@ -25,11 +49,50 @@ api_bp = Blueprint("api", __name__)
 # Configure a logger for error reporting
 logger = logging.getLogger(__name__)
 
+# Set after a successful write; while present the client's reads go to the primary
+PRIMARY_READS_COOKIE = "read_primary"
+
+
+@api_bp.before_request
+def _route_reads():
+    if request.cookies.get(PRIMARY_READS_COOKIE):
+        g._read_routing_token = prefer_primary_reads()
+
+
+@api_bp.after_request
+def _mark_writer(response):
+    if request.method in ("POST", "PUT", "PATCH", "DELETE") and response.status_code < 400:
+        window = read_your_writes_seconds()
+        if window > 0 and get_replicas() is not None:
+            response.set_cookie(PRIMARY_READS_COOKIE, "1", max_age=int(window) or 1, httponly=True, samesite="Lax")
+    return response
+
+
+@api_bp.teardown_request
+def _reset_read_routing(exc):
+    token = g.pop("_read_routing_token", None)
+    if token is not None:
+        restore_read_routing(token)
+
 @api_bp.get("/health")
 def api_health():
     """Lightweight health endpoint for API layer monitoring."""
     return jsonify({"status": "ok", "service": "api"})
 
+@api_bp.get("/metrics")
+def api_metrics():
+    """Per-query latency/row histograms, slow-query counts, pool and cache stats (Prometheus text)."""
+    lines = get_db_metrics().render()
+    render_stats(lines, "db_pool", get_pool_stats(),
+                 counters=("checkouts", "created", "recycled", "discarded", "timeouts"))
+    render_stats(lines, "result_cache", get_result_cache().stats(),
+                 counters=("hits", "misses", "coalesced", "evictions", "expirations", "invalidations"))
+    render_stats(lines, "prepared_statements", prepared_stats(), counters=("prepares", "executions", "evictions"))
+    bodies = current_app.extensions.get("compressed_bodies")
+    if bodies is not None:
+        render_stats(lines, "compressed_bodies", bodies.stats(), counters=("hits", "misses"))
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
 @api_bp.get("/db/ping")
 def db_ping():
     """Verifies DB connectivity/credentials with a trivial SELECT."""
@@ -41,31 +104,52 @@ def db_ping():
         "status": "ok" if ok else "error",
         "error": None if ok else "Database connection failed",
     })
+
+@api_bp.get("/db/pool")
+def db_pool_stats():
+    """Connection pool occupancy and lifetime counters for this worker."""
+    return jsonify(get_pool_stats())
+
+
+@api_bp.get("/cache/stats")
+def cache_stats():
+    """Result cache hit/miss/eviction counters for this worker, plus the per-entity caches."""
+    stats = get_result_cache().stats()
+    stats["entities"] = entity_cache_stats()
+    return jsonify(stats)
+
+
 @api_bp.get("/users")
+@conditional(("User",))
 def get_users():
     """Return all users from the User table."""
     try:
-        from .db import get_connection  # safe lazy import
-
-        conn = get_connection()
-        cur = conn.cursor(dictionary=True)
-        cur.execute("SELECT * FROM User")
-        rows = cur.fetchall()
-
-        cur.close()
-        conn.close()
-
-        return jsonify(rows)
+        rows = fetch_all_users(rowset=True)
+        return jsonify(shaped(rows, wants_columns(request.args)))
 
     except Exception as exc:
         logger.error(f"/users failed: {exc}")
         return jsonify({"error": "Failed to fetch users"}), 500
 
+
+def _ranking_limit() -> Optional[int]:
+    """?limit= for the ranking routes, clamped to 1..LEADERBOARD_K; None if malformed."""
+    try:
+        limit = int(request.args.get("limit", 5))
+    except ValueError:
+        return None
+    return max(1, min(limit, get_leaderboard().k))
+
+
 @api_bp.get("/top-rated-media")
+@conditional(get_top_rated_media.tables)
 def top_rated_media():
-    """Top 5 highest-rated media overall by type."""
+    """Top ``limit`` (default 5) highest-rated media overall by type."""
+    limit = _ranking_limit()
+    if limit is None:
+        return jsonify({"error": "limit must be an integer"}), 400
     try:
-        ok, err, data = get_top_rated_media()
+        ok, err, data = get_top_rated_media(limit)
         if not ok:
             logger.error(f"/top-rated-media failed: {err}")
             return jsonify({"error": "Query failed"}), 500
@@ -75,10 +159,14 @@ def top_rated_media():
         return jsonify({"error": "Query failed"}), 500
 
 @api_bp.get("/top-users-completed")
+@conditional(get_top_users_completed.tables)
 def top_users_completed():
-    """Top 5 users who completed the most media."""
+    """Top ``limit`` (default 5) users who completed the most media."""
+    limit = _ranking_limit()
+    if limit is None:
+        return jsonify({"error": "limit must be an integer"}), 400
     try:
-        ok, err, data = get_top_users_completed()
+        ok, err, data = get_top_users_completed(limit)
         if not ok:
             logger.error(f"/top-users-completed failed: {err}")
             return jsonify({"error": "Query failed"}), 500
@@ -88,10 +176,14 @@ def top_users_completed():
         return jsonify({"error": "Query failed"}), 500
 
 @api_bp.get("/top-media-completions")
+@conditional(get_top_media_completed.tables)
 def top_media_completions():
-    """Top 5 media with the most completions."""
+    """Top ``limit`` (default 5) media with the most completions."""
+    limit = _ranking_limit()
+    if limit is None:
+        return jsonify({"error": "limit must be an integer"}), 400
     try:
-        ok, err, data = get_top_media_completed()
+        ok, err, data = get_top_media_completed(limit)
         if not ok:
             logger.error(f"/top-media-completions failed: {err}")
             return jsonify({"error": "Query failed"}), 500
@@ -101,6 +193,7 @@ def top_media_completions():
         return jsonify({"error": "Query failed"}), 500
 
 @api_bp.get("/avg-rating-genre")
+@conditional(get_avg_rating_per_genre.tables)
 def avg_rating_genre():
     """Average rating per genre."""
     try:
@@ -113,7 +206,25 @@ def avg_rating_genre():
         logger.error(f"/avg-rating-genre failed: {exc}")
         return jsonify({"error": "Query failed"}), 500
 
+@api_bp.get("/rating-histogram")
+@conditional(get_rating_histogram.tables)
+def rating_histogram():
+    """Reviews per rating value; ``?by=all|genre|type`` (default all)."""
+    by = request.args.get("by", "all")
+    if by not in HISTOGRAM_GROUPS:
+        return jsonify({"error": f"by must be one of: {', '.join(HISTOGRAM_GROUPS)}"}), 400
+    try:
+        ok, err, data = get_rating_histogram(by)
+        if not ok:
+            logger.error(f"/rating-histogram failed: {err}")
+            return jsonify({"error": "Query failed"}), 500
+        return jsonify(data)
+    except Exception as exc:
+        logger.error(f"/rating-histogram failed: {exc}")
+        return jsonify({"error": "Query failed"}), 500
+
 @api_bp.get("/users-rated-high")
+@conditional(get_users_rating_above.tables)
 def users_rated_high():
     """Users who rated at least one media above 4 (per your SQL)."""
     try:
@@ -127,6 +238,7 @@ def users_rated_high():
         return jsonify({"error": "Query failed"}), 500
 
 @api_bp.get("/low-rated-recent")
+@conditional(get_recent_low_rated.tables)
 def low_rated_recent():
     """10 most recent low-rated media (rating ≤ 3)."""
     try:
@@ -140,32 +252,152 @@ def low_rated_recent():
         return jsonify({"error": "Query failed"}), 500
     
 
+def _dashboard_deps(args: Any) -> Any:
+    sections = args.get("sections")
+    return dashboard_tables([s.strip() for s in sections.split(",")] if sections else None)
+
+
+@api_bp.get("/dashboard")
+@conditional(_dashboard_deps)
+def api_dashboard():
+    """All analytics sections in one response, queried in parallel.
+
+    ?sections=a,b limits the response to those sections. Sections that fail
+    or time out are listed under "errors" and the rest are still returned.
+    """
+    sections = request.args.get("sections")
+    names = [s.strip() for s in sections.split(",") if s.strip()] if sections else None
+    try:
+        result = load_dashboard(names)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    except Exception as exc:
+        logger.error(f"/dashboard failed: {exc}")
+        return jsonify({"error": "Query failed"}), 500
+    if result["errors"] and not result["data"]:
+        return jsonify(result), 500
+    response = jsonify(result)
+    if result["errors"]:
+        # Partial results must not be revalidated as if they were complete
+        response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+def _search_deps(args: Any) -> Any:
+    if args.get("stream", "").lower() in ("1", "true", "yes"):
+        return None
+    return search_tables(args.get("category", "media"))
+
+
 @api_bp.get("/search")
+@conditional(_search_deps)
 def api_search():
-    """Search endpoint for Media, Users, and Genres."""
+    """Search endpoint for Media, Users, and Genres.
+
+    Without paging parameters the full match list is returned (legacy shape).
+    Passing ``limit`` and/or ``cursor`` returns one keyset page as
+    ``{"items": [...], "next_cursor": "..."}``; ``stream=1`` streams every
+    match as newline-delimited JSON, ending with an ``{"error": ...}`` line if
+    the query fails part-way. ``format=columns`` returns rows as
+    arrays under a single ``columns`` header instead of objects.
+    """
     query = request.args.get("q", "")
     category = request.args.get("category", "media")
     sort = request.args.get("sort", "az")
+    token = request.args.get("cursor")
+    raw_limit = request.args.get("limit")
+    stream = request.args.get("stream", "").lower() in ("1", "true", "yes")
+
+    after = None
+    if token:
+        try:
+            after = decode_search_cursor(token, category, sort, query)
+        except InvalidCursorError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+    if stream:
+        if category not in ("media", "user", "genre"):
+            return jsonify({"error": "Invalid category"}), 400
+        rows = iter_search(query, category, sort, after=after)
+        # Run the query and read the first row before committing to a 200, so
+        # a failed checkout or query still gets the usual error response
+        try:
+            first = next(rows, None)
+        except Exception as exc:
+            logger.error(f"/search stream failed: {exc}")
+            return jsonify({"error": "Search failed"}), 500
+
+        def generate():
+            try:
+                if first is not None:
+                    yield encode_line(first)
+                for row in rows:
+                    yield encode_line(row)
+            except Exception as exc:
+                # Headers are gone; a last line tells the client the list is cut short
+                logger.error(f"/search stream failed: {exc}")
+                yield encode_line({"error": "Search failed"})
+            finally:
+                rows.close()
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    if raw_limit is not None or token:
+        try:
+            limit = int(raw_limit) if raw_limit is not None else SEARCH_DEFAULT_LIMIT
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        try:
+            ok, err, data, next_cursor = search_page(query, category, sort, limit=limit, after=after)
+            if not ok:
+                logger.error(f"/search failed: {err}")
+                return jsonify({"error": err or "Search failed"}), 500
+            if wants_columns(request.args):
+                return jsonify({**shaped(data, True).to_json_value(), "next_cursor": next_cursor})
+            return jsonify({"items": data, "next_cursor": next_cursor})
+        except Exception as exc:
+            logger.error(f"/search failed: {exc}")
+            return jsonify({"error": "Search failed"}), 500
 
     try:
-        ok, err, data = search_database(query, category, sort)
+        ok, err, data = search_database(query, category, sort, rowset=True)
         if not ok:
             logger.error(f"/search failed: {err}")
             return jsonify({"error": err or "Search failed"}), 500
-        return jsonify(data)
+        return jsonify(shaped(data, wants_columns(request.args)))
     except Exception as exc:
         logger.error(f"/search failed: {exc}")
         return jsonify({"error": "Search failed"}), 500
 
 
+@api_bp.get("/suggest")
+def api_suggest():
+    """Typeahead completions for the search box, most-reviewed first."""
+    prefix = request.args.get("q", "").strip()
+    category = request.args.get("category", "all")
+    try:
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if not prefix:
+        return jsonify([])
+
+    ok, err, data = suggest_names(prefix, category, limit)
+    if not ok:
+        if err == "Invalid category":
+            return jsonify({"error": err}), 400
+        logger.error(f"/suggest failed: {err}")
+        return jsonify({"error": "Suggest failed"}), 500
+    return jsonify(data)
+
+
 @api_bp.post("/media-entries")
 def api_create_media_entry():
     """Create a full media entry (User, Media, Review, etc.)."""
     data: Dict[str, Any] = request.get_json(silent=True) or {}  # type: ignore
     
     # Basic validation
-    required = ["firstname", "lastname", "profilename", "mediatype", "medianame", "releaseyear", "genre", "platform", "rating", "status"]
-    for field in required:
+    for field in MEDIA_ENTRY_FIELDS:
         if field not in data or not data[field]:
             return jsonify({"error": f"Missing field: {field}"}), 400
 
@@ -177,6 +409,29 @@ def api_create_media_entry():
     return jsonify({"status": "ok"}), 201
 
 
+@api_bp.post("/media-entries/bulk")
+def api_bulk_media_entries():
+    """Create or update many media entries in chunked transactions.
+
+    Accepts a JSON array of media-entry objects, or NDJSON (one object per
+    line) with ``Content-Type: application/x-ndjson``, which is processed as
+    it is read. Responds with counts and a per-item result list.
+    """
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        entries: Any = parse_ndjson(request.stream)
+    else:
+        entries = request.get_json(silent=True)
+        if not isinstance(entries, list):
+            return jsonify({"error": "Expected a JSON array or NDJSON body"}), 400
+
+    try:
+        summary = ingest_media_entries(entries)
+    except Exception as exc:
+        logger.error(f"Bulk media entry import failed: {exc}")
+        return jsonify({"error": "Bulk import failed"}), 500
+    return jsonify(summary)
+
+
 # USER CRUD ROUTES
 
 
@@ -200,14 +455,80 @@ def api_create_user():
 
 
 @api_bp.get("/users/all")
+@conditional(("User",))
 def api_get_all_users():
-    """Get all users."""
+    """Get all users; an empty list if they can't be read."""
     try:
-        rows = get_all_users()
-        return jsonify(rows)
+        rows = fetch_all_users(rowset=True)
     except Exception as exc:
         logger.error(f"/users/all failed: {exc}")
-        return jsonify({"error": "Failed to fetch users"}), 500
+        # Keeps get_all_users' empty-list contract, but must not be tagged
+        # and revalidated as if it were the real list
+        response = jsonify([])
+        response.headers["Cache-Control"] = "no-store"
+        return response
+    return jsonify(shaped(rows, wants_columns(request.args)))
+
+
+@api_bp.get("/users/<int:user_id>/stats")
+@conditional(get_user_stats.tables)
+def api_user_stats(user_id: int):
+    """Review count, average rating and reviews per status for one user."""
+    try:
+        ok, err, stats = get_user_stats(user_id)
+        if not ok:
+            logger.error(f"/users/{user_id}/stats failed: {err}")
+            return jsonify({"error": "Query failed"}), 500
+        if stats is None:
+            return jsonify({"error": "User not found"}), 404
+        return jsonify(stats)
+    except Exception as exc:
+        logger.error(f"/users/{user_id}/stats failed: {exc}")
+        return jsonify({"error": "Query failed"}), 500
+
+
+def _batch_lookup(entity: str):
+    """``?ids=3,1,2`` -> ``{"results": [row or null per id, in order], "missing": [ids not found]}``."""
+    raw = request.args.get("ids", "")
+    try:
+        ids = [int(part) for part in raw.split(",") if part.strip()]
+    except ValueError:
+        return jsonify({"error": "ids must be a comma-separated list of integers"}), 400
+    if not ids:
+        return jsonify({"error": "ids is required"}), 400
+    if len(ids) > batch_max_ids():
+        return jsonify({"error": f"At most {batch_max_ids()} ids per request"}), 400
+    try:
+        ok, err, rows = get_by_ids(entity, ids)
+        if not ok:
+            logger.error(f"{request.path} failed: {err}")
+            return jsonify({"error": "Query failed"}), 500
+        missing = [item_id for item_id, row in zip(ids, rows) if row is None]
+        return jsonify({"results": rows, "missing": missing})
+    except Exception as exc:
+        logger.error(f"{request.path} failed: {exc}")
+        return jsonify({"error": "Query failed"}), 500
+
+
+@api_bp.get("/users/batch")
+@conditional((ENTITIES["user"][0],))
+def users_batch():
+    """Users by id, up to BATCH_MAX_IDS per request."""
+    return _batch_lookup("user")
+
+
+@api_bp.get("/media/batch")
+@conditional((ENTITIES["media"][0],))
+def media_batch():
+    """Media by id, up to BATCH_MAX_IDS per request."""
+    return _batch_lookup("media")
+
+
+@api_bp.get("/reviews/batch")
+@conditional((ENTITIES["review"][0],))
+def reviews_batch():
+    """Reviews by id, up to BATCH_MAX_IDS per request."""
+    return _batch_lookup("review")
 
 
 @api_bp.put("/users/<int:user_id>")
@@ -1,3 +1,8 @@
+-- Full schema snapshot for setting up a fresh database by hand.
+-- init_db.py builds the schema from app/migrations/ instead and never drops
+-- the database unless run with --reset; when adding a migration, mirror it
+-- here so the two stay equivalent.
+
 -- Drop and recreate the database
 DROP DATABASE IF EXISTS mediawatchlist;
 CREATE DATABASE mediawatchlist;
@@ -12,19 +17,24 @@ CREATE TABLE User (
     UserId INT AUTO_INCREMENT PRIMARY KEY,
     FirstName VARCHAR(50),
     LastName VARCHAR(50),
-    ProfileName VARCHAR(50)
+    ProfileName VARCHAR(50),
+    INDEX idx_user_profile (ProfileName),
+    FULLTEXT INDEX ft_user_names (FirstName, LastName, ProfileName)
 );
 
 -- Genre table
 CREATE TABLE Genre (
     GenreId INT AUTO_INCREMENT PRIMARY KEY,
-    GenreName VARCHAR(50)
+    GenreName VARCHAR(50),
+    UNIQUE INDEX uq_genre_name (GenreName),
+    FULLTEXT INDEX ft_genre_name (GenreName)
 );
 
 -- Platform table
 CREATE TABLE Platform (
     PlatformId INT AUTO_INCREMENT PRIMARY KEY,
-    PlatformName VARCHAR(50)
+    PlatformName VARCHAR(50),
+    UNIQUE INDEX uq_platform_name (PlatformName)
 );
 
 -- Media table
@@ -36,6 +46,9 @@ CREATE TABLE Media (
     GenreId INT,
     PlatformId INT,
     Description TEXT,
+    UNIQUE INDEX uq_media_identity (MediaName, MediaType, ReleaseYear),
+    INDEX idx_media_year (ReleaseYear),
+    FULLTEXT INDEX ft_media_name (MediaName),
     FOREIGN KEY (GenreId) REFERENCES Genre(GenreId),
     FOREIGN KEY (PlatformId) REFERENCES Platform(PlatformId)
 );
@@ -48,10 +61,54 @@ CREATE TABLE Review (
     Rating INT,
     ReviewText TEXT,
     Status ENUM ('Planning', 'Watching', 'Completed', 'Havent Watched') DEFAULT 'Planning',
+    UNIQUE INDEX uq_review_user_media (UserId, MediaId),
+    INDEX idx_review_status_user (Status, UserId),
+    INDEX idx_review_status_media (Status, MediaId),
+    INDEX idx_review_rating_user (Rating, UserId),
+    INDEX idx_review_media_rating (MediaId, Rating),
     FOREIGN KEY (UserId) REFERENCES User(UserId),
     FOREIGN KEY (MediaId) REFERENCES Media(MediaId)
 );
 
+-- ==============================
+-- ANALYTICS ROLLUPS
+-- ==============================
+-- Running sums/counts maintained by the write helpers in app/db.py.
+-- Rebuild from Review at any time with `python rebuild_rollups.py`.
+
+-- Per-media rating sum/count and completions
+CREATE TABLE MediaSummary (
+    MediaId INT PRIMARY KEY,
+    RatingSum BIGINT NOT NULL DEFAULT 0,
+    RatingCount INT NOT NULL DEFAULT 0,
+    Completions INT NOT NULL DEFAULT 0,
+    AvgRating DECIMAL(6,2) AS (IF(RatingCount > 0, ROUND(RatingSum / RatingCount, 2), NULL)) STORED,
+    INDEX idx_mediasummary_avg (AvgRating),
+    INDEX idx_mediasummary_completions (Completions)
+);
+
+-- Per-user review count, rating sum/count and reviews per status
+CREATE TABLE UserSummary (
+    UserId INT PRIMARY KEY,
+    Completions INT NOT NULL DEFAULT 0,
+    ReviewCount INT NOT NULL DEFAULT 0,
+    RatingSum BIGINT NOT NULL DEFAULT 0,
+    RatingCount INT NOT NULL DEFAULT 0,
+    Planning INT NOT NULL DEFAULT 0,
+    Watching INT NOT NULL DEFAULT 0,
+    HaventWatched INT NOT NULL DEFAULT 0,
+    AvgRating DECIMAL(6,2) AS (IF(RatingCount > 0, ROUND(RatingSum / RatingCount, 2), NULL)) STORED,
+    INDEX idx_usersummary_completions (Completions),
+    INDEX idx_usersummary_reviews (ReviewCount)
+);
+
+-- Per-genre rating sum/count
+CREATE TABLE GenreSummary (
+    GenreId INT PRIMARY KEY,
+    RatingSum BIGINT NOT NULL DEFAULT 0,
+    RatingCount INT NOT NULL DEFAULT 0
+);
+
 -- Watchlist table
 CREATE TABLE Watchlist (
     UserId INT,
@@ -88,5 +145,8 @@ TRUNCATE TABLE Media;
 TRUNCATE TABLE Platform;
 TRUNCATE TABLE Genre;
 TRUNCATE TABLE User;
+TRUNCATE TABLE MediaSummary;
+TRUNCATE TABLE UserSummary;
+TRUNCATE TABLE GenreSummary;
 SET FOREIGN_KEY_CHECKS = 1;
 
@@ -0,0 +1,215 @@
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .snapshots import Refresh, start_background_load as _start_load
+
+# Fields are joined with a character no query can contain, so trigrams never
+# span two fields (e.g. FirstName "Ann" + LastName "Lee" won't match "nnl").
+_FIELD_SEP = "\x00"
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _field_score(field: str, needle: str) -> float:
+    """Relevance of ``needle`` inside one field: exact > prefix > word start > substring.
+
+    The fractional part favours shorter fields, so "Dune" outranks "Dune Part Two".
+    """
+    pos = field.find(needle)
+    if pos < 0:
+        return 0.0
+    if field == needle:
+        base = 4.0
+    elif pos == 0:
+        base = 3.0
+    elif not field[pos - 1].isalnum():
+        base = 2.0
+    else:
+        base = 1.0
+    return base + len(needle) / len(field)
+
+
+class TrigramIndex:
+    """Inverted index from lowercase character trigrams to document ids.
+
+    Answers the same question as ``LIKE '%term%'`` on the indexed fields, but
+    by intersecting posting sets instead of scanning every row, and ranks the
+    matches by where the term occurs. Terms shorter than three characters
+    can't be looked up; callers fall back to SQL for those.
+    """
+
+    MIN_QUERY = 3
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._docs: Dict[int, Tuple[str, ...]] = {}
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, doc_id: int, fields: Sequence[Optional[str]]) -> None:
+        """Index (or re-index) a document made of one or more text fields."""
+        lowered = tuple((f or "").lower() for f in fields)
+        with self._lock:
+            self._remove(doc_id)
+            self._docs[doc_id] = lowered
+            for gram in _trigrams(_FIELD_SEP.join(lowered)):
+                self._postings[gram].add(doc_id)
+
+    def remove(self, doc_id: int) -> None:
+        with self._lock:
+            self._remove(doc_id)
+
+    def search(self, query: str) -> Optional[List[Tuple[int, float]]]:
+        """Return ``[(doc_id, score), ...]`` best first, or None if ``query`` is too short."""
+        needle = query.lower()
+        if len(needle) < self.MIN_QUERY:
+            return None
+
+        with self._lock:
+            postings = [self._postings.get(g) for g in _trigrams(needle)]
+            if not postings or any(p is None for p in postings):
+                return []
+            postings.sort(key=len)
+            candidates = set(postings[0])  # type: ignore[arg-type]
+            for p in postings[1:]:
+                candidates &= p  # type: ignore[operator]
+                if not candidates:
+                    return []
+
+            # Trigram overlap is necessary but not sufficient; confirm the substring
+            scored = []
+            for doc_id in candidates:
+                score = max(_field_score(f, needle) for f in self._docs[doc_id])
+                if score > 0:
+                    scored.append((doc_id, score))
+
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored
+
+    def _remove(self, doc_id: int) -> None:
+        old = self._docs.pop(doc_id, None)
+        if old is None:
+            return
+        for gram in _trigrams(_FIELD_SEP.join(old)):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self._postings[gram]
+
+
+# Per-category source queries used to build the indexes from the database
+_SOURCES: Dict[str, str] = {
+    "media": "SELECT MediaId, MediaName FROM Media",
+    "user": "SELECT UserId, FirstName, LastName, ProfileName FROM User",
+    "genre": "SELECT GenreId, GenreName FROM Genre",
+}
+
+
+class SearchIndex:
+    """The media/user/genre trigram indexes for this process.
+
+    Disabled unless SEARCH_INDEX=trigram. Loading happens in a background
+    thread at startup; until it finishes ``ready`` is False and search falls
+    back to SQL, so the API is never blocked on the initial build.
+
+    The write hooks only see this process's writes, and an index missing a
+    row would drop it from the results, not just rank it lower. With
+    ``refresh`` (seconds) the index is rebuilt that often, and search falls
+    back to SQL once it is twice that old.
+    """
+
+    def __init__(self, enabled: bool, refresh: float = 0) -> None:
+        self.enabled = enabled
+        self.ready = False
+        self._indexes: Dict[str, TrigramIndex] = {c: TrigramIndex() for c in _SOURCES}
+        self._load_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        # Writes that land while a load is scanning are replayed onto the new
+        # indexes, so a row committed mid-build is never lost.
+        self._pending: Optional[List[Tuple[str, int, Optional[Tuple[Optional[str], ...]]]]] = None
+        self._refresh = Refresh("Search index", self.load, refresh)
+
+    def load(self, conn: Any) -> Dict[str, int]:
+        """Rebuild every category from the database on ``conn``."""
+        with self._load_lock:
+            self._pending = []
+            fresh = {c: TrigramIndex() for c in _SOURCES}
+            for category, sql in _SOURCES.items():
+                cur = conn.cursor(buffered=False)
+                cur.execute(sql)
+                while True:
+                    batch = cur.fetchmany(1000)
+                    if not batch:
+                        break
+                    for row in batch:
+                        fresh[category].add(row[0], row[1:])
+                cur.close()
+            with self._write_lock:
+                for category, doc_id, fields in self._pending:
+                    if fields is None:
+                        fresh[category].remove(doc_id)
+                    else:
+                        fresh[category].add(doc_id, fields)
+                self._pending = None
+                self._indexes = fresh
+            self.ready = True
+            self._refresh.mark_loaded()
+            return {c: len(idx) for c, idx in fresh.items()}
+
+    def search(self, category: str, query: str) -> Optional[List[Tuple[int, float]]]:
+        """Ranked matches, or None when the index can't answer (disabled, loading, stale, short term)."""
+        if not (self.enabled and self.ready and self._refresh.usable()):
+            return None
+        index = self._indexes.get(category)
+        return index.search(query) if index is not None else None
+
+    def upsert(self, category: str, doc_id: Optional[int], fields: Iterable[Optional[str]]) -> None:
+        if self.enabled and doc_id:
+            self._apply(category, int(doc_id), tuple(fields))
+
+    def remove(self, category: str, doc_id: int) -> None:
+        if self.enabled:
+            self._apply(category, int(doc_id), None)
+
+    def _apply(self, category: str, doc_id: int, fields: Optional[Tuple[Optional[str], ...]]) -> None:
+        with self._write_lock:
+            if self._pending is not None:
+                self._pending.append((category, doc_id, fields))
+            index = self._indexes[category]
+            if fields is None:
+                index.remove(doc_id)
+            else:
+                index.add(doc_id, fields)
+
+
+_search_index: Optional[SearchIndex] = None
+_search_index_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """Process-wide search index, enabled by SEARCH_INDEX=trigram."""
+    global _search_index
+    if _search_index is None:
+        with _search_index_lock:
+            if _search_index is None:
+                _search_index = SearchIndex(
+                    os.getenv("SEARCH_INDEX", "").lower() == "trigram",
+                    refresh=max(0, int(os.getenv("SEARCH_INDEX_REFRESH", "60"))),
+                )
+    return _search_index
+
+
+def start_background_load(connect: Any) -> Optional[threading.Thread]:
+    """Build the index off the request path; ``connect`` is a db_connection-style factory."""
+    index = get_search_index()
+    if not index.enabled:
+        return None
+    index._refresh.connect = connect
+    return _start_load("Search index", index.load, connect)
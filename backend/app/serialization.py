@@ -0,0 +1,148 @@
+"""JSON encoding for API responses.
+
+orjson is used when it is installed (it is several times faster on the large
+row lists that search and the user lists return); otherwise the stdlib
+encoder. Either way the output matches Flask's default provider: sorted keys
+and Decimal as a string.
+
+Rows read through a tuple cursor can be wrapped in a ``RowSet``. It encodes
+as the usual list of objects, or with ``?format=columns`` as
+``{"columns": [...], "rows": [[...], ...]}``, which skips building a dict per
+row and repeats no keys.
+"""
+import json
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # optional speedup, see requirements.txt
+    orjson = None
+
+# mysql.connector FieldType codes for DECIMAL and NEWDECIMAL
+_DECIMAL_TYPES = (0, 246)
+
+COLUMNS_FORMAT = "columns"
+
+
+class RowSet:
+    """Tuple rows plus their column names, encoded without per-row dicts."""
+
+    __slots__ = ("columns", "rows", "columnar")
+
+    def __init__(self, columns: Sequence[str], rows: List[Sequence[Any]], columnar: bool = False) -> None:
+        self.columns = list(columns)
+        self.rows = rows
+        self.columnar = columnar
+
+    @classmethod
+    def from_cursor(cls, cur: Any, exclude: Iterable[str] = (), columnar: bool = False) -> "RowSet":
+        """Fetch everything from a tuple cursor.
+
+        DECIMAL columns are turned into strings once per column here rather
+        than through the encoder's fallback once per value. ``exclude`` drops
+        helper columns (e.g. sort keys) from the output.
+        """
+        description = cur.description or []
+        names = [d[0] for d in description]
+        rows = cur.fetchall() or []
+        dropped = set(exclude)
+        keep = [i for i, name in enumerate(names) if name not in dropped]
+        decimals = [i for i in keep if description[i][1] in _DECIMAL_TYPES]
+        if decimals or len(keep) != len(names):
+            rows = [_convert_row(row, keep, decimals) for row in rows]
+        return cls([names[i] for i in keep], rows, columnar)
+
+    @classmethod
+    def from_dicts(cls, rows: List[Dict[str, Any]], columnar: bool = False) -> "RowSet":
+        columns = list(rows[0]) if rows else []
+        return cls(columns, [tuple(row[c] for c in columns) for row in rows], columnar)
+
+    def as_dicts(self) -> List[Dict[str, Any]]:
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in self.rows]
+
+    def to_json_value(self) -> Any:
+        if self.columnar:
+            return {"columns": self.columns, "rows": self.rows}
+        return self.as_dicts()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+def _convert_row(row: Sequence[Any], keep: List[int], decimals: List[int]) -> Tuple[Any, ...]:
+    if not decimals:
+        return tuple(row[i] for i in keep)
+    values = list(row)
+    for i in decimals:
+        if values[i] is not None:
+            values[i] = str(values[i])
+    return tuple(values[i] for i in keep)
+
+
+def _default(o: Any) -> Any:
+    if isinstance(o, Decimal):
+        return str(o)
+    if isinstance(o, RowSet):
+        return o.to_json_value()
+    return DefaultJSONProvider.default(o)
+
+
+def encode(obj: Any, sort_keys: bool = True) -> bytes:
+    """Compact JSON bytes for ``obj``; ``sort_keys`` matches Flask's default."""
+    if orjson is not None:
+        # Dates go through _default so they match Flask's HTTP-date format
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(obj, default=_default, sort_keys=sort_keys, separators=(",", ":")).encode("utf-8")
+
+
+def wants_columns(args: Any) -> bool:
+    """Whether the request asked for the columnar response shape (``?format=columns``)."""
+    return args.get("format") == COLUMNS_FORMAT
+
+
+def shaped(rows: Any, columnar: bool) -> Any:
+    """``rows`` (dicts or a RowSet) in the requested response shape."""
+    if not columnar:
+        return rows
+    if isinstance(rows, RowSet):
+        return RowSet(rows.columns, rows.rows, columnar=True)
+    return RowSet.from_dicts(rows, columnar=True)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by ``encode()`` (orjson when available)."""
+
+    default = staticmethod(_default)  # type: ignore[assignment]
+
+    def encode(self, obj: Any) -> bytes:
+        return encode(obj, self.sort_keys)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            # Callers asking for stdlib options (indent, ...) get the stdlib encoder
+            return super().dumps(obj, **kwargs)
+        return self.encode(obj).decode("utf-8")
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any) -> Any:
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            # Pretty-printed debug output
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.encode(obj) + b"\n", mimetype=self.mimetype)
+
+
+def encode_line(row: Any) -> bytes:
+    """One NDJSON line, keys in column order."""
+    return encode(row, sort_keys=False) + b"\n"
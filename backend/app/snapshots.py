@@ -0,0 +1,137 @@
+"""Loading and refreshing the in-process snapshots of the database.
+
+The leaderboard (and the other optional in-memory indexes) are built from a
+scan of their tables in a background thread, then kept current by the db.py
+write hooks. Those hooks only see writes made through this process. Writes
+handled by a sibling serve.py worker, and anything done outside the app
+(bulk_load.py, rebuild_rollups.py, manual SQL), never reach them.
+
+``WriteLog`` keeps a load from losing writes that commit while it scans.
+``Refresh`` bounds the staleness by reloading the snapshot every
+``interval`` seconds. Reloads are started by reads, in the process doing the
+read, so each forked worker refreshes its own copy and no thread is running
+in the master when it forks. A snapshot older than twice the interval (a
+worker forked long after the preload, or one whose reloads keep failing) is
+not used at all: reads fall back to SQL until a reload succeeds.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Hashable, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def run_load(name: str, load: Callable[[Any], Any], connect: Any) -> bool:
+    """``load(conn)`` on a connection from ``connect``, logging the outcome."""
+    try:
+        with connect() as conn:
+            counts = load(conn)
+        logger.info("%s loaded: %s", name, counts)
+        return True
+    except Exception as exc:
+        logger.error("%s load failed, using SQL: %s", name, exc)
+        return False
+
+
+def _thread_name(name: str) -> str:
+    return name.lower().replace(" ", "-") + "-load"
+
+
+def start_background_load(name: str, load: Callable[[Any], Any], connect: Any) -> threading.Thread:
+    """Run ``load`` off the request path; ``connect`` is a db_connection-style factory."""
+    thread = threading.Thread(target=run_load, args=(name, load, connect), name=_thread_name(name), daemon=True)
+    thread.start()
+    return thread
+
+
+class Refresh:
+    """Read-driven periodic reload of one snapshot (0 disables it)."""
+
+    def __init__(self, name: str, load: Callable[[Any], Any], interval: float = 0.0) -> None:
+        self.name = name
+        self.interval = interval
+        self.connect: Any = None
+        self.loaded_at: Optional[float] = None
+        self._load = load
+        self._attempted_at = 0.0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def mark_loaded(self) -> None:
+        self.loaded_at = time.monotonic()
+
+    def usable(self) -> bool:
+        """Whether the snapshot may answer a read; starts a reload when one is due."""
+        if not self.interval:
+            return True
+        now = time.monotonic()
+        loaded = self.loaded_at if self.loaded_at is not None else float("-inf")
+        if self.connect is not None and now - max(loaded, self._attempted_at) >= self.interval:
+            self._start(now)
+        return now - loaded < 2 * self.interval
+
+    def _start(self, now: float) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._attempted_at = now
+            self._thread = threading.Thread(
+                target=run_load, args=(self.name, self._load, self.connect),
+                name=_thread_name(self.name), daemon=True,
+            )
+            self._thread.start()
+
+
+class WriteLog:
+    """Keys written while a load is scanning, read again before it installs its result.
+
+    A write that commits during the scan may or may not be in what the scan
+    read. While a load is running, the write hooks ``record`` the keys they
+    touch (one set per kind of key). Once the scan is done, ``replay`` hands
+    those keys to ``reread`` and repeats until a pass sees no new writes. It
+    then calls ``install`` under the same lock as that last check. A write is
+    therefore neither lost nor counted twice, however it interleaves with the
+    scan.
+
+    Connections don't autocommit, so under InnoDB's REPEATABLE READ the scan's
+    transaction would show every reread the snapshot the scan began with.
+    ``replay`` ends that transaction on ``conn`` before each pass, so a pass
+    sees the writes that committed before it started.
+
+    ``start``, ``record`` and ``stop`` are called with the owner's lock held.
+    """
+
+    def __init__(self, kinds: int) -> None:
+        self.kinds = kinds
+        self._pending: Optional[List[Set[Hashable]]] = None
+
+    def start(self) -> None:
+        self._pending = [set() for _ in range(self.kinds)]
+
+    def stop(self) -> None:
+        self._pending = None
+
+    def record(self, *keys: Iterable[Optional[Hashable]]) -> None:
+        if self._pending is not None:
+            for pending, written in zip(self._pending, keys):
+                pending.update(key for key in written if key is not None)
+
+    def replay(
+        self,
+        lock: threading.Lock,
+        reread: Callable[..., None],
+        install: Callable[[], None],
+        conn: Any,
+    ) -> None:
+        while True:
+            with lock:
+                pending = self._pending
+                assert pending is not None, "replay() without start()"
+                if not any(pending):
+                    self._pending = None
+                    install()
+                    return
+                self.start()
+            conn.rollback()
+            reread(*pending)
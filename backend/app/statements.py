@@ -0,0 +1,168 @@
+"""Named SQL statements, run as server-side prepared statements when pooled.
+
+Queries that db.py runs over and over are declared once with
+``statement(name, sql)``, which records them in ``STATEMENTS``. A
+``Statement`` is a ``str``, so it can still be passed anywhere SQL text is
+expected.
+
+``run()`` executes SQL and yields the cursor holding its result. For a
+``Statement`` on a pooled connection, the cursor is a prepared cursor cached
+on that connection. MySQL then parses and plans the statement once per
+connection, and each later call only sends the parameters in the binary
+protocol. Everything else, including direct (unpooled) connections where a
+prepare would just add a round trip, uses a plain cursor as before.
+"""
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+
+class Statement(str):
+    """SQL text with the name it is registered under."""
+
+    name: str
+
+    def __new__(cls, name: str, sql: str) -> "Statement":
+        # Prepared statements take exactly one statement, without a terminator
+        obj = super().__new__(cls, sql.strip().rstrip(";").rstrip())
+        obj.name = name
+        return obj
+
+
+STATEMENTS: Dict[str, Statement] = {}
+_registry_lock = threading.Lock()
+
+
+def statement(name: str, sql: str) -> Statement:
+    """Register ``sql`` under ``name`` and return it as a Statement."""
+    stmt = Statement(name, sql)
+    with _registry_lock:
+        existing = STATEMENTS.get(name)
+        if existing is not None and existing != stmt:
+            raise ValueError(f"Statement {name!r} is already registered with different SQL")
+        STATEMENTS[name] = stmt
+    return stmt
+
+
+class _Stats:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.prepares = 0
+        self.executions = 0
+        self.evictions = 0
+
+
+_stats = _Stats()
+
+
+def prepared_stats() -> Dict[str, Any]:
+    """Process-wide prepared statement counters."""
+    with _stats.lock:
+        executions = _stats.executions
+        return {
+            "prepares": _stats.prepares,
+            "executions": executions,
+            "evictions": _stats.evictions,
+            "reuse_ratio": round(1 - _stats.prepares / executions, 4) if executions else 0.0,
+        }
+
+
+class PreparedStatements:
+    """LRU of prepared cursors for one connection, keyed by SQL text and row shape.
+
+    Each entry also keeps the exact string the cursor was prepared with:
+    mysql.connector only reuses a prepared statement when it is executed
+    with that same object again.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, bool], Tuple[Any, str]]" = OrderedDict()
+
+    def checkout(self, conn: Any, sql: Statement, dictionary: bool) -> Tuple[Any, str]:
+        """(cursor, sql) to execute, preparing a new cursor on a miss."""
+        key = (str(sql), dictionary)
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            entry = (conn.cursor(prepared=True, dictionary=dictionary), sql)
+            with _stats.lock:
+                _stats.prepares += 1
+            while len(self._entries) >= self.max_size:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                _close_quietly(evicted)
+                with _stats.lock:
+                    _stats.evictions += 1
+        # Checked-out entries are out of the LRU until returned, so a failed
+        # execution simply never puts its cursor back
+        return entry
+
+    def checkin(self, sql: Statement, dictionary: bool, cur: Any, prepared_as: str) -> None:
+        self._entries[(str(sql), dictionary)] = (cur, prepared_as)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _close_quietly(cur: Any) -> None:
+    try:
+        cur.close()
+    except Exception:
+        pass
+
+
+def prepared_cache_size() -> int:
+    """Prepared statements kept per pooled connection (DB_PREPARED_CACHE, 0 disables)."""
+    return int(os.getenv("DB_PREPARED_CACHE", "64"))
+
+
+def attach_prepared(conn: Any, max_size: int) -> None:
+    """Give a pooled connection its prepared statement cache (kept across checkouts)."""
+    if max_size > 0 and not isinstance(getattr(conn, "_prepared_statements", None), PreparedStatements):
+        conn._prepared_statements = PreparedStatements(max_size)
+
+
+@contextmanager
+def run(
+    conn: Any,
+    sql: str,
+    params: Optional[Sequence[Any]] = None,
+    dictionary: bool = False,
+    buffered: bool = False,
+) -> Iterator[Any]:
+    """Execute ``sql`` and yield the cursor holding its result.
+
+    Read the result inside the block. A prepared cursor goes back to the
+    connection's cache afterwards, and any rows left unread are drained so the
+    connection stays usable. A plain cursor is closed.
+    """
+    cache = getattr(conn, "_prepared_statements", None)
+    if not isinstance(cache, PreparedStatements) or not isinstance(sql, Statement):
+        options = {"dictionary": dictionary, "buffered": buffered}
+        cur = conn.cursor(**{k: v for k, v in options.items() if v})
+        try:
+            cur.execute(sql, params)
+            yield cur
+        finally:
+            cur.close()
+        return
+
+    cur, prepared_as = cache.checkout(conn, sql, dictionary)
+    try:
+        cur.execute(prepared_as, tuple(params) if params else ())
+        with _stats.lock:
+            _stats.executions += 1
+        yield cur
+        if conn.unread_result:
+            cur.fetchall()
+    except BaseException:
+        _close_quietly(cur)
+        raise
+    cache.checkin(sql, dictionary, cur, prepared_as)
+
+
+def execute(conn: Any, sql: str, params: Optional[Sequence[Any]] = None) -> Any:
+    """Run a statement that returns no rows; returns the cursor's ``lastrowid``."""
+    with run(conn, sql, params) as cur:
+        return cur.lastrowid
@@ -0,0 +1,285 @@
+import bisect
+import heapq
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .snapshots import Refresh, start_background_load as _start_load
+
+SUGGEST_MAX_LIMIT = 20
+
+
+class PrefixIndex:
+    """Sorted array of lowercase names with per-name weights.
+
+    A prefix maps to one contiguous slice of the array (found with two
+    bisects), and the best ``limit`` names in that slice are the completions.
+    Short prefixes cover huge slices, so their top-N is memoised and dropped
+    whenever a name underneath them changes weight.
+    """
+
+    def __init__(self, scan_threshold: int = 256) -> None:
+        self.scan_threshold = scan_threshold
+        self._keys: List[str] = []
+        # lowercase key -> [display name, weight]
+        self._entries: Dict[str, List[Any]] = {}
+        self._top: Dict[str, List[Tuple[str, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def adjust(self, name: Optional[str], delta: int) -> None:
+        """Add ``delta`` to ``name``'s weight, inserting it if new."""
+        if not name:
+            return
+        key = name.lower()
+        entry = self._entries.get(key)
+        if entry is None:
+            bisect.insort(self._keys, key)
+            entry = self._entries[key] = [name, 0]
+        entry[1] += delta
+        self._forget_prefixes(key)
+
+    def discard(self, name: Optional[str]) -> None:
+        """Remove ``name`` entirely."""
+        if not name:
+            return
+        key = name.lower()
+        if self._entries.pop(key, None) is None:
+            return
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+        self._forget_prefixes(key)
+
+    def weight(self, name: str) -> int:
+        entry = self._entries.get(name.lower())
+        return entry[1] if entry else 0
+
+    def complete(self, prefix: str, limit: int) -> List[Tuple[str, int]]:
+        """Top ``limit`` (name, weight) pairs starting with ``prefix``, heaviest first."""
+        prefix = prefix.lower()
+        memo = self._top.get(prefix)
+        if memo is not None:
+            return memo[:limit]
+
+        lo = bisect.bisect_left(self._keys, prefix)
+        hi = bisect.bisect_left(self._keys, prefix + "￿", lo)
+        candidates = (self._entries[k] for k in self._keys[lo:hi])
+        best = heapq.nsmallest(
+            max(limit, SUGGEST_MAX_LIMIT) if hi - lo > self.scan_threshold else limit,
+            candidates,
+            key=lambda e: (-e[1], e[0].lower()),
+        )
+        result = [(display, weight) for display, weight in best]
+        if hi - lo > self.scan_threshold:
+            self._top[prefix] = result
+        return result[:limit]
+
+    def _forget_prefixes(self, key: str) -> None:
+        if self._top:
+            for i in range(len(key) + 1):
+                self._top.pop(key[:i], None)
+
+
+class _SuggestState:
+    """The three prefix indexes plus the id maps the write hooks need."""
+
+    def __init__(self) -> None:
+        self.indexes = {c: PrefixIndex() for c in Suggester.CATEGORIES}
+        self.media: Dict[int, Tuple[str, Optional[int]]] = {}
+        self.genres: Dict[int, str] = {}
+        # user id -> [profile name, review count]; profile names aren't unique
+        self.users: Dict[int, List[Any]] = {}
+        self.profile_owners: Dict[str, int] = {}
+
+    def review_added(self, user_id: Optional[int], media_id: Optional[int], delta: int) -> None:
+        user = self.users.get(user_id)  # type: ignore[arg-type]
+        if user is not None:
+            user[1] += delta
+            self.indexes["user"].adjust(user[0], delta)
+        if media_id in self.media:
+            name, genre_id = self.media[media_id]  # type: ignore[index]
+            self.indexes["media"].adjust(name, delta)
+            if genre_id in self.genres:
+                self.indexes["genre"].adjust(self.genres[genre_id], delta)  # type: ignore[index]
+
+    def user_saved(self, user_id: int, profile: str, count: int = 0) -> None:
+        old = self.users.get(user_id)
+        if old is not None:
+            count = old[1]
+            self.user_removed(user_id)
+        self.users[user_id] = [profile, count]
+        key = profile.lower()
+        self.profile_owners[key] = self.profile_owners.get(key, 0) + 1
+        self.indexes["user"].adjust(profile, count)
+
+    def user_removed(self, user_id: int) -> None:
+        old = self.users.pop(user_id, None)
+        if old is None:
+            return
+        profile, count = old
+        key = profile.lower()
+        self.profile_owners[key] -= 1
+        if self.profile_owners[key] <= 0:
+            del self.profile_owners[key]
+            self.indexes["user"].discard(profile)
+        else:
+            self.indexes["user"].adjust(profile, -count)
+
+    def media_saved(self, media_id: int, name: str, genre_id: Optional[int]) -> None:
+        self.media[media_id] = (name, genre_id)
+        self.indexes["media"].adjust(name, 0)
+
+    def genre_saved(self, genre_id: int, name: str) -> None:
+        self.genres[genre_id] = name
+        self.indexes["genre"].adjust(name, 0)
+
+
+class Suggester:
+    """Typeahead over media names, profile names and genre names.
+
+    Each name is weighted by its review count so popular completions come
+    first. Disabled unless SUGGEST_INDEX=1; built from the database in a
+    background thread at startup and kept current by the write helpers in
+    db.py. While it is disabled or still loading, ``complete`` returns None
+    and /api/suggest answers from SQL instead.
+
+    Names written through other workers only arrive with a rebuild. With
+    ``refresh`` (seconds) one runs that often, and the index is not used
+    once it is twice that old.
+    """
+
+    CATEGORIES = ("media", "user", "genre")
+
+    def __init__(self, enabled: bool, refresh: float = 0) -> None:
+        self.enabled = enabled
+        self.ready = False
+        self._state = _SuggestState()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # Writes that land while a load is scanning are replayed onto the new
+        # state. Weights are only a ranking signal, so a review counted by both
+        # the scan and the replay is tolerated until the next rebuild.
+        self._pending: Optional[List[Callable[[_SuggestState], None]]] = None
+        self._refresh = Refresh("Suggest index", self.load, refresh)
+
+    def load(self, conn: Any) -> Dict[str, int]:
+        """Rebuild from the database in one pass per table."""
+        with self._load_lock:
+            with self._lock:
+                self._pending = []
+            fresh = _SuggestState()
+            genre_weight: Dict[int, int] = {}
+
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT GenreId, GenreName FROM Genre")
+                for genre_id, name in cur.fetchall():
+                    fresh.genres[genre_id] = name
+                    genre_weight[genre_id] = 0
+
+                cur.execute("""
+                    SELECT m.MediaId, m.MediaName, m.GenreId, COUNT(r.ReviewId)
+                    FROM Media m
+                    LEFT JOIN Review r ON r.MediaId = m.MediaId
+                    GROUP BY m.MediaId
+                """)
+                for media_id, name, genre_id, count in cur.fetchall():
+                    fresh.media[media_id] = (name, genre_id)
+                    fresh.indexes["media"].adjust(name, int(count))
+                    if genre_id in genre_weight:
+                        genre_weight[genre_id] += int(count)
+
+                cur.execute("""
+                    SELECT u.UserId, u.ProfileName, COUNT(r.ReviewId)
+                    FROM User u
+                    LEFT JOIN Review r ON r.UserId = u.UserId
+                    GROUP BY u.UserId
+                """)
+                for user_id, profile, count in cur.fetchall():
+                    fresh.user_saved(user_id, profile, int(count))
+            finally:
+                cur.close()
+
+            for genre_id, name in fresh.genres.items():
+                fresh.indexes["genre"].adjust(name, genre_weight[genre_id])
+
+            with self._lock:
+                for change in self._pending or ():
+                    change(fresh)
+                self._pending = None
+                self._state = fresh
+            self.ready = True
+            self._refresh.mark_loaded()
+            return {c: len(idx) for c, idx in fresh.indexes.items()}
+
+    def complete(self, prefix: str, category: str = "all", limit: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """Ranked completions, or None when the index can't answer."""
+        if not (self.enabled and self.ready and self._refresh.usable()):
+            return None
+        limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+        categories = self.CATEGORIES if category == "all" else (category,)
+        with self._lock:
+            found = [
+                {"text": name, "type": c, "weight": weight}
+                for c in categories
+                for name, weight in self._state.indexes[c].complete(prefix, limit)
+            ]
+        found.sort(key=lambda s: (-s["weight"], s["text"].lower()))
+        return found[:limit]
+
+    # Write hooks, called by db.py after commit
+
+    def review_added(self, user_id: Optional[int], media_id: Optional[int], delta: int = 1) -> None:
+        """Re-weight the names a review counts toward (delta=-1 for a delete)."""
+        self._apply(lambda s: s.review_added(user_id, media_id, delta))
+
+    def user_saved(self, user_id: Optional[int], profile: str) -> None:
+        if user_id:
+            self._apply(lambda s: s.user_saved(int(user_id), profile))
+
+    def user_removed(self, user_id: int) -> None:
+        self._apply(lambda s: s.user_removed(int(user_id)))
+
+    def media_saved(self, media_id: Optional[int], name: str, genre_id: Optional[int]) -> None:
+        if media_id:
+            self._apply(lambda s: s.media_saved(int(media_id), name, genre_id))
+
+    def genre_saved(self, genre_id: Optional[int], name: str) -> None:
+        if genre_id:
+            self._apply(lambda s: s.genre_saved(int(genre_id), name))
+
+    def _apply(self, change: Callable[[_SuggestState], None]) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(change)
+            change(self._state)
+
+
+_suggester: Optional[Suggester] = None
+_suggester_lock = threading.Lock()
+
+
+def get_suggester() -> Suggester:
+    """Process-wide suggester, enabled by SUGGEST_INDEX=1."""
+    global _suggester
+    if _suggester is None:
+        with _suggester_lock:
+            if _suggester is None:
+                _suggester = Suggester(
+                    os.getenv("SUGGEST_INDEX", "0") == "1",
+                    refresh=max(0, int(os.getenv("SUGGEST_INDEX_REFRESH", "60"))),
+                )
+    return _suggester
+
+
+def start_background_load(connect: Any) -> Optional[threading.Thread]:
+    """Build the suggester off the request path; ``connect`` is a db_connection-style factory."""
+    suggester = get_suggester()
+    if not suggester.enabled:
+        return None
+    suggester._refresh.connect = connect
+    return _start_load("Suggest index", suggester.load, connect)
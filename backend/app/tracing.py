@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from flask import Flask, Response, g, request
+
+from .serialization import FastJSONProvider
+
+logger = logging.getLogger(__name__)
+
+# Spans kept per trace for the JSON log; totals in Server-Timing are exact regardless
+MAX_SPANS = 200
+
+# Server-Timing metric names, in header order. "handler" is whatever is
+# left of the request once the named spans are taken out.
+SPAN_ORDER = ("db-checkout", "sql", "json")
+
+
+class Trace:
+    """Spans collected while one request is handled.
+
+    Spans can be added from worker threads that copied the request's
+    context (e.g. parallel dashboard queries), so updates take a lock.
+    """
+
+    def __init__(self, method: str, path: str, sampled: bool) -> None:
+        self.method = method
+        self.path = path
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._totals: Dict[str, List[float]] = {}
+        self._spans: List[Tuple[str, float, float, Optional[str]]] = []
+        self.dropped = 0
+
+    def add(self, name: str, seconds: float, detail: Optional[str] = None) -> None:
+        end = time.perf_counter()
+        with self._lock:
+            total = self._totals.setdefault(name, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+            if not self.sampled:
+                return
+            if len(self._spans) < MAX_SPANS:
+                self._spans.append((name, end - seconds - self.started, seconds, detail))
+            else:
+                self.dropped += 1
+
+    def totals(self) -> Dict[str, Tuple[float, int]]:
+        with self._lock:
+            return {name: (t[0], int(t[1])) for name, t in self._totals.items()}
+
+    def server_timing(self, elapsed: float) -> str:
+        totals = self.totals()
+        parts = []
+        accounted = 0.0
+        for name in SPAN_ORDER + tuple(sorted(set(totals) - set(SPAN_ORDER))):
+            if name not in totals:
+                continue
+            seconds, count = totals[name]
+            accounted += seconds
+            parts.append(f'{name};dur={seconds * 1000:.2f};desc="{count}x"')
+        # Parallel spans can add up to more than the wall time
+        parts.append(f"handler;dur={max(elapsed - accounted, 0.0) * 1000:.2f}")
+        parts.append(f"total;dur={elapsed * 1000:.2f}")
+        return ", ".join(parts)
+
+    def to_log(self, status: int, elapsed: float) -> Dict[str, Any]:
+        with self._lock:
+            spans = [
+                {"name": name, "start_ms": round(start * 1000, 3), "dur_ms": round(dur * 1000, 3),
+                 **({"detail": detail} if detail else {})}
+                for name, start, dur, detail in self._spans
+            ]
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "total_ms": round(elapsed * 1000, 3),
+            "totals_ms": {name: round(s * 1000, 3) for name, (s, _) in self.totals().items()},
+            "spans": spans,
+            **({"dropped_spans": self.dropped} if self.dropped else {}),
+        }
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def add_span(name: str, seconds: float, detail: Optional[str] = None) -> None:
+    """Attribute ``seconds`` to ``name`` in the current request's trace, if any."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, seconds, detail)
+
+
+@contextmanager
+def span(name: str, detail: Optional[str] = None) -> Iterator[None]:
+    """Time a block as a span of the current trace (a no-op outside a request)."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - started, detail)
+
+
+@contextmanager
+def activate(trace: Trace) -> Iterator[Trace]:
+    """Make ``trace`` the current trace for the block (used outside Flask's request hooks)."""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def finish_trace(trace: Trace, status: int) -> str:
+    """Log ``trace`` if it was sampled and return its Server-Timing header value."""
+    elapsed = time.perf_counter() - trace.started
+    if trace.sampled:
+        logger.info("trace %s", json.dumps(trace.to_log(status, elapsed)))
+    return trace.server_timing(elapsed)
+
+
+def tracing_settings() -> Tuple[bool, float]:
+    """(SERVER_TIMING enabled, TRACE_SAMPLE_RATE) from the environment."""
+    return os.getenv("SERVER_TIMING", "1") == "1", float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+
+
+class TracingJSONProvider(FastJSONProvider):
+    """The app's JSON provider with serialization timed as the ``json`` span."""
+
+    def encode(self, obj: Any) -> bytes:
+        with span("json"):
+            return super().encode(obj)
+
+
+def init_tracing(app: Flask) -> None:
+    """Register the request hooks (SERVER_TIMING=0 turns tracing off).
+
+    TRACE_SAMPLE_RATE (0-1) is the fraction of requests logged as one JSON
+    line with their individual spans, at INFO on the ``app.tracing`` logger.
+    """
+    enabled, sample_rate = tracing_settings()
+    if not enabled:
+        return
+    allow_origin = os.getenv("FRONTEND_ORIGIN", "*")
+
+    app.json_provider_class = TracingJSONProvider
+    app.json = TracingJSONProvider(app)
+
+    @app.before_request
+    def _start_trace() -> None:
+        sampled = sample_rate > 0 and random.random() < sample_rate
+        trace = Trace(request.method, request.path, sampled)
+        g._trace_token = _current.set(trace)
+
+    @app.after_request
+    def _finish_trace(response: Response) -> Response:
+        trace = _current.get()
+        if trace is None:
+            return response
+        response.headers["Server-Timing"] = finish_trace(trace, response.status_code)
+        response.headers["Timing-Allow-Origin"] = allow_origin
+        return response
+
+    @app.teardown_request
+    def _end_trace(exc: Optional[BaseException]) -> None:
+        token = g.pop("_trace_token", None)
+        if token is not None:
+            try:
+                _current.reset(token)
+            except ValueError:
+                # Torn down from a different context (e.g. after a streamed body)
+                _current.set(None)
@@ -0,0 +1,127 @@
+"""Data versions and HTTP validators for the read endpoints.
+
+Every committed write bumps a counter per table it touched (via
+``db._after_commit``). A GET response is tagged with a strong ETag derived
+from the counters of the tables it reads plus its URL, so a client revalidating
+with ``If-None-Match`` gets a bodiless ``304`` without any query being run.
+
+Counters are per worker process, like the result cache. So that a write
+handled by another ``serve.py`` worker is picked up within a bounded time, the
+ETag also includes the current ``ETAG_WINDOW``-second window of the wall
+clock: every tag rolls over once per window even without local writes.
+"""
+import functools
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple, Union
+
+from flask import current_app, request
+
+# Caches may keep the body but must revalidate before reusing it
+CACHE_CONTROL = "private, no-cache"
+
+TablesArg = Union[Sequence[str], Callable[[Any], Optional[Sequence[str]]]]
+
+
+class DataVersions:
+    """Thread-safe per-table write counters with last-modified times."""
+
+    def __init__(self, window: float = 30.0) -> None:
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._modified: Dict[str, float] = {}
+
+    @classmethod
+    def from_env(cls) -> "DataVersions":
+        return cls(window=float(os.getenv("ETAG_WINDOW", "30")))
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def bump(self, tables: Iterable[str]) -> None:
+        now = time.time()
+        with self._lock:
+            for table in tables:
+                self._counters[table] = self._counters.get(table, 0) + 1
+                self._modified[table] = now
+
+    def validators(self, tables: Iterable[str], key: str) -> Tuple[str, datetime]:
+        """(ETag, Last-Modified) for a response reading ``tables``, identified by ``key``."""
+        now = time.time()
+        window = int(now // self.window)
+        wanted = sorted(set(tables))
+        with self._lock:
+            counters = [self._counters.get(t, 0) for t in wanted]
+            modified = max([self._modified.get(t, 0.0) for t in wanted] + [window * self.window])
+        raw = f"{window}|{key}|" + ",".join(f"{t}={c}" for t, c in zip(wanted, counters))
+        etag = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+        # HTTP dates have one-second resolution
+        return etag, datetime.fromtimestamp(int(modified), tz=timezone.utc)
+
+
+def _not_modified(etag: str, modified: datetime) -> bool:
+    """Whether the client's validators still match (``If-None-Match`` wins)."""
+    if_none_match = request.if_none_match
+    if if_none_match:
+        # Compressed responses carry the tag with a "-<coding>" suffix
+        tags = {t.split("-", 1)[0] for t in if_none_match.as_set(include_weak=True)}
+        return if_none_match.star_tag or etag in tags
+    since = request.if_modified_since
+    return since is not None and modified <= since
+
+
+_versions: Optional[DataVersions] = None
+_versions_lock = threading.Lock()
+
+
+def get_data_versions() -> DataVersions:
+    """Process-wide data versions, configured from ETAG_WINDOW on first use."""
+    global _versions
+    if _versions is None:
+        with _versions_lock:
+            if _versions is None:
+                _versions = DataVersions.from_env()
+    return _versions
+
+
+def conditional(tables: TablesArg) -> Callable:
+    """Add ETag/Last-Modified/Cache-Control to a GET view and answer ``304`` early.
+
+    ``tables`` lists the tables the response is read from, or is a function of
+    ``request.args`` returning them (``None`` to skip, e.g. for a streamed or
+    invalid request). Only ``200`` responses are tagged, and a view can opt a
+    response out by setting its own ``Cache-Control``. A view that answers a
+    failure with a normal-looking body (an empty list, partial data) must do
+    so, or clients would revalidate the failure as current.
+    """
+
+    def decorator(view: Callable) -> Callable:
+        @functools.wraps(view)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            versions = get_data_versions()
+            deps = tables(request.args) if callable(tables) else tables
+            if not versions.enabled or not deps:
+                return view(*args, **kwargs)
+
+            # Taken before the view runs: a write that lands meanwhile changes
+            # the tag the next request sees rather than hiding behind this one
+            etag, modified = versions.validators(deps, request.full_path)
+            if _not_modified(etag, modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed or "Cache-Control" in response.headers:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = modified
+            response.headers["Cache-Control"] = CACHE_CONTROL
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,668 @@
+"""End-to-end HTTP benchmark for every /api route.
+
+Starts ``create_app()`` under waitress (or the ASGI app under uvicorn with
+``--server asgi``) in a subprocess, or targets ``--url``. It optionally seeds
+the database with synth_data.py, and then drives a weighted request mix from
+``--concurrency`` client threads for ``--duration`` seconds after a
+``--warmup``. It reports throughput and p50/p95/p99 latency per route.
+``--save`` writes the run as a JSON baseline. ``--compare`` checks the run
+against a baseline and exits 1 when p95 latency or throughput regress by more
+than ``--tolerance``.
+
+The write scenarios create, update and delete rows, and ``--seed-db`` drops
+and recreates DB_NAME. Point DB_NAME at a scratch database.
+
+  python bench.py --seed-db --users 20000 --save benchmarks/before.json
+  python bench.py --compare benchmarks/before.json
+  python bench.py --mix read --concurrency 32 --url http://127.0.0.1:5001
+  python bench.py --server asgi --mix search_page=1 --concurrency 500 --compare benchmarks/waitress.json
+"""
+import argparse
+import http.client
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from synth_data import FIRST_NAMES, LAST_NAMES, TITLE_ADJECTIVES, TITLE_NOUNS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SEARCH_WORDS = [w.lower() for w in TITLE_ADJECTIVES + TITLE_NOUNS + FIRST_NAMES + LAST_NAMES]
+SORTS = {
+    "media": ("az", "za", "rating_desc", "year_desc"),
+    "user": ("az", "count_desc"),
+    "genre": ("az", "rating_desc"),
+}
+STATUSES = ("Planning", "Watching", "Completed", "Havent Watched")
+
+
+class BenchContext:
+    """What scenarios need to know about the target: id ranges and scratch rows.
+
+    Filled in by prepare() from the database when it is reachable; without it
+    only the scenarios that don't need ids can run.
+    """
+
+    def __init__(self, run_id: str) -> None:
+        self.run_id = run_id
+        self.max_user_id = 0
+        self.max_media_id = 0
+        self.max_review_id = 0
+        self.scratch_users: List[int] = []
+        self._seq = itertools.count(1)
+        self._local = threading.local()
+
+    def next_seq(self) -> int:
+        return next(self._seq)
+
+    def lookup(self, sql: str, params: Tuple[Any, ...]) -> Optional[int]:
+        """First column of the first row, on this thread's own connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            from app.db import get_connection
+            conn = self._local.conn = get_connection()
+            conn.autocommit = True
+        cur = conn.cursor()
+        try:
+            cur.execute(sql, params)
+            row = cur.fetchone()
+            return int(row[0]) if row and row[0] is not None else None
+        finally:
+            cur.close()
+
+
+class Recorder:
+    """Per-thread latency samples (ms) and error counts, keyed by route."""
+
+    def __init__(self) -> None:
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.active = False
+
+    def add(self, route: str, millis: float, ok: bool) -> None:
+        if not self.active:
+            return
+        self.samples[route].append(millis)
+        if not ok:
+            self.errors[route] += 1
+
+
+class Client:
+    """Keep-alive HTTP client for one benchmark thread."""
+
+    def __init__(self, base_url: str, recorder: Recorder, timeout: float = 30) -> None:
+        parts = urlsplit(base_url)
+        self._host = parts.hostname or "127.0.0.1"
+        self._port = parts.port or 80
+        self._prefix = parts.path.rstrip("/")
+        self._timeout = timeout
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self.recorder = recorder
+
+    def call(
+        self,
+        route: str,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        body: Any = None,
+        content_type: str = "application/json",
+    ) -> Tuple[int, bytes]:
+        """Send one request, read the whole response and record its latency under ``route``."""
+        url = self._prefix + path + ("?" + urlencode(params) if params else "")
+        headers = {}
+        payload: Optional[bytes] = None
+        if body is not None:
+            payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+            headers["Content-Type"] = content_type
+
+        started = time.perf_counter()
+        try:
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+            self._conn.request(method, url, body=payload, headers=headers)
+            response = self._conn.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.close()
+            status, data = 0, b""
+        self.recorder.add(route, (time.perf_counter() - started) * 1000, 200 <= status < 300)
+        return status, data
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+Scenario = Callable[[Client, BenchContext, random.Random], None]
+
+
+def _get(route: str, path: str) -> Scenario:
+    def run(client: Client, ctx: BenchContext, rng: random.Random) -> None:
+        client.call(route, "GET", path)
+    return run
+
+
+def _search(client: Client, ctx: BenchContext, rng: random.Random) -> None:
+    category = rng.choice(tuple(SORTS))
+    client.call("GET /search", "GET", "/api/search",
+                {"q": rng.choice(SEARCH_WORDS), "category": category, "sort": rng.choice(SORTS[category])})
+
+
+def _search_page(client: Client, ctx: BenchContext, rng: random.Random) -> None:
+    category = rng.choice(tuple(SORTS))
+    params = {"q": rng.choice(SEARCH_WORDS), "category": category, "sort": rng.choice(SORTS[category]), "limit": 20}
+    status, data = client.call("GET /search?limit", "GET", "/api/search", params)
+    # Follow the cursor for a second page half the time
+    if status == 200 and rng.random() < 0.5:
+        cursor = json.loads(data).get("next_cursor")
+        if cursor:
+            client.call("GET /search?limit", "GET", "/api/search", dict(params, cursor=cursor))
+
+
+def _search_stream(client: Client, ctx: BenchContext, rng: random.Random) -> None:
+    client.call("GET /search?stream", "GET", "/api/search",
+                {"q": rng.choice(SEARCH_WORDS), "category": "media", "stream": 1})
+
+
+def _user_stats(client: Client, ctx: BenchContext, rng: random.Random) -> None:
+    user_id = rng.randint(1, ctx.max_user_id)
+    client.call("GET /users/<id>/stats", "GET", f"/api/users/{user_id}/stats")
+
+
+def _rating_histogram(client: Client, ctx: BenchContext, rng: random.Random) -> None:
+    client.call("GET /rating-histogram", "GET", "/api/rating-histogram", {"by": rng.choice(("all", "genre", "type"))})
+
+
+def _batch(entity: str, path: str, top: Callable[[BenchContext], int]) -> Scenario:
+    def run(client: Client, ctx: BenchContext, rng: random.Random) -> None:
+        ids = [rng.randint(1, top(ctx)) for _ in range(20)]
+        client.call(f"GET /{entity}/batch", "GET", path, {"ids": ",".join(map(str, ids))})
+    return run
+
+
+def _suggest(client: Client, ctx: BenchContext, rng: random.Random) -> None:
+    word = rng.choice(SEARCH_WORDS)
+    client.call("GET /suggest", "GET", "/api/suggest", {"q": word[:rng.randint(1, 3)], "limit": 10})
+
+
+def _media_entry(ctx: BenchContext, rng: random.Random) -> Dict[str, Any]:
+    seq = ctx.next_seq()
+    return {
+        "firstname": rng.choice(FIRST_NAMES),
+        "lastname": rng.choice(LAST_NAMES),
+        "profilename": f"bench{ctx.run_id}-{seq}",
+        "mediatype": "Movie",
+        "medianame": f"Bench {ctx.run_id} {seq}",
+        "releaseyear": rng.randint(1990, 2024),
+        "genre": "Drama",
+        "platform": "Netflix",
+        "rating": rng.randint(1, 5),
+        "reviewtext": "benchmark",
+        "status": rng.choice(STATUSES),
+    }
+
+
+def _create_media_entry(client: Client, ctx: BenchContext, rng: random.Random) -> None:
+    client.call("POST /media-entries", "POST", "/api/media-entries", body=_media_entry(ctx, rng))
+
+
+def _bulk_media_entries(client: Client, ctx: BenchContext, rng: random.Random) -> None:
+    body = [_media_entry(ctx, rng) for _ in range(50)]
+    client.call("POST /media-entries/bulk", "POST", "/api/media-entries/bulk", body=body)
+
+
+def _user_crud(client: Client, ctx: BenchContext, rng: random.Random) -> None:
+    profile = f"bench{ctx.run_id}-u{ctx.next_seq()}"
+    user = {"FirstName": rng.choice(FIRST_NAMES), "LastName": rng.choice(LAST_NAMES), "ProfileName": profile}
+    status, _ = client.call("POST /users/create", "POST", "/api/users/create", body=user)
+    # The API doesn't return ids, so find the new row directly (not timed)
+    user_id = ctx.lookup("SELECT MAX(UserId) FROM User WHERE ProfileName = %s", (profile,)) if status == 201 else None
+    if user_id is None:
+        return
+    client.call("PUT /users/<id>", "PUT", f"/api/users/{user_id}", body=dict(user, LastName=rng.choice(LAST_NAMES)))
+    client.call("DELETE /users/<id>", "DELETE", f"/api/users/{user_id}")
+
+
+def _review_crud(client: Client, ctx: BenchContext, rng: random.Random) -> None:
+    # Scratch users start with no reviews and seq never repeats, so the
+    # (user, media) pair is always free; the review is deleted again at the end.
+    seq = ctx.next_seq()
+    user_id = ctx.scratch_users[seq % len(ctx.scratch_users)]
+    media_id = seq // len(ctx.scratch_users) % ctx.max_media_id + 1
+    review = {"UserId": user_id, "MediaId": media_id, "Rating": rng.randint(1, 5),
+              "ReviewText": "benchmark", "Status": rng.choice(STATUSES)}
+    status, _ = client.call("POST /reviews/create", "POST", "/api/reviews/create", body=review)
+    review_id = ctx.lookup(
+        "SELECT ReviewId FROM Review WHERE UserId = %s AND MediaId = %s", (user_id, media_id)
+    ) if status == 201 else None
+    if review_id is None:
+        return
+    client.call("PUT /reviews/<id>", "PUT", f"/api/reviews/{review_id}",
+                body={"Rating": rng.randint(1, 5), "ReviewText": "updated", "Status": "Completed"})
+    client.call("DELETE /reviews/<id>", "DELETE", f"/api/reviews/{review_id}")
+
+
+def _update_review(client: Client, ctx: BenchContext, rng: random.Random) -> None:
+    # PUT on an existing (seeded) review; ratings stay on the 1-5 scale
+    review_id = rng.randint(1, ctx.max_review_id)
+    client.call("PUT /reviews/<id>", "PUT", f"/api/reviews/{review_id}",
+                body={"Rating": rng.randint(1, 5), "ReviewText": "updated", "Status": rng.choice(STATUSES)})
+
+
+def _has_users(ctx: BenchContext) -> bool:
+    return ctx.max_user_id > 0
+
+
+def _has_media(ctx: BenchContext) -> bool:
+    return ctx.max_media_id > 0
+
+
+def _has_reviews(ctx: BenchContext) -> bool:
+    return ctx.max_review_id > 0
+
+
+def _has_scratch_users(ctx: BenchContext) -> bool:
+    return ctx.max_media_id > 0 and bool(ctx.scratch_users)
+
+
+# name -> (scenario, what it needs from prepare() to run, or None)
+SCENARIOS: Dict[str, Tuple[Scenario, Optional[Callable[[BenchContext], bool]]]] = {
+    "health": (_get("GET /health", "/api/health"), None),
+    "metrics": (_get("GET /metrics", "/api/metrics"), None),
+    "db_ping": (_get("GET /db/ping", "/api/db/ping"), None),
+    "db_pool": (_get("GET /db/pool", "/api/db/pool"), None),
+    "cache_stats": (_get("GET /cache/stats", "/api/cache/stats"), None),
+    "users": (_get("GET /users", "/api/users"), None),
+    "users_all": (_get("GET /users/all", "/api/users/all"), None),
+    "user_stats": (_user_stats, _has_users),
+    "users_batch": (_batch("users", "/api/users/batch", lambda ctx: ctx.max_user_id), _has_users),
+    "media_batch": (_batch("media", "/api/media/batch", lambda ctx: ctx.max_media_id), _has_media),
+    "reviews_batch": (_batch("reviews", "/api/reviews/batch", lambda ctx: ctx.max_review_id), _has_reviews),
+    "top_rated_media": (_get("GET /top-rated-media", "/api/top-rated-media"), None),
+    "top_users_completed": (_get("GET /top-users-completed", "/api/top-users-completed"), None),
+    "top_media_completions": (_get("GET /top-media-completions", "/api/top-media-completions"), None),
+    "avg_rating_genre": (_get("GET /avg-rating-genre", "/api/avg-rating-genre"), None),
+    "rating_histogram": (_rating_histogram, None),
+    "users_rated_high": (_get("GET /users-rated-high", "/api/users-rated-high"), None),
+    "low_rated_recent": (_get("GET /low-rated-recent", "/api/low-rated-recent"), None),
+    "dashboard": (_get("GET /dashboard", "/api/dashboard"), None),
+    "search": (_search, None),
+    "search_page": (_search_page, None),
+    "search_stream": (_search_stream, None),
+    "suggest": (_suggest, None),
+    "media_entry": (_create_media_entry, None),
+    "media_entries_bulk": (_bulk_media_entries, None),
+    "user_crud": (_user_crud, None),
+    "review_crud": (_review_crud, _has_scratch_users),
+    "update_review": (_update_review, _has_reviews),
+}
+
+# Full-table routes (/users, /users/all, unpaged search) get low weights: at
+# benchmark scale they dominate wall time and say little about the rest.
+MIXES: Dict[str, Dict[str, float]] = {
+    "read": {
+        "health": 1, "metrics": 0.2, "db_ping": 1, "db_pool": 0.5, "cache_stats": 0.5,
+        "users": 0.1, "users_all": 0.1, "user_stats": 4,
+        "users_batch": 4, "media_batch": 4, "reviews_batch": 4,
+        "top_rated_media": 4, "top_users_completed": 4, "top_media_completions": 4,
+        "avg_rating_genre": 4, "rating_histogram": 2, "users_rated_high": 2, "low_rated_recent": 4,
+        "dashboard": 4,
+        "search": 2, "search_page": 10, "search_stream": 0.5, "suggest": 15,
+    },
+    "write": {
+        "media_entry": 4, "media_entries_bulk": 0.5, "user_crud": 3, "review_crud": 4, "update_review": 4,
+    },
+}
+MIXES["mixed"] = {**{k: v * 4 for k, v in MIXES["read"].items()}, **MIXES["write"]}
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """A named mix, or ``name=weight,...`` over SCENARIOS."""
+    if spec in MIXES:
+        return dict(MIXES[spec])
+    mix: Dict[str, float] = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario: {name}")
+        mix[name] = float(weight) if weight else 1.0
+    return mix
+
+
+def prepare(ctx: BenchContext, scratch_users: int) -> None:
+    """Read id ranges and create scratch users for review_crud."""
+    from app.db import get_connection
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT COALESCE(MAX(UserId), 0) FROM User")
+        ctx.max_user_id = cur.fetchone()[0]
+        cur.execute("SELECT COALESCE(MAX(MediaId), 0) FROM Media")
+        ctx.max_media_id = cur.fetchone()[0]
+        cur.execute("SELECT COALESCE(MAX(ReviewId), 0) FROM Review")
+        ctx.max_review_id = cur.fetchone()[0]
+        names = [(f"bench{ctx.run_id}-s{i}",) for i in range(scratch_users)]
+        cur.executemany("INSERT INTO User (FirstName, LastName, ProfileName) VALUES ('Bench', 'Scratch', %s)", names)
+        cur.execute("SELECT UserId FROM User WHERE ProfileName LIKE %s", (f"bench{ctx.run_id}-s%",))
+        ctx.scratch_users = [row[0] for row in cur.fetchall()]
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+
+def cleanup(ctx: BenchContext) -> None:
+    """Remove the scratch users (and any review a failed review_crud left behind)."""
+    if not ctx.scratch_users:
+        return
+    from app.db import get_connection
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        marks = ", ".join(["%s"] * len(ctx.scratch_users))
+        cur.execute(f"DELETE FROM Review WHERE UserId IN ({marks})", ctx.scratch_users)
+        cur.execute(f"DELETE FROM User WHERE UserId IN ({marks})", ctx.scratch_users)
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+
+def seed_database(users: int, media: int, reviews: int, seed: int) -> None:
+    """Drop and recreate DB_NAME, then load a synth_data.py dataset of the given scale."""
+    import init_db
+    from synth_data import SynthConfig, generate
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = SynthConfig(users=users, media=media, reviews=reviews, seed=seed, fmt="csv")
+        counts = generate(config, tmp)
+        print(f"Generated {sum(counts.values()):,} rows; loading...")
+        init_db.init_db(reset=True, csv_dir=tmp)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarise(samples: List[float], errors: int, seconds: float) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "rps": round(len(ordered) / seconds, 2) if seconds else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50), 3),
+        "p95_ms": round(percentile(ordered, 95), 3),
+        "p99_ms": round(percentile(ordered, 99), 3),
+        "max_ms": round(ordered[-1], 3) if ordered else 0.0,
+    }
+
+
+def run_load(
+    base_url: str,
+    mix: Dict[str, float],
+    ctx: BenchContext,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    seed: int,
+) -> Dict[str, Any]:
+    """Drive ``mix`` against ``base_url`` and return per-route and total stats."""
+    names = list(mix)
+    cum_weights = list(itertools.accumulate(mix[n] for n in names))
+    recorders = [Recorder() for _ in range(concurrency)]
+    start_at = time.perf_counter() + warmup
+    stop_at = start_at + duration
+
+    def worker(index: int) -> None:
+        rng = random.Random(f"{seed}:{index}")
+        recorder = recorders[index]
+        client = Client(base_url, recorder)
+        try:
+            while True:
+                now = time.perf_counter()
+                if now >= stop_at:
+                    break
+                recorder.active = now >= start_at
+                name = rng.choices(names, cum_weights=cum_weights)[0]
+                SCENARIOS[name][0](client, ctx, rng)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # Scenarios that started before the deadline can finish after it
+    elapsed = max(time.perf_counter(), stop_at) - start_at
+
+    samples: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    for r in recorders:
+        for route, values in r.samples.items():
+            samples[route].extend(values)
+        for route, count in r.errors.items():
+            errors[route] += count
+
+    everything = [v for values in samples.values() for v in values]
+    return {
+        "routes": {route: summarise(samples[route], errors[route], elapsed) for route in sorted(samples)},
+        "total": summarise(everything, sum(errors.values()), elapsed),
+        "seconds": round(elapsed, 3),
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float, min_count: int = 50) -> List[str]:
+    """Regressions of ``current`` against ``baseline`` beyond ``tolerance`` (0.1 = 10%)."""
+    problems = []
+    base_total, cur_total = baseline["total"], current["total"]
+    if base_total["rps"] and cur_total["rps"] < base_total["rps"] * (1 - tolerance):
+        problems.append(f"throughput {base_total['rps']:.1f} -> {cur_total['rps']:.1f} req/s")
+    for route, cur in current["routes"].items():
+        base = baseline["routes"].get(route)
+        if not base or min(base["count"], cur["count"]) < min_count:
+            continue
+        if cur["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            problems.append(f"{route}: p95 {base['p95_ms']:.1f} -> {cur['p95_ms']:.1f} ms")
+        base_rate = base["errors"] / base["count"]
+        cur_rate = cur["errors"] / cur["count"]
+        if cur_rate > base_rate + 0.01:
+            problems.append(f"{route}: error rate {base_rate:.1%} -> {cur_rate:.1%}")
+    return problems
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    header = f"{'route':<28}{'count':>8}{'err':>6}{'req/s':>10}{'p50':>9}{'p95':>9}{'p99':>9}"
+    print(header + ("   p95 vs base" if baseline else ""))
+    rows = list(report["routes"].items()) + [("TOTAL", report["total"])]
+    for route, s in rows:
+        line = (f"{route:<28}{s['count']:>8}{s['errors']:>6}{s['rps']:>10.1f}"
+                f"{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}")
+        base = (baseline or {}).get("routes", {}).get(route) if route != "TOTAL" else (baseline or {}).get("total")
+        if base and base["p95_ms"]:
+            line += f"   {(s['p95_ms'] / base['p95_ms'] - 1) * 100:+.1f}%"
+        print(line)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+SERVERS = ("waitress", "asgi")
+
+
+def _server_command(server: str, port: int, threads: int) -> List[str]:
+    if server == "asgi":
+        # Native async routes plus `threads` threads for the Flask-served ones
+        return [sys.executable, "-m", "uvicorn", "--factory", "app.asgi:create_asgi_app",
+                "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning", "--no-access-log"]
+    return [sys.executable, "-m", "waitress", "--host=127.0.0.1", f"--port={port}",
+            f"--threads={threads}", "--call", "app:create_app"]
+
+
+def start_server(threads: int, log_path: Optional[str] = None, server: str = "waitress") -> Tuple[subprocess.Popen, str]:
+    """Run the app under waitress (or uvicorn for ``asgi``) in a child process; returns (process, base URL)."""
+    port = _free_port()
+    log = open(log_path, "ab") if log_path else subprocess.DEVNULL
+    env = dict(os.environ)
+    if server == "asgi":
+        env.setdefault("ASGI_WSGI_THREADS", str(threads))
+    try:
+        proc = subprocess.Popen(
+            _server_command(server, port, threads),
+            env=env,
+            cwd=BASE_DIR,
+            stdout=log,
+            stderr=log,
+        )
+    finally:
+        if log_path:
+            log.close()
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{server} exited with status {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/api/health")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return proc, base_url
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"{server} did not become ready within 30s")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark every /api route over HTTP.")
+    parser.add_argument("--url", help="Benchmark a running server instead of starting one")
+    parser.add_argument("--server", choices=SERVERS, default="waitress",
+                        help="How to serve the started app: waitress, or uvicorn on app.asgi (default: waitress)")
+    parser.add_argument("--threads", type=int, default=8,
+                        help="waitress threads, or ASGI_WSGI_THREADS for --server asgi (default: 8)")
+    parser.add_argument("--server-log", help="Append the started server's output to this file")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads (default: 8)")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds (default: 30)")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds first (default: 5)")
+    parser.add_argument("--mix", default="mixed",
+                        help=f"{', '.join(MIXES)}, or name=weight,... over: {', '.join(SCENARIOS)}")
+    parser.add_argument("--seed", type=int, default=1, help="RNG seed for the request mix and --seed-db")
+    parser.add_argument("--seed-db", action="store_true", help="Drop DB_NAME and load synthetic data first")
+    parser.add_argument("--users", type=int, default=10000, help="--seed-db scale (default: 10000)")
+    parser.add_argument("--media", type=int, help="--seed-db media (default: 3x users)")
+    parser.add_argument("--reviews", type=int, help="--seed-db reviews (default: 9x users)")
+    parser.add_argument("--scratch-users", type=int, default=200, help="Users created for review_crud (default: 200)")
+    parser.add_argument("--save", help="Write the report as a JSON baseline")
+    parser.add_argument("--compare", help="Baseline JSON to check this run against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed p95/throughput regression as a fraction (default: 0.15)")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.seed_db:
+        seed_database(args.users, args.media or args.users * 3, args.reviews or args.users * 9, args.seed)
+
+    ctx = BenchContext(run_id=f"{int(time.time()):x}")
+    try:
+        prepare(ctx, args.scratch_users)
+    except Exception as exc:
+        print(f"Database setup failed: {exc}")
+    skipped = [name for name in mix if SCENARIOS[name][1] and not SCENARIOS[name][1](ctx)]
+    if skipped:
+        print(f"Skipping scenarios that need seeded ids: {', '.join(skipped)}")
+        mix = {name: w for name, w in mix.items() if name not in skipped}
+    if not mix:
+        parser.error("no runnable scenarios in this mix")
+
+    proc = None
+    base_url = args.url
+    if not base_url:
+        proc, base_url = start_server(args.threads, args.server_log, args.server)
+    try:
+        print(f"Benchmarking {base_url}: {args.concurrency} clients, {args.duration:g}s after {args.warmup:g}s warmup")
+        report = run_load(base_url, mix, ctx, args.concurrency, args.duration, args.warmup, args.seed)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+        try:
+            cleanup(ctx)
+        except Exception as exc:
+            print(f"Scratch cleanup failed: {exc}")
+
+    report["meta"] = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "url": args.url or f"{args.server} (started)",
+        "threads": args.threads,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "mix": mix,
+        "seed": args.seed,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if baseline is not None:
+        problems = compare(baseline, report, args.tolerance)
+        for p in problems:
+            print(f"REGRESSION {p}")
+        if problems:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Load environment variables from the .env next to this script
+dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
+if os.path.exists(dotenv_path):
+    load_dotenv(dotenv_path)
+else:
+    load_dotenv()
+
+from app.db import db_connection  # noqa: E402  (needs env loaded first)
+from app.explain import check_query_plans  # noqa: E402
+
+
+def main() -> int:
+    """EXPLAIN the hot queries in app/db.py and fail if any does a full table scan.
+
+    Run after `python init_db.py` has applied the migrations.
+    """
+    with db_connection() as conn:
+        results = check_query_plans(conn)
+
+    failed = 0
+    for result in results:
+        keys = ", ".join(str(k) for k in result["keys"])
+        if result["ok"]:
+            print(f"  ok    {result['name']}  [{keys}]")
+        else:
+            failed += 1
+            print(f"  SCAN  {result['name']}  full scan on: {', '.join(result['full_scans'])}  [{keys}]")
+
+    print(f"{len(results) - failed}/{len(results)} queries use an index")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,5 @@
 import os
 import random
-import requests
 import time
 from typing import List, Dict, Any, Set, Tuple
 
@@ -73,6 +72,9 @@ REVIEW_ADJECTIVES = [
 
 def fetch_random_users(count: int) -> List[Dict[str, Any]]:
     """Fetch random user data from API"""
+    # Imported here so the data pools above can be reused offline (synth_data.py)
+    import requests
+
     users: List[Dict[str, Any]] = []
     batch_size = 50  # API allows up to 5000 per request
     
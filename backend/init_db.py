@@ -1,7 +1,15 @@
+import argparse
+import logging
 import os
+from typing import Optional
+
 import mysql.connector
 from dotenv import load_dotenv
 
+from app.bulk_load import LoadStats, fast_load_session, indexes_deferred, load_csv_dir, load_sql_file
+from app.migrate import MigrationError, iter_statements, migrate
+from app.rollups import rebuild_rollups
+
 # Load environment variables
 # Force loading from the file in the same directory to ensure we get the right values
 dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
@@ -12,7 +20,49 @@ else:
     print("Warning: .env file not found!")
     load_dotenv() # Fallback
 
-def init_db():
+
+def _review_count(cursor) -> int:
+    cursor.execute("SELECT COUNT(*) FROM Review")
+    return cursor.fetchone()[0]
+
+
+def _load_statements(conn, cursor, path: str, db_name: str) -> LoadStats:
+    """Execute the insert script one statement per round trip (the original loader)."""
+    stats = LoadStats()
+    with open(path, "r", encoding="utf-8") as f:
+        # Replace the hardcoded DB name as each line streams past
+        lines = (line.replace("mediawatchlist", f"`{db_name}`") for line in f)
+        for stmt in iter_statements(lines):
+            try:
+                cursor.execute(stmt)
+                stats.statements += 1
+                if stmt[:6].upper() == "INSERT":
+                    stats.rows += 1
+                if stats.statements % 1000 == 0:
+                    print(f"  Executed {stats.statements} statements...")
+                    conn.commit()
+            except mysql.connector.Error as err:
+                # Ignore duplicate entry errors if re-running
+                if err.errno != 1062:
+                    print(f"Error executing insert statement: {err}")
+    conn.commit()
+    return stats
+
+
+def _fast_load(conn, load) -> LoadStats:
+    """Run ``load`` with FK checks off and secondary indexes dropped, then rebuild them."""
+    with fast_load_session(conn):
+        with indexes_deferred(conn) as deferred:
+            if deferred:
+                print(f"  Deferred {len(deferred)} secondary indexes until the load finishes")
+            stats = load()
+            print(f"  Loaded {stats.summary()}")
+        if deferred:
+            print("  Secondary indexes rebuilt")
+    return stats
+
+
+def init_db(reset: bool = False, load_data: bool = True, fast: bool = False, csv_dir: Optional[str] = None):
     # Get DB config from .env
     host = os.getenv("DB_HOST", "localhost")
     port = int(os.getenv("DB_PORT", "3306"))
@@ -33,96 +83,59 @@ def init_db():
             host=host,
             port=port,
             user=user,
-            password=password
+            password=password,
+            allow_local_infile=bool(csv_dir),
         )
         cursor = conn.cursor()
-        
-        # Read schema.sql
-        with open("app/schema.sql", "r") as f:
-            schema_sql = f.read()
 
-        # Replace the hardcoded database name in schema.sql with the one from .env
-        # This handles the mismatch where schema.sql says 'mediawatchlist' but .env says 'CS-364-Project'
-        schema_sql = schema_sql.replace("mediawatchlist", f"`{db_name}`")
-        
-        # Execute statements
-        print(f"Initializing database '{db_name}'...")
-        
-        # Split by semicolon, but be careful with delimiters if any (simple split works for this schema)
-        statements = schema_sql.split(';')
-        
-        for statement in statements:
-            stmt = statement.strip()
-            if not stmt:
-                continue
+        if reset:
+            print(f"Dropping database '{db_name}' (--reset)...")
+            cursor.execute(f"DROP DATABASE IF EXISTS `{db_name}`")
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}`")
+        conn.database = db_name  # type: ignore
 
-            try:
-                cursor.execute(stmt)
-                
-                # If we just created the database, force the connection to use it
-                # This ensures subsequent queries know where to go
-                if "CREATE DATABASE" in stmt.upper():
-                    conn.database = db_name  # type: ignore
-                    
-            except mysql.connector.Error as err:
-                # If error is "No database selected" (1046), try selecting it and retrying
-                if err.errno == 1046:
-                    try:
-                        print(f"Encountered 'No database selected'. Switching to {db_name} and retrying...")
-                        conn.database = db_name  # type: ignore
-                        cursor.execute(stmt)
-                    except Exception as retry_err:
-                        print(f"Retry failed: {retry_err}")
-                else:
-                    print(f"Error executing statement: {err}")
-                    print(f"Statement: {stmt[:50]}...")
-                    # Ignore "database exists" or similar harmless errors if you want, 
-                    # but usually we want to see them. 
-                    # However, the script drops and recreates, so it should be fine.
-                    print(f"Error executing statement: {err}")
-                    print(f"Statement: {stmt[:50]}...")
+        # Bring the schema up to date; already-applied migrations are skipped,
+        # so this is safe to run against a live database
+        print(f"Applying migrations to '{db_name}'...")
+        try:
+            applied = migrate(conn)
+        except MigrationError as err:
+            print(f"Migration failed: {err}")
+            return
+        for migration in applied:
+            print(f"  applied {migration.version:04d}_{migration.name}")
+        if not applied:
+            print("  schema is up to date")
 
-        conn.commit()
+        if not load_data:
+            print("Skipping sample data (--no-data).")
+        elif _review_count(cursor) > 0:
+            print("Database already has reviews; skipping sample data (use --reset to reload).")
+            load_data = False
 
-        # --- Insert Data from insert_data.sql if it exists ---
+        # --- Insert Data from insert_data.sql (or a CSV directory) ---
         insert_script = "app/insert_data.sql"
-        if os.path.exists(insert_script):
-            print(f"\nFound {insert_script}. Inserting sample data...")
+        if load_data and (csv_dir or os.path.exists(insert_script)):
             try:
-                with open(insert_script, "r", encoding='utf-8') as f:
-                    insert_sql = f.read()
-                
-                # Replace DB name if needed
-                insert_sql = insert_sql.replace("mediawatchlist", f"`{db_name}`")
-                
-                # Split and execute
-                insert_statements = insert_sql.split(';')
-                total_stmts = len(insert_statements)
-                print(f"Executing ~{total_stmts} statements from insert_data.sql...")
-                
-                count = 0
-                for statement in insert_statements:
-                    stmt = statement.strip()
-                    if not stmt:
-                        continue
-                    try:
-                        cursor.execute(stmt)
-                        count += 1
-                        if count % 1000 == 0:
-                            print(f"  Executed {count} statements...")
-                            conn.commit()
-                    except mysql.connector.Error as err:
-                        # Ignore duplicate entry errors if re-running
-                        if err.errno == 1062: 
-                            pass
-                        else:
-                            print(f"Error executing insert statement: {err}")
-                
-                conn.commit()
-                print("Data insertion complete!")
+                if csv_dir:
+                    print(f"\nLoading CSV files from {csv_dir}...")
+                    stats = _fast_load(conn, lambda: load_csv_dir(conn, csv_dir))
+                elif fast:
+                    print(f"\nFound {insert_script}. Bulk loading sample data...")
+                    stats = _fast_load(conn, lambda: load_sql_file(
+                        conn, insert_script, replace_db=("mediawatchlist", f"`{db_name}`")
+                    ))
+                else:
+                    print(f"\nFound {insert_script}. Inserting sample data...")
+                    stats = _load_statements(conn, cursor, insert_script, db_name)
+                print(f"Data insertion complete: {stats.summary()}")
+
+                # Sample data bypasses db.py, so derive the analytics rollups from it
+                counts = rebuild_rollups(conn)
+                print(f"Analytics rollups rebuilt: {counts}")
             except Exception as e:
                 print(f"Failed to insert data: {e}")
-        else:
+        elif load_data:
             print(f"\nNo {insert_script} found. Skipping data insertion.")
             print("Run 'python generate_data.py' to generate sample data.")
 
@@ -134,4 +147,13 @@ def init_db():
         print(f"Error: {err}")
 
 if __name__ == "__main__":
-    init_db()
+    parser = argparse.ArgumentParser(description="Create the database if needed, apply pending migrations and load sample data.")
+    parser.add_argument("--reset", action="store_true", help="drop and recreate the database first (destroys all data)")
+    parser.add_argument("--no-data", action="store_true", help="don't load app/insert_data.sql")
+    parser.add_argument("--fast", action="store_true",
+                        help="bulk load: multi-row INSERTs, FK checks off, secondary indexes rebuilt afterwards")
+    parser.add_argument("--csv", metavar="DIR",
+                        help="load <Table>.csv files from DIR with LOAD DATA LOCAL INFILE instead of insert_data.sql")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    init_db(reset=args.reset, load_data=not args.no_data, fast=args.fast, csv_dir=args.csv)
@@ -0,0 +1,34 @@
+import os
+import time
+
+from dotenv import load_dotenv
+
+# Load environment variables from the .env next to this script
+dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
+if os.path.exists(dotenv_path):
+    load_dotenv(dotenv_path)
+else:
+    load_dotenv()
+
+from app.db import db_connection  # noqa: E402  (needs env loaded first)
+from app.rollups import rebuild_rollups  # noqa: E402
+
+
+def main():
+    """Recompute MediaSummary/UserSummary/GenreSummary from the Review table.
+
+    Safe to run at any time: pending migrations (which create the tables) are
+    applied first, and the tables are rebuilt in a single transaction, so
+    readers never see a half-built rollup.
+    """
+    print(f"Rebuilding analytics rollups in '{os.getenv('DB_NAME', 'mediawatchlist')}'...")
+    started = time.perf_counter()
+    with db_connection() as conn:
+        counts = rebuild_rollups(conn)
+    for table, rows in counts.items():
+        print(f"  {table}: {rows} rows")
+    print(f"Rollups rebuilt in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
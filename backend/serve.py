@@ -0,0 +1,359 @@
+"""Production launcher: a pre-forked pool of waitress workers sharing one socket.
+
+The master binds the listening socket, optionally builds the app once
+(``--preload``) and forks ``--workers`` processes that each serve it on
+``--threads`` waitress threads, so the API uses every core instead of one
+GIL-bound process. Each worker has its own DB connection pool (db.py rebuilds
+pools after fork), sized from the DB_* settings so that all workers together
+stay within DB_MAX_CONNECTIONS.
+
+Signals to the master:
+  TERM, INT  stop accepting, let in-flight requests finish (up to
+             ``--graceful-timeout``), then exit
+  HUP        rolling restart: start a fresh set of workers, then drain the
+             old ones. Without --preload the new workers re-import the code;
+             with it they are forked from the already loaded app.
+
+  python serve.py --workers 4 --threads 8 --pid-file serve.pid
+  kill -HUP "$(cat serve.pid)"
+
+Options default to the SERVE_* environment variables (see README). Platforms
+without fork() (Windows) run a single waitress process instead.
+"""
+import argparse
+import importlib
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger("serve")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class ServeConfig(NamedTuple):
+    app: str = "app:create_app"
+    host: str = "127.0.0.1"
+    port: int = 5001
+    workers: int = 1
+    threads: int = 8
+    backlog: int = 2048
+    keepalive: int = 15
+    connection_limit: int = 1000
+    graceful_timeout: float = 30.0
+    preload: bool = False
+    pid_file: Optional[str] = None
+
+
+def parse_args(argv: Optional[Sequence[str]] = None, environ: Mapping[str, str] = os.environ) -> ServeConfig:
+    parser = argparse.ArgumentParser(description="Serve the API from several waitress worker processes.")
+    parser.add_argument("--app", default=environ.get("SERVE_APP", "app:create_app"),
+                        help="module:factory returning the WSGI app (default: app:create_app)")
+    parser.add_argument("--host", default=environ.get("FLASK_RUN_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(environ.get("FLASK_RUN_PORT", "5001")))
+    parser.add_argument("--workers", type=int, default=int(environ.get("SERVE_WORKERS", str(os.cpu_count() or 1))),
+                        help="Worker processes (default: SERVE_WORKERS or the CPU count)")
+    parser.add_argument("--threads", type=int, default=int(environ.get("SERVE_THREADS", "8")),
+                        help="Request threads per worker (default: 8)")
+    parser.add_argument("--backlog", type=int, default=int(environ.get("SERVE_BACKLOG", "2048")),
+                        help="listen() backlog of the shared socket (default: 2048)")
+    parser.add_argument("--keepalive", type=int, default=int(environ.get("SERVE_KEEPALIVE", "15")),
+                        help="Seconds an idle keep-alive connection is held open (default: 15)")
+    parser.add_argument("--connection-limit", type=int, default=int(environ.get("SERVE_CONNECTION_LIMIT", "1000")),
+                        help="Open connections per worker before it stops accepting (default: 1000)")
+    parser.add_argument("--graceful-timeout", type=float, default=float(environ.get("SERVE_GRACEFUL_TIMEOUT", "30")),
+                        help="Seconds a stopping worker may spend finishing requests (default: 30)")
+    parser.add_argument("--preload", action="store_true", default=environ.get("SERVE_PRELOAD", "0") == "1",
+                        help="Build the app (and its search indexes) once in the master before forking")
+    parser.add_argument("--pid-file", default=environ.get("SERVE_PID_FILE"), help="Write the master's pid here")
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.threads < 1:
+        parser.error("--workers and --threads must be at least 1")
+    return ServeConfig(
+        app=args.app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        threads=args.threads,
+        backlog=args.backlog,
+        keepalive=args.keepalive,
+        connection_limit=args.connection_limit,
+        graceful_timeout=args.graceful_timeout,
+        preload=args.preload,
+        pid_file=args.pid_file,
+    )
+
+
+def worker_pool_size(config: ServeConfig, environ: Mapping[str, str] = os.environ) -> Tuple[int, Optional[str]]:
+    """DB_POOL_SIZE for each worker, plus a warning when the numbers don't fit.
+
+    Without an explicit DB_POOL_SIZE a worker gets one connection per request
+    thread plus DASHBOARD_WORKERS for the parallel dashboard queries, capped at
+    its share of DB_MAX_CONNECTIONS (the server's max_connections minus
+    whatever else connects to it).
+    """
+    explicit = environ.get("DB_POOL_SIZE")
+    if explicit is not None and explicit != "":
+        size = int(explicit)
+    else:
+        size = config.threads + int(environ.get("DASHBOARD_WORKERS", "6"))
+    budget = environ.get("DB_MAX_CONNECTIONS")
+    if not budget or size <= 0:
+        return size, None
+
+    share = int(budget) // config.workers
+    if size * config.workers <= int(budget):
+        return size, None
+    if explicit:
+        return size, (f"{config.workers} workers x DB_POOL_SIZE={size} exceeds "
+                      f"DB_MAX_CONNECTIONS={budget}; connections will be refused under load")
+    size = max(1, share)
+    warning = None
+    if size < config.threads:
+        warning = (f"DB_MAX_CONNECTIONS={budget} leaves {size} connections per worker for "
+                   f"{config.threads} threads; requests will wait for connections")
+    return size, warning
+
+
+def load_app(spec: str) -> Any:
+    """Import ``module:factory`` and call the factory."""
+    module_name, _, attr = spec.partition(":")
+    factory = getattr(importlib.import_module(module_name), attr or "create_app")
+    return factory()
+
+
+def _wait_for_background_loads(app: Any) -> None:
+    # Forking while a loader thread runs would leave the index half built
+    # (and its locks possibly held) in every worker
+    for thread in getattr(app, "extensions", {}).get("background_loads", []):
+        thread.join()
+    try:
+        from app.db import close_pool
+    except ImportError:
+        return
+    # The master's connections must not be shared with the workers
+    close_pool()
+
+
+# Worker
+
+
+class _Drain(Exception):
+    """Raised in a worker's main loop when it is asked to stop."""
+
+
+def _raise_drain(signum: int, frame: Any) -> None:
+    raise _Drain()
+
+
+def run_worker(app: Any, sock: socket.socket, config: ServeConfig) -> None:
+    """Serve ``app`` on the shared socket until SIGTERM, then drain and return."""
+    from waitress.server import create_server
+
+    server = create_server(
+        app,
+        sockets=[sock],
+        threads=config.threads,
+        backlog=config.backlog,
+        channel_timeout=config.keepalive,
+        connection_limit=config.connection_limit,
+    )
+    signal.signal(signal.SIGTERM, _raise_drain)
+    # Ctrl-C reaches the whole process group; the master turns it into TERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    try:
+        server.run()
+    except _Drain:
+        _drain(server, config.graceful_timeout)
+
+
+def _drain(server: Any, timeout: float) -> None:
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    # Stop accepting (the other workers keep serving the socket) and close
+    # idle keep-alive connections at the next sweep; busy ones finish first
+    server.accepting = False
+    server.adj.channel_timeout = 0
+    server.adj.cleanup_interval = 0
+    server.next_channel_cleanup = 0
+    deadline = time.monotonic() + timeout
+    while server.active_channels and time.monotonic() < deadline:
+        server.asyncore.loop(timeout=0.2, map=server._map, use_poll=server.adj.asyncore_use_poll, count=1)
+    if server.active_channels:
+        logger.warning("Worker %d stopped with %d connections still open", os.getpid(), len(server.active_channels))
+    server.task_dispatcher.shutdown()
+
+
+# Master
+
+
+class Arbiter:
+    """Forks workers on a shared socket, replaces ones that die and handles signals."""
+
+    def __init__(self, config: ServeConfig, load: Callable[[str], Any] = load_app) -> None:
+        self.config = config
+        self.load = load
+        self.app: Any = None
+        self.sock: Optional[socket.socket] = None
+        self.workers: Dict[int, float] = {}
+        self.retiring: Set[int] = set()
+        self._signals: List[int] = []
+        self._wake_r = self._wake_w = -1
+
+    def run(self) -> int:
+        cfg = self.config
+        self.sock = socket.create_server((cfg.host, cfg.port), backlog=cfg.backlog)
+        if cfg.preload:
+            self.app = self.load(cfg.app)
+            _wait_for_background_loads(self.app)
+        if cfg.pid_file:
+            with open(cfg.pid_file, "w", encoding="utf-8") as f:
+                f.write(f"{os.getpid()}\n")
+
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_w, False)
+        signal.set_wakeup_fd(self._wake_w)
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, self._on_signal)
+
+        logger.info("Listening on http://%s:%d with %d workers x %d threads%s",
+                    cfg.host, self.sock.getsockname()[1], cfg.workers, cfg.threads,
+                    " (preloaded)" if cfg.preload else "")
+        try:
+            self._spawn_missing()
+            return self._loop()
+        finally:
+            if cfg.pid_file and os.path.exists(cfg.pid_file):
+                os.unlink(cfg.pid_file)
+
+    def _on_signal(self, signum: int, frame: Any) -> None:
+        self._signals.append(signum)
+
+    def _loop(self) -> int:
+        while True:
+            # Signals write to the wakeup pipe, so this returns as soon as one arrives
+            readable, _, _ = select.select([self._wake_r], [], [], 1.0)
+            if readable:
+                os.read(self._wake_r, 64)
+            self._reap()
+            while self._signals:
+                signum = self._signals.pop(0)
+                if signum in (signal.SIGTERM, signal.SIGINT):
+                    self._stop()
+                    return 0
+                if signum == signal.SIGHUP:
+                    self._reload()
+            self._spawn_missing()
+
+    def _spawn_missing(self) -> None:
+        while len(self.workers) < self.config.workers:
+            self._spawn()
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.monotonic()
+            return
+        status = 0
+        try:
+            for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+                signal.signal(signum, signal.SIG_DFL)
+            signal.set_wakeup_fd(-1)
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+            assert self.sock is not None
+            app = self.app if self.app is not None else self.load(self.config.app)
+            run_worker(app, self.sock, self.config)
+        except BaseException:
+            traceback.print_exc()
+            status = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(status)
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self.workers.pop(pid, None)
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+                continue
+            if started is None:
+                continue
+            logger.warning("Worker %d exited with status %d; starting a replacement", pid, os.waitstatus_to_exitcode(status))
+            if time.monotonic() - started < 1.0:
+                # Crashing on startup (bad config, import error): don't spin
+                time.sleep(1.0)
+
+    def _reload(self) -> None:
+        old = list(self.workers)
+        logger.info("Reloading: starting %d new workers", self.config.workers)
+        self.workers = {}
+        self._spawn_missing()
+        for pid in old:
+            self.retiring.add(pid)
+            self._signal(pid, signal.SIGTERM)
+
+    def _stop(self) -> None:
+        logger.info("Shutting down %d workers", len(self.workers) + len(self.retiring))
+        pids = set(self.workers) | self.retiring
+        for pid in pids:
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.config.graceful_timeout + 5
+        while pids and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                pids.discard(pid)
+            else:
+                time.sleep(0.05)
+        for pid in pids:
+            self._signal(pid, signal.SIGKILL)
+        self.workers.clear()
+        self.retiring.clear()
+
+    @staticmethod
+    def _signal(pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s")
+    config = parse_args(argv)
+    sys.path.insert(0, BASE_DIR)
+
+    size, warning = worker_pool_size(config)
+    os.environ["DB_POOL_SIZE"] = str(size)
+    if warning:
+        logger.warning(warning)
+
+    if not hasattr(os, "fork"):
+        from waitress import serve
+
+        logger.info("fork() is unavailable here; serving from a single process")
+        serve(load_app(config.app), host=config.host, port=config.port, threads=config.threads,
+              backlog=config.backlog, channel_timeout=config.keepalive,
+              connection_limit=config.connection_limit)
+        return 0
+    return Arbiter(config).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
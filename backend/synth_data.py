@@ -0,0 +1,479 @@
+"""Offline, deterministic synthetic data generator for load testing.
+
+Unlike generate_data.py this needs no network: names come from local pools
+and every value is drawn from RNGs seeded by ``--seed``, so the same
+arguments always produce byte-identical output, whatever ``--workers`` is.
+Users (with their reviews and watchlist rows) and media are generated in
+fixed-size shards on a process pool; each shard streams to its own part
+file, and the parts are concatenated in shard order.
+
+Output is either one SQL file of multi-row INSERTs (for ``init_db.py
+--fast``) or a directory of ``<Table>.csv`` files (for ``init_db.py --csv``).
+
+Skew knobs:
+  --media-skew     Zipf exponent for media popularity (0 = uniform)
+  --activity-skew  Pareto shape for reviews per user (> 1; lower = heavier tail)
+
+Example, ~10M reviews:
+  python synth_data.py --users 500000 --media 200000 --reviews 10000000 \\
+      --format csv --out /tmp/synth
+  python init_db.py --reset --csv /tmp/synth
+"""
+import argparse
+import bisect
+import csv
+import itertools
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, TextIO, Tuple
+
+from generate_data import (
+    GENRES,
+    MEDIA_TYPES,
+    PLATFORMS,
+    REVIEW_ADJECTIVES,
+    REVIEW_TEMPLATES,
+    STATUSES,
+    TITLE_ADJECTIVES,
+    TITLE_NOUNS,
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+FIRST_NAMES = [
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda',
+    'David', 'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica',
+    'Thomas', 'Sarah', 'Charles', 'Karen', 'Daniel', 'Lisa', 'Matthew', 'Nancy',
+    'Anthony', 'Betty', 'Mark', 'Sandra', 'Steven', 'Ashley', 'Paul', 'Emily',
+    'Andrew', 'Donna', 'Joshua', 'Michelle', 'Kenneth', 'Carol', 'Kevin', 'Amanda',
+    'Brian', 'Melissa', 'Oliver', 'Amelia', 'Jack', 'Isla', 'Harry', 'Ava',
+    'Noah', 'Mia', 'Leo', 'Grace', 'Liam', 'Chloe', 'Lucas', 'Zoe',
+    'Mateo', 'Sofia', 'Aiden', 'Maya', 'Ethan', 'Nora', 'Owen', 'Ruby',
+]
+
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+    'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas',
+    'Taylor', 'Moore', 'Jackson', 'Martin', 'Lee', 'Perez', 'Thompson', 'White',
+    'Harris', 'Sanchez', 'Clark', 'Ramirez', 'Lewis', 'Robinson', 'Walker', 'Young',
+    'Allen', 'King', 'Wright', 'Scott', 'Torres', 'Nguyen', 'Hill', 'Flores',
+    'Green', 'Adams', 'Nelson', 'Baker', 'Hall', 'Rivera', 'Campbell', 'Mitchell',
+    "O'Brien", "O'Connor", 'MacDonald', 'Murphy', 'Kelly', 'Walsh', 'Byrne', 'Ryan',
+    'Chen', 'Wang', 'Singh', 'Patel', 'Kim', 'Park', 'Tanaka', 'Silva',
+]
+
+YEARS = list(range(1990, 2025))
+
+# Parent-first, the order init_db.py loads them in
+TABLE_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "Genre": ("GenreId", "GenreName"),
+    "Platform": ("PlatformId", "PlatformName"),
+    "Media": ("MediaId", "MediaName", "MediaType", "ReleaseYear", "GenreId", "PlatformId", "Description"),
+    "User": ("UserId", "FirstName", "LastName", "ProfileName"),
+    "Review": ("UserId", "MediaId", "Rating", "ReviewText", "Status"),
+    "Watchlist": ("UserId", "MediaId", "Status"),
+}
+
+_MASK64 = (1 << 64) - 1
+
+
+class SynthConfig(NamedTuple):
+    users: int
+    media: int
+    reviews: int
+    seed: int = 42
+    media_skew: float = 1.0
+    activity_skew: float = 1.5
+    max_per_user: int = 1000
+    watchlist: bool = True
+    shard_size: int = 20000
+    fmt: str = "sql"
+    rows_per_insert: int = 1000
+
+
+def _mix(value: int, salt: int) -> int:
+    """SplitMix64 finaliser: a stable, well-spread hash of ``value``."""
+    x = (value * 0x9E3779B97F4A7C15 + salt) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def _coprime_stride(n: int) -> int:
+    """A large multiplier coprime with ``n``, so ``i * stride % n`` permutes range(n)."""
+    stride = 2654435761 % n or 1
+    while math.gcd(stride, n) != 1:
+        stride += 1
+    return stride
+
+
+def _base_titles() -> List[str]:
+    adj, nouns = TITLE_ADJECTIVES, TITLE_NOUNS
+    titles = [f"The {a} {n}" for a in adj for n in nouns]
+    titles += [f"{n} of {m}" for n in nouns for m in nouns if n != m]
+    titles += [f"{a} {n}s" for a in adj for n in nouns]
+    titles += [f"The {n}'s {m}" for n in nouns for m in nouns if n != m]
+    titles += [f"{a} and {b}" for a in adj for b in adj if a != b]
+    return list(dict.fromkeys(titles))
+
+
+_TITLES = _base_titles()
+_IDENTITY_SPACE = len(_TITLES) * len(MEDIA_TYPES) * len(YEARS)
+_IDENTITY_STRIDE = _coprime_stride(_IDENTITY_SPACE)
+
+
+def media_identity(media_id: int) -> Tuple[str, str, int]:
+    """(MediaName, MediaType, ReleaseYear) for ``media_id``, unique across all ids.
+
+    Ids are spread over every title/type/year combination before any repeats;
+    later passes get a " Vol. N" suffix. Being a pure function of the id,
+    review shards can look up a media's type without sharing state.
+    """
+    cycle, slot = divmod(media_id - 1, _IDENTITY_SPACE)
+    slot = slot * _IDENTITY_STRIDE % _IDENTITY_SPACE
+    title, rest = divmod(slot, len(MEDIA_TYPES) * len(YEARS))
+    media_type, year = divmod(rest, len(YEARS))
+    name = _TITLES[title] + (f" Vol. {cycle + 1}" if cycle else "")
+    return name[:100], MEDIA_TYPES[media_type], YEARS[year]
+
+
+def _media_genre(media_id: int, seed: int) -> int:
+    return _mix(media_id, seed * 4 + 1) % len(GENRES) + 1
+
+
+def _media_quality(media_id: int, seed: int) -> float:
+    """0..1 per-media score that shifts its ratings up or down."""
+    return _mix(media_id, seed * 4 + 2) % 1000 / 1000
+
+
+class _Popularity:
+    """Draws media ids with Zipf(``skew``) popularity over a seeded ranking."""
+
+    def __init__(self, media: int, skew: float) -> None:
+        self.media = media
+        self._stride = _coprime_stride(media)
+        self._cumulative: Optional[array] = None
+        if skew > 0:
+            self._cumulative = array("d", itertools.accumulate(r ** -skew for r in range(1, media + 1)))
+
+    def draw(self, rng: random.Random) -> int:
+        if self._cumulative is None:
+            rank = rng.randrange(self.media)
+        else:
+            rank = bisect.bisect_right(self._cumulative, rng.random() * self._cumulative[-1])
+            rank = min(rank, self.media - 1)
+        return rank * self._stride % self.media + 1
+
+    def sample(self, rng: random.Random, k: int) -> List[int]:
+        """``k`` distinct media ids, popularity-weighted."""
+        chosen: Dict[int, None] = {}
+        attempts = 0
+        while len(chosen) < k and attempts < 8 * k:
+            chosen[self.draw(rng)] = None
+            attempts += 1
+        # Very skewed draws for heavy users can stall on the head; walk the
+        # id space from a random point to fill the rest.
+        if len(chosen) < k:
+            start = rng.randrange(self.media)
+            for offset in range(self.media):
+                chosen.setdefault((start + offset) % self.media + 1, None)
+                if len(chosen) == k:
+                    break
+        return list(chosen)
+
+
+_POPULARITY: Dict[Tuple[int, float], _Popularity] = {}
+
+
+def _popularity(media: int, skew: float) -> _Popularity:
+    # Built once per worker process and reused by every shard it runs
+    key = (media, skew)
+    if key not in _POPULARITY:
+        _POPULARITY.clear()
+        _POPULARITY[key] = _Popularity(media, skew)
+    return _POPULARITY[key]
+
+
+def _sql_literal(value: Any) -> str:
+    if isinstance(value, int):
+        return str(value)
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+class _SqlWriter:
+    """Streams rows as multi-row INSERT statements."""
+
+    def __init__(self, f: TextIO, table: str, rows_per_insert: int) -> None:
+        self._f = f
+        self._prefix = f"INSERT INTO {table} ({', '.join(TABLE_COLUMNS[table])}) VALUES "
+        self._rows_per_insert = rows_per_insert
+        self._rows: List[str] = []
+
+    def write(self, row: Sequence[Any]) -> None:
+        self._rows.append("(" + ", ".join(_sql_literal(v) for v in row) + ")")
+        if len(self._rows) >= self._rows_per_insert:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._rows:
+            self._f.write(self._prefix + ", ".join(self._rows) + ";\n")
+            self._rows = []
+
+
+class _CsvWriter:
+    """Streams rows as CSV in the dialect bulk_load.load_csv() reads."""
+
+    def __init__(self, f: TextIO, table: str, rows_per_insert: int) -> None:
+        self._writer = csv.writer(f, lineterminator="\n")
+
+    def write(self, row: Sequence[Any]) -> None:
+        self._writer.writerow(row)
+
+    def flush(self) -> None:
+        pass
+
+
+_WRITERS = {"sql": _SqlWriter, "csv": _CsvWriter}
+
+
+class _Part:
+    """One table's part file for a shard."""
+
+    def __init__(self, tmp_dir: str, table: str, shard: int, config: SynthConfig) -> None:
+        self.path = os.path.join(tmp_dir, f"{table}.{shard:06d}.part")
+        self.rows = 0
+        self._f = open(self.path, "w", encoding="utf-8", newline="")
+        self._writer = _WRITERS[config.fmt](self._f, table, config.rows_per_insert)
+
+    def write(self, row: Sequence[Any]) -> None:
+        self._writer.write(row)
+        self.rows += 1
+
+    def close(self) -> Tuple[str, int]:
+        self._writer.flush()
+        self._f.close()
+        return self.path, self.rows
+
+
+def _rng(config: SynthConfig, kind: str, shard: int) -> random.Random:
+    # String seeds hash deterministically (unlike hash() of a tuple)
+    return random.Random(f"{config.seed}:{kind}:{shard}")
+
+
+def _media_shard(config: SynthConfig, tmp_dir: str, shard: int, lo: int, hi: int) -> Dict[str, Tuple[str, int]]:
+    rng = _rng(config, "media", shard)
+    part = _Part(tmp_dir, "Media", shard, config)
+    for media_id in range(lo, hi):
+        name, media_type, year = media_identity(media_id)
+        genre_id = _media_genre(media_id, config.seed)
+        genre = GENRES[genre_id - 1].lower()
+        description = rng.choice((
+            f"An exciting {genre} adventure featuring {name}",
+            f"A {genre} masterpiece that explores themes of humanity and nature",
+            f"Experience the thrill of {name} in this {genre} sensation",
+            f"A captivating {genre} story that will keep you engaged",
+            f"The ultimate {genre} experience with stunning visuals",
+        ))
+        part.write((media_id, name, media_type, year, genre_id, rng.randint(1, len(PLATFORMS)), description))
+    return {"Media": part.close()}
+
+
+def _reviews_for(config: SynthConfig, rng: random.Random) -> int:
+    """Reviews for one user: Pareto-distributed with mean reviews/users."""
+    mean = config.reviews / config.users
+    alpha = config.activity_skew
+    unit = rng.paretovariate(alpha) * (alpha - 1) / alpha
+    cap = min(config.max_per_user, config.media)
+    return max(1, min(cap, round(mean * unit)))
+
+
+def _user_shard(config: SynthConfig, tmp_dir: str, shard: int, lo: int, hi: int) -> Dict[str, Tuple[str, int]]:
+    rng = _rng(config, "users", shard)
+    popularity = _popularity(config.media, config.media_skew)
+    tables = ["User", "Review"] + (["Watchlist"] if config.watchlist else [])
+    parts = {t: _Part(tmp_dir, t, shard, config) for t in tables}
+
+    for user_id in range(lo, hi):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        profile = rng.choice((
+            f"{first}{last}{user_id}",
+            f"{first[0]}{last}{user_id}",
+            f"{last}_{first[:3]}_{user_id}",
+            f"{first.lower()}.{last.lower()}{user_id}",
+        ))
+        parts["User"].write((user_id, first, last, profile[:50]))
+
+        for media_id in popularity.sample(rng, _reviews_for(config, rng)):
+            quality = _media_quality(media_id, config.seed)
+            rating = max(1, min(5, round(rng.gauss(1.5 + 3 * quality, 1.0))))
+            status = "Completed" if rng.random() < 0.6 else rng.choice(STATUSES)
+            text = rng.choice(REVIEW_TEMPLATES).format(
+                adj=rng.choice(REVIEW_ADJECTIVES),
+                media_type=media_identity(media_id)[1].lower(),
+                genre=GENRES[_media_genre(media_id, config.seed) - 1].lower(),
+            )
+            parts["Review"].write((user_id, media_id, rating, text, status))
+            if config.watchlist:
+                parts["Watchlist"].write((user_id, media_id, status))
+
+    return {t: p.close() for t, p in parts.items()}
+
+
+def _run_shard(task: Tuple[str, SynthConfig, str, int, int, int]) -> Dict[str, Tuple[str, int]]:
+    kind, config, tmp_dir, shard, lo, hi = task
+    return (_media_shard if kind == "media" else _user_shard)(config, tmp_dir, shard, lo, hi)
+
+
+def _tasks(config: SynthConfig, tmp_dir: str) -> List[Tuple[str, SynthConfig, str, int, int, int]]:
+    tasks = []
+    for kind, total in (("media", config.media), ("users", config.users)):
+        for shard, lo in enumerate(range(1, total + 1, config.shard_size)):
+            tasks.append((kind, config, tmp_dir, shard, lo, min(lo + config.shard_size, total + 1)))
+    return tasks
+
+
+def _static_rows() -> Dict[str, List[Tuple[int, str]]]:
+    return {
+        "Genre": list(enumerate(GENRES, start=1)),
+        "Platform": list(enumerate(PLATFORMS, start=1)),
+    }
+
+
+def _append(dest: TextIO, path: str) -> None:
+    with open(path, "r", encoding="utf-8", newline="") as src:
+        shutil.copyfileobj(src, dest, 1 << 20)
+    os.remove(path)
+
+
+def _assemble_sql(config: SynthConfig, out: str, parts: Dict[str, List[str]], db_name: str) -> None:
+    with open(out, "w", encoding="utf-8", newline="") as f:
+        f.write("-- Synthetic data generated by synth_data.py\n")
+        f.write(f"-- seed={config.seed} users={config.users} media={config.media} reviews~{config.reviews}\n\n")
+        f.write(f"USE {db_name};\n\n")
+        f.write("SET FOREIGN_KEY_CHECKS = 0;\n\n")
+        for table, rows in _static_rows().items():
+            writer = _SqlWriter(f, table, config.rows_per_insert)
+            for row in rows:
+                writer.write(row)
+            writer.flush()
+        for table in TABLE_COLUMNS:
+            for path in parts.get(table, []):
+                _append(f, path)
+        f.write("\nSET FOREIGN_KEY_CHECKS = 1;\n")
+
+
+def _assemble_csv(out: str, parts: Dict[str, List[str]]) -> None:
+    os.makedirs(out, exist_ok=True)
+    static = _static_rows()
+    for table, columns in TABLE_COLUMNS.items():
+        if table not in static and table not in parts:
+            continue
+        with open(os.path.join(out, f"{table}.csv"), "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(columns)
+            writer.writerows(static.get(table, []))
+            for path in parts.get(table, []):
+                _append(f, path)
+
+
+def generate(config: SynthConfig, out: str, workers: Optional[int] = None, db_name: str = "mediawatchlist") -> Dict[str, int]:
+    """Generate a dataset to ``out`` (a .sql file or a CSV directory).
+
+    Returns the row count per table.
+    """
+    if config.users < 1 or config.media < 1:
+        raise ValueError("users and media must be positive")
+    if config.activity_skew <= 1:
+        raise ValueError("activity_skew must be greater than 1")
+
+    out_dir = out if config.fmt == "csv" else (os.path.dirname(os.path.abspath(out)) or ".")
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".synth-", dir=out_dir)
+    try:
+        tasks = _tasks(config, tmp_dir)
+        if workers == 1 or len(tasks) == 1:
+            results = [_run_shard(t) for t in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_run_shard, tasks))
+
+        counts = {table: len(rows) for table, rows in _static_rows().items()}
+        parts: Dict[str, List[str]] = {}
+        for result in results:
+            for table, (path, rows) in result.items():
+                parts.setdefault(table, []).append(path)
+                counts[table] = counts.get(table, 0) + rows
+
+        if config.fmt == "csv":
+            _assemble_csv(out, parts)
+        else:
+            _assemble_sql(config, out, parts, db_name)
+        return counts
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _positive_float(value: str) -> float:
+    number = float(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError("must be >= 0")
+    return number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a reproducible synthetic dataset without network access.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--media", type=int, help="Media items (default: 3x users)")
+    parser.add_argument("--reviews", type=int, help="Target total reviews (default: 9x users)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--media-skew", type=_positive_float, default=1.0,
+                        help="Zipf exponent for media popularity; 0 is uniform (default: 1.0)")
+    parser.add_argument("--activity-skew", type=float, default=1.5,
+                        help="Pareto shape for reviews per user, > 1; lower is heavier-tailed (default: 1.5)")
+    parser.add_argument("--max-per-user", type=int, default=1000, help="Cap on reviews per user (default: 1000)")
+    parser.add_argument("--no-watchlist", action="store_true", help="Skip Watchlist rows")
+    parser.add_argument("--format", choices=sorted(_WRITERS), default="sql")
+    parser.add_argument("--out", help="Output .sql file or CSV directory "
+                                      "(default: app/insert_data.sql, or synth_csv/ for CSV)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes (default: CPU count)")
+    parser.add_argument("--shard-size", type=int, default=20000,
+                        help="Users or media per shard; changing it changes the output (default: 20000)")
+    parser.add_argument("--rows-per-insert", type=int, default=1000)
+    args = parser.parse_args()
+
+    config = SynthConfig(
+        users=args.users,
+        media=args.media or args.users * 3,
+        reviews=args.reviews or args.users * 9,
+        seed=args.seed,
+        media_skew=args.media_skew,
+        activity_skew=args.activity_skew,
+        max_per_user=args.max_per_user,
+        watchlist=not args.no_watchlist,
+        shard_size=args.shard_size,
+        fmt=args.format,
+        rows_per_insert=args.rows_per_insert,
+    )
+    out = args.out or os.path.join(BASE_DIR, *(("app", "insert_data.sql") if args.format == "sql" else ("synth_csv",)))
+
+    started = time.perf_counter()
+    try:
+        counts = generate(config, out, workers=args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - started
+
+    total = sum(counts.values())
+    for table, rows in counts.items():
+        print(f"  {table}: {rows:,}")
+    print(f"Wrote {total:,} rows to {out} in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import patch
+
+from app import asgi, create_app
+from app.asgi import AsgiApp
+from app.db import _build_search_sql, encode_search_cursor
+
+
+class FakeDatabase:
+    """Stands in for AsyncDatabase: records statements and returns canned rows."""
+
+    def __init__(self, rows=None, error=None):
+        self.rows = rows or []
+        self.error = error
+        self.statements = []
+        self.closed = False
+
+    async def fetchall(self, sql, params=None):
+        self.statements.append((sql, params))
+        if self.error:
+            raise self.error
+        return [dict(row) for row in self.rows]
+
+    async def stream(self, caller, sql, params=None):
+        self.statements.append((sql, params))
+        for row in self.rows:
+            yield dict(row)
+        if self.error:
+            raise self.error
+
+    async def close(self):
+        self.closed = True
+
+
+def call(app, method, path, query=b"", body=b"", headers=()):
+    """Drive one HTTP request through the ASGI app; returns (status, headers, body)."""
+    scope = {
+        "type": "http", "method": method, "path": path, "query_string": query,
+        "headers": [(b"content-type", b"application/json"), *headers],
+        "http_version": "1.1", "scheme": "http", "server": ("testserver", 80), "client": ("127.0.0.1", 1),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = sent[0]
+    payload = b"".join(m.get("body", b"") for m in sent[1:])
+    return start["status"], dict(start["headers"]), payload
+
+
+@patch('app.db.get_search_index')
+class TestNativeRoutes(unittest.TestCase):
+    def setUp(self):
+        self.flask_app = create_app()
+
+    def app(self, db):
+        return AsgiApp(self.flask_app, db, wsgi_threads=2)
+
+    def test_search_page_uses_the_flask_sql_and_cursor(self, index):
+        index.return_value.search.return_value = None
+        db = FakeDatabase(rows=[
+            {"MediaName": "Alien", "_k0": "Alien", "_k1": 1},
+            {"MediaName": "Brazil", "_k0": "Brazil", "_k1": 2},
+            {"MediaName": "Cube", "_k0": "Cube", "_k1": 3},
+        ])
+        status, headers, body = call(self.app(db), "GET", "/api/search", b"q=a&limit=2")
+
+        self.assertEqual(status, 200)
+        page = json.loads(body)
+        self.assertEqual(page["items"], [{"MediaName": "Alien"}, {"MediaName": "Brazil"}])
+        self.assertEqual(page["next_cursor"], encode_search_cursor("media", "az", "a", ["Brazil", 2]))
+        sql, params = _build_search_sql("a", "media", "az", limit=3, with_keys=True)
+        self.assertEqual(db.statements, [(sql, tuple(params))])
+        self.assertEqual(headers[b"access-control-allow-origin"], b"*")
+        self.assertIn(b"server-timing", headers)
+
+    def test_search_stream_is_ndjson(self, index):
+        index.return_value.search.return_value = None
+        db = FakeDatabase(rows=[{"UserId": 1}, {"UserId": 2}])
+        status, headers, body = call(self.app(db), "GET", "/api/search", b"category=user&stream=1")
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b"content-type"], b"application/x-ndjson")
+        self.assertEqual([json.loads(line) for line in body.splitlines()], [{"UserId": 1}, {"UserId": 2}])
+
+    def test_search_stream_failures_are_reported(self, index):
+        index.return_value.search.return_value = None
+        status, _, body = call(self.app(FakeDatabase(error=RuntimeError("down"))), "GET", "/api/search", b"stream=1")
+        self.assertEqual((status, json.loads(body)), (500, {"error": "Search failed"}))
+
+        db = FakeDatabase(rows=[{"MediaName": "Alien"}], error=RuntimeError("lost"))
+        status, _, body = call(self.app(db), "GET", "/api/search", b"stream=1")
+        self.assertEqual(status, 200)
+        self.assertEqual([json.loads(line) for line in body.splitlines()], [{"MediaName": "Alien"}, {"error": "Search failed"}])
+
+    def test_bad_requests_match_flask(self, index):
+        app = self.app(FakeDatabase())
+        self.assertEqual(call(app, "GET", "/api/search", b"cursor=garbage")[0], 400)
+        self.assertEqual(call(app, "GET", "/api/search", b"limit=x&q=a")[0], 400)
+        self.assertEqual(call(app, "GET", "/api/suggest", b"q=a&category=nope")[0], 400)
+
+    @patch('app.asgi.get_suggester')
+    def test_suggest_falls_back_to_sql(self, suggester, index):
+        suggester.return_value.complete.return_value = None
+        db = FakeDatabase(rows=[{"text": "Alien", "type": "media", "weight": 3}])
+        status, _, body = call(self.app(db), "GET", "/api/suggest", b"q=al&category=media")
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), [{"text": "Alien", "type": "media", "weight": 3}])
+        self.assertEqual(db.statements[0][1], ("al%", 10))
+
+    def test_database_errors_are_hidden(self, index):
+        db = FakeDatabase(error=RuntimeError("Access denied for user 'root'"))
+        status, _, body = call(self.app(db), "GET", "/api/users")
+        self.assertEqual((status, json.loads(body)), (500, {"error": "Failed to fetch users"}))
+        status, _, body = call(self.app(db), "GET", "/api/db/ping")
+        self.assertEqual(json.loads(body), {"status": "error", "error": "Database connection failed"})
+
+
+class TestWsgiBridge(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDatabase()
+        self.app = AsgiApp(create_app(), self.db, wsgi_threads=2)
+
+    @patch('app.routes.get_pool_stats', return_value={"enabled": False})
+    def test_other_routes_are_served_by_flask(self, _):
+        status, headers, body = call(self.app, "GET", "/api/db/pool")
+        self.assertEqual((status, json.loads(body)), (200, {"enabled": False}))
+        self.assertIn(b"server-timing", headers)
+        self.assertEqual(self.db.statements, [])
+
+    def test_request_body_reaches_flask(self):
+        status, _, body = call(self.app, "POST", "/api/users/create", body=json.dumps({"FirstName": "A"}).encode())
+        self.assertEqual((status, json.loads(body)), (400, {"error": "Missing fields"}))
+
+    def test_lifespan_shutdown_closes_the_pool(self):
+        messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        asyncio.run(self.app({"type": "lifespan"}, receive, send))
+        self.assertEqual(sent, ["lifespan.startup.complete", "lifespan.shutdown.complete"])
+        self.assertTrue(self.db.closed)
+
+
+@unittest.skipUnless(asgi.aiomysql is None, "aiomysql is installed")
+class TestWithoutDriver(unittest.TestCase):
+    def test_factory_explains_the_missing_dependency(self):
+        with self.assertRaisesRegex(RuntimeError, "requirements-async.txt"):
+            asgi.create_asgi_app()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import json
+import random
+import unittest
+from unittest.mock import patch
+
+from app import create_app
+from bench import MIXES, SCENARIOS, BenchContext, compare, parse_mix, percentile, summarise
+
+
+class FakeClient:
+    """Records requests and answers like a healthy server."""
+
+    def __init__(self):
+        self.calls = []
+
+    def call(self, route, method, path, params=None, body=None, content_type="application/json"):
+        self.calls.append((method, path))
+        status = 201 if method == "POST" and "bulk" not in path else 200
+        return status, json.dumps({"items": [], "next_cursor": "abc"}).encode()
+
+
+class TestScenarios(unittest.TestCase):
+    def test_every_api_route_is_exercised(self):
+        app = create_app()
+        adapter = app.url_map.bind("localhost")
+        api_endpoints = {r.endpoint for r in app.url_map.iter_rules() if r.rule.startswith("/api/")}
+
+        ctx = BenchContext("t")
+        ctx.max_user_id, ctx.max_media_id, ctx.max_review_id, ctx.scratch_users = 10, 10, 10, [1, 2]
+        client = FakeClient()
+        with patch.object(BenchContext, "lookup", return_value=5):
+            for scenario, _ in SCENARIOS.values():
+                scenario(client, ctx, random.Random(0))
+
+        hit = {adapter.match(path, method=method)[0] for method, path in client.calls}
+        self.assertEqual(api_endpoints - hit, set())
+
+    def test_mixes_only_name_known_scenarios(self):
+        for mix in MIXES.values():
+            self.assertLessEqual(set(mix), set(SCENARIOS))
+        self.assertEqual(parse_mix("suggest=3,health"), {"suggest": 3.0, "health": 1.0})
+        with self.assertRaisesRegex(ValueError, "Unknown scenario"):
+            parse_mix("nope=1")
+
+
+class TestStats(unittest.TestCase):
+    def test_percentiles_use_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7.0], 95), 7.0)
+        stats = summarise([3.0, 1.0, 2.0], errors=1, seconds=2)
+        self.assertEqual((stats["count"], stats["errors"], stats["rps"], stats["p50_ms"]), (3, 1, 1.5, 2.0))
+
+    def test_compare_flags_latency_throughput_and_errors(self):
+        def report(rps, p95, errors=0, count=100):
+            return {
+                "total": {"rps": rps},
+                "routes": {"GET /suggest": {"count": count, "errors": errors, "p95_ms": p95}},
+            }
+
+        base = report(1000, 10)
+        self.assertEqual(compare(base, report(950, 11), 0.15), [])
+        problems = compare(base, report(800, 13, errors=5), 0.15)
+        self.assertEqual(len(problems), 3)
+        # Too few samples to judge a route
+        self.assertEqual(compare(base, report(1000, 50, count=10), 0.15), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
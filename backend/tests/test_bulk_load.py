@@ -0,0 +1,138 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from mysql.connector import Error
+
+from app.bulk_load import (
+    IndexDef,
+    _count_rows,
+    load_csv,
+    load_sql_stream,
+    rebuild_indexes,
+    secondary_indexes,
+)
+from app.migrate import iter_statements
+
+
+DUMP = """USE mediawatchlist;
+SET FOREIGN_KEY_CHECKS = 0;
+-- Insert Genres
+INSERT IGNORE INTO Genre (GenreName) VALUES ('Sci-Fi');
+INSERT IGNORE INTO Genre (GenreName) VALUES ('Pop');
+INSERT INTO User (FirstName, LastName, ProfileName) VALUES ('Ann', 'O''Neil', 'ann;1');
+INSERT INTO User (FirstName, LastName, ProfileName) VALUES ('Bo', 'Lee', 'bo(2)');
+INSERT INTO Review (UserId, MediaId, Rating, ReviewText, Status) VALUES (1, 1, 5, 'Loved it;
+would watch again', 'Completed');
+SET FOREIGN_KEY_CHECKS = 1;
+"""
+
+
+class TestStreamingSplitter(unittest.TestCase):
+    def test_statements_span_lines(self):
+        stmts = list(iter_statements(DUMP.splitlines(keepends=True)))
+        self.assertEqual(len(stmts), 8)
+        self.assertIn("Loved it;\nwould watch again", stmts[6])
+
+    def test_block_comment_across_lines(self):
+        lines = ["SELECT 1; /* a;\n", "b; */ SELECT 2;\n"]
+        self.assertEqual(list(iter_statements(lines)), ["SELECT 1", "SELECT 2"])
+
+
+class TestLoadSqlStream(unittest.TestCase):
+    def test_merges_consecutive_inserts_per_table(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+        cur.with_rows = False
+
+        stats = load_sql_stream(conn, DUMP.splitlines(keepends=True))
+
+        executed = [c.args[0] for c in cur.execute.call_args_list]
+        self.assertEqual(executed[2], "INSERT IGNORE INTO Genre (GenreName) VALUES ('Sci-Fi'), ('Pop')")
+        self.assertEqual(
+            executed[3],
+            "INSERT INTO User (FirstName, LastName, ProfileName) VALUES "
+            "('Ann', 'O''Neil', 'ann;1'), ('Bo', 'Lee', 'bo(2)')",
+        )
+        self.assertEqual(len(executed), 6)
+        self.assertEqual(stats.rows, 5)
+        self.assertEqual(dict(stats.tables), {"Genre": 2, "User": 2, "Review": 1})
+
+    def test_duplicate_in_batch_falls_back_to_single_rows(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+        cur.with_rows = False
+        dup = Error(msg="Duplicate entry", errno=1062)
+        cur.execute.side_effect = [dup, None, dup, None]
+        lines = [f"INSERT INTO Genre (GenreName) VALUES ('{g}');\n" for g in ("A", "B", "C")]
+
+        stats = load_sql_stream(conn, lines)
+
+        self.assertEqual(stats.rows, 2)
+        self.assertEqual(cur.execute.call_args.args[0], "INSERT INTO Genre (GenreName) VALUES ('C')")
+
+    def test_batches_respect_size_cap(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+        cur.with_rows = False
+        lines = [f"INSERT INTO Genre (GenreName) VALUES ('{i:04d}');\n" for i in range(10)]
+        load_sql_stream(conn, lines, max_bytes=20)
+        self.assertEqual(cur.execute.call_count, 5)
+
+    def test_count_rows_ignores_parens_in_strings(self):
+        self.assertEqual(_count_rows("(1, 'a(b)'), (2, 'it''s (x)')"), 2)
+
+
+class TestIndexes(unittest.TestCase):
+    def test_skips_indexes_backing_foreign_keys(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+        cur.fetchall.side_effect = [
+            [
+                ("Review", "MediaId", "BTREE", "MediaId", None, "A"),
+                ("Review", "idx_review_status_user", "BTREE", "Status", None, "A"),
+                ("Review", "idx_review_status_user", "BTREE", "UserId", None, "A"),
+                ("User", "ft_user_names", "FULLTEXT", "FirstName", None, None),
+            ],
+            [("Review", "MediaId"), ("Review", "UserId")],
+        ]
+        found = secondary_indexes(conn)
+        self.assertEqual([repr(i) for i in found], ["Review.idx_review_status_user", "User.ft_user_names"])
+        self.assertEqual(found[0].columns, ["`Status`", "`UserId`"])
+
+    def test_rebuild_groups_btrees_and_serialises_fulltext(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+        rebuild_indexes(conn, [
+            IndexDef("Review", "a", "INDEX", ["`Status`"]),
+            IndexDef("Review", "b", "INDEX", ["`Rating`"]),
+            IndexDef("User", "ft1", "FULLTEXT INDEX", ["`FirstName`"]),
+            IndexDef("User", "ft2", "FULLTEXT INDEX", ["`LastName`"]),
+        ])
+        executed = [c.args[0] for c in cur.execute.call_args_list]
+        self.assertEqual(executed[0], "ALTER TABLE `Review` ADD INDEX `a` (`Status`), ADD INDEX `b` (`Rating`)")
+        self.assertEqual(len(executed), 3)
+
+
+class TestLoadCsv(unittest.TestCase):
+    def test_falls_back_to_inserts_when_local_infile_is_refused(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "Genre.csv")
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write('GenreId,GenreName\n1,Drama\n2,"Sci, Fi"\n')
+            conn = MagicMock()
+            cur = conn.cursor.return_value
+            cur.execute.side_effect = Error(msg="Loading local data is disabled", errno=3948)
+
+            stats = load_csv(conn, "Genre", path)
+
+        cur.executemany.assert_called_once_with(
+            "INSERT INTO `Genre` (`GenreId`, `GenreName`) VALUES (%s, %s)",
+            [["1", "Drama"], ["2", "Sci, Fi"]],
+        )
+        self.assertEqual(stats.rows, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
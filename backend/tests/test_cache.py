@@ -0,0 +1,112 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app import create_app
+from app.cache import ResultCache, get_result_cache
+
+
+class TestResultCache(unittest.TestCase):
+    def test_hit_after_miss(self):
+        """The second lookup for a key is served without recomputing."""
+        cache = ResultCache()
+        compute = MagicMock(return_value=[1, 2, 3])
+        self.assertEqual(cache.get_or_compute("k", compute), [1, 2, 3])
+        self.assertEqual(cache.get_or_compute("k", compute), [1, 2, 3])
+        self.assertEqual(compute.call_count, 1)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_entries_expire_after_ttl(self):
+        """An entry older than the TTL is recomputed."""
+        cache = ResultCache(ttl=0.01)
+        compute = MagicMock(return_value="v")
+        cache.get_or_compute("k", compute)
+        time.sleep(0.02)
+        cache.get_or_compute("k", compute)
+        self.assertEqual(compute.call_count, 2)
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_lru_eviction_by_entry_count(self):
+        """The least recently used entry is evicted first."""
+        cache = ResultCache(max_entries=2)
+        cache.get_or_compute("a", lambda: 1)
+        cache.get_or_compute("b", lambda: 2)
+        cache.get_or_compute("a", lambda: 1)  # touch a
+        cache.get_or_compute("c", lambda: 3)  # evicts b
+        compute = MagicMock(return_value=2)
+        cache.get_or_compute("b", compute)
+        compute.assert_called_once()
+        self.assertGreaterEqual(cache.stats()["evictions"], 1)
+
+    def test_byte_budget_is_enforced(self):
+        """Entries are evicted once the byte budget is exceeded."""
+        cache = ResultCache(max_bytes=50)
+        cache.get_or_compute("a", lambda: "x" * 30)
+        cache.get_or_compute("b", lambda: "y" * 30)
+        self.assertEqual(cache.stats()["entries"], 1)
+        self.assertLessEqual(cache.stats()["bytes"], 50)
+
+    def test_invalidate_by_tag(self):
+        """Invalidating a table only drops entries read from it."""
+        cache = ResultCache()
+        cache.get_or_compute("reviews", lambda: 1, tags=("Review",))
+        cache.get_or_compute("users", lambda: 2, tags=("User",))
+        self.assertEqual(cache.invalidate(["Review"]), 1)
+        self.assertEqual(cache.stats()["entries"], 1)
+
+    def test_concurrent_misses_are_coalesced(self):
+        """A burst of identical lookups runs the computation once."""
+        cache = ResultCache()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.05)
+            return "v"
+
+        threads = [threading.Thread(target=cache.get_or_compute, args=("k", slow)) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()["coalesced"], 7)
+
+
+class TestCachedAnalytics(unittest.TestCase):
+    def setUp(self):
+        get_result_cache().invalidate()
+        self.client = create_app().test_client()
+
+    def tearDown(self):
+        get_result_cache().invalidate()
+
+    @patch('app.db.db_connection')
+    def test_repeat_request_skips_database(self, mock_conn):
+        """Two dashboard loads hit MySQL once; a review write forces a refetch."""
+        cur = mock_conn.return_value.__enter__.return_value.cursor.return_value
+        cur.fetchall.return_value = [{"GenreName": "Drama", "avg_rating": 4}]
+
+        self.client.get('/api/avg-rating-genre')
+        self.client.get('/api/avg-rating-genre')
+        self.assertEqual(mock_conn.call_count, 1)
+
+        from app.db import delete_review
+        delete_review(1)
+        self.client.get('/api/avg-rating-genre')
+        self.assertEqual(mock_conn.call_count, 3)
+
+    @patch('app.db.db_connection')
+    def test_failures_are_not_cached(self, mock_conn):
+        """A failed query is retried on the next request."""
+        from mysql.connector import Error
+        mock_conn.side_effect = Error("down")
+        self.assertEqual(self.client.get('/api/top-rated-media').status_code, 500)
+        self.assertEqual(self.client.get('/api/top-rated-media').status_code, 500)
+        self.assertEqual(mock_conn.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
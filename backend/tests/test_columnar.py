@@ -0,0 +1,165 @@
+import unittest
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from app import create_app, db
+from app.cache import get_result_cache
+from app.columnar import AnalyticsEngine, numpy_available
+
+GENRES = [(1, "Drama"), (2, "Sci-Fi")]
+MEDIA = [
+    (10, "Dune", "Movie", 2, 1, 2021),
+    (11, "Alien", "Movie", 2, 1, 1979),
+    (12, "Lost", "Show", 1, 2, 2004),
+]
+REVIEWS = [
+    (1, 10, 5, "Completed"),
+    (2, 10, 4, "Completed"),
+    (1, 11, 3, "Completed"),
+    (2, 11, None, "Planning"),
+    (1, 12, 4, "Watching"),
+]
+
+
+def loaded(refresh=0):
+    conn = MagicMock()
+    cur = conn.cursor.return_value
+    cur.fetchall.side_effect = [GENRES, MEDIA]
+    cur.fetchmany.side_effect = [REVIEWS[:3], REVIEWS[3:], []]
+    engine = AnalyticsEngine(enabled=True, refresh=refresh)
+    engine.load(conn)
+    return engine
+
+
+@unittest.skipIf(not numpy_available(), "numpy not installed")
+class TestAnalyticsEngine(unittest.TestCase):
+    def test_metrics_after_load(self):
+        engine = loaded()
+        self.assertEqual(engine.genre_averages(), [
+            {"avg_rating": Decimal("4.0000"), "GenreName": "Drama"},
+            {"avg_rating": Decimal("4.0000"), "GenreName": "Sci-Fi"},
+        ])
+        self.assertEqual(engine.top_rated_media(2), [
+            {"MediaType": "Movie", "MediaName": "Dune", "AvgRating": Decimal("4.50")},
+            {"MediaType": "Show", "MediaName": "Lost", "AvgRating": Decimal("4.00")},
+        ])
+        self.assertEqual(engine.top_media_completed(5, min_completions=2), [
+            {"MediaName": "Dune", "user_completions": 2},
+        ])
+
+    def test_rating_histogram_groups(self):
+        engine = loaded()
+        self.assertEqual(engine.rating_histogram("all"), {"ratings": [3, 4, 5], "counts": {"all": [1, 2, 1]}})
+        self.assertEqual(engine.rating_histogram("genre")["counts"], {"Drama": [0, 1, 0], "Sci-Fi": [1, 1, 1]})
+        self.assertEqual(engine.rating_histogram("type")["counts"], {"Movie": [1, 1, 1], "Show": [0, 1, 0]})
+
+    def test_writes_patch_the_snapshot(self):
+        engine = loaded()
+        engine.review_changed(2, 11, (5, "Completed"))
+        engine.review_changed(1, 10, None)
+        self.assertEqual([r["MediaName"] for r in engine.top_media_completed(5)], ["Alien", "Dune"])
+        self.assertEqual(engine.top_rated_media(1)[0]["AvgRating"], Decimal("4.00"))
+
+        engine.genre_saved(3, "Horror")
+        engine.media_saved(13, "Heat", "Film", 3, 1, 1995)
+        engine.review_changed(4, 13, (9, "Completed"))
+        self.assertEqual(engine.top_rated_media(1), [{"MediaType": "Film", "MediaName": "Heat", "AvgRating": Decimal("9.00")}])
+        self.assertEqual(engine.genre_averages()[1], {"avg_rating": Decimal("9.0000"), "GenreName": "Horror"})
+        self.assertEqual(engine.rating_histogram("all")["ratings"], list(range(3, 10)))
+
+    def test_ties_break_by_id_and_thresholds_apply(self):
+        engine = loaded()
+        engine.review_changed(3, 12, (5, "Completed"))
+        # Dune and Lost both average 4.50
+        self.assertEqual([r["MediaName"] for r in engine.top_rated_media(2)], ["Dune", "Lost"])
+        self.assertEqual([r["MediaName"] for r in engine.top_rated_media(5, min_votes=2)], ["Dune", "Lost"])
+        self.assertEqual(engine.top_media_completed(0), [])
+
+    def test_writes_during_a_load_are_read_again(self):
+        engine = AnalyticsEngine(enabled=True)
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+
+        def scan(_):
+            # A review of Dune commits while the scan is running
+            engine.review_changed(2, 10, (1, "Completed"))
+            return []
+
+        def fetchall():
+            if "FROM Genre" in cur.execute.call_args.args[0]:
+                return GENRES
+            if "FROM Media" in cur.execute.call_args.args[0]:
+                return MEDIA
+            # The scan's snapshot predates the review; only a new one sees it
+            return [(2, 10, 1, "Completed")] if conn.rollback.called else []
+
+        cur.fetchall.side_effect = fetchall
+        cur.fetchmany.side_effect = scan
+        engine.load(conn)
+
+        self.assertEqual(engine.rating_histogram("all"), {"ratings": [1], "counts": {"all": [1]}})
+        self.assertEqual(cur.execute.call_args_list[-1].args[1], (2, 10))
+
+    def test_stale_snapshot_reloads_and_then_defers_to_sql(self):
+        engine = loaded(refresh=60)
+        engine._refresh.connect = MagicMock()
+        loaded_at = engine._refresh.loaded_at
+        with patch.object(engine._refresh, '_start') as start:
+            with patch('app.snapshots.time.monotonic', return_value=loaded_at + 30):
+                self.assertIsNotNone(engine.genre_averages())
+            start.assert_not_called()
+            with patch('app.snapshots.time.monotonic', return_value=loaded_at + 61):
+                self.assertIsNotNone(engine.genre_averages())
+            start.assert_called_once()
+            with patch('app.snapshots.time.monotonic', return_value=loaded_at + 121):
+                self.assertIsNone(engine.genre_averages())
+
+    def test_disabled_or_loading_defers_to_sql(self):
+        self.assertIsNone(AnalyticsEngine(enabled=False).genre_averages())
+        self.assertIsNone(AnalyticsEngine(enabled=True).rating_histogram())
+
+
+class TestHistogramReads(unittest.TestCase):
+    def setUp(self):
+        get_result_cache().invalidate()
+        self.addCleanup(get_result_cache().invalidate)
+
+    @unittest.skipIf(not numpy_available(), "numpy not installed")
+    def test_loaded_engine_answers_without_sql(self):
+        with patch('app.db.get_analytics_engine', return_value=loaded()), \
+                patch('app.db.db_connection') as connection:
+            ok, _, rows = db.get_avg_rating_per_genre()
+        self.assertTrue(ok)
+        self.assertEqual(rows[0]["GenreName"], "Drama")
+        connection.assert_not_called()
+
+    def test_sql_fallback_has_the_same_shape(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+        cur.fetchall.return_value = [("Sci-Fi", 5, 2), ("Drama", 3, 1), ("Sci-Fi", 4, 1)]
+        with patch('app.db.get_analytics_engine', return_value=AnalyticsEngine(enabled=False)), \
+                patch('app.db.get_pool', return_value=None), \
+                patch('app.db.get_connection', return_value=conn):
+            ok, _, histogram = db.get_rating_histogram("genre")
+        self.assertTrue(ok)
+        self.assertEqual(histogram, {
+            "ratings": [3, 4, 5],
+            "counts": {"Drama": [1, 0, 0], "Sci-Fi": [0, 1, 2]},
+        })
+
+
+class TestHistogramRoute(unittest.TestCase):
+    def setUp(self):
+        self.client = create_app().test_client()
+
+    @patch('app.routes.get_rating_histogram', return_value=(True, None, {"ratings": [], "counts": {}}))
+    def test_group_is_validated(self, query):
+        self.assertEqual(self.client.get('/api/rating-histogram?by=type').status_code, 200)
+        query.assert_called_with("type")
+        self.client.get('/api/rating-histogram')
+        query.assert_called_with("all")
+        self.assertEqual(self.client.get('/api/rating-histogram?by=platform').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
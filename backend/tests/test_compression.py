@@ -0,0 +1,93 @@
+import gzip
+import json
+import unittest
+from unittest.mock import patch
+
+from app import create_app
+from app.compression import CompressedBodies, coding_level
+from app.versions import DataVersions
+
+USERS = [{"UserId": i, "ProfileName": f"user{i}"} for i in range(200)]
+
+
+class TestCompressionLevels(unittest.TestCase):
+    def test_level_defaults_and_clamping(self):
+        self.assertEqual(coding_level("gzip", None), 6)
+        self.assertEqual(coding_level("gzip", 15), 9)
+        self.assertEqual(coding_level("br", 15), 11)
+        self.assertEqual(coding_level("zstd", 0), 1)
+
+    def test_bodies_are_evicted_by_size(self):
+        bodies = CompressedBodies(max_bytes=10)
+        bodies.put(("a", "gzip"), b"12345")
+        bodies.put(("b", "gzip"), b"12345")
+        bodies.get(("a", "gzip"))
+        bodies.put(("c", "gzip"), b"12345")
+        self.assertIsNone(bodies.get(("b", "gzip")))
+        self.assertEqual(bodies.get(("a", "gzip")), b"12345")
+        self.assertEqual(bodies.stats()["bytes"], 10)
+
+
+@patch('app.compression.zstandard', None)
+@patch('app.compression.brotli', None)
+class TestCompressedResponses(unittest.TestCase):
+    def setUp(self):
+        patcher = patch('app.versions._versions', DataVersions())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def client(self, **env):
+        with patch.dict('os.environ', env):
+            app = create_app()
+        return app, app.test_client()
+
+    @patch('app.routes.fetch_all_users', return_value=USERS)
+    def test_large_json_is_gzipped(self, _):
+        _, client = self.client()
+        response = client.get('/api/users/all', headers={"Accept-Encoding": "br;q=1, gzip;q=0.5"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        self.assertEqual(json.loads(gzip.decompress(response.data)), USERS)
+        self.assertTrue(response.headers["ETag"].endswith('-gzip"'))
+
+    @patch('app.routes.fetch_all_users', return_value=USERS[:2])
+    def test_small_or_unaccepted_bodies_are_left_alone(self, _):
+        _, client = self.client()
+        small = client.get('/api/users/all', headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", small.headers)
+        self.assertIn("Accept-Encoding", small.headers["Vary"])
+        _, client = self.client(COMPRESS_MIN_SIZE="1")
+        refused = client.get('/api/users/all', headers={"Accept-Encoding": "gzip;q=0, identity"})
+        self.assertNotIn("Content-Encoding", refused.headers)
+
+    @patch('app.routes.fetch_all_users', return_value=USERS)
+    def test_tagged_responses_reuse_the_compressed_body(self, _):
+        app, client = self.client()
+        headers = {"Accept-Encoding": "gzip"}
+        with patch('app.compression.gzip.compress', wraps=gzip.compress) as compress:
+            first = client.get('/api/users/all', headers=headers)
+            second = client.get('/api/users/all', headers=headers)
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(app.extensions["compressed_bodies"].stats()["hits"], 1)
+
+        # The suffixed tag still revalidates, and the 304 carries it back
+        again = client.get('/api/users/all', headers={**headers, "If-None-Match": first.headers["ETag"]})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.headers["ETag"], first.headers["ETag"])
+        self.assertIn("Accept-Encoding", again.headers["Vary"])
+
+        identity = client.get('/api/users/all', headers={"Accept-Encoding": "identity"})
+        plain = client.get('/api/users/all', headers={"Accept-Encoding": "identity", "If-None-Match": identity.headers["ETag"]})
+        self.assertEqual(plain.status_code, 304)
+        self.assertEqual(plain.headers["ETag"], identity.headers["ETag"])
+
+    @patch('app.routes.fetch_all_users', return_value=USERS)
+    def test_disabled(self, _):
+        _, client = self.client(COMPRESS="0")
+        response = client.get('/api/users/all', headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app import create_app
+from app.dashboard import DASHBOARD_QUERIES, load_dashboard
+from app.db import _statement_timeout_ms, db_connection, statement_timeout
+from app.metrics import DbMetrics
+
+
+def ok(rows):
+    return lambda: (True, None, rows)
+
+
+def failing():
+    return False, "Table 'Review' doesn't exist", None
+
+
+def sleeping(seconds):
+    def run():
+        time.sleep(seconds)
+        return True, None, []
+    return run
+
+
+FAST = {name: ok([{"section": name}]) for name in DASHBOARD_QUERIES}
+
+
+class TestLoadDashboard(unittest.TestCase):
+    @patch.dict('app.dashboard.DASHBOARD_QUERIES', FAST)
+    def test_returns_every_section(self):
+        result = load_dashboard(timeout=2)
+        self.assertEqual(set(result["data"]), set(DASHBOARD_QUERIES))
+        self.assertEqual(result["errors"], {})
+        self.assertEqual(result["data"]["avg_rating_genre"], [{"section": "avg_rating_genre"}])
+        self.assertEqual(set(result["timings_ms"]), set(DASHBOARD_QUERIES))
+
+    @patch.dict('app.dashboard.DASHBOARD_QUERIES', {**FAST, "users_rated_high": failing})
+    def test_failed_section_does_not_hide_the_rest(self):
+        with self.assertLogs("app.dashboard", "ERROR"):
+            result = load_dashboard(timeout=2)
+        self.assertEqual(result["errors"], {"users_rated_high": "Query failed"})
+        self.assertEqual(len(result["data"]), len(DASHBOARD_QUERIES) - 1)
+
+    @patch.dict('app.dashboard.DASHBOARD_QUERIES', {**FAST, "low_rated_recent": sleeping(1.0)})
+    def test_slow_section_is_reported_as_timed_out(self):
+        started = time.perf_counter()
+        with self.assertLogs("app.dashboard", "ERROR"):
+            result = load_dashboard(timeout=0.1)
+        self.assertLess(time.perf_counter() - started, 0.8)
+        self.assertEqual(result["errors"], {"low_rated_recent": "Timed out after 0.1s"})
+        self.assertIn("top_rated_media", result["data"])
+
+    def test_sections_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=2)
+
+        def meet():
+            barrier.wait()
+            return True, None, []
+
+        queries = {"top_rated_media": meet, "avg_rating_genre": meet, "low_rated_recent": meet}
+        with patch.dict('app.dashboard.DASHBOARD_QUERIES', queries, clear=True):
+            result = load_dashboard(timeout=3)
+        self.assertEqual(result["errors"], {})
+
+    def test_sections_see_the_statement_timeout(self):
+        seen = []
+
+        def record():
+            seen.append(_statement_timeout_ms.get())
+            return True, None, []
+
+        with patch.dict('app.dashboard.DASHBOARD_QUERIES', {"top_rated_media": record}):
+            load_dashboard(["top_rated_media"], timeout=1.5)
+        self.assertEqual(seen, [1500])
+
+    def test_unknown_section_is_rejected(self):
+        with self.assertRaises(ValueError):
+            load_dashboard(["top_rated_media", "nope"])
+
+
+class TestDashboardRoute(unittest.TestCase):
+    def setUp(self):
+        self.client = create_app().test_client()
+
+    @patch.dict('app.dashboard.DASHBOARD_QUERIES', FAST)
+    def test_sections_filter(self):
+        response = self.client.get('/api/dashboard?sections=top_rated_media,avg_rating_genre')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.get_json()["data"]), {"top_rated_media", "avg_rating_genre"})
+
+        response = self.client.get('/api/dashboard?sections=bogus')
+        self.assertEqual(response.status_code, 400)
+
+    @patch.dict('app.dashboard.DASHBOARD_QUERIES', {name: failing for name in DASHBOARD_QUERIES})
+    def test_all_sections_failing_is_a_server_error(self):
+        with self.assertLogs("app.dashboard", "ERROR"):
+            response = self.client.get('/api/dashboard')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(len(response.get_json()["errors"]), len(DASHBOARD_QUERIES))
+
+
+@patch('app.db.get_db_metrics', return_value=DbMetrics(enabled=False))
+@patch('app.db.get_pool', return_value=None)
+class TestStatementTimeout(unittest.TestCase):
+    def test_limit_is_set_and_cleared_on_the_session(self, _pool, _metrics):
+        conn = MagicMock()
+        with patch('app.db.get_connection', return_value=conn):
+            with statement_timeout(2):
+                with db_connection():
+                    pass
+        executed = [c.args for c in conn.cursor.return_value.execute.call_args_list]
+        self.assertEqual(executed, [
+            ("SET SESSION max_execution_time = %s", (2000,)),
+            ("SET SESSION max_execution_time = 0",),
+        ])
+
+    def test_no_limit_by_default(self, _pool, _metrics):
+        conn = MagicMock()
+        with patch('app.db.get_connection', return_value=conn):
+            with db_connection():
+                pass
+        conn.cursor.return_value.execute.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
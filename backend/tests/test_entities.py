@@ -0,0 +1,112 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app import create_app, db
+from app.entities import EntityCache, get_entity_cache
+
+
+def loader(rows):
+    calls = []
+
+    def load(ids):
+        calls.append(list(ids))
+        return {i: rows[i] for i in ids if i in rows}
+    return load, calls
+
+
+class TestEntityCache(unittest.TestCase):
+    def test_reads_through_only_the_ids_not_cached(self):
+        cache = EntityCache()
+        load, calls = loader({1: {"id": 1}, 2: {"id": 2}})
+        self.assertEqual(cache.get_many([2, 1, 2, 3], load), {1: {"id": 1}, 2: {"id": 2}})
+        self.assertEqual(cache.get_many([1, 2, 3], load), {1: {"id": 1}, 2: {"id": 2}})
+        # Unknown ids are asked for again; known ones are not
+        self.assertEqual(calls, [[2, 1, 3], [3]])
+        self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_discard_and_expiry(self):
+        cache = EntityCache(ttl=30)
+        load, calls = loader({1: {"id": 1}, 2: {"id": 2}})
+        with patch('app.entities.time.monotonic', return_value=100.0):
+            cache.get_many([1, 2], load)
+            cache.discard([1])
+            cache.get_many([1, 2], load)
+        with patch('app.entities.time.monotonic', return_value=131.0):
+            cache.get_many([2], load)
+        self.assertEqual(calls, [[1, 2], [1], [2]])
+
+    def test_load_racing_a_write_is_not_stored(self):
+        cache = EntityCache()
+
+        def load(ids):
+            cache.discard(ids)  # a write commits while the row is being read
+            return {i: {"id": i} for i in ids}
+
+        self.assertEqual(cache.get_many([1], load), {1: {"id": 1}})
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_lru_eviction_and_disabled_cache(self):
+        cache = EntityCache(max_entries=2)
+        load, _ = loader({i: {"id": i} for i in range(5)})
+        cache.get_many([0, 1], load)
+        cache.get_many([0], load)
+        cache.get_many([2], load)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(list(cache._entries), [0, 2])
+
+        disabled = EntityCache(ttl=0)
+        load, calls = loader({1: {"id": 1}})
+        disabled.get_many([1], load)
+        disabled.get_many([1], load)
+        self.assertEqual(calls, [[1], [1]])
+
+
+class TestBatchReads(unittest.TestCase):
+    def setUp(self):
+        get_entity_cache("media").clear()
+        self.addCleanup(get_entity_cache("media").clear)
+
+    def test_one_query_and_request_order(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+        cur.fetchall.return_value = [{"MediaId": 3, "MediaName": "Dune"}, {"MediaId": 5, "MediaName": "Alien"}]
+        with patch('app.db.get_pool', return_value=None), patch('app.db.get_connection', return_value=conn):
+            ok, _, rows = db.get_by_ids("media", [5, 4, 3, 5])
+            self.assertTrue(ok)
+            self.assertEqual([r and r["MediaName"] for r in rows], ["Alien", None, "Dune", "Alien"])
+            db.get_by_ids("media", [3, 5])
+
+        self.assertEqual(cur.execute.call_count, 1)
+        sql, params = cur.execute.call_args.args
+        self.assertIn("WHERE MediaId IN (%s, %s, %s)", sql)
+        self.assertEqual(params, (5, 4, 3))
+
+    @patch('app.db.get_data_versions')
+    @patch('app.db.get_result_cache')
+    def test_review_writes_drop_the_cached_row(self, *_):
+        cache = get_entity_cache("review")
+        cache.get_many([9], lambda ids: {9: {"ReviewId": 9, "Rating": 3}})
+        with patch('app.db.db_connection'), patch('app.db._needs_old_review', return_value=False):
+            db.update_review(9, 5, "", "Completed")
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+class TestBatchRoutes(unittest.TestCase):
+    def setUp(self):
+        self.client = create_app().test_client()
+
+    @patch('app.routes.get_by_ids', return_value=(True, None, [{"UserId": 2}, None]))
+    def test_results_keep_request_order_with_misses(self, lookup):
+        response = self.client.get('/api/users/batch?ids=2,7')
+        self.assertEqual(response.get_json(), {"results": [{"UserId": 2}, None], "missing": [7]})
+        lookup.assert_called_with("user", [2, 7])
+
+    @patch.dict('os.environ', {'BATCH_MAX_IDS': '3'})
+    def test_ids_are_validated(self):
+        self.assertEqual(self.client.get('/api/reviews/batch').status_code, 400)
+        self.assertEqual(self.client.get('/api/reviews/batch?ids=1,x').status_code, 400)
+        self.assertEqual(self.client.get('/api/media/batch?ids=1,2,3,4').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
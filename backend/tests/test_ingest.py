@@ -0,0 +1,151 @@
+import json
+import unittest
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+from app import create_app
+from app.ingest import _ingest_chunk, _normalize, ingest_media_entries, parse_ndjson
+from app.metrics import DbMetrics
+from app.pool import ConnectionPool
+
+
+def entry(profile, medianame="Dune", rating=4, status="Completed", **extra):
+    base = {
+        "firstname": "Ann", "lastname": "Lee", "profilename": profile,
+        "mediatype": "Movie", "medianame": medianame, "releaseyear": 2021,
+        "genre": "Drama", "platform": "Netflix", "rating": rating, "status": status,
+    }
+    base.update(extra)
+    return base
+
+
+@contextmanager
+def fake_connection():
+    yield MagicMock()
+
+
+class TestNormalize(unittest.TestCase):
+    def test_rejects_bad_entries_per_item(self):
+        with self.assertRaisesRegex(ValueError, "Missing field: genre"):
+            _normalize({k: v for k, v in entry("ann").items() if k != "genre"})
+        with self.assertRaisesRegex(ValueError, "Invalid status"):
+            _normalize(entry("ann", status="Done"))
+        with self.assertRaisesRegex(ValueError, "profilename longer"):
+            _normalize(entry("a" * 51))
+
+    def test_ndjson_reports_bad_lines_without_stopping(self):
+        items = list(parse_ndjson([b'{"a": 1}\n', b'\n', b'{oops\n', b'{"b": 2}']))
+        self.assertEqual(items[0], {"a": 1})
+        self.assertIsInstance(items[1], ValueError)
+        self.assertEqual(items[2], {"b": 2})
+
+
+class TestIngestChunk(unittest.TestCase):
+    @patch.dict('os.environ', {'ANALYTICS_ROLLUPS': '1'})
+    def test_set_based_upsert_with_aggregated_rollups(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+        cur.fetchall.side_effect = [
+            [(7, "bob")],                          # existing users
+            [(8, "Ann")],                          # user inserted for "ann"
+            [(1, "Drama")],
+            [(2, "Netflix")],
+            [(30, "Dune", "Movie", 2021, 1)],
+            [(7, 30, 99, 3, "Watching")],          # bob already reviewed Dune
+        ]
+        items = [
+            (0, _normalize(entry("ann"))),
+            (1, _normalize(entry("bob", rating=5))),
+            (2, _normalize(entry("ANN", rating=2, status="Watching"))),
+        ]
+
+        outcome = _ingest_chunk(conn, items)
+
+        self.assertEqual([r["status"] for r in outcome["results"]], ["created", "updated", "updated"])
+        self.assertEqual(outcome["users"], [(8, ("Ann", "Lee", "ann"))])
+        self.assertEqual(outcome["new_reviews"], [(8, 30)])
+        self.assertEqual(outcome["updated_reviews"], [99])
+
+        many = {c.args[0].split("(")[0].strip(): c.args[1] for c in cur.executemany.call_args_list}
+        # One user insert, and the repeated ann/Dune pair collapses to its last value
+        self.assertEqual(many["INSERT INTO User"], [("Ann", "Lee", "ann")])
+        reviews = many["INSERT INTO Review"]
+        self.assertEqual([(r[0], r[1], r[2], r[4]) for r in reviews], [(8, 30, 2, "Watching"), (7, 30, 5, "Completed")])
+        # Rollups get one net delta per row: ann +2/+1/0, bob +2/0/+1
+        self.assertEqual(many["INSERT INTO MediaSummary"], [(30, 4, 1, 1)])
+        self.assertEqual(many["INSERT INTO GenreSummary"], [(1, 4, 1)])
+        # ann gains a rated Watching review; bob's moves from Watching to Completed
+        self.assertEqual(many["INSERT INTO UserSummary"], [(8, 1, 2, 1, 0, 1, 0, 0), (7, 0, 2, 0, 0, -1, 1, 0)])
+        conn.commit.assert_called_once()
+
+
+class TestIngestEntries(unittest.TestCase):
+    @patch('app.ingest.db_connection', fake_connection)
+    @patch('app.ingest._ingest_chunk')
+    def test_failed_chunk_is_retried_per_entry(self, mock_chunk):
+        sizes = []
+
+        def chunk(conn, items):
+            sizes.append(len(items))
+            raise RuntimeError("Data too long")
+
+        mock_chunk.side_effect = chunk
+        summary = ingest_media_entries([entry("ann"), {"bad": 1}, entry("bob")], chunk_size=10)
+        self.assertEqual(summary["received"], 3)
+        self.assertEqual(summary["failed"], 3)
+        self.assertEqual(sizes, [2, 1, 1])
+        self.assertEqual(summary["results"][1], {"index": 1, "status": "error", "error": "Missing field: firstname"})
+        self.assertEqual(summary["results"][2], {"index": 2, "status": "error", "error": "Data too long"})
+
+    @patch('app.db.get_db_metrics', return_value=DbMetrics(enabled=False))
+    @patch('app.ingest._after_chunk')
+    def test_retries_fit_in_a_single_connection_pool(self, *_):
+        pool = ConnectionPool(MagicMock, max_size=1, timeout=0.05)
+
+        def chunk(conn, items):
+            if len(items) > 1 or items[0][1]["profilename"] == "bad":
+                raise RuntimeError("Duplicate entry")
+            return {"results": [{"index": i, "status": "created"} for i, _ in items]}
+
+        with patch('app.db.get_pool', return_value=pool), patch('app.ingest._ingest_chunk', side_effect=chunk):
+            summary = ingest_media_entries([entry("ann"), entry("bad"), entry("bob")], chunk_size=10)
+
+        self.assertEqual([r["status"] for r in summary["results"]], ["created", "error", "created"])
+        self.assertEqual(pool.stats()["checkouts"], 1)
+        self.assertEqual(pool.stats()["timeouts"], 0)
+
+    @patch('app.ingest.db_connection', fake_connection)
+    @patch('app.ingest._after_chunk')
+    @patch('app.ingest._ingest_chunk')
+    def test_commits_in_chunks(self, mock_chunk, _):
+        sizes = []
+
+        def chunk(conn, items):
+            sizes.append(len(items))
+            return {"results": [{"index": i, "status": "created"} for i, _ in items]}
+
+        mock_chunk.side_effect = chunk
+        summary = ingest_media_entries([entry(f"u{i}") for i in range(5)], chunk_size=2)
+        self.assertEqual(sizes, [2, 2, 1])
+        self.assertEqual(summary["created"], 5)
+
+
+class TestBulkRoute(unittest.TestCase):
+    def setUp(self):
+        self.client = create_app().test_client()
+
+    @patch('app.routes.ingest_media_entries')
+    def test_ndjson_body(self, mock_ingest):
+        mock_ingest.side_effect = lambda entries: {"received": len(list(entries))}
+        body = "\n".join(json.dumps(entry(f"u{i}")) for i in range(3))
+        response = self.client.post('/api/media-entries/bulk', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["received"], 3)
+
+    def test_rejects_non_array_json(self):
+        response = self.client.post('/api/media-entries/bulk', json={"profilename": "x"})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
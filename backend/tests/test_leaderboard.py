@@ -0,0 +1,195 @@
+import unittest
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from app import create_app, db
+from app.cache import get_result_cache
+from app.leaderboard import Leaderboard, Ranking, average_rating
+
+MEDIA = [(10, "Dune", "Movie"), (11, "Alien", "Movie"), (12, "Lost", "Show")]
+USERS = [(1, "Ann", "Lee"), (2, "Bob", "Ray")]
+REVIEWS = [
+    (1, 10, 5, "Completed"),
+    (2, 10, 4, "Completed"),
+    (1, 11, 3, "Completed"),
+    (2, 11, None, "Planning"),
+    (1, 12, 4, "Watching"),
+]
+
+
+def loaded(min_completions=2, **kwargs):
+    conn = MagicMock()
+    cur = conn.cursor.return_value
+    cur.fetchall.side_effect = [MEDIA, USERS]
+    cur.fetchmany.side_effect = [REVIEWS[:3], REVIEWS[3:], []]
+    board = Leaderboard(enabled=True, min_completions=min_completions, **kwargs)
+    board.load(conn)
+    return board
+
+
+class TestRanking(unittest.TestCase):
+    def test_moves_and_removes_entries(self):
+        ranking = Ranking()
+        for item_id, score in ((1, 3), (2, 5), (3, 4)):
+            ranking.set(item_id, score)
+        ranking.set(2, 1)
+        ranking.set(3, None)
+        ranking.set(4, 3)
+        self.assertEqual(ranking.top(10), [(1, 3), (4, 3), (2, 1)])
+        self.assertEqual(len(ranking), 3)
+
+    def test_average_matches_mysql_rounding(self):
+        self.assertEqual(average_rating(2, 3), Decimal("0.67"))
+        self.assertEqual(average_rating(1, 8), Decimal("0.13"))
+
+
+class TestLeaderboard(unittest.TestCase):
+    def test_rankings_after_load(self):
+        board = loaded()
+        self.assertEqual(board.top("top_rated_media", 2), [
+            {"MediaType": "Movie", "MediaName": "Dune", "AvgRating": Decimal("4.50")},
+            {"MediaType": "Show", "MediaName": "Lost", "AvgRating": Decimal("4.00")},
+        ])
+        self.assertEqual(board.top("top_media_completed", 5), [{"MediaName": "Dune", "user_completions": 2}])
+        self.assertEqual(board.top("top_users_completed", 5), [{"FirstName": "Ann", "LastName": "Lee", "media_done": 2}])
+
+    def test_review_writes_rerank(self):
+        board = loaded()
+        board.review_changed(2, 11, (None, "Planning"), (5, "Completed"))
+        self.assertEqual(board.top("top_rated_media", 1)[0]["MediaName"], "Dune")
+        self.assertEqual(board.top("top_rated_media", 3)[1]["AvgRating"], Decimal("4.00"))
+        self.assertEqual([r["MediaName"] for r in board.top("top_media_completed", 5)], ["Dune", "Alien"])
+        self.assertEqual([r["media_done"] for r in board.top("top_users_completed", 5)], [2, 2])
+
+        board.review_changed(1, 10, (5, "Completed"), None)
+        self.assertEqual([r["MediaName"] for r in board.top("top_media_completed", 5)], ["Alien"])
+        self.assertEqual(board.top("top_users_completed", 5)[0]["FirstName"], "Bob")
+
+    def test_thresholds_and_limit_cap(self):
+        board = loaded(min_votes=2, k=1)
+        self.assertEqual(board.top("top_rated_media", 10), [
+            {"MediaType": "Movie", "MediaName": "Dune", "AvgRating": Decimal("4.50")},
+        ])
+
+    def test_new_media_and_users_join_the_rankings(self):
+        board = loaded()
+        board.media_saved(13, "Heat", "Movie")
+        board.user_saved(3, "Cy", "Orr")
+        board.review_changed(3, 13, None, (5, "Completed"))
+        self.assertEqual(board.top("top_rated_media", 1)[0]["MediaName"], "Heat")
+        board.user_saved(1, "Annie", "Lee")
+        self.assertEqual(board.top("top_users_completed", 1)[0]["FirstName"], "Annie")
+        board.user_removed(1)
+        self.assertEqual(board.top("top_users_completed", 5), [])
+
+    def test_writes_during_a_load_are_read_again(self):
+        board = Leaderboard(enabled=True, min_completions=1)
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+
+        def scan(_):
+            # A review of Dune commits while the scan is running
+            board.review_changed(2, 10, None, (1, "Completed"))
+            return []
+
+        cur.fetchall.side_effect = [
+            MEDIA, USERS,
+            [(10, "Dune", "Movie")], [(10, 1, 1, 1)],
+            [(2, "Bob", "Ray")], [(2, 1)],
+        ]
+        cur.fetchmany.side_effect = scan
+        board.load(conn)
+
+        self.assertEqual(board.top("top_rated_media", 5), [
+            {"MediaType": "Movie", "MediaName": "Dune", "AvgRating": Decimal("1.00")},
+        ])
+        self.assertEqual(board.top("top_users_completed", 5)[0]["FirstName"], "Bob")
+        reread = [c.args[1] for c in cur.execute.call_args_list[3:]]
+        self.assertEqual(reread, [(10,), (10,), (2,), (2,)])
+
+    def test_rereads_see_writes_committed_after_the_scan_began(self):
+        board = Leaderboard(enabled=True, min_completions=1)
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+        # What each query returns inside the scan's snapshot, and once it has ended
+        before = {
+            "FROM Media": MEDIA, "FROM User": USERS,
+            "FROM Review WHERE MediaId": [], "FROM Review WHERE UserId": [],
+        }
+        after = dict(before, **{"FROM Review WHERE MediaId": [(10, 1, 1, 1)], "FROM Review WHERE UserId": [(2, 1)]})
+
+        def fetchall():
+            sql = cur.execute.call_args.args[0]
+            rows = after if conn.rollback.called else before
+            return next(found for query, found in rows.items() if query in sql)
+
+        def scan(_):
+            # A review of Dune commits while the scan is running
+            board.review_changed(2, 10, None, (1, "Completed"))
+            return []
+
+        cur.fetchall.side_effect = fetchall
+        cur.fetchmany.side_effect = scan
+        board.load(conn)
+
+        conn.rollback.assert_called_once()
+        self.assertEqual(board.top("top_rated_media", 5)[0]["AvgRating"], Decimal("1.00"))
+        self.assertEqual(board.top("top_users_completed", 5)[0]["media_done"], 1)
+
+    def test_stale_rankings_reload_and_then_defer_to_sql(self):
+        board = loaded(refresh=10)
+        board._refresh.connect = MagicMock()
+        loaded_at = board._refresh.loaded_at
+        with patch.object(board._refresh, '_start') as start:
+            with patch('app.snapshots.time.monotonic', return_value=loaded_at + 11):
+                self.assertIsNotNone(board.top("top_rated_media", 5))
+            start.assert_called_once()
+            with patch('app.snapshots.time.monotonic', return_value=loaded_at + 25):
+                self.assertIsNone(board.top("top_rated_media", 5))
+
+    def test_disabled_or_loading_defers_to_sql(self):
+        self.assertIsNone(Leaderboard(enabled=False).top("top_rated_media", 5))
+        self.assertIsNone(Leaderboard(enabled=True).top("top_rated_media", 5))
+
+
+class TestRankingReads(unittest.TestCase):
+    def setUp(self):
+        get_result_cache().invalidate()
+        self.addCleanup(get_result_cache().invalidate)
+
+    def test_loaded_leaderboard_answers_without_sql(self):
+        with patch('app.db.get_leaderboard', return_value=loaded()), \
+                patch('app.db.db_connection') as connection:
+            ok, _, rows = db.get_top_rated_media(1)
+        self.assertTrue(ok)
+        self.assertEqual(rows[0]["MediaName"], "Dune")
+        connection.assert_not_called()
+
+    @patch.dict('os.environ', {'ANALYTICS_ROLLUPS': '1'})
+    def test_sql_applies_the_same_threshold(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+        cur.fetchall.return_value = []
+        with patch('app.db.get_leaderboard', return_value=Leaderboard(enabled=False, min_completions=3)), \
+                patch('app.db.get_pool', return_value=None), \
+                patch('app.db.get_connection', return_value=conn):
+            db.get_top_users_completed(7)
+        self.assertEqual(cur.execute.call_args.args[1], (3, 7))
+
+
+class TestRankingRoutes(unittest.TestCase):
+    def setUp(self):
+        self.client = create_app().test_client()
+
+    @patch('app.routes.get_leaderboard', return_value=Leaderboard(enabled=False, k=20))
+    @patch('app.routes.get_top_media_completed', return_value=(True, None, []))
+    def test_limit_is_parsed_and_capped(self, query, _):
+        self.client.get('/api/top-media-completions?limit=500')
+        query.assert_called_with(20)
+        self.client.get('/api/top-media-completions')
+        query.assert_called_with(5)
+        self.assertEqual(self.client.get('/api/top-media-completions?limit=x').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app import create_app
+from app.metrics import DbMetrics, Histogram, InstrumentedConnection, fingerprint
+
+
+def get_top_rated(conn):
+    cur = conn.cursor(dictionary=True)
+    cur.execute("SELECT MediaId FROM MediaSummary WHERE RatingCount > %s", (0,))
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+
+def stream_users(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT UserId FROM User")
+    return [row for row in cur]
+
+
+def rename_user(conn):
+    cur = conn.cursor()
+    cur.execute("UPDATE User SET FirstName = %s WHERE UserId = %s", ("A", 1))
+    return cur
+
+
+class TestInstrumentedCursor(unittest.TestCase):
+    def setUp(self):
+        self.metrics = DbMetrics(slow_ms=0)
+        self.raw = MagicMock()
+        self.cur = self.raw.cursor.return_value
+        self.conn = InstrumentedConnection(self.raw, self.metrics)
+
+    def test_select_recorded_after_fetch_with_caller_name(self):
+        self.cur.with_rows = True
+        self.cur.fetchall.return_value = [{"MediaId": 1}, {"MediaId": 2}]
+        self.assertEqual(len(get_top_rated(self.conn)), 2)
+        self.raw.cursor.assert_called_once_with(dictionary=True)
+        snap = self.metrics.snapshot()
+        self.assertEqual(list(snap), ["get_top_rated:select_mediasummary"])
+        self.assertEqual((snap["get_top_rated:select_mediasummary"]["count"], snap["get_top_rated:select_mediasummary"]["rows"]), (1, 2))
+
+    def test_iteration_counts_rows_until_exhausted(self):
+        self.cur.with_rows = True
+        self.cur.fetchone.side_effect = [(1,), (2,), (3,), None]
+        self.assertEqual(stream_users(self.conn), [(1,), (2,), (3,)])
+        self.assertEqual(self.metrics.snapshot()["stream_users:select_user"]["rows"], 3)
+
+    def test_dml_uses_rowcount_and_errors_are_counted(self):
+        self.cur.with_rows = False
+        self.cur.rowcount = 1
+        rename_user(self.conn)
+        self.assertEqual(self.metrics.snapshot()["rename_user:update_user"]["rows"], 1)
+
+        self.cur.execute.side_effect = RuntimeError("gone away")
+        with self.assertRaises(RuntimeError):
+            rename_user(self.conn)
+        self.assertIn('db_query_errors_total{query="rename_user:update_user"} 1', self.metrics.render())
+
+    def test_connection_attributes_pass_through(self):
+        self.conn.autocommit = True
+        self.assertIs(self.raw.autocommit, True)
+        self.conn.commit()
+        self.raw.commit.assert_called_once()
+
+    def test_slow_query_logged_with_params_and_plan(self):
+        metrics = DbMetrics(slow_ms=0.000001, explain_slow=True)
+        conn = InstrumentedConnection(self.raw, metrics)
+        plan_cur = MagicMock()
+        plan_cur.fetchall.return_value = [{"table": "MediaSummary", "type": "ALL", "key": None, "rows": 9, "Extra": ""}]
+        self.raw.cursor.side_effect = [self.cur, plan_cur]
+        self.raw.unread_result = False
+        self.cur.with_rows = True
+        self.cur.fetchall.return_value = []
+
+        with self.assertLogs("app.metrics", "WARNING") as logs:
+            get_top_rated(conn)
+
+        self.assertIn("params=(0,)", logs.output[0])
+        self.assertIn("MediaSummary: type=ALL", logs.output[0])
+        plan_cur.execute.assert_called_once_with(
+            "EXPLAIN SELECT MediaId FROM MediaSummary WHERE RatingCount > %s", (0,)
+        )
+        self.assertEqual(metrics.snapshot()["get_top_rated:select_mediasummary"]["slow"], 1)
+
+
+class TestRendering(unittest.TestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        hist = Histogram((0.01, 0.1))
+        for value in (0.005, 0.01, 0.05, 3):
+            hist.observe(value)
+        self.assertEqual(hist.cumulative(), [("0.01", 2), ("0.1", 3), ("+Inf", 4)])
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint("\n  INSERT INTO `Review` (UserId) VALUES (%s)"), "insert_review")
+        self.assertEqual(fingerprint("SELECT 1"), "select")
+
+    @patch('app.routes.get_pool_stats', return_value={"enabled": True, "in_use": 2, "checkouts": 7})
+    def test_metrics_route(self, _):
+        response = create_app().test_client().get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        body = response.get_data(as_text=True)
+        self.assertIn("# TYPE db_query_duration_seconds histogram", body)
+        self.assertIn("db_pool_in_use 2", body)
+        self.assertIn("db_pool_checkouts_total 7", body)
+        self.assertIn("result_cache_hits_total", body)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import re
+import unittest
+from unittest.mock import MagicMock
+
+from mysql.connector import Error
+
+from app.explain import HOT_QUERIES, full_scans
+from app.migrate import MIGRATIONS_DIR, Migration, MigrationError, discover, migrate, split_sql
+
+
+class TestSplitSql(unittest.TestCase):
+    def test_semicolons_in_strings_and_comments_are_kept(self):
+        sql = """
+            -- comment; not a statement
+            INSERT INTO Review (ReviewText) VALUES ('Great; loved it');
+            /* block; comment */ SELECT "a;b";
+            INSERT INTO User (ProfileName) VALUES ('O''Brien\\'s; id')
+        """
+        self.assertEqual(list(split_sql(sql)), [
+            "INSERT INTO Review (ReviewText) VALUES ('Great; loved it')",
+            'SELECT "a;b"',
+            "INSERT INTO User (ProfileName) VALUES ('O''Brien\\'s; id')",
+        ])
+
+    def test_empty_statements_are_skipped(self):
+        self.assertEqual(list(split_sql(";; SELECT 1;;")), ["SELECT 1"])
+
+
+class TestMigrate(unittest.TestCase):
+    def _conn(self, applied=()):
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+        cur.fetchall.return_value = list(applied)
+        return conn, cur
+
+    def test_applies_only_pending_in_order(self):
+        first = Migration(1, "one", "CREATE TABLE A (x INT)")
+        second = Migration(2, "two", "ALTER TABLE A ADD INDEX i (x); ALTER TABLE A ADD INDEX j (x)")
+        conn, cur = self._conn(applied=[(1, first.checksum)])
+
+        done = migrate(conn, [first, second])
+
+        self.assertEqual(done, [second])
+        statements = [c.args[0] for c in cur.execute.call_args_list]
+        self.assertNotIn("CREATE TABLE A (x INT)", statements)
+        self.assertIn("ALTER TABLE A ADD INDEX j (x)", statements)
+        self.assertEqual(cur.execute.call_args.args[1], (2, "two", second.checksum))
+        conn.commit.assert_called_once()
+
+    def test_existing_index_is_treated_as_applied(self):
+        """A re-run after a half-applied migration skips what's already there."""
+        conn, cur = self._conn()
+        effects = [None, None, Error(msg="Duplicate key name 'i'", errno=1061), None, None]
+        cur.execute.side_effect = effects
+        done = migrate(conn, [Migration(1, "idx", "ALTER TABLE A ADD INDEX i (x); ALTER TABLE A ADD INDEX j (x)")])
+        self.assertEqual(len(done), 1)
+
+    def test_failure_stops_and_is_not_recorded(self):
+        conn, cur = self._conn()
+        cur.execute.side_effect = [None, None, Error(msg="Duplicate entry", errno=1062)]
+        with self.assertRaises(MigrationError):
+            migrate(conn, [Migration(1, "uq", "ALTER TABLE A ADD UNIQUE INDEX u (x)"), Migration(2, "next", "SELECT 1")])
+        conn.commit.assert_not_called()
+
+
+class TestShippedMigrations(unittest.TestCase):
+    def test_versions_are_sequential(self):
+        versions = [m.version for m in discover()]
+        self.assertEqual(versions, list(range(1, len(versions) + 1)))
+
+    def test_baseline_matches_the_pre_migration_schema(self):
+        """Old databases skip 0001's CREATE TABLE IF NOT EXISTS, so later schema must be its own migration."""
+        baseline = discover()[0]
+        self.assertNotIn("FULLTEXT", baseline.sql)
+        self.assertNotIn("Summary", baseline.sql)
+
+    def test_schema_snapshot_has_every_migrated_index(self):
+        """schema.sql is kept in step with the migrations."""
+        with open(os.path.join(MIGRATIONS_DIR, "..", "schema.sql"), encoding="utf-8") as f:
+            snapshot = f.read()
+        for migration in discover():
+            for name in re.findall(r"ADD (?:UNIQUE |FULLTEXT )?INDEX (\w+)", migration.sql):
+                self.assertIn(name, snapshot, f"{name} from {migration.name} missing in schema.sql")
+
+
+class TestPlanCheck(unittest.TestCase):
+    def test_flags_full_scans_outside_allow_list(self):
+        plan = [
+            {"table": "s", "type": "ALL", "key": None},
+            {"table": "m", "type": "eq_ref", "key": "PRIMARY"},
+            {"table": "r", "type": "ALL", "key": None},
+        ]
+        self.assertEqual(full_scans(plan, allow=("s",)), ["r"])
+
+    def test_hot_queries_are_explainable(self):
+        """Each check's sample params match its placeholders."""
+        for check in HOT_QUERIES:
+            self.assertEqual(check.sql.count("%s"), len(check.params), check.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
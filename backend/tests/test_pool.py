@@ -0,0 +1,123 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app import db
+from app.metrics import DbMetrics
+from app.pool import ConnectionPool, PoolTimeoutError
+
+
+def make_conn():
+    conn = MagicMock()
+    conn.unread_result = False
+    conn.in_transaction = False
+    return conn
+
+
+class TestConnectionPool(unittest.TestCase):
+    def test_reuses_released_connection(self):
+        """A released connection is handed out again instead of reconnecting."""
+        factory = MagicMock(side_effect=make_conn)
+        pool = ConnectionPool(factory, max_size=2)
+
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+
+        self.assertIs(first, second)
+        self.assertEqual(factory.call_count, 1)
+        self.assertEqual(pool.stats()["checkouts"], 2)
+
+    def test_checkout_times_out_when_exhausted(self):
+        """Borrowing beyond max_size waits, then raises PoolTimeoutError."""
+        pool = ConnectionPool(make_conn, max_size=1, timeout=0.05)
+        conn = pool.acquire()
+        with self.assertRaises(PoolTimeoutError):
+            pool.acquire()
+        pool.release(conn)
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_waiter_receives_released_connection(self):
+        """A blocked checkout is woken as soon as another thread releases."""
+        pool = ConnectionPool(make_conn, max_size=1, timeout=2)
+        held = pool.acquire()
+        got = []
+
+        t = threading.Thread(target=lambda: got.append(pool.acquire()))
+        t.start()
+        time.sleep(0.05)
+        pool.release(held)
+        t.join(1)
+
+        self.assertEqual(got, [held])
+
+    def test_recycles_old_connections(self):
+        """Connections past their max age are closed rather than reused."""
+        factory = MagicMock(side_effect=make_conn)
+        pool = ConnectionPool(factory, max_size=1, recycle=0.01)
+
+        first = pool.acquire()
+        pool.release(first)
+        time.sleep(0.02)
+        second = pool.acquire()
+
+        self.assertIsNot(first, second)
+        first.close.assert_called_once()
+        self.assertEqual(pool.stats()["recycled"], 1)
+
+    def test_dead_connection_is_replaced(self):
+        """A connection that fails its ping is discarded before checkout."""
+        factory = MagicMock(side_effect=make_conn)
+        pool = ConnectionPool(factory, max_size=1, ping_after=0)
+
+        first = pool.acquire()
+        first.ping.side_effect = Exception("gone away")
+        pool.release(first)
+        second = pool.acquire()
+
+        self.assertIsNot(first, second)
+        self.assertEqual(pool.stats()["discarded"], 1)
+
+    def test_release_rolls_back_open_transaction(self):
+        """Returning a connection mid-transaction rolls it back."""
+        pool = ConnectionPool(make_conn, max_size=1)
+        with pool.connection() as conn:
+            conn.in_transaction = True
+        conn.rollback.assert_called_once()
+
+
+class TestDbConnection(unittest.TestCase):
+    def tearDown(self):
+        db.close_pool()
+
+    @patch.dict('os.environ', {'DB_POOL_SIZE': '0'})
+    @patch('app.db.get_db_metrics', return_value=DbMetrics(enabled=False))
+    @patch('app.db.get_connection')
+    def test_direct_mode_closes_connection(self, mock_connect, _):
+        """With DB_POOL_SIZE=0 every borrow opens and closes its own connection."""
+        db.close_pool()
+        with db.db_connection() as conn:
+            pass
+        self.assertIs(conn, mock_connect.return_value)
+        conn.close.assert_called_once()
+        self.assertEqual(db.get_pool_stats(), {"enabled": False})
+
+    @patch.dict('os.environ', {'DB_POOL_SIZE': '3'})
+    @patch('app.db.get_connection', side_effect=make_conn)
+    def test_pooled_mode_keeps_connection_open(self, mock_connect):
+        """Pooled borrows share one connection across sequential calls."""
+        db.close_pool()
+        with db.db_connection():
+            pass
+        with db.db_connection():
+            pass
+        self.assertEqual(mock_connect.call_count, 1)
+        stats = db.get_pool_stats()
+        self.assertTrue(stats["enabled"])
+        self.assertEqual(stats["max_size"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from mysql.connector import errors
+
+from app import create_app, db
+from app.metrics import DbMetrics
+from app.pool import ConnectionPool
+from app.replicas import ReplicaSet, parse_endpoints
+
+
+def fake_pool(name):
+    def factory():
+        conn = MagicMock(name=name)
+        conn.unread_result = False
+        conn.in_transaction = False
+        return conn
+    return ConnectionPool(factory, max_size=2)
+
+
+class TestReplicaSet(unittest.TestCase):
+    def test_parse_endpoints(self):
+        self.assertEqual(parse_endpoints(" r1, r2:3307,,"), [("r1", 3306), ("r2", 3307)])
+
+    def test_round_robin_skips_ejected_replicas_until_they_recover(self):
+        replicas = ReplicaSet([("r1", 1), ("r2", 2)], lambda host, port: fake_pool(host), eject_seconds=30)
+        self.assertEqual([replicas.choose().name for _ in range(4)], ["r1:1", "r2:2", "r1:1", "r2:2"])
+
+        with patch('app.replicas.time.monotonic', return_value=100.0):
+            replicas.eject(replicas.replicas[0])
+            self.assertEqual({replicas.choose().name for _ in range(4)}, {"r2:2"})
+            replicas.eject(replicas.replicas[1])
+            self.assertIsNone(replicas.choose())
+        with patch('app.replicas.time.monotonic', return_value=131.0):
+            self.assertIsNotNone(replicas.choose())
+        stats = replicas.stats()
+        self.assertEqual(stats["r1:1"]["ejections"], 1)
+
+
+@patch('app.db.get_db_metrics', return_value=DbMetrics(enabled=False))
+class TestRouting(unittest.TestCase):
+    def setUp(self):
+        self.primary = fake_pool("primary")
+        self.replicas = ReplicaSet([("r1", 3306)], lambda host, port: fake_pool(host))
+        for target, value in (('app.db.get_pool', self.primary), ('app.db.get_replicas', self.replicas)):
+            patcher = patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch('app.db._last_local_write', float("-inf"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def target(self, **kwargs):
+        with db.db_connection(**kwargs) as conn:
+            return conn._mock_name
+
+    def test_reads_go_to_replicas_and_writes_to_the_primary(self, _):
+        self.assertEqual(self.target(read_only=True), "r1")
+        self.assertEqual(self.target(), "primary")
+
+    def test_a_writer_reads_from_the_primary(self, _):
+        token = db.prefer_primary_reads()
+        try:
+            self.assertEqual(self.target(read_only=True), "primary")
+        finally:
+            db.restore_read_routing(token)
+        self.assertEqual(self.target(read_only=True), "r1")
+
+    @patch('app.db.get_result_cache')
+    @patch('app.db.get_data_versions')
+    def test_shared_results_stay_on_the_primary_right_after_a_write(self, *_):
+        db._after_commit("Review")
+        self.assertEqual(self.target(read_only=True, shared=True), "primary")
+        self.assertEqual(self.target(read_only=True), "r1")
+        with patch.dict('os.environ', {'DB_READ_YOUR_WRITES': '0'}):
+            self.assertEqual(self.target(read_only=True, shared=True), "r1")
+
+    def test_unreachable_replica_is_ejected_and_the_primary_serves(self, _):
+        replica = self.replicas.replicas[0]
+        with patch.object(replica.pool, 'acquire', side_effect=errors.DatabaseError(errno=2003)):
+            self.assertEqual(self.target(read_only=True), "primary")
+        self.assertEqual(replica.ejections, 1)
+        self.assertEqual(self.target(read_only=True), "primary")
+
+    def test_lost_connection_ejects_but_query_errors_do_not(self, _):
+        with self.assertRaises(errors.Error):
+            with db.db_connection(read_only=True):
+                raise errors.DatabaseError(msg="syntax", errno=1064)
+        self.assertEqual(self.replicas.replicas[0].ejections, 0)
+        with self.assertRaises(errors.Error):
+            with db.db_connection(read_only=True):
+                raise errors.OperationalError(msg="Lost connection", errno=2013)
+        self.assertEqual(self.replicas.replicas[0].ejections, 1)
+
+
+class TestReadYourWritesCookie(unittest.TestCase):
+    def setUp(self):
+        self.client = create_app().test_client()
+
+    @patch('app.routes.get_replicas', return_value=MagicMock())
+    @patch('app.routes.create_user', return_value=(True, None))
+    def test_write_marks_the_client_and_its_reads_use_the_primary(self, *_):
+        response = self.client.post('/api/users/create', json={"FirstName": "A", "LastName": "B", "ProfileName": "ab"})
+        self.assertIn("read_primary=1", response.headers["Set-Cookie"])
+        self.assertIn("Max-Age=5", response.headers["Set-Cookie"])
+
+        seen = []
+        with patch('app.routes.fetch_all_users', side_effect=lambda rowset: seen.append(db._read_primary.get()) or []):
+            self.client.get('/api/users/all')
+            self.client.delete_cookie('read_primary')
+            self.client.get('/api/users/all')
+        self.assertEqual(seen, [True, False])
+        self.assertFalse(db._read_primary.get())
+
+    @patch('app.routes.get_replicas', return_value=None)
+    @patch('app.routes.create_user', return_value=(True, None))
+    def test_no_cookie_without_replicas(self, *_):
+        response = self.client.post('/api/users/create', json={"FirstName": "A", "LastName": "B", "ProfileName": "ab"})
+        self.assertNotIn("Set-Cookie", response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from app import create_app, db
+from app.cache import get_result_cache
+from app.rollups import apply_review_change, rebuild_rollups
+
+
+def executed_params(cur):
+    return [c.args[1] for c in cur.execute.call_args_list]
+
+
+class TestApplyReviewChange(unittest.TestCase):
+    def test_insert_adds_rating_and_completion(self):
+        """A new completed review bumps media, genre and user rollups."""
+        cur = MagicMock()
+        apply_review_change(cur, 7, 3, None, (4, "Completed"))
+        self.assertEqual(executed_params(cur), [(3, 4, 1, 1), (4, 1, 3), (7, 1, 4, 1, 0, 0, 1, 0)])
+
+    def test_update_applies_net_delta(self):
+        """Changing 5/Completed to 2/Watching subtracts the difference."""
+        cur = MagicMock()
+        apply_review_change(cur, 7, 3, (5, "Completed"), (2, "Watching"))
+        self.assertEqual(executed_params(cur), [(3, -3, 0, -1), (-3, 0, 3), (7, 0, -3, 0, 0, 1, -1, 0)])
+
+    def test_delete_of_unrated_planning_review_only_touches_user_stats(self):
+        """An unrated Planning review only counts towards its user's statistics."""
+        cur = MagicMock()
+        apply_review_change(cur, 7, 3, (None, "Planning"), None)
+        self.assertEqual(executed_params(cur), [(7, -1, 0, 0, -1, 0, 0, 0)])
+
+    def test_unchanged_review_is_noop(self):
+        cur = MagicMock()
+        apply_review_change(cur, 7, 3, (4, "Watching"), (4, "Watching"))
+        cur.execute.assert_not_called()
+
+
+class TestRebuildRollups(unittest.TestCase):
+    @patch('app.rollups.migrate')
+    def test_migrates_before_rebuilding(self, migrate):
+        conn = MagicMock()
+        conn.start_transaction.side_effect = lambda: migrate.assert_called_once_with(conn)
+        counts = rebuild_rollups(conn)
+        self.assertEqual(set(counts), {"MediaSummary", "UserSummary", "GenreSummary"})
+        conn.commit.assert_called_once()
+
+
+class TestRollupReads(unittest.TestCase):
+    def setUp(self):
+        get_result_cache().invalidate()
+
+    def _run(self, func):
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+        cur.fetchall.return_value = []
+        with patch('app.db.get_pool', return_value=None), \
+                patch('app.db.get_connection', return_value=conn):
+            ok, err, rows = func()
+        self.assertTrue(ok)
+        return cur.execute.call_args.args[0]
+
+    @patch.dict('os.environ', {'ANALYTICS_ROLLUPS': '1'})
+    def test_top_rated_reads_summary_table(self):
+        """With rollups on, top-rated media never aggregates Review."""
+        sql = self._run(db.get_top_rated_media)
+        self.assertIn("MediaSummary", sql)
+        self.assertNotIn("Review", sql)
+
+    @patch.dict('os.environ', {'ANALYTICS_ROLLUPS': '0'})
+    def test_rollups_disabled_uses_group_by(self):
+        """ANALYTICS_ROLLUPS=0 keeps the original full aggregation."""
+        sql = self._run(db.get_top_rated_media)
+        self.assertIn("GROUP BY", sql)
+        self.assertNotIn("MediaSummary", sql)
+
+    @patch.dict('os.environ', {'ANALYTICS_ROLLUPS': '1'})
+    def test_user_stats_read_one_summary_row(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+        cur.fetchone.return_value = {
+            "UserId": 7, "ProfileName": "bob", "ReviewCount": 3, "RatingCount": 2, "AvgRating": Decimal("4.50"),
+            "Planning": 1, "Watching": 0, "Completed": 2, "Havent Watched": 0,
+        }
+        with patch('app.db.get_pool', return_value=None), \
+                patch('app.db.get_connection', return_value=conn):
+            ok, _, stats = db.get_user_stats(7)
+        self.assertTrue(ok)
+        self.assertIn("UserSummary", cur.execute.call_args.args[0])
+        self.assertNotIn("GROUP BY", cur.execute.call_args.args[0])
+        self.assertEqual(stats["Status"], {"Planning": 1, "Watching": 0, "Completed": 2, "Havent Watched": 0})
+        self.assertEqual((stats["ReviewCount"], stats["AvgRating"]), (3, Decimal("4.50")))
+
+
+class TestUserStatsRoute(unittest.TestCase):
+    def setUp(self):
+        self.client = create_app().test_client()
+
+    @patch('app.routes.get_user_stats', return_value=(True, None, {"UserId": 7, "ReviewCount": 0}))
+    def test_found(self, _):
+        response = self.client.get('/api/users/7/stats')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["UserId"], 7)
+        self.assertIn("ETag", response.headers)
+
+    @patch('app.routes.get_user_stats', return_value=(True, None, None))
+    def test_unknown_user(self, _):
+        self.assertEqual(self.client.get('/api/users/9/stats').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+import json
+import unittest
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from app import create_app
+from app.db import (
+    InvalidCursorError,
+    _build_search_sql,
+    decode_search_cursor,
+    encode_search_cursor,
+)
+from app.search_index import SearchIndex, TrigramIndex
+
+
+def rows_then(rows, error=None):
+    """A stand-in for iter_search that fails with ``error`` after ``rows``."""
+    yield from rows
+    if error is not None:
+        raise error
+
+
+class TestSearchCursor(unittest.TestCase):
+    def test_round_trip(self):
+        """A token decodes back to the sort keys it was built from."""
+        token = encode_search_cursor("media", "rating_desc", "star", [Decimal("4.50"), 12])
+        self.assertEqual(decode_search_cursor(token, "media", "rating_desc", "star"), ["4.50", 12])
+
+    def test_rejects_token_from_another_search(self):
+        """A cursor can't be replayed against a different sort or query."""
+        token = encode_search_cursor("media", "az", "star", ["Star", 3])
+        with self.assertRaises(InvalidCursorError):
+            decode_search_cursor(token, "media", "za", "star")
+        with self.assertRaises(InvalidCursorError):
+            decode_search_cursor(token, "media", "az", "moon")
+
+    def test_rejects_garbage(self):
+        with self.assertRaises(InvalidCursorError):
+            decode_search_cursor("not-a-cursor!!", "media", "az", "")
+
+    def test_keyset_predicate_for_aggregate_sort_uses_having(self):
+        """Aggregate sort keys are compared after grouping."""
+        sql, params = _build_search_sql("a", "media", "rating_desc", after=["3.50", 7], limit=11)
+        self.assertIn("HAVING", sql)
+        self.assertEqual(params, ["%a%", "3.50", "3.50", 7, 11])
+
+    def test_keyset_predicate_for_column_sort_uses_where(self):
+        """Plain column sort keys are filtered before grouping."""
+        sql, _ = _build_search_sql("a", "media", "az", after=["Star", 7])
+        self.assertNotIn("HAVING", sql)
+        self.assertIn("COALESCE(m.MediaName, '') > %s", sql)
+
+    @patch.dict('os.environ', {'ANALYTICS_ROLLUPS': '1'})
+    def test_user_search_reads_review_counts_from_the_rollup(self):
+        """No per-user grouping of Review, and count sorts page in WHERE."""
+        sql, params = _build_search_sql("a", "user", "count_desc", after=[4, 7], limit=11)
+        self.assertIn("UserSummary", sql)
+        self.assertNotIn("Review r", sql)
+        self.assertNotIn("GROUP BY", sql)
+        self.assertIn("COALESCE(s.ReviewCount, 0) < %s", sql)
+        self.assertEqual(params, ["%a%"] * 3 + [4, 4, 7, 11])
+
+    @patch.dict('os.environ', {'ANALYTICS_ROLLUPS': '0'})
+    def test_user_search_without_rollups_groups_reviews(self):
+        sql, _ = _build_search_sql("a", "user", "count_desc", after=[4, 7])
+        self.assertIn("GROUP BY u.UserId", sql)
+        self.assertIn("HAVING", sql)
+
+
+class TestTrigramIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = TrigramIndex()
+        self.index.add(1, ["The Dark Night"])
+        self.index.add(2, ["Dark"])
+        self.index.add(3, ["Darkness Falls"])
+        self.index.add(4, ["Kingdom of Ice"])
+
+    def test_substring_matches_like_semantics(self):
+        """Any case-insensitive substring hit is returned, nothing else."""
+        self.assertEqual({i for i, _ in self.index.search("ARK")}, {1, 2, 3})
+        self.assertEqual(self.index.search("zzz"), [])
+
+    def test_ranks_exact_then_prefix_then_word_start(self):
+        self.assertEqual([i for i, _ in self.index.search("dark")], [2, 3, 1])
+
+    def test_short_terms_are_not_answered(self):
+        self.assertIsNone(self.index.search("da"))
+
+    def test_reindex_and_remove(self):
+        self.index.add(2, ["Bright"])
+        self.index.remove(3)
+        self.assertEqual([i for i, _ in self.index.search("dark")], [1])
+
+    def test_fields_do_not_bleed_into_each_other(self):
+        """A user's first and last name don't form matches across the boundary."""
+        self.index.add(9, ["Ann", "Lee", "al"])
+        self.assertEqual(self.index.search("nnl"), [])
+        self.assertEqual([i for i, _ in self.index.search("ann")], [9])
+
+
+class TestSearchIndex(unittest.TestCase):
+    def test_stale_index_defers_to_sql(self):
+        conn = MagicMock()
+        conn.cursor.return_value.fetchmany.return_value = []
+        index = SearchIndex(enabled=True, refresh=60)
+        index.load(conn)
+        index.upsert("media", 5, ["Star Trek"])
+        index._refresh.connect = MagicMock()
+        loaded_at = index._refresh.loaded_at
+        with patch.object(index._refresh, '_start') as start:
+            with patch('app.snapshots.time.monotonic', return_value=loaded_at + 61):
+                self.assertEqual([i for i, _ in index.search("media", "star")], [5])
+            start.assert_called_once()
+            with patch('app.snapshots.time.monotonic', return_value=loaded_at + 121):
+                self.assertIsNone(index.search("media", "star"))
+
+class TestTextPlan(unittest.TestCase):
+    def test_relevance_without_index_uses_fulltext(self):
+        sql, params = _build_search_sql("star wa", "media", "relevance")
+        self.assertIn("MATCH(m.MediaName) AGAINST (%s IN BOOLEAN MODE)", sql)
+        self.assertEqual(params, ["+star* +wa*", "+star* +wa*"])
+
+    def test_trigram_index_replaces_like_with_id_list(self):
+        index = SearchIndex(enabled=True)
+        index.ready = True
+        index.upsert("media", 5, ["Star Trek"])
+        index.upsert("media", 6, ["Starlight"])
+        with patch('app.db.get_search_index', return_value=index):
+            sql, params = _build_search_sql("star", "media", "relevance")
+        self.assertNotIn("LIKE", sql)
+        self.assertIn("m.MediaId IN (%s, %s)", sql)
+        # FIELD() list is worst-first so the best match gets the highest rank
+        self.assertEqual(params, [6, 5, 5, 6])
+
+
+class TestSearchRoute(unittest.TestCase):
+    def setUp(self):
+        self.client = create_app().test_client()
+
+    @patch('app.routes.search_page')
+    def test_paged_response_shape(self, mock_page):
+        mock_page.return_value = (True, None, [{"MediaName": "Star"}], "tok")
+        response = self.client.get('/api/search?q=st&limit=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {"items": [{"MediaName": "Star"}], "next_cursor": "tok"})
+        self.assertEqual(mock_page.call_args.kwargs["limit"], 1)
+
+    @patch('app.routes.search_database')
+    def test_legacy_response_without_paging_params(self, mock_search):
+        mock_search.return_value = (True, None, [{"MediaName": "Star"}])
+        response = self.client.get('/api/search?q=st')
+        self.assertEqual(response.json, [{"MediaName": "Star"}])
+
+    def test_invalid_cursor_is_bad_request(self):
+        response = self.client.get('/api/search?q=st&cursor=bogus')
+        self.assertEqual(response.status_code, 400)
+
+    @patch('app.routes.iter_search')
+    def test_stream_emits_ndjson(self, mock_iter):
+        mock_iter.return_value = rows_then([{"GenreName": "Drama", "AvgRating": Decimal("3.50")}, {"GenreName": "War"}])
+        response = self.client.get('/api/search?category=genre&stream=1')
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(lines, [{"GenreName": "Drama", "AvgRating": "3.50"}, {"GenreName": "War"}])
+
+    @patch('app.routes.iter_search')
+    def test_stream_failures_are_reported(self, mock_iter):
+        mock_iter.return_value = rows_then([], RuntimeError("pool exhausted"))
+        response = self.client.get('/api/search?stream=1')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json, {"error": "Search failed"})
+
+        mock_iter.return_value = rows_then([{"MediaName": "Alien"}], RuntimeError("connection lost"))
+        response = self.client.get('/api/search?stream=1')
+        self.assertEqual(response.status_code, 200)
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(lines, [{"MediaName": "Alien"}, {"error": "Search failed"}])
+
+
+if __name__ == '__main__':
+    unittest.main()
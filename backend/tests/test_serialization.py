@@ -0,0 +1,104 @@
+import json
+import unittest
+from datetime import date
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import create_app
+from app.serialization import RowSet, encode, shaped
+
+ROWS = [
+    {"MediaName": "Alien", "AvgRating": Decimal("4.50"), "ReleaseYear": 1979, "Tags": None},
+    {"MediaName": "Amélie", "AvgRating": None, "ReleaseYear": 2001, "Tags": ["a", "b"]},
+]
+
+
+def tuple_cursor(names, rows, types=None):
+    cur = MagicMock()
+    types = types or [253] * len(names)
+    cur.description = [(name, code, None, None, None, None, 1, 0, 0) for name, code in zip(names, types)]
+    cur.fetchall.return_value = rows
+    return cur
+
+
+class TestEncode(unittest.TestCase):
+    def flask_default(self, obj):
+        app = create_app()
+        return json.loads(DefaultJSONProvider(app).dumps(obj))
+
+    def test_matches_flask_default_output(self):
+        payload = {"items": ROWS, "when": date(2024, 5, 1), "next_cursor": None}
+        self.assertEqual(json.loads(encode(payload)), self.flask_default(payload))
+
+    def test_stdlib_fallback_is_identical(self):
+        fast = encode({"items": ROWS})
+        with patch('app.serialization.orjson', None):
+            fallback = encode({"items": ROWS})
+        self.assertEqual(json.loads(fallback), json.loads(fast))
+        self.assertTrue(fallback.startswith(b'{"items":[{"AvgRating":"4.50"'))
+
+    def test_keys_are_sorted_unless_asked_not_to(self):
+        self.assertEqual(encode({"b": 1, "a": 2}), b'{"a":2,"b":1}')
+        self.assertEqual(encode({"b": 1, "a": 2}, sort_keys=False), b'{"b":1,"a":2}')
+
+
+class TestRowSet(unittest.TestCase):
+    def test_from_cursor_converts_decimal_columns_and_drops_helpers(self):
+        cur = tuple_cursor(
+            ["GenreName", "AvgRating", "_k0"],
+            [("Drama", Decimal("3.50"), 7), ("War", None, 2)],
+            types=[253, 246, 8],
+        )
+        rowset = RowSet.from_cursor(cur, exclude=("_k0",))
+        self.assertEqual(rowset.columns, ["GenreName", "AvgRating"])
+        self.assertEqual(rowset.rows, [("Drama", "3.50"), ("War", None)])
+
+    def test_rows_are_used_as_is_when_nothing_needs_converting(self):
+        rows = [(1, "ann"), (2, "bob")]
+        rowset = RowSet.from_cursor(tuple_cursor(["UserId", "ProfileName"], rows))
+        self.assertIs(rowset.rows, rows)
+
+    def test_object_and_columnar_shapes(self):
+        rowset = RowSet(["UserId", "ProfileName"], [(1, "ann"), (2, "bob")])
+        self.assertEqual(json.loads(encode(rowset)), [{"UserId": 1, "ProfileName": "ann"}, {"UserId": 2, "ProfileName": "bob"}])
+        self.assertEqual(json.loads(encode(shaped(rowset, True))),
+                         {"columns": ["UserId", "ProfileName"], "rows": [[1, "ann"], [2, "bob"]]})
+        self.assertEqual(json.loads(encode(shaped(ROWS[:1], True)))["rows"], [["Alien", "4.50", 1979, None]])
+
+
+@patch('app.db.get_pool', return_value=None)
+class TestRoutes(unittest.TestCase):
+    def setUp(self):
+        self.client = create_app().test_client()
+
+    def test_users_all_columnar(self, _):
+        conn = MagicMock()
+        conn.cursor.return_value = tuple_cursor(["UserId", "ProfileName"], [(1, "ann")])
+        with patch('app.db.get_connection', return_value=conn):
+            objects = self.client.get('/api/users/all').get_json()
+            columns = self.client.get('/api/users/all?format=columns').get_json()
+        self.assertEqual(objects, [{"UserId": 1, "ProfileName": "ann"}])
+        self.assertEqual(columns, {"columns": ["UserId", "ProfileName"], "rows": [[1, "ann"]]})
+
+    def test_users_reads_rows_as_tuples(self, _):
+        conn = MagicMock()
+        conn.cursor.return_value = tuple_cursor(["UserId", "ProfileName"], [(1, "ann")])
+        with patch('app.db.get_connection', return_value=conn):
+            columns = self.client.get('/api/users?format=columns').get_json()
+        self.assertEqual(columns, {"columns": ["UserId", "ProfileName"], "rows": [[1, "ann"]]})
+        conn.cursor.assert_called_with()
+        with patch('app.db.get_connection', side_effect=RuntimeError("down")):
+            # Unlike /users/all, a failed read is still an error here
+            self.assertEqual(self.client.get('/api/users').status_code, 500)
+
+    @patch('app.routes.search_page')
+    def test_search_page_columnar(self, mock_page, _):
+        mock_page.return_value = (True, None, [{"MediaName": "Star"}], "tok")
+        response = self.client.get('/api/search?q=st&limit=1&format=columns')
+        self.assertEqual(response.get_json(), {"columns": ["MediaName"], "rows": [["Star"]], "next_cursor": "tok"})
+
+
+if __name__ == '__main__':
+    unittest.main()
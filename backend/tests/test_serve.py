@@ -0,0 +1,136 @@
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import textwrap
+import threading
+import time
+import unittest
+
+import serve
+from serve import ServeConfig, parse_args, worker_pool_size
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A tiny WSGI app: answers with the worker's pid; /slow takes a second
+TEST_APP = textwrap.dedent("""
+    import os, time
+
+    def make_app():
+        def app(environ, start_response):
+            if environ["PATH_INFO"] == "/slow":
+                time.sleep(1.0)
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [str(os.getpid()).encode()]
+        return app
+""")
+
+
+class TestConfig(unittest.TestCase):
+    def test_env_defaults_and_flags(self):
+        env = {"SERVE_WORKERS": "3", "SERVE_THREADS": "4", "FLASK_RUN_PORT": "6000", "SERVE_PRELOAD": "1"}
+        config = parse_args([], env)
+        self.assertEqual((config.workers, config.threads, config.port, config.preload), (3, 4, 6000, True))
+        self.assertEqual(parse_args(["--workers", "5"], env).workers, 5)
+
+    def test_pool_defaults_to_threads_plus_dashboard_workers(self):
+        config = ServeConfig(workers=4, threads=8)
+        self.assertEqual(worker_pool_size(config, {}), (14, None))
+        self.assertEqual(worker_pool_size(config, {"DASHBOARD_WORKERS": "2"}), (10, None))
+
+    def test_pool_is_capped_by_the_connection_budget(self):
+        config = ServeConfig(workers=4, threads=8)
+        self.assertEqual(worker_pool_size(config, {"DB_MAX_CONNECTIONS": "100"}), (14, None))
+        size, warning = worker_pool_size(config, {"DB_MAX_CONNECTIONS": "40"})
+        self.assertEqual(size, 10)
+        self.assertIsNone(warning)
+        size, warning = worker_pool_size(config, {"DB_MAX_CONNECTIONS": "20"})
+        self.assertEqual(size, 5)
+        self.assertIn("requests will wait", warning)
+
+    def test_explicit_pool_size_is_kept_but_flagged(self):
+        config = ServeConfig(workers=4, threads=8)
+        self.assertEqual(worker_pool_size(config, {"DB_POOL_SIZE": "0", "DB_MAX_CONNECTIONS": "4"}), (0, None))
+        size, warning = worker_pool_size(config, {"DB_POOL_SIZE": "20", "DB_MAX_CONNECTIONS": "40"})
+        self.assertEqual(size, 20)
+        self.assertIn("exceeds", warning)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(port, path="/", timeout=5.0):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        return response.status, response.read().decode()
+    finally:
+        conn.close()
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "needs fork()")
+class TestArbiter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.tmp.name, "serve_test_app.py"), "w") as f:
+            f.write(TEST_APP)
+        self.port = _free_port()
+        env = dict(os.environ, PYTHONPATH=self.tmp.name)
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.join(BACKEND_DIR, "serve.py"), "--app", "serve_test_app:make_app",
+             "--workers", "2", "--threads", "2", "--port", str(self.port), "--graceful-timeout", "5"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        self.addCleanup(self._cleanup)
+        self._wait_ready()
+
+    def _cleanup(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+        self.tmp.cleanup()
+
+    def _wait_ready(self):
+        deadline = time.time() + 15
+        while time.time() < deadline:
+            try:
+                _get(self.port, timeout=1)
+                return
+            except OSError:
+                time.sleep(0.1)
+        self.fail("serve.py did not start")
+
+    def _worker_pids(self, tries=200):
+        return {_get(self.port)[1] for _ in range(tries)}
+
+    def test_workers_reload_and_drain(self):
+        before = self._worker_pids(50)
+        self.assertNotIn(str(self.proc.pid), before)
+
+        self.proc.send_signal(signal.SIGHUP)
+        deadline = time.time() + 10
+        while time.time() < deadline and not (self._worker_pids(20) - before):
+            time.sleep(0.1)
+        time.sleep(0.5)
+        self.assertFalse(self._worker_pids(50) & before, "old workers still serving after HUP")
+
+        # An in-flight request finishes even though shutdown starts meanwhile
+        result = {}
+        slow = threading.Thread(target=lambda: result.update(r=_get(self.port, "/slow")))
+        slow.start()
+        time.sleep(0.3)
+        self.proc.send_signal(signal.SIGTERM)
+        slow.join(10)
+        self.assertEqual(result["r"][0], 200)
+        self.assertEqual(self.proc.wait(10), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
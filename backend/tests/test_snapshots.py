@@ -0,0 +1,80 @@
+import threading
+import unittest
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+from app.snapshots import Refresh, WriteLog, run_load
+
+
+@contextmanager
+def fake_connection():
+    yield MagicMock()
+
+
+class TestRunLoad(unittest.TestCase):
+    def test_failures_are_logged_not_raised(self):
+        self.assertTrue(run_load("Index", lambda conn: {"rows": 1}, fake_connection))
+        with self.assertLogs('app.snapshots', level='ERROR'):
+            self.assertFalse(run_load("Index", MagicMock(side_effect=RuntimeError("gone")), fake_connection))
+
+
+class TestRefresh(unittest.TestCase):
+    def setUp(self):
+        self.load = MagicMock(return_value={})
+        self.refresh = Refresh("Index", self.load, interval=10)
+        self.refresh.connect = fake_connection
+
+    def at(self, now):
+        with patch('app.snapshots.time.monotonic', return_value=now):
+            usable = self.refresh.usable()
+        if self.refresh._thread is not None:
+            self.refresh._thread.join()
+        return usable
+
+    def test_reloads_when_due_and_stops_serving_when_twice_as_old(self):
+        with patch('app.snapshots.time.monotonic', return_value=100.0):
+            self.refresh.mark_loaded()
+        self.assertTrue(self.at(105.0))
+        self.load.assert_not_called()
+
+        self.assertTrue(self.at(111.0))
+        self.assertEqual(self.load.call_count, 1)
+        # That reload didn't succeed: no new attempt until the interval passes again
+        self.assertTrue(self.at(115.0))
+        self.assertEqual(self.load.call_count, 1)
+
+        self.assertFalse(self.at(121.0))
+        self.assertEqual(self.load.call_count, 2)
+
+    def test_never_loaded_or_disabled(self):
+        self.assertFalse(self.at(5.0))
+        self.assertTrue(Refresh("Index", self.load).usable())
+
+
+
+class TestWriteLog(unittest.TestCase):
+    def test_replays_until_no_new_writes_then_installs(self):
+        lock = threading.Lock()
+        log = WriteLog(2)
+        installed = []
+        reread = []
+        log.record([1], [2])  # not loading: nothing kept
+        log.start()
+        log.record([1, None], [])
+
+        def read_again(media_ids, user_ids):
+            reread.append((media_ids, user_ids))
+            if len(reread) == 1:
+                log.record([], [7])  # a write lands while the first pass reads
+
+        conn = MagicMock()
+        log.replay(lock, read_again, lambda: installed.append(True), conn)
+        self.assertEqual(reread, [({1}, set()), (set(), {7})])
+        # Each pass starts a new snapshot, so it sees writes committed after the scan
+        self.assertEqual(conn.rollback.call_count, 2)
+        self.assertEqual(installed, [True])
+        log.record([3], [])
+        self.assertIsNone(log._pending)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app import db
+from app.metrics import DbMetrics, InstrumentedConnection
+from app.pool import ConnectionPool
+from app.statements import STATEMENTS, PreparedStatements, Statement, attach_prepared, run, statement
+
+TOP = Statement("top", "SELECT MediaId FROM MediaSummary LIMIT %s;\n")
+
+
+def pooled_conn(max_size=8):
+    conn = MagicMock()
+    conn.unread_result = False
+    conn.cursor.side_effect = lambda **kwargs: MagicMock(name=str(kwargs))
+    attach_prepared(conn, max_size)
+    return conn
+
+
+def top_media(conn, limit=5):
+    with run(conn, TOP, (limit,), dictionary=True) as cur:
+        return cur.fetchall()
+
+
+class TestRegistry(unittest.TestCase):
+    def test_statement_is_sql_text_without_terminator(self):
+        self.assertEqual(TOP, "SELECT MediaId FROM MediaSummary LIMIT %s")
+        self.assertEqual(TOP.name, "top")
+
+    def test_names_are_unique(self):
+        statement("test_unique", "SELECT 1")
+        self.assertIs(type(statement("test_unique", "SELECT 1")), Statement)
+        with self.assertRaises(ValueError):
+            statement("test_unique", "SELECT 2")
+
+    def test_db_registers_its_queries(self):
+        for name in ("top_rated_media", "top_rated_media_rollup", "all_users", "insert_review", "find_media"):
+            self.assertIn(name, STATEMENTS)
+
+
+class TestRun(unittest.TestCase):
+    def test_prepared_cursor_is_reused_with_the_same_string(self):
+        conn = pooled_conn()
+        top_media(conn)
+        top_media(conn, 10)
+        conn.cursor.assert_called_once_with(prepared=True, dictionary=True)
+        cur = conn._prepared_statements.checkout(conn, TOP, True)[0]
+        first, second = cur.execute.call_args_list
+        self.assertIs(first.args[0], second.args[0])
+        self.assertEqual(second.args[1], (10,))
+
+    def test_equal_text_from_another_object_reuses_the_first(self):
+        conn = pooled_conn()
+        top_media(conn)
+        with run(conn, Statement("search", str(TOP)), (1,), dictionary=True):
+            pass
+        self.assertEqual(conn.cursor.call_count, 1)
+
+    def test_least_recently_used_cursor_is_closed(self):
+        conn = pooled_conn(max_size=2)
+        for sql in ("SELECT 1", "SELECT 2", "SELECT 1", "SELECT 3"):
+            with run(conn, Statement("s", sql)):
+                pass
+        cache = conn._prepared_statements
+        self.assertEqual(len(cache), 2)
+        with run(conn, Statement("s", "SELECT 1")):
+            pass
+        self.assertEqual(conn.cursor.call_count, 3)
+
+    def test_failed_cursor_is_dropped(self):
+        conn = pooled_conn()
+        with self.assertRaises(RuntimeError):
+            with run(conn, TOP, (1,), dictionary=True) as cur:
+                raise RuntimeError("boom")
+        cur.close.assert_called_once()
+        self.assertEqual(len(conn._prepared_statements), 0)
+
+    def test_unread_rows_are_drained(self):
+        conn = pooled_conn()
+        conn.unread_result = True
+        with run(conn, TOP, (1,), dictionary=True) as cur:
+            cur.fetchone()
+        cur.fetchall.assert_called_once()
+
+    def test_plain_text_and_direct_connections_use_a_fresh_cursor(self):
+        conn = pooled_conn()
+        with run(conn, "SELECT 1", buffered=True):
+            pass
+        conn.cursor.assert_called_once_with(buffered=True)
+        direct = MagicMock()
+        with run(direct, TOP, (1,)) as cur:
+            pass
+        direct.cursor.assert_called_once_with()
+        cur.close.assert_called_once()
+
+    def test_metrics_name_the_db_helper(self):
+        metrics = DbMetrics(slow_ms=0)
+        raw = pooled_conn()
+        top_media(InstrumentedConnection(raw, metrics))
+        self.assertEqual(list(metrics.snapshot()), ["top_media:select_mediasummary"])
+
+
+class TestPooledConnections(unittest.TestCase):
+    @patch('app.db.get_db_metrics', return_value=DbMetrics(enabled=False))
+    def test_cache_is_kept_across_checkouts(self, _):
+        raw = MagicMock()
+        pool = ConnectionPool(lambda: raw, max_size=1)
+        with patch('app.db.get_pool', return_value=pool):
+            with db.db_connection():
+                cache = raw._prepared_statements
+            with db.db_connection():
+                self.assertIs(raw._prepared_statements, cache)
+        self.assertIsInstance(cache, PreparedStatements)
+
+    @patch.dict('os.environ', {'DB_PREPARED_CACHE': '0'})
+    @patch('app.db.get_db_metrics', return_value=DbMetrics(enabled=False))
+    def test_disabled(self, _):
+        raw = MagicMock()
+        pool = ConnectionPool(lambda: raw, max_size=1)
+        with patch('app.db.get_pool', return_value=pool):
+            with db.db_connection():
+                pass
+        self.assertNotIsInstance(raw._prepared_statements, PreparedStatements)
+
+    def test_search_shapes_are_prepared_but_index_id_lists_are_not(self):
+        with patch('app.db.get_search_index') as index:
+            index.return_value.search.return_value = None
+            sql, _ = db._build_search_sql("star", "media", "az", limit=10)
+            self.assertEqual(sql.name, "search_media")
+            index.return_value.search.return_value = [(3, 1.0), (9, 0.5)]
+            sql, _ = db._build_search_sql("star", "media", "az", limit=10)
+            self.assertNotIsInstance(sql, Statement)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app import create_app
+from app.db import suggest_names
+from app.suggest import PrefixIndex, Suggester
+
+
+class TestPrefixIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = PrefixIndex(scan_threshold=2)
+        self.index.adjust("Dune", 5)
+        self.index.adjust("Dark", 9)
+        self.index.adjust("Darkness Falls", 1)
+        self.index.adjust("Arrival", 7)
+
+    def test_completes_case_insensitively_by_weight(self):
+        self.assertEqual(self.index.complete("DA", 10), [("Dark", 9), ("Darkness Falls", 1)])
+        self.assertEqual(self.index.complete("d", 2), [("Dark", 9), ("Dune", 5)])
+
+    def test_no_match(self):
+        self.assertEqual(self.index.complete("zz", 5), [])
+
+    def test_memoised_prefix_sees_weight_changes(self):
+        """A cached top-N for a wide prefix is dropped when a name under it changes."""
+        self.index.complete("d", 3)
+        self.index.adjust("Dune", 10)
+        self.assertEqual(self.index.complete("d", 1), [("Dune", 15)])
+
+    def test_discard(self):
+        self.index.discard("dark")
+        self.assertEqual(self.index.complete("dar", 5), [("Darkness Falls", 1)])
+
+
+class TestSuggester(unittest.TestCase):
+    def setUp(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+        cur.fetchall.side_effect = [
+            [(1, "Drama")],
+            [(10, "Dune", 1, 3), (11, "Dracula", 1, 1)],
+            [(100, "dan", 2), (101, "dana", 2)],
+        ]
+        self.suggester = Suggester(enabled=True, refresh=60)
+        self.suggester.load(conn)
+
+    def test_ranks_across_categories(self):
+        found = self.suggester.complete("d", limit=3)
+        self.assertEqual(
+            [(s["text"], s["type"]) for s in found],
+            [("Drama", "genre"), ("Dune", "media"), ("dan", "user")],
+        )
+
+    def test_review_writes_reweight_names(self):
+        self.suggester.review_added(101, 11, 3)
+        found = self.suggester.complete("d", "media", 1)
+        self.assertEqual(found, [{"text": "Dracula", "type": "media", "weight": 4}])
+        self.assertEqual(self.suggester.complete("dana", "user")[0]["weight"], 5)
+        self.assertEqual(self.suggester.complete("dr", "genre")[0]["weight"], 7)
+
+    def test_rename_moves_weight(self):
+        self.suggester.user_saved(100, "zed")
+        self.assertEqual(self.suggester.complete("dan", "user"), [{"text": "dana", "type": "user", "weight": 2}])
+        self.assertEqual(self.suggester.complete("z", "user")[0]["weight"], 2)
+
+    def test_stale_index_reloads_and_then_defers_to_sql(self):
+        self.suggester._refresh.connect = MagicMock()
+        loaded_at = self.suggester._refresh.loaded_at
+        with patch.object(self.suggester._refresh, '_start') as start:
+            with patch('app.snapshots.time.monotonic', return_value=loaded_at + 61):
+                self.assertIsNotNone(self.suggester.complete("d"))
+            start.assert_called_once()
+            with patch('app.snapshots.time.monotonic', return_value=loaded_at + 121):
+                self.assertIsNone(self.suggester.complete("d"))
+
+    def test_disabled_defers_to_sql(self):
+        self.assertIsNone(Suggester(enabled=False).complete("d"))
+
+
+class TestSuggestSqlFallback(unittest.TestCase):
+    def test_prefix_is_escaped_and_anchored(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+        cur.fetchall.return_value = [{"text": "100% Wolf", "type": "media", "weight": 2}]
+        with patch('app.db.get_pool', return_value=None), \
+                patch('app.db.get_connection', return_value=conn):
+            ok, _, rows = suggest_names("100%", "media", 5)
+        self.assertTrue(ok)
+        self.assertEqual(cur.execute.call_args.args[1], ("100\\%%", 5))
+        self.assertEqual(rows[0]["text"], "100% Wolf")
+
+
+class TestSuggestRoute(unittest.TestCase):
+    def setUp(self):
+        self.client = create_app().test_client()
+
+    @patch('app.routes.suggest_names')
+    def test_returns_suggestions(self, mock_suggest):
+        mock_suggest.return_value = (True, None, [{"text": "Dune", "type": "media", "weight": 3}])
+        response = self.client.get('/api/suggest?q=du&limit=5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json[0]["text"], "Dune")
+        mock_suggest.assert_called_once_with("du", "all", 5)
+
+    def test_empty_prefix_returns_nothing(self):
+        response = self.client.get('/api/suggest?q=')
+        self.assertEqual(response.json, [])
+
+    def test_invalid_category(self):
+        response = self.client.get('/api/suggest?q=a&category=platform')
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import csv
+import os
+import tempfile
+import unittest
+from collections import Counter
+
+from app.bulk_load import _INSERT, _count_rows
+from app.migrate import split_sql
+from synth_data import _IDENTITY_SPACE, SynthConfig, generate, media_identity
+
+
+def read_csv(directory, table):
+    with open(os.path.join(directory, f"{table}.csv"), encoding="utf-8", newline="") as f:
+        return list(csv.reader(f))
+
+
+class TestSynthData(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.config = SynthConfig(users=300, media=200, reviews=3000, shard_size=70, max_per_user=100)
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_output_is_independent_of_worker_count(self):
+        generate(self.config, self.path("a.sql"), workers=1)
+        generate(self.config, self.path("b.sql"), workers=3)
+        generate(self.config._replace(seed=7), self.path("c.sql"), workers=1)
+        with open(self.path("a.sql"), "rb") as a, open(self.path("b.sql"), "rb") as b, open(self.path("c.sql"), "rb") as c:
+            first = a.read()
+            self.assertEqual(first, b.read())
+            self.assertNotEqual(first, c.read())
+        # Shard part files are cleaned up
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ["a.sql", "b.sql", "c.sql"])
+
+    def test_sql_is_multi_row_inserts_the_bulk_loader_understands(self):
+        counts = generate(self.config, self.path("out.sql"), workers=1)
+        with open(self.path("out.sql"), encoding="utf-8") as f:
+            statements = list(split_sql(f.read()))
+        rows = Counter()
+        for stmt in statements:
+            match = _INSERT.match(stmt)
+            if match:
+                rows[match.group(2)] += _count_rows(match.group(3))
+        self.assertEqual(dict(rows), counts)
+        self.assertEqual(statements[0], "USE mediawatchlist")
+
+    def test_csv_rows_satisfy_unique_keys(self):
+        counts = generate(self.config._replace(fmt="csv", media_skew=1.2), self.path("csv"), workers=1)
+
+        header, *media = read_csv(self.path("csv"), "Media")
+        self.assertEqual(header[0], "MediaId")
+        self.assertEqual(len({tuple(m[1:4]) for m in media}), len(media))
+
+        header, *reviews = read_csv(self.path("csv"), "Review")
+        self.assertEqual(header, ["UserId", "MediaId", "Rating", "ReviewText", "Status"])
+        self.assertEqual(len({(r[0], r[1]) for r in reviews}), counts["Review"])
+        self.assertTrue(all(r[4] in ("Planning", "Watching", "Completed", "Havent Watched") for r in reviews))
+        self.assertTrue(all("" not in r for r in reviews))
+
+        # Zipf popularity: the busiest media item sees far more reviews than the median one
+        per_media = sorted(Counter(r[1] for r in reviews).values(), reverse=True)
+        self.assertGreater(per_media[0], 5 * per_media[len(per_media) // 2])
+
+        # Power-law activity: some users review far more than the mean
+        per_user = Counter(r[0] for r in reviews)
+        self.assertGreater(max(per_user.values()), 3 * counts["Review"] / counts["User"])
+
+    def test_media_identity_is_unique_past_the_title_space(self):
+        names = {media_identity(i) for i in range(1, 3001)}
+        self.assertEqual(len(names), 3000)
+        wrapped = media_identity(_IDENTITY_SPACE + 1)
+        self.assertEqual(wrapped[0], media_identity(1)[0] + " Vol. 2")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app import create_app
+from app.tracing import Trace, add_span, span
+
+
+def fake_connection():
+    conn = MagicMock()
+    cur = conn.cursor.return_value
+    cur.with_rows = True
+    cur.fetchall.return_value = [{"UserId": 1, "ProfileName": "ann"}]
+    return conn
+
+
+@patch('app.db.get_pool', return_value=None)
+@patch('app.db.get_connection', side_effect=fake_connection)
+class TestServerTiming(unittest.TestCase):
+    def test_header_breaks_down_the_request(self, *_):
+        response = create_app().test_client().get('/api/users')
+        self.assertEqual(response.status_code, 200)
+        header = response.headers["Server-Timing"]
+        names = [part.split(";")[0] for part in header.split(", ")]
+        self.assertEqual(names, ["db-checkout", "sql", "json", "handler", "total"])
+        self.assertIn('sql;dur=', header)
+        self.assertIn('desc="1x"', header)
+        self.assertIn("Timing-Allow-Origin", response.headers)
+
+    @patch.dict('os.environ', {'TRACE_SAMPLE_RATE': '1'})
+    def test_sampled_requests_are_logged_as_json(self, *_):
+        client = create_app().test_client()
+        with self.assertLogs("app.tracing", "INFO") as logs:
+            client.get('/api/users')
+        trace = json.loads(logs.output[0].split("trace ", 1)[1])
+        self.assertEqual((trace["method"], trace["path"], trace["status"]), ("GET", "/api/users", 200))
+        self.assertIn({"name": "sql", "detail": "fetch_all_users:select_user"},
+                      [{k: s[k] for k in ("name", "detail") if k in s} for s in trace["spans"]])
+
+    @patch.dict('os.environ', {'SERVER_TIMING': '0'})
+    def test_can_be_disabled(self, *_):
+        response = create_app().test_client().get('/api/health')
+        self.assertNotIn("Server-Timing", response.headers)
+
+
+class TestTrace(unittest.TestCase):
+    def test_spans_outside_a_request_are_ignored(self):
+        add_span("sql", 1.0)
+        with span("json"):
+            pass
+
+    def test_handler_time_is_what_the_named_spans_leave(self):
+        trace = Trace("GET", "/x", sampled=False)
+        trace.add("sql", 0.010)
+        trace.add("sql", 0.005)
+        header = trace.server_timing(0.020)
+        self.assertEqual(header, 'sql;dur=15.00;desc="2x", handler;dur=5.00, total;dur=20.00')
+
+
+if __name__ == '__main__':
+    unittest.main()
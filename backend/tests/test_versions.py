@@ -0,0 +1,108 @@
+import unittest
+from unittest.mock import patch
+
+from app import create_app
+from app.db import _after_commit
+from app.versions import DataVersions
+
+
+class TestDataVersions(unittest.TestCase):
+    def test_tag_changes_only_with_the_tables_read(self):
+        versions = DataVersions()
+        review, _ = versions.validators(("Review", "Media"), "/api/top-rated-media")
+        user, _ = versions.validators(("User",), "/api/users")
+        versions.bump(("User",))
+        self.assertEqual(versions.validators(("Media", "Review"), "/api/top-rated-media")[0], review)
+        self.assertNotEqual(versions.validators(("User",), "/api/users")[0], user)
+
+    def test_tag_depends_on_the_url(self):
+        versions = DataVersions()
+        self.assertNotEqual(versions.validators(("Media",), "/api/search?q=a")[0],
+                            versions.validators(("Media",), "/api/search?q=b")[0])
+
+    @patch('app.versions.time.time')
+    def test_tags_roll_over_each_window(self, now):
+        versions = DataVersions(window=30)
+        now.return_value = 1000.0
+        first, modified = versions.validators(("User",), "/k")
+        self.assertEqual(modified.timestamp(), 990)
+        now.return_value = 1019.0
+        self.assertEqual(versions.validators(("User",), "/k")[0], first)
+        now.return_value = 1020.0
+        self.assertNotEqual(versions.validators(("User",), "/k")[0], first)
+
+    @patch('app.db.get_result_cache')
+    def test_writes_bump_through_after_commit(self, _):
+        versions = DataVersions()
+        before = versions.validators(("Review",), "/k")[0]
+        with patch('app.db.get_data_versions', return_value=versions):
+            _after_commit("Review")
+        self.assertNotEqual(versions.validators(("Review",), "/k")[0], before)
+
+
+class TestConditionalRoutes(unittest.TestCase):
+    def setUp(self):
+        self.versions = DataVersions()
+        patcher = patch('app.versions._versions', self.versions)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = create_app().test_client()
+
+    @patch('app.routes.get_top_rated_media')
+    def test_revalidation_skips_the_query(self, query):
+        query.return_value = (True, None, [{"MediaName": "Alien"}])
+        first = self.client.get('/api/top-rated-media')
+        etag = first.headers["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+        self.assertEqual(first.headers["Cache-Control"], "private, no-cache")
+        self.assertIn("Last-Modified", first.headers)
+
+        again = self.client.get('/api/top-rated-media', headers={"If-None-Match": etag})
+        self.assertEqual((again.status_code, again.data), (304, b""))
+        self.assertEqual(again.headers["ETag"], etag)
+        self.assertEqual(query.call_count, 1)
+
+        self.versions.bump(("Review",))
+        changed = self.client.get('/api/top-rated-media', headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["ETag"], etag)
+
+    @patch('app.routes.search_page')
+    def test_search_tags_per_category_and_skips_streams(self, page):
+        page.return_value = (True, None, [], None)
+        user = self.client.get('/api/search?q=a&category=user&limit=5')
+        self.versions.bump(("Platform",))
+        again = self.client.get('/api/search?q=a&category=user&limit=5', headers={"If-None-Match": user.headers["ETag"]})
+        self.assertEqual(again.status_code, 304)
+
+        with patch('app.routes.iter_search', return_value=(row for row in [])):
+            stream = self.client.get('/api/search?stream=1')
+        self.assertNotIn("ETag", stream.headers)
+        self.assertNotIn("ETag", self.client.get('/api/search?category=nope&limit=5').headers)
+
+    def test_failures_and_partial_dashboards_are_not_tagged(self):
+        with patch('app.routes.get_top_rated_media', return_value=(False, "boom", None)):
+            self.assertNotIn("ETag", self.client.get('/api/top-rated-media').headers)
+
+        partial = {"data": {"top_rated_media": []}, "errors": {"low_rated_recent": "timeout"}, "timings_ms": {}}
+        with patch('app.routes.load_dashboard', return_value=partial):
+            response = self.client.get('/api/dashboard')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response.headers)
+        self.assertEqual(response.headers["Cache-Control"], "no-store")
+
+        # /users/all answers [] when the read fails; that must not be revalidated later
+        with patch('app.routes.fetch_all_users', side_effect=RuntimeError("down")):
+            masked = self.client.get('/api/users/all')
+        self.assertEqual((masked.status_code, masked.get_json()), (200, []))
+        self.assertNotIn("ETag", masked.headers)
+        self.assertEqual(masked.headers["Cache-Control"], "no-store")
+
+    def test_disabled_with_a_zero_window(self):
+        self.versions.window = 0
+        with patch('app.routes.fetch_all_users', return_value=[]):
+            self.assertNotIn("ETag", self.client.get('/api/users/all').headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import QueryResults from './QueryResults';
 
 export default function SearchSection() {
@@ -8,25 +8,72 @@ export default function SearchSection() {
   const [results, setResults] = useState({
     loading: false,
     data: null,
-    error: ''
+    error: '',
+    nextCursor: null
   });
 
+  const [suggestions, setSuggestions] = useState([]);
+
+  const PAGE_SIZE = 100;
+
+  // Typeahead: ask /api/suggest once typing pauses; stale replies are ignored
+  useEffect(() => {
+    const prefix = query.trim();
+    if (!prefix) {
+      setSuggestions([]);
+      return undefined;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const params = new URLSearchParams({ q: prefix, category, limit: 8 });
+        const res = await fetch(`/api/suggest?${params}`);
+        if (res.ok && !cancelled) setSuggestions(await res.json());
+      } catch {
+        // Suggestions are best-effort
+      }
+    }, 150);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [query, category]);
+
+  const fetchPage = async (cursor) => {
+    const params = new URLSearchParams({ q: query, category, sort, limit: PAGE_SIZE });
+    if (cursor) params.set('cursor', cursor);
+    const res = await fetch(`/api/search?${params}`);
+    const data = await res.json();
+    if (!res.ok) {
+      throw new Error(data.error || 'Search failed');
+    }
+    return data;
+  };
+
   const handleSearch = async (e) => {
     e.preventDefault();
-    setResults({ loading: true, data: null, error: '' });
+    setResults({ loading: true, data: null, error: '', nextCursor: null });
 
     try {
-      const params = new URLSearchParams({ q: query, category, sort });
-      const res = await fetch(`/api/search?${params}`);
-      const data = await res.json();
+      const page = await fetchPage(null);
+      setResults({ loading: false, data: page.items, error: '', nextCursor: page.next_cursor });
+    } catch (err) {
+      const message = err instanceof TypeError ? 'Network error' : err.message;
+      setResults({ loading: false, data: null, error: message, nextCursor: null });
+    }
+  };
 
-      if (!res.ok) {
-        setResults({ loading: false, data: null, error: data.error || 'Search failed' });
-      } else {
-        setResults({ loading: false, data: data, error: '' });
-      }
+  const loadMore = async () => {
+    try {
+      const page = await fetchPage(results.nextCursor);
+      setResults((prev) => ({
+        ...prev,
+        data: [...(prev.data || []), ...page.items],
+        nextCursor: page.next_cursor
+      }));
     } catch (err) {
-      setResults({ loading: false, data: null, error: 'Network error' });
+      const message = err instanceof TypeError ? 'Network error' : err.message;
+      setResults((prev) => ({ ...prev, error: message, nextCursor: null }));
     }
   };
 
@@ -39,7 +86,14 @@ export default function SearchSection() {
           value={query}
           onChange={(e) => setQuery(e.target.value)}
           className="search-input"
+          list="search-suggestions"
+          autoComplete="off"
         />
+        <datalist id="search-suggestions">
+          {suggestions.map((s) => (
+            <option key={`${s.type}-${s.text}`} value={s.text} />
+          ))}
+        </datalist>
         
         <select 
           value={category} 
@@ -61,6 +115,7 @@ export default function SearchSection() {
         >
           <option value="az">A-Z</option>
           <option value="za">Z-A</option>
+          <option value="relevance">Best Match</option>
           
           {category === 'media' && (
             <>
@@ -94,11 +149,15 @@ export default function SearchSection() {
       {(results.data || results.error) && (
         <div className="search-results-dropdown">
           <div className="results-header-bar">
-            <span>{results.error ? 'Error' : `Results: ${results.data ? results.data.length : 0}`}</span>
+            <span>
+              {results.error
+                ? 'Error'
+                : `Results: ${results.data ? results.data.length : 0}${results.nextCursor ? '+' : ''}`}
+            </span>
             <button 
               type="button" 
               className="close-results-btn"
-              onClick={() => setResults({ ...results, data: null, error: '' })}
+              onClick={() => setResults({ ...results, data: null, error: '', nextCursor: null })}
             >
               ×
             </button>
@@ -109,6 +168,11 @@ export default function SearchSection() {
             loading={results.loading}
             error={results.error}
           />
+          {results.nextCursor && (
+            <button type="button" className="search-button" onClick={loadMore}>
+              Load more
+            </button>
+          )}
         </div>
       )}
     </div>